@@ -0,0 +1,74 @@
+"""
+Compares building the rows of the DB writer through ORM objects (one per payload, as the
+if/elif chain of DBHelper.create_db_record did) with the compiled record mappers.
+
+    python local_tests/benchmark_record_mapping.py
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.record_mapping import RECORD_MAPPERS
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+ROWS = 100000
+
+
+def generate_payloads(rows: int) -> list[dict]:
+    plant_simulation = PlantSimulation(
+        clock=UnthrottledClock(start_time=datetime(2025, 1, 1, 8, 0, 0))
+    )
+    payloads = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: payloads.append(
+            {**event.data["machine_state"], "batch_id": event.data["batch_id"]}
+        ),
+        include_batch_context=True,
+    )
+    plant_simulation.add_batch(block=True)
+    plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return (payloads * (rows // len(payloads) + 1))[:rows]
+
+
+def orm_rows(payloads: list[dict]) -> list[dict]:
+    rows = []
+    for payload in payloads:
+        record = RECORD_MAPPERS[payload["process"]].create_record(payload)
+        rows.append(
+            {
+                column.key: getattr(record, column.key)
+                for column in record.__table__.columns
+                if not column.primary_key
+            }
+        )
+    return rows
+
+
+def compiled_rows(payloads: list[dict]) -> list[dict]:
+    rows = []
+    for payload in payloads:
+        mapper = RECORD_MAPPERS[payload["process"]]
+        rows.append(dict(zip(mapper.columns, mapper.extract(payload))))
+    return rows
+
+
+def measure(name: str, build_rows, payloads: list[dict]) -> float:
+    start_time = time.perf_counter()
+    build_rows(payloads)
+    rows_per_second = len(payloads) / (time.perf_counter() - start_time)
+    print(f"{name:<24} {rows_per_second:>12,.0f} rows/s")
+    return rows_per_second
+
+
+if __name__ == "__main__":
+    payloads = generate_payloads(ROWS)
+    orm_rate = measure("ORM object per row", orm_rows, payloads)
+    compiled_rate = measure("compiled mappers", compiled_rows, payloads)
+    print(f"speed-up: {compiled_rate / orm_rate:.1f}x")
@@ -0,0 +1,91 @@
+"""
+Measures what merging the rows into the rollups (see server/db/rollup.py) adds to a write of the
+DB writer: the payloads are written in chunks of `batch_size`, with and without rollups, to an
+in-memory SQLite database, and the aggregation in Python is timed on its own.
+
+    python local_tests/benchmark_rollup.py
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.db_helper import DBHelper
+from server.db.record_mapping import RECORD_MAPPERS
+from server.db.rollup import aggregate_rows
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+ROWS = 100000
+BATCH_SIZE = 1000
+
+
+def generate_payloads(rows: int) -> list[dict]:
+    plant_simulation = PlantSimulation(
+        clock=UnthrottledClock(start_time=datetime(2025, 1, 1, 8, 0, 0))
+    )
+    payloads = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: payloads.append(
+            {**event.data["machine_state"], "batch_id": event.data["batch_id"]}
+        ),
+        include_batch_context=True,
+    )
+    plant_simulation.add_batch(block=True, seed=7)
+    plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    request = {
+        "process": "batch",
+        "batch_id": payloads[0]["batch_id"],
+        "seed": 7,
+        "timestamp": payloads[0]["timestamp"],
+    }
+    return [request, *(payloads * (rows // len(payloads) + 1))[:rows]]
+
+
+def measure_writes(name: str, payloads: list[dict], rollups: bool) -> float:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    database_helper = DBHelper(engine=engine, wal_directory=None, rollups=rollups)
+    start_time = time.perf_counter()
+    for start in range(0, len(payloads), BATCH_SIZE):
+        database_helper.write_records(payloads[start : start + BATCH_SIZE])
+    rows_per_second = len(payloads) / (time.perf_counter() - start_time)
+    print(f"{name:<24} {rows_per_second:>12,.0f} rows/s")
+    return rows_per_second
+
+
+def measure_aggregation(payloads: list[dict]) -> float:
+    records_by_table = {}
+    for payload in payloads:
+        mapper = RECORD_MAPPERS[payload["process"]]
+        records_by_table.setdefault(mapper.table, []).append(
+            dict(zip(mapper.columns, mapper.extract(payload)))
+        )
+    # every row belongs to one request, as in the writes
+    requests = {payloads[0]["batch_id"]: ([datetime.min], [1])}
+    start_time = time.perf_counter()
+    for table, records in records_by_table.items():
+        for start in range(0, len(records), BATCH_SIZE):
+            aggregate_rows(table, records[start : start + BATCH_SIZE], requests)
+    rows_per_second = len(payloads) / (time.perf_counter() - start_time)
+    print(f"{'aggregation only':<24} {rows_per_second:>12,.0f} rows/s")
+    return rows_per_second
+
+
+if __name__ == "__main__":
+    payloads = generate_payloads(ROWS)
+    without_rate = measure_writes("writes without rollups", payloads, rollups=False)
+    with_rate = measure_writes("writes with rollups", payloads, rollups=True)
+    measure_aggregation(payloads[1:])
+    print(f"rollup overhead: {without_rate / with_rate - 1:.0%} of the write time")
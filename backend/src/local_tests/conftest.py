@@ -0,0 +1,39 @@
+import sys
+import os
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def empty_sqlite_engine():
+    # stands in for PostgreSQL: one in-memory database shared by the connections
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+
+    # transactions (and savepoints) like PostgreSQL's: pysqlite's own BEGIN comes too late for a
+    # transaction starting with a SAVEPOINT (see the SQLAlchemy SQLite dialect documentation)
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_engine(empty_sqlite_engine):
+    # imported here: server.db.db needs the PostgreSQL driver, which the other tests do not
+    from server.db.db import Base
+
+    Base.metadata.create_all(empty_sqlite_engine)
+    return empty_sqlite_engine
@@ -0,0 +1,96 @@
+import sys
+import os
+import asyncio
+import time
+from datetime import datetime
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import ScaledClock, UnthrottledClock
+from simulation.factory import Batch, BatchQueueFullError, PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def create_slow_plant(max_queued_batches):
+    # slow enough that nothing leaves the queue (nor keeps running after the test)
+    return PlantSimulation(
+        clock=ScaledClock(speed_factor=1e-3, start_time=START_TIME),
+        max_queued_batches=max_queued_batches,
+    )
+
+
+def wait_for_queue_state(plant_simulation, predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate(plant_simulation.get_queue_state()):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def fill_queue(plant_simulation, max_queued_batches):
+    # the first batch starts straight away, the next ones wait in the queue
+    plant_simulation.add_batch(Batch(batch_id="running"))
+    assert wait_for_queue_state(
+        plant_simulation, lambda state: state["running_batches"] == 1
+    )
+    for index in range(max_queued_batches):
+        plant_simulation.add_batch(Batch(batch_id=f"queued-{index}"))
+
+
+def test_queue_capacity_is_configurable():
+    plant_simulation = create_slow_plant(max_queued_batches=5)
+    fill_queue(plant_simulation, 5)
+    queue_state = plant_simulation.get_queue_state()
+    assert queue_state["queued_batches"] == 5
+    assert queue_state["available_places"] == 0
+    assert plant_simulation.get_current_plant_state()["queue"]["queued_batches"] == 5
+    with pytest.raises(BatchQueueFullError) as error:
+        plant_simulation.add_batch(Batch(batch_id="rejected"))
+    # the place frees up when the running batch leaves the mixing machines
+    assert error.value.retry_after > 0
+    assert error.value.retry_after == pytest.approx(
+        plant_simulation.get_queue_state()["estimated_wait_seconds"], abs=0.5
+    )
+    # still a ValueError for the callers of the previous hard limit
+    assert isinstance(error.value, ValueError)
+
+
+def test_blocking_submission_times_out_when_no_place_frees_up():
+    plant_simulation = create_slow_plant(max_queued_batches=1)
+    fill_queue(plant_simulation, 1)
+    with pytest.raises(BatchQueueFullError):
+        plant_simulation.add_batch(Batch(batch_id="late"), block=True, timeout=0.1)
+
+
+def test_blocking_and_async_submissions_wait_for_a_place():
+    plant_simulation = PlantSimulation(
+        clock=UnthrottledClock(start_time=START_TIME), max_queued_batches=1
+    )
+    batch_ids = [f"B{index}" for index in range(4)]
+    for batch_id in batch_ids[:2]:
+        plant_simulation.add_batch(Batch(batch_id=batch_id), block=True, timeout=10)
+
+    async def submit_remaining():
+        return [
+            await plant_simulation.add_batch_async(Batch(batch_id=batch_id), timeout=10)
+            for batch_id in batch_ids[2:]
+        ]
+
+    assert asyncio.run(submit_remaining()) == batch_ids[2:]
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=30)
+    queue_state = plant_simulation.get_queue_state()
+    assert queue_state["queued_batches"] == 0
+    assert queue_state["waiting_submissions"] == 0
+
+
+def test_async_submission_times_out_when_no_place_frees_up():
+    plant_simulation = create_slow_plant(max_queued_batches=1)
+    fill_queue(plant_simulation, 1)
+    with pytest.raises(BatchQueueFullError):
+        asyncio.run(
+            plant_simulation.add_batch_async(Batch(batch_id="late"), timeout=0.1)
+        )
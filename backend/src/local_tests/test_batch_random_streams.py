@@ -0,0 +1,83 @@
+import sys
+import os
+from datetime import datetime
+import numpy as np
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import Batch, PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def run_batches(seeds, execution_mode="scheduler"):
+    """Runs a batch per seed, returns the plant, the batches and the seeds of the BATCH_REQUESTED events."""
+    plant_simulation = PlantSimulation(
+        clock=UnthrottledClock(start_time=START_TIME),
+        execution_mode=execution_mode,
+        max_workers=2,
+    )
+    requested_seeds = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.BATCH_REQUESTED,
+        lambda event: requested_seeds.append(event.data["seed"]),
+    )
+    batches = [Batch(batch_id=f"B{index}", seed=seed) for index, seed in enumerate(seeds)]
+    for batch in batches:
+        plant_simulation.add_batch(batch, block=True)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return plant_simulation, batches, requested_seeds
+
+
+def get_inspection_properties(batch):
+    return {
+        line_type: batch.get_batch_model(line_type).get_properties()
+        for line_type in ["anode", "cathode"]
+    }
+
+
+def test_batches_with_the_same_seed_are_reproduced():
+    _, batches, requested_seeds = run_batches([7, 7, 8])
+    assert requested_seeds == [7, 7, 8]
+    first, second, other = map(get_inspection_properties, batches)
+    assert first == second
+    assert first != other
+    assert (
+        batches[0].get_batch_model("cell").get_properties()
+        == batches[1].get_batch_model("cell").get_properties()
+    )
+
+
+def test_worker_processes_draw_the_same_streams():
+    _, (scheduler_batch,), _ = run_batches([11])
+    _, (worker_batch,), _ = run_batches([11], execution_mode="process_line")
+    assert get_inspection_properties(scheduler_batch) == get_inspection_properties(
+        worker_batch
+    )
+
+
+def test_stage_generators_are_independent_of_the_run_order():
+    batch = Batch(batch_id="B", seed=3)
+    slitting_draws = batch.get_random_generator("anode", "slitting").random(4)
+    batch.get_random_generator("anode", "inspection").random(4)
+    assert np.array_equal(
+        batch.get_random_generator("anode", "slitting").random(4), slitting_draws
+    )
+    assert not np.array_equal(
+        batch.get_random_generator("cathode", "slitting").random(4), slitting_draws
+    )
+    # a batch without a seed gets a random one, recorded for replays
+    assert Batch(batch_id="C").seed != Batch(batch_id="D").seed
+
+
+def test_recompute_reproduces_the_random_stages():
+    plant_simulation, (batch,), _ = run_batches([5])
+    result = plant_simulation.recompute_batch_from_stage("B0", "anode", "slitting")
+    assert (
+        result["recomputed_stages"]["anode"]["inspection"]
+        == batch.get_batch_model("anode").get_properties()
+    )
@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.binary_format import BinaryFrameEncoder, decode_machine_frame
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import PlantSimulation
+from server.live_view import MachineDataCoalescer
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def run_batch_frame():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    coalescer = MachineDataCoalescer()
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        coalescer.update,
+        include_batch_context=True,
+    )
+    plant_simulation.add_batch(block=True)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return coalescer.take_frame()
+
+
+def test_frame_round_trip_is_smaller_than_json():
+    events, coalesced_steps = run_batch_frame()
+    encoder = BinaryFrameEncoder()
+    frame = encoder.encode_machine_frame(events, coalesced_steps)
+    schema_message = json.loads(encoder.get_schema_message(frame.schema_ids))
+    decoded = decode_machine_frame(frame.payload, schema_message["data"]["schemas"])
+
+    assert decoded["coalesced_steps"] == coalesced_steps
+    assert len(decoded["machines"]) == len(events) == 16
+    for event, machine in zip(events, decoded["machines"]):
+        assert machine["machine_id"] == event.data["machine_id"]
+        assert machine["batch_id"] == event.data["batch_id"]
+        assert machine["timestamp"] == datetime.fromisoformat(event.timestamp).isoformat()
+        assert machine["fields"]
+    json_frame = json.dumps(
+        [
+            {
+                "machine_id": event.data["machine_id"],
+                "batch_id": event.data["batch_id"],
+                "timestamp": event.timestamp,
+                "machine_state": event.data["machine_state"],
+            }
+            for event in events
+        ]
+    )
+    assert len(frame.payload) * 3 < len(json_frame.encode())
+    # the layouts are known now: the same machines reuse their schema
+    assert encoder.encode_machine_frame(events, 1).schema_ids == frame.schema_ids
@@ -0,0 +1,70 @@
+import sys
+import os
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.batch_summary import BatchSummaryCollector
+from server.db.batch_summary_query import get_batch_summaries, get_batch_summary
+from server.db.db_helper import DBHelper
+
+
+def create_summary(collector, batch_id, capacity, overall, defect_risk, seconds):
+    for process, battery_model in [
+        ("inspection_anode", {"Overall": True}),
+        ("inspection_cathode", {"Overall": overall}),
+        ("formation_cycling_cell", {"Capacity_Ah": capacity}),
+        ("aging_cell", {"defect_risk": defect_risk, "Final_OCV_V": 3.0}),
+    ]:
+        # the first and the last step of the stage
+        for timestamp in ["2025-01-01T08:00:00", f"2025-01-01T08:00:{seconds:02d}"]:
+            collector.update(
+                batch_id,
+                {
+                    "process": process,
+                    "timestamp": timestamp,
+                    "duration": 0,
+                    "battery_model": battery_model,
+                    "machine_parameters": {"speed": 1.0},
+                },
+            )
+    return collector.complete(batch_id, f"2025-01-01T08:01:{seconds:02d}")
+
+
+def test_summaries_are_written_and_sorted_by_quality(sqlite_engine, tmp_path):
+    engine = sqlite_engine
+    database_helper = DBHelper(
+        engine=engine,
+        wal_directory=None,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    collector = BatchSummaryCollector()
+    payloads = [
+        create_summary(collector, "1", 2.0, True, False, 10),
+        create_summary(collector, "2", 3.0, False, False, 20),
+        create_summary(collector, "3", 1.0, True, True, 30),
+        create_summary(collector, "4", 2.5, True, False, 40),
+    ]
+    assert [payload["passed"] for payload in payloads] == [True, False, False, True]
+
+    assert database_helper.write_records(payloads) == 4
+
+    with engine.connect() as connection:
+        by_capacity = get_batch_summaries(connection, sort_by="capacity_Ah")
+        assert [summary["batch"] for summary in by_capacity] == ["2", "4", "1", "3"]
+        passed = get_batch_summaries(
+            connection, sort_by="capacity_Ah", descending=False, passed=True
+        )
+        assert [summary["batch"] for summary in passed] == ["1", "4"]
+        assert [s["batch"] for s in get_batch_summaries(connection, defect_risk=True)] == [
+            "3"
+        ]
+        summary = get_batch_summary(connection, "2")
+        assert summary["cathode_inspection_passed"] is False
+        assert summary["duration_s"] == 80.0
+        assert summary["stage_parameters"]["aging_cell"] == {"speed": 1.0}
+        assert summary["stage_durations_s"]["inspection_anode"] == 20.0
+        assert get_batch_summary(connection, "5") is None
+        with pytest.raises(ValueError):
+            get_batch_summaries(connection, sort_by="seed")
@@ -0,0 +1,74 @@
+import sys
+import os
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.db_helper import DBHelper
+from server.db.model_table import AnodeMixing
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def run_batch_payloads():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    payloads = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: payloads.append(
+            {**event.data["machine_state"], "batch_id": event.data["batch_id"]}
+        ),
+        include_batch_context=True,
+    )
+    plant_simulation.add_batch(block=True, seed=7)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return payloads
+
+
+def test_payloads_are_written_in_bulk_per_table(sqlite_engine, tmp_path):
+    engine = sqlite_engine
+    database_helper = DBHelper(
+        engine=engine,
+        wal_directory=str(tmp_path / "db_write_ahead_log"),
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    payloads = run_batch_payloads()
+    batch_payload = {
+        "process": "batch",
+        "batch_id": "1",
+        "seed": 7,
+        "timestamp": START_TIME.isoformat(),
+    }
+    unknown_payload = {"process": "unknown_machine", "timestamp": START_TIME.isoformat()}
+
+    written = database_helper.write_records([batch_payload, *payloads, unknown_payload])
+
+    assert written == len(payloads) + 1
+    expected_rows = Counter(
+        DBHelper.create_db_record(payload).__table__.name
+        for payload in [batch_payload, *payloads]
+    )
+    with engine.connect() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name.startswith("rollup_"):
+                # aggregates of the rows (see test_db_rollup)
+                continue
+            count = connection.scalar(select(func.count()).select_from(table))
+            assert count == expected_rows[table.name]
+        first_mixing = connection.execute(
+            select(AnodeMixing).order_by(AnodeMixing.id).limit(1)
+        ).one()
+    mixing_payload = next(
+        payload for payload in payloads if payload["process"] == "mixing_anode"
+    )
+    assert first_mixing.batch == "1"
+    assert first_mixing.timestamp == datetime.fromisoformat(mixing_payload["timestamp"])
+    assert first_mixing.viscosity_Pa_s == mixing_payload["battery_model"]["viscosity"]
@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.db_helper import DBHelper
+from server.db.model_table import BatchRecord
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def create_sqlite_engine(directory):
+    # a file, so that the test reads through its own connection while the worker writes
+    engine = create_engine(f"sqlite:///{directory / 'telemetry.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def queue_batches(database_helper, count):
+    for seed in range(count):
+        database_helper.queue_data(
+            {
+                "process": "batch",
+                "batch_id": str(seed),
+                "seed": seed,
+                "timestamp": (START_TIME + timedelta(seconds=seed)).isoformat(),
+            }
+        )
+
+
+def count_rows(engine):
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(BatchRecord))
+
+
+def wait_for_rows(engine, count, timeout):
+    deadline = time.monotonic() + timeout
+    while count_rows(engine) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return count_rows(engine)
+
+
+def test_a_full_flush_size_is_written_without_waiting_for_the_interval(tmp_path):
+    engine = create_sqlite_engine(tmp_path)
+    database_helper = DBHelper(
+        batch_size=100,
+        flush_size=100,
+        interval=60,
+        engine=engine,
+        wal_directory=None,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    database_helper.start_worker()
+    try:
+        # the whole queue is drained, in chunks of 100 rows
+        queue_batches(database_helper, 1050)
+        assert wait_for_rows(engine, 1000, timeout=5) >= 1000
+        assert database_helper.get_statistics()["flushes"] >= 10
+        assert database_helper.get_statistics()["last_error"] is None
+    finally:
+        database_helper.stop_worker()
+    # what was left is written when the worker stops
+    assert count_rows(engine) == 1050
+
+
+def test_a_few_rows_are_written_after_the_interval(tmp_path):
+    engine = create_sqlite_engine(tmp_path)
+    database_helper = DBHelper(
+        flush_size=100,
+        interval=0.05,
+        engine=engine,
+        wal_directory=None,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    database_helper.start_worker()
+    try:
+        queue_batches(database_helper, 3)
+        assert wait_for_rows(engine, 3, timeout=5) == 3
+    finally:
+        database_helper.stop_worker()
@@ -0,0 +1,93 @@
+import sys
+import os
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, inspect, text
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.db_helper import DBHelper
+from server.db.migrations import (
+    create_missing_indexes,
+    get_partitions,
+    get_telemetry_tables,
+)
+
+
+def test_existing_tables_get_the_batch_and_time_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'telemetry.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # a table created before the indexes existed
+        connection.execute(text("DROP INDEX ix_mixing_anode_batch_timestamp"))
+        connection.execute(text("DROP INDEX ix_mixing_anode_timestamp_brin"))
+
+    assert sorted(create_missing_indexes(engine)) == [
+        "ix_mixing_anode_batch_timestamp",
+        "ix_mixing_anode_timestamp_brin",
+    ]
+    indexes = {
+        index["name"]: index["column_names"]
+        for index in inspect(engine).get_indexes("mixing_anode")
+    }
+    assert indexes["ix_mixing_anode_batch_timestamp"] == ["batch", "timestamp"]
+    assert create_missing_indexes(engine) == []
+    assert len(get_telemetry_tables()) == 16 and "batch" not in get_telemetry_tables()
+
+
+def test_partitions_cover_the_time_range():
+    assert get_partitions(
+        "aging", datetime(2025, 11, 30, 8), datetime(2026, 1, 2), "month"
+    ) == [
+        ("aging_p202511", datetime(2025, 11, 1), datetime(2025, 12, 1)),
+        ("aging_p202512", datetime(2025, 12, 1), datetime(2026, 1, 1)),
+        ("aging_p202601", datetime(2026, 1, 1), datetime(2026, 2, 1)),
+    ]
+    assert [
+        name
+        for name, _, _ in get_partitions(
+            "aging", datetime(2025, 12, 31, 23), datetime(2026, 1, 1, 1), "day"
+        )
+    ] == ["aging_p20251231", "aging_p20260101"]
+
+
+def test_partitions_of_a_failed_write_are_created_again(empty_sqlite_engine, tmp_path):
+    engine = empty_sqlite_engine
+    created = []
+
+    # SQLite has no partitions: the DDL is recorded and replaced by a no-op
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def record_partitions(connection, cursor, statement, parameters, context, executemany):
+        if "PARTITION OF" in statement:
+            created.append(statement.split('"')[1])
+            return "SELECT 1", ()
+        return statement, parameters
+
+    database_helper = DBHelper(
+        engine=engine,
+        wal_directory=None,
+        partition_interval="day",
+        rollups=False,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    payload = {
+        "process": "mixing_anode",
+        "batch_id": "1",
+        "timestamp": "2025-01-01T08:00:00",
+        "duration": 1,
+        "machine_parameters": {},
+        "battery_model": {},
+    }
+    # no tables yet: the insert fails and the partition is rolled back with it
+    database_helper.queue_data(dict(payload))
+    assert database_helper.flush() == 0
+    assert created == ["mixing_anode_p20250101"]
+
+    Base.metadata.create_all(engine)
+    database_helper.queue_data(dict(payload))
+    database_helper.queue_data(dict(payload))
+    assert database_helper.flush() == 2
+    database_helper.queue_data(dict(payload))
+    assert database_helper.flush() == 1
+    assert created == ["mixing_anode_p20250101", "mixing_anode_p20250101"]
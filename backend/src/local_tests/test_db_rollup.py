@@ -0,0 +1,200 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db_helper import DBHelper
+from server.db.migrations import rebuild_rollups
+from server.db.model_table import AnodeCalendaring, BatchRollup, TimeRollup
+from server.db.rollup import choose_resolution, get_batch_rollup, get_time_rollup
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def simulation_payloads():
+    """The requests of the batches (see EventHandler) and their machine data."""
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    requests = []
+    payloads = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.BATCH_REQUESTED,
+        lambda event: requests.append(
+            {
+                "process": "batch",
+                "batch_id": event.data["batch_id"],
+                "seed": event.data["seed"],
+                "timestamp": event.timestamp,
+            }
+        ),
+    )
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: payloads.append(
+            {**event.data["machine_state"], "batch_id": event.data["batch_id"]}
+        ),
+        include_batch_context=True,
+    )
+    plant_simulation.add_batch(block=True, seed=7)
+    plant_simulation.add_batch(block=True, seed=8)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=120)
+    return requests, payloads
+
+
+def shift(payloads, delay):
+    """The payloads of a later run of the server, whose batch ids started again from 1."""
+    return [
+        {
+            **payload,
+            "timestamp": (datetime.fromisoformat(payload["timestamp"]) + delay).isoformat(),
+        }
+        for payload in payloads
+    ]
+
+
+def get_expected_batch_rollup(connection):
+    """The aggregates of the per-step rows, computed by the database."""
+    column = AnodeCalendaring.__table__.c.porosity
+    return {
+        row.batch: row[1:]
+        for row in connection.execute(
+            select(
+                AnodeCalendaring.batch,
+                func.count(column),
+                func.min(column),
+                func.max(column),
+                func.avg(column),
+            ).group_by(AnodeCalendaring.batch)
+        )
+    }
+
+
+def get_batch_rollup_values(connection):
+    return {
+        row["batch"]: (
+            row["sample_count"],
+            row["min_value"],
+            row["max_value"],
+            row["mean_value"],
+        )
+        for row in get_batch_rollup(connection, "calendaring_anode", "porosity")
+    }
+
+
+def test_rollups_follow_the_written_rows(simulation_payloads, sqlite_engine, tmp_path):
+    requests, payloads = simulation_payloads
+    engine = sqlite_engine
+    database_helper = DBHelper(
+        engine=engine,
+        wal_directory=None,
+        rollups=True,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+
+    # merged across flushes
+    database_helper.write_records(requests)
+    half = len(payloads) // 2
+    database_helper.write_records(payloads[:half])
+    database_helper.write_records(payloads[half:])
+
+    with engine.connect() as connection:
+        expected = get_expected_batch_rollup(connection)
+        actual = get_batch_rollup_values(connection)
+        assert set(actual) == {"1", "2"}
+        for batch, values in expected.items():
+            assert actual[batch][:3] == values[:3]
+            assert actual[batch][3] == pytest.approx(values[3])
+
+        last_row = connection.execute(
+            select(AnodeCalendaring)
+            .order_by(AnodeCalendaring.timestamp.desc(), AnodeCalendaring.id.desc())
+            .limit(1)
+        ).one()
+        start = START_TIME
+        end = last_row.timestamp + timedelta(seconds=1)
+        resolution, buckets = get_time_rollup(
+            connection, "calendaring_anode", "porosity", start, end, "minute"
+        )
+        assert resolution == "minute"
+        assert sum(bucket["sample_count"] for bucket in buckets) == sum(
+            count for count, *_ in expected.values()
+        )
+        assert buckets[-1]["last_value"] == last_row.porosity
+        _, hours = get_time_rollup(
+            connection, "calendaring_anode", "porosity", start, end, "hour"
+        )
+        assert len(hours) <= len(buckets)
+        # a boolean column is rolled up as a rate
+        defect_rates = get_batch_rollup(connection, "aging", "defect_risk")
+        assert all(0 <= row["mean_value"] <= 1 for row in defect_rates)
+
+        before = {
+            table.name: connection.execute(select(table).order_by(table.c.id)).all()
+            for table in [BatchRollup.__table__, TimeRollup.__table__]
+        }
+
+    rebuild_rollups(engine, chunk_size=50)
+    with engine.connect() as connection:
+        rebuilt_values = get_batch_rollup_values(connection)
+        assert set(rebuilt_values) == set(actual)
+        for batch, values in actual.items():
+            assert rebuilt_values[batch] == pytest.approx(values)
+        for table in [BatchRollup.__table__, TimeRollup.__table__]:
+            rebuilt = connection.execute(select(func.count()).select_from(table)).scalar()
+            assert rebuilt == len(before[table.name])
+
+
+def test_batches_of_a_restarted_server_are_rolled_up_apart(
+    simulation_payloads, sqlite_engine, tmp_path
+):
+    requests, payloads = simulation_payloads
+    database_helper = DBHelper(
+        engine=sqlite_engine,
+        wal_directory=None,
+        rollups=True,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    database_helper.write_records(requests + payloads)
+    # unknown run: rolled up over time only
+    database_helper.write_records(
+        [{**payload, "batch_id": "3"} for payload in payloads[:10]]
+    )
+    with sqlite_engine.connect() as connection:
+        first_run = get_batch_rollup(connection, "calendaring_anode", "porosity")
+
+    delay = timedelta(days=1)
+    database_helper.write_records(shift(requests, delay) + shift(payloads, delay))
+
+    with sqlite_engine.connect() as connection:
+        rollup = get_batch_rollup(connection, "calendaring_anode", "porosity")
+        assert [row["batch"] for row in rollup] == ["1", "2", "1", "2"]
+        assert len({row["batch_record_id"] for row in rollup}) == 4
+        # the rollups of the first run are left as they were
+        assert rollup[:2] == first_run
+        for first, second in zip(rollup[:2], rollup[2:]):
+            assert second["sample_count"] == first["sample_count"]
+            assert second["first_timestamp"] == first["first_timestamp"] + delay
+    rebuild_rollups(sqlite_engine)
+    with sqlite_engine.connect() as connection:
+        rebuilt = get_batch_rollup(connection, "calendaring_anode", "porosity")
+        assert [row["batch_record_id"] for row in rebuilt] == [
+            row["batch_record_id"] for row in rollup
+        ]
+        assert [row["sample_count"] for row in rebuilt] == [
+            row["sample_count"] for row in rollup
+        ]
+
+
+def test_resolution_fits_the_range():
+    start = datetime(2025, 1, 1)
+    assert choose_resolution(start, start + timedelta(hours=6)) == "minute"
+    assert choose_resolution(start, start + timedelta(days=2)) == "hour"
+    assert choose_resolution(start, start + timedelta(days=365)) == "hour"
+    assert choose_resolution(start, start + timedelta(hours=6), max_points=100) == "hour"
@@ -0,0 +1,149 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.db_helper import DBHelper
+from server.db.model_table import BatchRecord
+from server.db.write_ahead_log import WriteAheadLog
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def batch_payloads(seeds):
+    return [
+        {
+            "process": "batch",
+            "batch_id": str(seed),
+            "seed": seed,
+            "timestamp": (START_TIME + timedelta(seconds=seed)).isoformat(),
+        }
+        for seed in seeds
+    ]
+
+
+def get_written_seeds(engine):
+    with engine.connect() as connection:
+        return list(
+            connection.scalars(select(BatchRecord.seed).order_by(BatchRecord.id))
+        )
+
+
+def test_payloads_wait_on_disk_while_the_database_is_unavailable(
+    tmp_path, empty_sqlite_engine
+):
+    # no tables yet: every write fails, like a database that is restarting
+    engine = empty_sqlite_engine
+    database_helper = DBHelper(
+        queue_size=10, batch_size=5, engine=engine, wal_directory=str(tmp_path)
+    )
+    for payload in batch_payloads(range(8)):
+        database_helper.queue_data(payload)
+    assert database_helper.flush() == 0
+    # the failed batch is on disk, the queue keeps the later payloads behind it
+    assert database_helper.get_statistics()["write_ahead_log"]["pending_records"] == 5
+    for payload in batch_payloads(range(8, 20)):
+        database_helper.queue_data(payload)
+    database_helper.flush()
+
+    Base.metadata.create_all(engine)
+    while database_helper.flush():
+        pass
+
+    assert get_written_seeds(engine) == list(range(20))
+    statistics = database_helper.get_statistics()
+    assert statistics["dropped"] == 0 and statistics["queued"] == 0
+    assert statistics["write_ahead_log"]["pending_records"] == 0
+    # 5 failed, then 11 spilled when the queue overflowed; the last 4 were written from memory
+    assert statistics["write_ahead_log"]["replayed"] == 16
+    assert os.listdir(tmp_path) == []
+
+
+def test_full_queue_spills_instead_of_dropping(tmp_path, sqlite_engine):
+    engine = sqlite_engine
+    database_helper = DBHelper(
+        queue_size=10, batch_size=100, engine=engine, wal_directory=str(tmp_path)
+    )
+    for payload in batch_payloads(range(25)):
+        database_helper.queue_data(payload)
+    statistics = database_helper.get_statistics()
+    assert statistics["queued"] + statistics["write_ahead_log"]["spilled"] == 25
+    while database_helper.flush():
+        pass
+    assert get_written_seeds(engine) == list(range(25))
+
+
+def test_spilled_payloads_survive_a_restart(tmp_path, sqlite_engine):
+    WriteAheadLog(str(tmp_path), segment_size=4).append(batch_payloads(range(10)))
+    engine = sqlite_engine
+    database_helper = DBHelper(engine=engine, wal_directory=str(tmp_path))
+    assert database_helper.get_statistics()["write_ahead_log"]["pending_segments"] == 3
+    database_helper.queue_data(batch_payloads([10])[0])
+    database_helper.flush()
+    assert get_written_seeds(engine) == list(range(11))
+
+
+def test_without_a_log_the_oldest_payloads_are_dropped(sqlite_engine, tmp_path):
+    database_helper = DBHelper(
+        queue_size=10,
+        engine=sqlite_engine,
+        wal_directory=None,
+        failed_writes_log=str(tmp_path / "failed_db_writes.log"),
+    )
+    for payload in batch_payloads(range(25)):
+        database_helper.queue_data(payload)
+    assert database_helper.get_statistics()["dropped"] == 15
+    assert [payload["seed"] for payload in database_helper.db_queue] == list(
+        range(15, 25)
+    )
+
+
+def test_without_a_log_failed_writes_are_reported(empty_sqlite_engine, tmp_path):
+    failed_writes_log = tmp_path / "failed_db_writes.log"
+    database_helper = DBHelper(
+        engine=empty_sqlite_engine,
+        wal_directory=None,
+        failed_writes_log=str(failed_writes_log),
+    )
+    for payload in batch_payloads(range(3)):
+        database_helper.queue_data(payload)
+    assert database_helper.flush() == 0
+    assert database_helper.get_statistics()["dropped"] == 3
+    assert "Failed to save 3 records" in failed_writes_log.read_text()
+
+
+def test_a_rejected_payload_does_not_block_the_log(tmp_path, sqlite_engine):
+    dead_letter_file = tmp_path / "failed_db_records.jsonl"
+    payloads = batch_payloads(range(4))
+    # the state is required: the database rejects the row, however often it is written again
+    rejected = {
+        "process": "mixing_cathode",
+        "batch_id": "1",
+        "state": None,
+        "timestamp": START_TIME.isoformat(),
+    }
+    WriteAheadLog(str(tmp_path / "log")).append(payloads[:2] + [rejected] + payloads[2:])
+    database_helper = DBHelper(
+        engine=sqlite_engine,
+        wal_directory=str(tmp_path / "log"),
+        dead_letter_file=str(dead_letter_file),
+    )
+    for payload in batch_payloads(range(4, 9)):
+        database_helper.queue_data(payload)
+
+    assert database_helper.flush() == 9
+    assert get_written_seeds(sqlite_engine) == list(range(9))
+    statistics = database_helper.get_statistics()
+    assert statistics["written"] == 9 and statistics["queued"] == 0
+    assert statistics["dead_letters"] == 1 and statistics["last_error"] is None
+    assert statistics["write_ahead_log"]["pending_segments"] == 0
+    lines = dead_letter_file.read_text().splitlines()
+    assert len(lines) == 1
+    dead_letter = json.loads(lines[0])
+    assert dead_letter["payload"] == rejected and "NOT NULL" in dead_letter["error"]
@@ -0,0 +1,157 @@
+import sys
+import os
+import time
+from datetime import datetime
+from threading import Event, Thread
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.dispatch import AsyncDispatch, OverflowPolicy
+from simulation.event_bus.events import EventBus, PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+DATA_GENERATED = PlantSimulationEventType.MACHINE_DATA_GENERATED
+
+
+class GatedListener:
+    """Listener blocked on its first event until the gate opens, to fill its queue."""
+
+    def __init__(self):
+        self.received = []
+        self.started = Event()
+        self.gate = Event()
+
+    def __call__(self, event):
+        self.started.set()
+        self.gate.wait(timeout=5)
+        self.received.append((event.data["machine_id"], event.data["step"]))
+
+
+def emit_steps(event_bus, steps, machine_ids=("mixing",)):
+    for step in steps:
+        for machine_id in machine_ids:
+            event_bus.emit_plant_simulation_event(
+                DATA_GENERATED, {"machine_id": machine_id, "step": step}
+            )
+
+
+def fill_queue(overflow_policy, steps, machine_ids=("mixing",), max_queue_size=3):
+    event_bus = EventBus()
+    listener = GatedListener()
+    event_bus.subscribe(
+        DATA_GENERATED,
+        listener,
+        AsyncDispatch(max_queue_size=max_queue_size, overflow_policy=overflow_policy),
+    )
+    emit_steps(event_bus, [0], machine_ids[:1])
+    assert listener.started.wait(timeout=5)
+    emit_steps(event_bus, steps, machine_ids)
+    return event_bus, listener
+
+
+def test_slow_listener_does_not_slow_the_emitter():
+    event_bus = EventBus()
+    received = []
+
+    def slow_listener(event):
+        time.sleep(0.01)
+        received.append(event.data["step"])
+
+    event_bus.subscribe(DATA_GENERATED, slow_listener, AsyncDispatch())
+    start_time = time.perf_counter()
+    emit_steps(event_bus, range(50))
+    assert time.perf_counter() - start_time < 0.25
+    assert event_bus.wait_until_dispatched(timeout=5)
+    assert received == list(range(50))
+    statistics = event_bus.get_dispatch_statistics()[0]
+    assert statistics["delivered"] == 50 and statistics["queued_events"] == 0
+    assert statistics["max_lag_seconds"] > 0.1
+
+
+def test_drop_oldest_keeps_the_latest_events():
+    event_bus, listener = fill_queue(OverflowPolicy.DROP_OLDEST, range(1, 11))
+    assert event_bus.get_dispatch_statistics()[0]["queued_events"] == 3
+    listener.gate.set()
+    assert event_bus.wait_until_dispatched(timeout=5)
+    assert [step for _, step in listener.received] == [0, 8, 9, 10]
+    assert event_bus.get_dispatch_statistics()[0]["dropped"] == 7
+
+
+def test_coalesce_delivers_the_latest_event_of_every_machine():
+    event_bus, listener = fill_queue(
+        OverflowPolicy.COALESCE, range(1, 11), machine_ids=("coating", "drying")
+    )
+    listener.gate.set()
+    assert event_bus.wait_until_dispatched(timeout=5)
+    assert listener.received == [("coating", 0), ("coating", 10), ("drying", 10)]
+    statistics = event_bus.get_dispatch_statistics()[0]
+    assert (statistics["coalesced"], statistics["dropped"]) == (18, 0)
+
+
+def test_coalesce_keeps_every_batch_event():
+    event_bus = EventBus()
+    started, gate = Event(), Event()
+    received = []
+
+    def listener(event):
+        started.set()
+        gate.wait(timeout=5)
+        received.append(event.data["batch_id"])
+
+    event_bus.subscribe(
+        PlantSimulationEventType.BATCH_COMPLETED,
+        listener,
+        AsyncDispatch(max_queue_size=10, overflow_policy=OverflowPolicy.COALESCE),
+    )
+    for batch_id in ["1", "2", "3", "4"]:
+        event_bus.emit_plant_simulation_event(
+            PlantSimulationEventType.BATCH_COMPLETED, {"batch_id": batch_id}
+        )
+        assert started.wait(timeout=5)
+    gate.set()
+    assert event_bus.wait_until_dispatched(timeout=5)
+    # not machine events: none of them replaced another while they were pending
+    assert received == ["1", "2", "3", "4"]
+    assert event_bus.get_dispatch_statistics()[0]["coalesced"] == 0
+
+
+def test_block_makes_the_emitter_wait_for_a_place():
+    event_bus, listener = fill_queue(OverflowPolicy.BLOCK, range(1, 4))
+    emitter = Thread(target=emit_steps, args=(event_bus, [4]))
+    emitter.start()
+    emitter.join(timeout=0.2)
+    assert emitter.is_alive()
+    listener.gate.set()
+    emitter.join(timeout=5)
+    assert event_bus.wait_until_dispatched(timeout=5)
+    assert [step for _, step in listener.received] == [0, 1, 2, 3, 4]
+
+
+def test_batch_context_is_attached_when_the_event_is_emitted():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    received = []
+
+    def slow_listener(event):
+        time.sleep(0.0001)
+        received.append((event.data["machine_id"], event.data["batch_id"]))
+
+    plant_simulation.subscribe_to_event(
+        DATA_GENERATED,
+        slow_listener,
+        include_batch_context=True,
+        dispatch=AsyncDispatch(
+            max_queue_size=100000, overflow_policy=OverflowPolicy.BLOCK
+        ),
+    )
+    for _ in range(2):
+        plant_simulation.add_batch(block=True)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    assert plant_simulation.wait_until_events_are_dispatched(timeout=60)
+    batch_ids = [
+        batch_id for machine_id, batch_id in received if machine_id == "aging_cell"
+    ]
+    # every step of the last stage was delivered with the batch it belonged to
+    assert batch_ids == sorted(batch_ids) and set(batch_ids) == {"1", "2"}
@@ -0,0 +1,168 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.event_handler import EventHandler, get_event_topics
+from server.state_delta import StateDeltaEncoder
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEvent, PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+class RecordingConnectionManager:
+    def __init__(self):
+        self.messages = []
+        self.threads = set()
+        self.state_delta_encoder = StateDeltaEncoder()
+
+    def has_recipients(self, topics) -> bool:
+        return True
+
+    def has_binary_clients(self) -> bool:
+        return False
+
+    async def publish(self, message: str, topics, binary_frame=None):
+        self.threads.add(threading.get_ident())
+        self.messages.append(json.loads(message))
+
+    async def publish_frame(self, frame, binary_frame=None):
+        # a single client without subscriptions
+        await self.publish(frame.encode(self.state_delta_encoder), frame.topics)
+
+
+def test_notifications_are_broadcast_on_the_server_loop():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    websocket_manager = RecordingConnectionManager()
+    event_handler = EventHandler(plant_simulation, websocket_manager)
+
+    async def serve():
+        await event_handler.start_broadcaster()
+        event_handler.initialise_system_subscriptions()
+        # the plant runs (and emits) on its scheduler thread
+        plant_simulation.add_batch()
+        await asyncio.to_thread(plant_simulation.wait_until_plant_simulation_is_idle, 60)
+        await asyncio.to_thread(plant_simulation.wait_until_events_are_dispatched, 60)
+        await event_handler.wait_until_broadcasted()
+        await event_handler.stop_broadcaster()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(serve())
+    assert websocket_manager.threads == {loop_thread}
+    statuses = [message["status"] for message in websocket_manager.messages]
+    assert statuses[0] == "batch_requested" and statuses[-1] == "batch_completed"
+    assert all(
+        message["data"]["batch_id"] == "1" for message in websocket_manager.messages
+    )
+
+
+def test_notifications_are_dropped_before_the_broadcaster_starts():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    websocket_manager = RecordingConnectionManager()
+    event_handler = EventHandler(plant_simulation, websocket_manager)
+    event_handler.initialise_system_subscriptions()
+    plant_simulation.add_batch()
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    assert plant_simulation.wait_until_events_are_dispatched(timeout=60)
+    assert websocket_manager.messages == []
+
+
+def test_events_are_indexed_by_their_topics():
+    machine_event = PlantSimulationEvent(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        data={"machine_id": "electrolyte_filling_cell", "batch_id": "3"},
+    )
+    assert get_event_topics(machine_event) == [
+        ("event_type", "data_generated"),
+        ("batch_id", "3"),
+        ("machine_id", "electrolyte_filling_cell"),
+        ("line_type", "cell"),
+    ]
+    line_event = PlantSimulationEvent(
+        PlantSimulationEventType.BATCH_COMPLETED_CATHODE_LINE, data={"batch_id": "3"}
+    )
+    assert ("line_type", "cathode") in get_event_topics(line_event)
+
+
+class RecordingDatabaseHelper:
+    def __init__(self):
+        self.records = []
+
+    def queue_data(self, payload):
+        self.records.append(payload)
+
+
+def test_machine_data_is_coalesced_into_frames_for_the_live_view():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    websocket_manager = RecordingConnectionManager()
+    database_helper = RecordingDatabaseHelper()
+    # frames are sent on demand below
+    event_handler = EventHandler(
+        plant_simulation,
+        websocket_manager,
+        database_helper,
+        live_view_rate_hz=1e-3,
+    )
+    completed = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.BATCH_COMPLETED, completed.append
+    )
+
+    async def serve():
+        await event_handler.start_broadcaster()
+        event_handler.initialise_system_subscriptions()
+        plant_simulation.add_batch()
+        await asyncio.to_thread(plant_simulation.wait_until_plant_simulation_is_idle, 60)
+        await asyncio.to_thread(plant_simulation.wait_until_events_are_dispatched, 60)
+        event_handler.send_live_view_frame()
+        # nothing ran since the last frame
+        event_handler.send_live_view_frame()
+        await event_handler.wait_until_broadcasted()
+        await event_handler.stop_broadcaster()
+
+    asyncio.run(serve())
+    frames = [
+        message
+        for message in websocket_manager.messages
+        if message["status"] == "data_generated"
+    ]
+    machine_records = [
+        record
+        for record in database_helper.records
+        if record.get("process") not in ["batch", "batch_summary"]
+    ]
+    # one frame with the last state of the 16 machines, the database got every step
+    assert len(frames) == 1
+    assert len(frames[0]["data"]["machines"]) == 16
+    assert frames[0]["data"]["coalesced_steps"] == len(machine_records)
+    assert len(machine_records) > 16
+    assert {record["batch_id"] for record in machine_records} == {"1"}
+    # one summary of the batch, queued after its machine data
+    assert database_helper.records[-1]["process"] == "batch_summary"
+    summary = database_helper.records[-1]
+    # the final models and seed come with the event, not from the plant
+    batch_state = completed[0].data["batch_state"]
+    assert summary["batch_id"] == "1" and summary["seed"] == batch_state["seed"]
+    assert (
+        summary["final_ocv_v"]
+        == batch_state["current_cell_line_model"]["Final_OCV_V"]
+    )
+    assert len(summary["stage_properties"]) == 16
+    assert summary["stage_properties"]["aging_cell"] == machine_records[-1]["battery_model"]
+    assert summary["passed"] == (
+        summary["anode_inspection_passed"]
+        and summary["cathode_inspection_passed"]
+        and not summary["defect_risk"]
+    )
+    statistics = event_handler.get_live_view_statistics()
+    assert (statistics["frames"], statistics["received_steps"]) == (
+        1,
+        len(machine_records),
+    )
@@ -0,0 +1,37 @@
+import sys
+import os
+
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.experiment_jobs import ExperimentJobs, ExperimentQueueFullError
+from simulation.experiments import Factor, ParameterSweep
+
+
+def create_sweep():
+    return ParameterSweep(
+        [Factor("anode", "coating", "coating_speed", values=[0.05, -0.01])],
+        replicates=2,
+        seed=3,
+        max_workers=1,
+    )
+
+
+def test_experiments_run_in_the_background():
+    experiment_jobs = ExperimentJobs(max_pending=2, max_finished=1)
+    first_id = experiment_jobs.submit(create_sweep())
+    second_id = experiment_jobs.submit(create_sweep())
+    # two are pending already
+    with pytest.raises(ExperimentQueueFullError):
+        experiment_jobs.submit(create_sweep())
+    assert experiment_jobs.get(first_id)["status"] in ["queued", "running"]
+
+    assert experiment_jobs.wait_until_finished(second_id, timeout=60)
+    experiment = experiment_jobs.get(second_id)
+    assert experiment["status"] == "completed" and experiment["error"] is None
+    assert experiment["result"]["n_runs"] == 2
+    # only the last finished experiment is kept
+    assert experiment_jobs.get(first_id) is None
+    assert experiment_jobs.get("unknown") is None
+    experiment_jobs.shutdown()
@@ -0,0 +1,250 @@
+import sys
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import ScaledClock, UnthrottledClock
+from simulation.event_bus.events import EventBus, PlantSimulationEventType
+from simulation.battery_model import (
+    MixingModel,
+    CoatingModel,
+    DryingModel,
+    CalendaringModel,
+    RewindingModel,
+    ElectrolyteFillingModel,
+    FormationCyclingModel,
+    AgingModel,
+    ElectrodeInspectionModel,
+)
+from simulation.machine import MixingMachine, FormationCyclingMachine
+from simulation.process_parameters.Parameters import (
+    MixingParameters,
+    CoatingParameters,
+    DryingParameters,
+    CalendaringParameters,
+    RewindingParameters,
+    ElectrolyteFillingParameters,
+    FormationCyclingParameters,
+    AgingParameters,
+    ElectrodeInspectionParameters,
+)
+
+
+def step_through(model, params, n_steps):
+    """Reference: the per-step path used by BaseMachine.run_simulation."""
+    rows = []
+    for t in range(n_steps):
+        model.update_properties(params, t)
+        rows.append(model.get_properties())
+    return rows
+
+
+def replay(model, params, n_steps, **step_inputs):
+    trajectory = model.compute_trajectory(params, n_steps, **step_inputs)
+    rows = []
+    for t in range(n_steps):
+        model.apply_trajectory_step(trajectory, t)
+        rows.append(model.get_properties())
+    return rows
+
+
+def assert_rows_match(expected_rows, actual_rows):
+    assert len(expected_rows) == len(actual_rows)
+    for expected, actual in zip(expected_rows, actual_rows):
+        assert expected.keys() == actual.keys()
+        for key, value in expected.items():
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+
+
+def mixed_slurry():
+    model = MixingModel("Anode")
+    for component, amount in [("AM", 99), ("CA", 9), ("PVDF", 10), ("solvent", 82)]:
+        model.add(component, amount)
+    model.update_properties(None)
+    return model
+
+
+def rewinding_input():
+    electrode = SimpleNamespace(final_thickness=100e-6, porosity=0.3, final_width=0.5)
+    return RewindingModel(electrode, electrode)
+
+
+COATING_PARAMS = CoatingParameters(
+    coating_speed=0.05, gap_height=200e-6, flow_rate=5e-6, coating_width=0.5
+)
+
+
+@pytest.mark.parametrize(
+    "make_model, params, n_steps",
+    [
+        (
+            lambda: CoatingModel(mixed_slurry()),
+            COATING_PARAMS,
+            20,
+        ),
+        (
+            lambda: DryingModel(
+                SimpleNamespace(wet_thickness=2e-4, solid_content=0.5)
+            ),
+            DryingParameters(web_speed=0.05),
+            200,
+        ),
+        (
+            lambda: CalendaringModel(
+                SimpleNamespace(dry_thickness=1.5e-4), initial_porosity=0.4
+            ),
+            CalendaringParameters(
+                roll_gap=100e-6,
+                roll_pressure=5e6,
+                temperature=80,
+                roll_speed=0.1,
+                dry_thickness=100e-6,
+                initial_porosity=0.4,
+            ),
+            60,
+        ),
+        (
+            rewinding_input,
+            RewindingParameters(
+                rewinding_speed=0.5,
+                initial_tension=100.0,
+                tapering_steps=0.3,
+                environment_humidity=30.0,
+            ),
+            24,
+        ),
+        (
+            lambda: ElectrolyteFillingModel(rewinding_input()),
+            ElectrolyteFillingParameters(
+                vacuum_level=100, vacuum_filling=60, soaking_time=10
+            ),
+            10,
+        ),
+        (
+            lambda: FormationCyclingModel(
+                SimpleNamespace(eta_wetting=0.95, V_elec_filling=0.1)
+            ),
+            FormationCyclingParameters(
+                charge_current_A=0.05, charge_voltage_limit_V=4.2, initial_voltage=1
+            ),
+            201,
+        ),
+        (
+            lambda: AgingModel(
+                SimpleNamespace(sei_efficiency=0.9, capacity=1.8, voltage=4.2)
+            ),
+            AgingParameters(k_leak=1e-3, temperature=25, aging_time_days=10),
+            240,
+        ),
+    ],
+)
+def test_trajectory_matches_step_by_step_updates(make_model, params, n_steps):
+    assert_rows_match(
+        step_through(make_model(), params, n_steps),
+        replay(make_model(), params, n_steps),
+    )
+
+
+def test_seeded_inspection_draws_the_same_noise_on_both_paths():
+    def make_model():
+        model = ElectrodeInspectionModel(
+            SimpleNamespace(
+                width_final=0.5,
+                dry_thickness=1e-4,
+                epsilon_width=0.01,
+                burr_factor=0.05,
+                porosity=0.25,
+            )
+        )
+        model.rng = np.random.default_rng(7)
+        return model
+
+    params = ElectrodeInspectionParameters(
+        epsilon_width_max=0.1, epsilon_thickness_max=1e-10, B_max=2.0, D_surface_max=1
+    )
+    expected = step_through(make_model(), params, 20)
+    # the limits are tight enough for the verdicts to depend on the draws
+    assert len({row["Overall"] for row in expected}) == 2
+    assert_rows_match(expected, replay(make_model(), params, 20))
+
+
+def test_drying_trajectory_refills_solvent_like_the_step_loop():
+    # a long stage makes the solvent mass reach 0 and be refilled several times
+    make_model = lambda: DryingModel(
+        SimpleNamespace(wet_thickness=2e-6, solid_content=0.5)
+    )
+    params = DryingParameters(web_speed=0.05)
+    expected = step_through(make_model(), params, 500)
+    assert min(row["M_solvent"] for row in expected) == 0
+    assert_rows_match(expected, replay(make_model(), params, 500))
+
+
+def test_mixing_machine_addition_schedule_matches_step_logic():
+    params = MixingParameters(
+        AM_ratio=0.495, CA_ratio=0.045, PVDF_ratio=0.05, solvent_ratio=0.41
+    )
+    machine = MixingMachine(
+        process_name="mixing_anode",
+        mixing_model=MixingModel("Anode"),
+        mixing_parameters=params,
+    )
+    machine.pre_run_check()
+    volumes = machine.prepare_trajectory()["volumes"]
+    for t in range(machine.total_steps):
+        machine.step_logic(t)
+        for component in ("AM", "CA", "PVDF", "solvent"):
+            assert volumes[component][t] == pytest.approx(
+                getattr(machine.battery_model, component)
+            )
+
+
+def run_formation_machine(clock):
+    params = FormationCyclingParameters(
+        charge_current_A=0.05, charge_voltage_limit_V=4.2, initial_voltage=1
+    )
+    event_bus = EventBus(clock=clock)
+    events = []
+    for event_type in [
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        PlantSimulationEventType.MACHINE_SIMULATION_ERROR,
+    ]:
+        event_bus.subscribe(event_type, events.append)
+    machine = FormationCyclingMachine(
+        process_name="formation_cycling_cell",
+        formation_cycling_parameters=params,
+        event_bus=event_bus,
+        clock=clock,
+    )
+    machine.receive_model_from_previous_process(
+        SimpleNamespace(eta_wetting=0.95, V_elec_filling=0.1)
+    )
+    machine.run_simulation(verbose=False)
+    return events, machine.battery_model.get_properties()
+
+
+def test_fast_mode_stops_where_step_logic_raises():
+    stepped_events, stepped_final = run_formation_machine(ScaledClock(1e9))
+    fast_events, fast_final = run_formation_machine(UnthrottledClock())
+    assert [event.event_type for event in fast_events] == [
+        event.event_type for event in stepped_events
+    ]
+    assert fast_events[-1].event_type == (
+        PlantSimulationEventType.MACHINE_SIMULATION_ERROR
+    )
+    assert fast_final == pytest.approx(stepped_final)
+
+
+def test_aging_defect_risk_is_a_boolean_flag():
+    model = AgingModel(SimpleNamespace(sei_efficiency=0.9, capacity=1.8, voltage=4.2))
+    model.update_properties(
+        AgingParameters(k_leak=1e-8, temperature=25, aging_time_days=10), 0
+    )
+    assert model.get_properties()["defect_risk"] is False
+    trajectory = model.compute_trajectory(
+        AgingParameters(k_leak=1e-3, temperature=25, aging_time_days=10), 240
+    )
+    assert trajectory["defect_risk"].dtype == np.bool_
+    assert not trajectory["defect_risk"][0] and trajectory["defect_risk"][-1]
@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import UnthrottledClock
+from simulation.battery_model import MixingModel, RewindingModel
+from simulation.factory.FactoryStructure import FACTORY_LINES, create_factory_structure
+from simulation.monte_carlo import MonteCarloSimulation
+
+
+def run_single_batch():
+    """Reference: one batch through the machines, the way the plant runs it."""
+    machines = create_factory_structure(clock=UnthrottledClock())
+    final_models = {}
+    for line_type in ["anode", "cathode", "cell"]:
+        if line_type == "cell":
+            model = RewindingModel(final_models["anode"], final_models["cathode"])
+        else:
+            model = MixingModel(line_type.capitalize())
+        for stage in FACTORY_LINES[line_type]:
+            machine = machines[line_type][stage]
+            machine.receive_model_from_previous_process(model)
+            machine.run_simulation(verbose=False)
+            model = machine.empty_model()
+            final_models[(line_type, stage)] = model
+        final_models[line_type] = model
+    return final_models
+
+
+@pytest.fixture(scope="module")
+def result():
+    return MonteCarloSimulation(n_batches=20000, seed=7).run()
+
+
+def test_deterministic_properties_match_a_single_batch(result):
+    reference = run_single_batch()
+    checks = [
+        ("anode", "coating", "wet_thickness"),
+        ("anode", "drying", "M_solvent"),
+        ("cathode", "calendaring", "porosity"),
+        ("cell", "rewinding", "L_wound"),
+        ("cell", "electrolyte_filling", "eta_wetting"),
+        ("cell", "formation_cycling", "voltage"),
+        ("cell", "aging", "SOC"),
+    ]
+    for line_type, stage, property_name in checks:
+        values = result.get_property_values(line_type, stage, property_name)
+        expected = getattr(reference[(line_type, stage)], property_name)
+        assert values == pytest.approx(np.full(result.n_batches, expected))
+
+
+def test_noise_is_drawn_per_batch(result):
+    widths = result.get_property_values("anode", "slitting", "width_final")
+    assert np.std(widths) == pytest.approx(0.05, rel=0.05)
+    temperatures = result.get_property_values("cathode", "mixing", "temperature")
+    assert 24 <= temperatures.min() and temperatures.max() <= 26
+    assert np.std(temperatures) > 0.5
+
+
+def test_pass_rate_combines_every_stage(result):
+    passed = result.get_passed_batches()
+    inspection = {
+        line_type: result.stage_passed[line_type]["inspection"]
+        for line_type in ["anode", "cathode"]
+    }
+    assert np.array_equal(passed, inspection["anode"] & inspection["cathode"])
+    # a width deviation above 0.1 (2 sigma) fails the inspection of an electrode
+    assert result.get_stage_pass_rates()["anode"]["inspection"] == pytest.approx(
+        0.954, abs=0.01
+    )
+    assert result.pass_rate == pytest.approx(0.954**2, abs=0.01)
+    summary = result.get_summary()
+    assert summary["stage_distributions"]["anode"]["slitting"]["defect_risk"][
+        "rate"
+    ] == pytest.approx(1 - summary["stage_pass_rates"]["anode"]["slitting"])
+
+
+def test_seeded_runs_are_reproducible():
+    first = MonteCarloSimulation(n_batches=100, seed=3).run()
+    second = MonteCarloSimulation(n_batches=100, seed=3).run()
+    assert np.array_equal(
+        first.get_property_values("cell", "rewinding", "final_width"),
+        second.get_property_values("cell", "rewinding", "final_width"),
+    )
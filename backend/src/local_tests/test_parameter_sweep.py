@@ -0,0 +1,90 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.experiments import (
+    Factor,
+    ParameterSweep,
+    count_design_points,
+    create_design_points,
+)
+
+
+def test_grid_design_is_every_combination():
+    points = create_design_points(
+        [
+            Factor("anode", "coating", "coating_speed", values=[0.04, 0.05, 0.06]),
+            Factor("cathode", "calendaring", "roll_pressure", values=[4e6, 5e6]),
+        ],
+        design="grid",
+    )
+    assert len(points) == 6
+    assert {
+        (point["anode.coating.coating_speed"], point["cathode.calendaring.roll_pressure"])
+        for point in points
+    } == {(speed, pressure) for speed in [0.04, 0.05, 0.06] for pressure in [4e6, 5e6]}
+
+
+def test_runs_are_counted_without_creating_the_points():
+    # 10 factors of 10 values: 10^10 points, never allocated
+    factors = [
+        Factor("anode", "coating", "coating_speed", values=list(range(10)))
+        for _ in range(10)
+    ]
+    assert count_design_points(factors) == 10**10
+    assert count_design_points(factors, "latin_hypercube", n_samples=10**9) == 10**9
+
+
+def test_latin_hypercube_has_one_sample_per_stratum():
+    n_samples = 10
+    points = create_design_points(
+        [
+            Factor("anode", "coating", "coating_speed", low=0.03, high=0.08),
+            Factor("anode", "calendaring", "roll_gap", low=80e-6, high=120e-6),
+        ],
+        design="latin_hypercube",
+        n_samples=n_samples,
+        seed=1,
+    )
+    speeds = np.array([point["anode.coating.coating_speed"] for point in points])
+    strata = np.floor((speeds - 0.03) / (0.08 - 0.03) * n_samples)
+    assert sorted(strata) == list(range(n_samples))
+
+
+def test_invalid_factors_are_rejected():
+    with pytest.raises(ValueError):
+        create_design_points([Factor("anode", "coating", "unknown", values=[1])])
+    with pytest.raises(ValueError):
+        create_design_points(
+            [Factor("anode", "coating", "coating_speed", values=[1])],
+            design="random",
+            n_samples=3,
+        )
+
+
+def test_sweep_returns_a_column_per_factor_and_output():
+    sweep = ParameterSweep(
+        [
+            Factor("anode", "mixing", "AM_ratio", values=[0.45, 0.495]),
+            Factor("anode", "coating", "coating_speed", values=[0.05, -0.01]),
+        ],
+        replicates=20,
+        seed=3,
+        max_workers=1,
+    )
+    result = sweep.run()
+    assert result.n_runs == 4
+    columns = result.columns
+    assert columns["anode.coating.coating_speed"] == [0.05, -0.01, 0.05, -0.01]
+    # a negative speed is invalid: the run is kept with its error
+    assert columns["error"][1] is not None and columns["error"][0] is None
+    assert columns["pass_rate"][1] is None
+    assert np.isnan(result.get_column("anode.coating.wet_thickness")[1])
+    # the solvent takes up the remainder of the varied ratio, so both ratios are valid
+    assert columns["error"][0] is None and columns["error"][2] is None
+    assert columns["anode.mixing.AM"][0] < columns["anode.mixing.AM"][2]
+    assert all(0 <= rate <= 1 for rate in columns["anode.inspection.pass_rate"][::2])
+    assert set(result.get_rows()[0]) == set(columns)
@@ -0,0 +1,156 @@
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import ScaledClock, UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import Batch, PlantSimulation
+from simulation.scheduler import DiscreteEventScheduler, SimulationResource
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def run_plant(batch_ids, observe_machine_data=False):
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    log = []
+    for event_type in PlantSimulationEventType:
+        if (
+            event_type == PlantSimulationEventType.MACHINE_DATA_GENERATED
+            and not observe_machine_data
+        ):
+            continue
+        plant_simulation.subscribe_to_event(
+            event_type,
+            lambda event: log.append(
+                (
+                    event.event_type,
+                    event.timestamp,
+                    event.data.get("batch_id"),
+                    event.data.get("machine_id"),
+                )
+            ),
+            include_batch_context=True,
+        )
+
+    def request_remaining_batches(event):
+        # runs under the plant's lock: every batch is queued before the scheduler moves on
+        if event.data["batch_id"] == batch_ids[0]:
+            for batch_id in batch_ids[1:]:
+                plant_simulation.add_batch(Batch(batch_id=batch_id))
+
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.BATCH_REQUESTED, request_remaining_batches
+    )
+    plant_simulation.add_batch(Batch(batch_id=batch_ids[0]))
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return plant_simulation, log
+
+
+def event_times(log, event_type):
+    return {
+        batch_id: datetime.fromisoformat(timestamp)
+        for logged_type, timestamp, batch_id, _ in log
+        if logged_type == event_type
+    }
+
+
+def test_scheduler_runs_events_in_time_then_scheduling_order():
+    scheduler = DiscreteEventScheduler(UnthrottledClock(start_time=START_TIME))
+    order = []
+    done = threading.Event()
+    scheduler.schedule(START_TIME + timedelta(seconds=2), order.append, "late")
+    scheduler.schedule(START_TIME + timedelta(seconds=1), order.append, "first")
+    scheduler.schedule(START_TIME + timedelta(seconds=1), order.append, "second")
+    scheduler.schedule(START_TIME + timedelta(seconds=3), done.set)
+    assert done.wait(timeout=5)
+    assert order == ["first", "second", "late"]
+
+
+def test_an_event_scheduled_now_runs_before_a_later_head_event():
+    clock = ScaledClock(1.0)
+    scheduler = DiscreteEventScheduler(clock)
+    order = []
+    ran = threading.Event()
+    scheduler.schedule(clock.now() + timedelta(seconds=3), order.append, "later")
+    # the worker is waiting for the later event
+    time.sleep(0.2)
+    start = time.monotonic()
+    scheduler.schedule_now(lambda: (order.append("now"), ran.set()))
+    assert ran.wait(timeout=5)
+    assert time.monotonic() - start < 0.5
+    assert order == ["now"]
+
+
+def test_resource_is_granted_in_request_order():
+    scheduler = DiscreteEventScheduler(UnthrottledClock(start_time=START_TIME))
+    resource = SimulationResource("machine", scheduler)
+    granted = []
+    done = threading.Event()
+
+    def use(name, hold_seconds):
+        granted.append((name, scheduler.now()))
+        scheduler.schedule(
+            scheduler.now() + timedelta(seconds=hold_seconds), resource.release
+        )
+
+    def request_all():
+        for name in ["a", "b", "c"]:
+            resource.request(lambda name=name: use(name, 5))
+
+    scheduler.schedule(START_TIME, request_all)
+    scheduler.schedule(START_TIME + timedelta(seconds=20), done.set)
+    assert done.wait(timeout=5)
+    assert [name for name, _ in granted] == ["a", "b", "c"]
+    assert [time for _, time in granted] == [
+        START_TIME + timedelta(seconds=seconds) for seconds in (0, 5, 10)
+    ]
+    assert not resource.busy
+
+
+def test_batches_share_the_pipeline_without_threads_per_batch():
+    threads_before = threading.active_count()
+    plant_simulation, log = run_plant(["B1", "B2", "B3"])
+    # the scheduler thread is the only thread the plant adds
+    assert threading.active_count() <= threads_before + 1
+    started = event_times(log, PlantSimulationEventType.BATCH_STARTED_PROCESSING)
+    completed = event_times(log, PlantSimulationEventType.BATCH_COMPLETED)
+    assert list(completed) == ["B1", "B2", "B3"]
+    # the next batch starts as soon as the mixing machines are free, before the previous one completes
+    mixing_duration = started["B2"] - started["B1"]
+    assert mixing_duration == started["B3"] - started["B2"] > timedelta(0)
+    assert started["B2"] < completed["B1"]
+    state = plant_simulation.get_current_plant_state()
+    assert state["batch_requests"] == [] and state["running_batches"] == []
+
+
+def test_machines_are_used_by_one_batch_at_a_time():
+    _, log = run_plant(["B1", "B2", "B3"], observe_machine_data=True)
+    running = {}
+    for event_type, _, batch_id, machine_id in log:
+        if event_type == PlantSimulationEventType.MACHINE_TURNED_ON:
+            assert machine_id not in running
+            running[machine_id] = batch_id
+        elif event_type == PlantSimulationEventType.MACHINE_TURNED_OFF:
+            assert running.pop(machine_id) == batch_id
+        elif event_type == PlantSimulationEventType.MACHINE_DATA_GENERATED:
+            assert running[machine_id] == batch_id
+    assert running == {}
+
+
+def test_unthrottled_runs_are_deterministic():
+    def simulated_events(log):
+        # requests are emitted by the caller's thread, the rest of the run by the scheduler
+        return [
+            event
+            for event in log
+            if event[0] != PlantSimulationEventType.BATCH_REQUESTED
+        ]
+
+    _, first_log = run_plant(["B1", "B2"], observe_machine_data=True)
+    _, second_log = run_plant(["B1", "B2"], observe_machine_data=True)
+    assert simulated_events(first_log) == simulated_events(second_log)
@@ -0,0 +1,85 @@
+import sys
+import os
+from datetime import datetime
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.battery_model import AgingModel, ElectrodeInspectionModel
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEventType
+from simulation.factory import Batch, PlantSimulation
+from simulation.process_pool import export_model_state, import_model_state
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+BATCH_IDS = ["B1", "B2", "B3"]
+
+
+def run_plant(execution_mode):
+    plant_simulation = PlantSimulation(
+        clock=UnthrottledClock(start_time=START_TIME),
+        execution_mode=execution_mode,
+        max_workers=2,
+    )
+    log = []
+    for event_type in PlantSimulationEventType:
+        if event_type == PlantSimulationEventType.MACHINE_DATA_GENERATED:
+            continue
+        plant_simulation.subscribe_to_event(
+            event_type,
+            lambda event: log.append(
+                (
+                    event.event_type,
+                    event.data.get("batch_id"),
+                    event.data.get("machine_id"),
+                )
+            ),
+            include_batch_context=True,
+        )
+    batches = [Batch(batch_id=batch_id) for batch_id in BATCH_IDS]
+    for batch in batches:
+        plant_simulation.add_batch(batch)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=120)
+    return batches, log
+
+
+def events_of_batch(log, batch_id):
+    return [
+        (event_type, machine_id)
+        for event_type, logged_batch_id, machine_id in log
+        if logged_batch_id == batch_id
+        and event_type != PlantSimulationEventType.BATCH_REQUESTED
+    ]
+
+
+@pytest.fixture(scope="module")
+def scheduler_log():
+    return run_plant("scheduler")[1]
+
+
+@pytest.mark.parametrize("execution_mode", ["process_batch", "process_line"])
+def test_worker_events_are_replayed_like_the_scheduler_emits_them(
+    execution_mode, scheduler_log
+):
+    batches, log = run_plant(execution_mode)
+    for batch_id in BATCH_IDS:
+        events = events_of_batch(log, batch_id)
+        # lines running at the same simulated time may interleave differently
+        assert sorted(events, key=str) == sorted(
+            events_of_batch(scheduler_log, batch_id), key=str
+        )
+        assert events[0][0] == PlantSimulationEventType.BATCH_STARTED_PROCESSING
+        assert events[-1][0] == PlantSimulationEventType.BATCH_COMPLETED
+    # the models computed by the workers are brought back into the batches
+    for batch in batches:
+        assert isinstance(batch.get_batch_model("anode"), ElectrodeInspectionModel)
+        assert isinstance(batch.get_batch_model("cell"), AgingModel)
+
+
+def test_model_state_round_trip():
+    batch = Batch(batch_id="B1")
+    model = batch.get_batch_model("anode")
+    rebuilt_model = import_model_state(export_model_state(model))
+    assert type(rebuilt_model) is type(model)
+    assert rebuilt_model.get_properties() == model.get_properties()
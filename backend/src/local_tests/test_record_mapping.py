@@ -0,0 +1,73 @@
+import sys
+import os
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db_helper import DBHelper
+from server.db.record_mapping import RECORD_MAPPERS
+
+
+def test_every_column_of_the_tables_is_mapped():
+    unmapped_columns = {}
+    for mapper in RECORD_MAPPERS.values():
+        table_columns = {
+            column.key for column in mapper.table.columns if not column.primary_key
+        }
+        if table_columns - set(mapper.columns):
+            unmapped_columns[mapper.process] = table_columns - set(mapper.columns)
+    # the coaters report no temperature of their own
+    assert unmapped_columns == {
+        "coating_anode": {"temperature"},
+        "coating_cathode": {"temperature"},
+    }
+
+
+def test_fields_are_read_converted_and_scaled():
+    mapper = RECORD_MAPPERS["drying_anode"]
+    row = dict(
+        zip(
+            mapper.columns,
+            mapper.extract(
+                {
+                    "process": "drying_anode",
+                    "batch_id": "3",
+                    "timestamp": "2025-01-01T08:00:00",
+                    "duration": "2",
+                    "battery_model": {
+                        "wet_thickness": 100e-6,
+                        "M_solvent": "not a number",
+                        "defect_risk": 1,
+                    },
+                    "machine_parameters": {"web_speed": 0.5},
+                }
+            ),
+        )
+    )
+    assert row["batch"] == "3" and row["state"] == "Unknown"
+    assert row["timestamp"] == datetime(2025, 1, 1, 8, 0, 0)
+    assert row["duration"] == 2.0
+    assert row["wet_thickness_um"] == 100e-6 * 1e6
+    # unreadable and missing values fall back to the defaults
+    assert row["m_solvent"] == 0.0 and row["solid_content"] == 0.0
+    assert row["defect_risk"] is True and row["web_speed"] == 0.5
+    # temperature is only nullable for the cell line machines
+    assert row["temperature_C"] == 0.0
+    aging_mapper = RECORD_MAPPERS["aging_cell"]
+    aging_row = dict(
+        zip(
+            aging_mapper.columns,
+            aging_mapper.extract(
+                {"process": "aging_cell", "timestamp": "2025-01-01T08:00:00"}
+            ),
+        )
+    )
+    assert aging_row["temperature_C"] is None
+
+
+def test_payloads_that_cannot_be_mapped_are_skipped():
+    messages = []
+    assert DBHelper.create_db_record({"process": "mixing_anode"}, messages.append) is None
+    assert DBHelper.create_db_record({"process": "polishing"}, messages.append) is None
+    assert messages[0].startswith("✗ Error creating DB record")
+    assert messages[-1] == "⚠ Unknown process type: polishing"
@@ -0,0 +1,104 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import RealTimeClock, ScaledClock, UnthrottledClock
+from simulation.event_bus.events import EventBus, PlantSimulationEventType
+from simulation.factory import Batch, PlantSimulation
+from simulation.machine.CoatingMachine import CoatingMachine
+from simulation.battery_model.MixingModel import MixingModel
+from simulation.process_parameters.Parameters import CoatingParameters
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def make_coating_machine(clock, event_bus=None):
+    mixing_model = MixingModel("Anode")
+    for component, amount in [("AM", 99), ("CA", 9), ("PVDF", 10), ("solvent", 82)]:
+        mixing_model.add(component, amount)
+    mixing_model.update_properties(None)
+    machine = CoatingMachine(
+        process_name="coating_anode",
+        coating_parameters=CoatingParameters(
+            coating_speed=0.05, gap_height=200e-6, flow_rate=5e-6, coating_width=0.5
+        ),
+        event_bus=event_bus,
+        clock=clock,
+    )
+    machine.receive_model_from_previous_process(mixing_model)
+    return machine
+
+
+def test_unthrottled_clock_only_moves_forward():
+    clock = UnthrottledClock(start_time=START_TIME)
+    clock.wait_until(START_TIME + timedelta(seconds=5))
+    clock.wait_until(START_TIME + timedelta(seconds=2))
+    assert clock.now() == START_TIME + timedelta(seconds=5)
+    assert clock.get_clock_state()["speed_factor"] is None
+
+
+def test_scaled_clock_runs_faster_than_wall_time():
+    clock = ScaledClock(speed_factor=100, start_time=START_TIME)
+    wall_start = time.monotonic()
+    clock.wait_until(START_TIME + timedelta(seconds=10))
+    assert time.monotonic() - wall_start < 1.0
+    assert clock.now() >= START_TIME + timedelta(seconds=10)
+
+
+def test_scaled_clock_speed_factor_is_adjustable_and_validated():
+    clock = ScaledClock(speed_factor=1)
+    clock.set_speed_factor(50)
+    assert clock.speed_factor == 50
+    with pytest.raises(ValueError):
+        clock.set_speed_factor(0)
+    with pytest.raises(TypeError):
+        RealTimeClock().set_speed_factor(2)
+
+
+def test_machine_timestamps_follow_simulated_time():
+    clock = UnthrottledClock(start_time=START_TIME)
+    event_bus = EventBus(clock=clock)
+    states = []
+    event_bus.subscribe(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: states.append(event),
+    )
+    machine = make_coating_machine(clock, event_bus)
+    wall_start = time.monotonic()
+    machine.run_simulation(verbose=False)
+    # 20 steps of 0.1s would take 2s in real time
+    assert time.monotonic() - wall_start < 1.0
+    assert len(states) == machine.total_steps
+    timestamps = [datetime.fromisoformat(event.timestamp) for event in states]
+    assert timestamps[0] == START_TIME
+    assert timestamps[-1] - timestamps[0] == timedelta(
+        seconds=machine.pause_between_steps * (machine.total_steps - 1)
+    )
+    assert all(
+        event.timestamp == event.data["machine_state"]["timestamp"] for event in states
+    )
+    assert clock.now() == START_TIME + timedelta(
+        seconds=machine.pause_between_steps * machine.total_steps
+    )
+
+
+def test_plant_simulation_runs_a_batch_unthrottled():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock())
+    completed = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.BATCH_COMPLETED, lambda event: completed.append(event)
+    )
+    plant_simulation.add_batch(Batch(batch_id="Batch_1"))
+    plant_simulation.wait_until_plant_simulation_is_idle(timeout=30)
+    deadline = time.monotonic() + 30
+    while not completed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [event.data["batch_id"] for event in completed] == ["Batch_1"]
+    assert plant_simulation.get_current_plant_state()["clock"]["clock_type"] == (
+        "UnthrottledClock"
+    )
@@ -0,0 +1,98 @@
+import sys
+import os
+from datetime import datetime
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.battery_model import MixingModel
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import EventBus, PlantSimulationEventType
+from simulation.factory.FactoryStructure import create_factory_structure
+from simulation.machine import StageOutputCache
+from simulation.machine.StageOutputCache import CachedStage
+from simulation.monte_carlo import MonteCarloSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def run_stage_twice(machine, create_model):
+    """Runs the machine twice on the same incoming model, returns the outputs."""
+    outputs = []
+    for _ in range(2):
+        machine.receive_model_from_previous_process(create_model())
+        machine.run_simulation(verbose=False, start_time=START_TIME)
+        outputs.append(machine.empty_model().get_properties())
+    return outputs
+
+
+def test_cached_stage_replays_its_trajectory_for_observers():
+    stage_cache = StageOutputCache()
+    event_bus = EventBus()
+    step_events = []
+    event_bus.subscribe(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        lambda event: step_events.append(event.data["machine_state"]["battery_model"]),
+    )
+    machines = create_factory_structure(
+        event_bus=event_bus,
+        clock=UnthrottledClock(start_time=START_TIME),
+        stage_cache=stage_cache,
+    )
+    mixing_model = MixingModel("Anode")
+    first_output, second_output = run_stage_twice(
+        machines["anode"]["coating"], lambda: mixing_model
+    )
+    assert first_output == second_output
+    # the second run emitted the same step data from the cached trajectory
+    assert len(step_events) % 2 == 0
+    half = len(step_events) // 2
+    assert step_events[:half] == step_events[half:]
+    statistics = stage_cache.get_statistics()
+    assert (statistics["hits"], statistics["misses"]) == (1, 1)
+
+
+def test_cached_output_is_loaded_when_nobody_observes_the_steps():
+    stage_cache = StageOutputCache()
+    machines = create_factory_structure(
+        clock=UnthrottledClock(start_time=START_TIME), stage_cache=stage_cache
+    )
+    mixing_model = MixingModel("Cathode")
+    first_output, second_output = run_stage_twice(
+        machines["cathode"]["coating"], lambda: mixing_model
+    )
+    assert first_output == second_output
+    assert stage_cache.get_statistics()["hits"] == 1
+    # random stages are never cached
+    run_stage_twice(machines["cathode"]["mixing"], lambda: MixingModel("Cathode"))
+    assert stage_cache.get_statistics()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    stage_cache = StageOutputCache(max_entries=2)
+    for key in ["a", "b"]:
+        stage_cache.put(key, CachedStage(output_state={}, completed_steps=1))
+    assert stage_cache.get("a") is not None
+    stage_cache.put("c", CachedStage(output_state={}, completed_steps=1))
+    assert stage_cache.get("b") is None
+    assert stage_cache.get("a") is not None and stage_cache.get("c") is not None
+    statistics = stage_cache.get_statistics()
+    assert statistics["evictions"] == 1
+    assert (statistics["hits"], statistics["misses"]) == (3, 1)
+
+
+def test_monte_carlo_runs_reuse_deterministic_stages():
+    stage_cache = StageOutputCache()
+    reference = MonteCarloSimulation(n_batches=200, seed=5).run()
+    for _ in range(2):
+        result = MonteCarloSimulation(
+            n_batches=200, seed=5, stage_cache=stage_cache
+        ).run()
+        assert np.array_equal(
+            result.get_property_values("cell", "aging", "SOC"),
+            reference.get_property_values("cell", "aging", "SOC"),
+        )
+    # coating, drying, calendaring of both electrodes and the four cell stages
+    statistics = stage_cache.get_statistics()
+    assert statistics["misses"] == statistics["hits"] == 10
@@ -0,0 +1,72 @@
+import sys
+import os
+from datetime import datetime
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.clock import UnthrottledClock
+from simulation.factory import Batch, PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def plant_simulation():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    batch = Batch(batch_id="B1")
+    plant_simulation.add_batch(batch)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+    return plant_simulation, batch
+
+
+def test_recompute_with_recorded_parameters_reproduces_the_batch(plant_simulation):
+    plant_simulation, batch = plant_simulation
+    result = plant_simulation.recompute_batch_from_stage("B1", "cell", "rewinding")
+    assert list(result["recomputed_stages"]["cell"]) == [
+        "rewinding",
+        "electrolyte_filling",
+        "formation_cycling",
+        "aging",
+    ]
+    assert (
+        result["recomputed_stages"]["cell"]["aging"]
+        == batch.get_batch_model("cell").get_properties()
+    )
+
+
+def test_recompute_replays_only_the_downstream_stages(plant_simulation):
+    plant_simulation, _ = plant_simulation
+    original = plant_simulation.recompute_batch_from_stage(
+        "B1", "cathode", "calendaring"
+    )
+    changed = plant_simulation.recompute_batch_from_stage(
+        "B1", "cathode", "calendaring", {"roll_gap": 80e-6}
+    )
+    assert list(changed["recomputed_stages"]) == ["cathode", "cell"]
+    assert list(changed["recomputed_stages"]["cathode"]) == [
+        "calendaring",
+        "slitting",
+        "inspection",
+    ]
+    assert changed["machine_parameters"]["roll_gap"] == 80e-6
+    assert (
+        changed["recomputed_stages"]["cathode"]["calendaring"]
+        != original["recomputed_stages"]["cathode"]["calendaring"]
+    )
+    # the batch and the plant's machines keep the recorded parameters
+    machine_parameters = plant_simulation.get_machine_status("cathode", "calendaring")[
+        "machine_parameters"
+    ]
+    assert machine_parameters["roll_gap"] == 100e-6
+
+
+def test_recompute_rejects_invalid_requests(plant_simulation):
+    plant_simulation, _ = plant_simulation
+    with pytest.raises(ValueError):
+        plant_simulation.recompute_batch_from_stage("unknown", "anode", "coating")
+    with pytest.raises(ValueError):
+        plant_simulation.recompute_batch_from_stage(
+            "B1", "anode", "coating", {"coating_speed": -1}
+        )
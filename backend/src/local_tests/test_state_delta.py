@@ -0,0 +1,98 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.state_delta import StateDeltaEncoder, apply_state_delta, diff_state
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import PlantSimulationEvent, PlantSimulationEventType
+from simulation.factory import PlantSimulation
+
+
+START_TIME = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def machine_event(machine_id, machine_state, step=0):
+    return PlantSimulationEvent(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED,
+        timestamp=f"2025-01-01T08:00:{step:02d}",
+        data={"machine_id": machine_id, "batch_id": "1", "machine_state": machine_state},
+    )
+
+
+def test_only_the_changed_fields_are_sent_between_keyframes():
+    encoder = StateDeltaEncoder(keyframe_interval=2)
+    first_state = {"state": "On", "battery_model": {"viscosity": 1.0, "density": 2.0}}
+    second_state = {"state": "On", "battery_model": {"viscosity": 1.5, "density": 2.0}}
+    frames = [
+        encoder.encode_frame([machine_event("mixing_anode", state, step)])
+        for step, state in enumerate([first_state, second_state, second_state])
+    ]
+    assert [(frame["sequence"], frame["keyframe"]) for frame in frames] == [
+        (1, True),
+        (2, False),
+        (3, True),
+    ]
+    assert frames[0]["machines"][0]["machine_state"] == first_state
+    assert frames[1]["machines"][0]["changes"] == {"battery_model": {"viscosity": 1.5}}
+    assert frames[2]["machines"][0]["machine_state"] == second_state
+
+
+def test_keyframe_holds_every_known_machine():
+    encoder = StateDeltaEncoder()
+    encoder.encode_frame([machine_event("mixing_anode", {"state": "On"})])
+    encoder.encode_frame([machine_event("coating_anode", {"state": "On"})])
+    encoder.request_keyframe()
+    frame = encoder.encode_frame([machine_event("coating_anode", {"state": "Off"})])
+    assert frame["keyframe"]
+    assert {
+        entry["machine_id"]: entry["machine_state"]["state"]
+        for entry in frame["machines"]
+    } == {"mixing_anode": "On", "coating_anode": "Off"}
+    assert encoder.keyframes == 2
+
+
+def test_deltas_rebuild_the_machine_states():
+    plant_simulation = PlantSimulation(clock=UnthrottledClock(start_time=START_TIME))
+    events = []
+    plant_simulation.subscribe_to_event(
+        PlantSimulationEventType.MACHINE_DATA_GENERATED, events.append
+    )
+    plant_simulation.add_batch(block=True)
+    assert plant_simulation.wait_until_plant_simulation_is_idle(timeout=60)
+
+    encoder = StateDeltaEncoder(keyframe_interval=len(events) + 1)
+    client_states = {}
+    full_size = delta_size = 0
+    for event in events:
+        (entry,) = encoder.encode_frame([event])["machines"]
+        machine_id = entry["machine_id"]
+        if "machine_state" in entry:
+            client_states[machine_id] = entry["machine_state"]
+        else:
+            client_states[machine_id] = apply_state_delta(
+                client_states[machine_id], entry["changes"], entry.get("removed")
+            )
+        assert client_states[machine_id] == event.data["machine_state"]
+        full_entry = {
+            "machine_id": machine_id,
+            "batch_id": event.data.get("batch_id"),
+            "timestamp": event.timestamp,
+            "machine_state": event.data["machine_state"],
+        }
+        full_size += len(json.dumps(full_entry))
+        delta_size += len(json.dumps(entry))
+    # the parameters and most model properties do not change from one step to the next
+    assert delta_size * 3 < full_size * 2
+
+
+def test_removed_fields_are_listed():
+    changes, removed = diff_state(
+        {"state": "On", "battery_model": {"viscosity": 1.0}}, {"state": "Off"}
+    )
+    assert (changes, removed) == ({"state": "Off"}, ["battery_model"])
+    assert apply_state_delta(
+        {"battery_model": {"viscosity": 1.0, "density": 2.0}}, {}, ["battery_model.density"]
+    ) == {"battery_model": {"viscosity": 1.0}}
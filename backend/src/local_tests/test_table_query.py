@@ -0,0 +1,102 @@
+import sys
+import os
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.db.db import Base
+from server.db.model_table import Aging
+from server.db.table_query import TableQuery, fetch_page, stream_rows
+
+START = datetime(2026, 1, 1, 8)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'telemetry.db'}")
+    Base.metadata.create_all(engine)
+    # two rows per timestamp, so that the timestamp order needs the id tie-break
+    rows = [
+        {
+            "batch": str(i % 2 + 1),
+            "state": "running",
+            "timestamp": START + timedelta(seconds=i // 2),
+            "duration": 1.0,
+            "process": "aging",
+        }
+        for i in range(25)
+    ]
+    with engine.begin() as connection:
+        connection.execute(Aging.__table__.insert(), rows)
+    return engine
+
+
+def read_all_pages(engine, query_args, limit):
+    rows, cursor, pages = [], None, 0
+    while True:
+        query = TableQuery(table=Aging.__table__, cursor=cursor, **query_args)
+        with engine.connect() as connection:
+            page, cursor = fetch_page(connection, query, limit)
+        rows.extend(page)
+        pages += 1
+        if cursor is None:
+            return rows, pages
+
+
+@pytest.mark.parametrize("order_by", ["id", "timestamp"])
+def test_pages_cover_every_row_once(engine, order_by):
+    rows, pages = read_all_pages(engine, {"order_by": order_by}, limit=4)
+
+    assert [row["id"] for row in rows] == list(range(1, 26))
+    assert pages == 7
+
+
+def test_filters_and_projection(engine):
+    rows, _ = read_all_pages(
+        engine,
+        {
+            "columns": ["batch", "timestamp"],
+            "batch": "2",
+            "start": START + timedelta(seconds=2),
+            "end": START + timedelta(seconds=10),
+            "order_by": "timestamp",
+        },
+        limit=3,
+    )
+
+    assert [set(row) for row in rows] == [{"batch", "timestamp"}] * 8
+    assert {row["batch"] for row in rows} == {"2"}
+    assert rows[0]["timestamp"] == START + timedelta(seconds=2)
+    assert rows[-1]["timestamp"] == START + timedelta(seconds=9)
+
+
+def test_invalid_queries_are_rejected():
+    with pytest.raises(ValueError):
+        TableQuery(table=Aging.__table__, columns=["no_such_column"])
+    with pytest.raises(ValueError):
+        TableQuery(table=Aging.__table__, order_by="batch")
+    with pytest.raises(ValueError):
+        TableQuery(table=Aging.__table__, order_by="timestamp", cursor="42")
+
+
+def test_rows_are_streamed_as_ndjson_and_csv(engine):
+    query = TableQuery(table=Aging.__table__, columns=["id", "timestamp"], batch="1")
+
+    chunks = list(stream_rows(engine, query, "ndjson", chunk_size=5))
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert len(chunks) == 3
+    assert [line["id"] for line in lines] == list(range(1, 26, 2))
+    assert lines[0]["timestamp"] == START.isoformat()
+
+    table = list(csv.reader(io.StringIO("".join(stream_rows(engine, query, "csv")))))
+    assert table[0] == ["id", "timestamp"]
+    assert [row[0] for row in table[1:]] == [str(i) for i in range(1, 26, 2)]
+
+    empty = TableQuery(table=Aging.__table__, columns=["id"], batch="3")
+    assert "".join(stream_rows(engine, empty, "csv")).splitlines() == ["id"]
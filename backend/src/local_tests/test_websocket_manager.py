@@ -0,0 +1,214 @@
+import sys
+import os
+import asyncio
+import json
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.binary_format import BinaryFrameEncoder, decode_machine_frame
+from server.event_handler import get_event_topics
+from server.state_delta import LiveViewFrame
+from server.websocket_manager import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager
+from simulation.event_bus.events import PlantSimulationEvent, PlantSimulationEventType
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay: float = 0.0):
+        self.send_delay = send_delay
+        self.received = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.send_delay)
+        self.received.append(message)
+
+    async def send_bytes(self, message: bytes):
+        await asyncio.sleep(self.send_delay)
+        self.received.append(message)
+
+    async def close(self, code: int):
+        self.close_code = code
+
+
+async def broadcast_messages(manager: ConnectionManager, messages: list[str]):
+    for message in messages:
+        await manager.broadcast(message)
+        # let the writers pick up the message, like the broadcaster between two events
+        await asyncio.sleep(0.001)
+
+
+def test_slow_client_does_not_delay_the_others():
+    async def run():
+        manager = ConnectionManager(max_queue_size=5)
+        fast_clients = [FakeWebSocket() for _ in range(20)]
+        slow_client = FakeWebSocket(send_delay=10)
+        for websocket in [slow_client, *fast_clients]:
+            await manager.connect(websocket)
+        await broadcast_messages(manager, [str(index) for index in range(20)])
+        await asyncio.sleep(0.01)
+        return manager, fast_clients, slow_client
+
+    manager, fast_clients, slow_client = asyncio.run(run())
+    assert all(
+        websocket.received == [str(index) for index in range(20)]
+        for websocket in fast_clients
+    )
+    slow_statistics, *fast_statistics = manager.get_statistics()["clients"]
+    # the first message is being sent, the latest 5 wait, the others were dropped
+    assert (slow_statistics["queued"], slow_statistics["dropped"]) == (5, 14)
+    assert slow_client.received == []
+    assert all(
+        (statistics["sent"], statistics["dropped"]) == (20, 0)
+        for statistics in fast_statistics
+    )
+
+
+def test_slow_client_is_disconnected_with_the_disconnect_policy():
+    async def run():
+        manager = ConnectionManager(max_queue_size=2, slow_consumer_policy="disconnect")
+        fast_client, slow_client = FakeWebSocket(), FakeWebSocket(send_delay=10)
+        await manager.connect(fast_client)
+        await manager.connect(slow_client)
+        await broadcast_messages(manager, [str(index) for index in range(5)])
+        await manager.send_personal_message("echo", fast_client)
+        await asyncio.sleep(0.01)
+        return manager, fast_client, slow_client
+
+    manager, fast_client, slow_client = asyncio.run(run())
+    assert manager.active_connections == [fast_client]
+    assert manager.get_statistics()["slow_consumers_disconnected"] == 1
+    assert slow_client.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert fast_client.received == ["0", "1", "2", "3", "4", "echo"]
+
+
+def test_messages_are_routed_to_the_subscribed_clients():
+    async def run():
+        manager = ConnectionManager()
+        anode_client, batch_client, all_client = (FakeWebSocket() for _ in range(3))
+        for websocket in [anode_client, batch_client, all_client]:
+            await manager.connect(websocket)
+        await manager.handle_client_message(
+            json.dumps({"action": "subscribe", "topics": {"line_type": ["anode"]}}),
+            anode_client,
+        )
+        await manager.handle_client_message(
+            json.dumps(
+                {"action": "subscribe", "topics": {"batch_id": ["1", "2"]}}
+            ),
+            batch_client,
+        )
+        await manager.handle_client_message(
+            json.dumps({"action": "unsubscribe", "topics": {"batch_id": "2"}}),
+            batch_client,
+        )
+        await manager.handle_client_message("not json", all_client)
+        await manager.publish("anode 1", [("line_type", "anode"), ("batch_id", "1")])
+        await manager.publish("cell 2", [("line_type", "cell"), ("batch_id", "2")])
+        await asyncio.sleep(0.01)
+        assert manager.has_recipients([("line_type", "cell")])
+        manager.disconnect(all_client)
+        assert not manager.has_recipients([("line_type", "cell")])
+        assert manager.has_recipients([("batch_id", "1")])
+        return anode_client, batch_client, all_client
+
+    anode_client, batch_client, all_client = asyncio.run(run())
+    # the acknowledgements come first
+    assert json.loads(anode_client.received[0])["topics"] == ["line_type:anode"]
+    assert json.loads(batch_client.received[1])["topics"] == ["batch_id:1"]
+    assert json.loads(all_client.received[0])["status"] == "error"
+    assert anode_client.received[1:] == ["anode 1"]
+    assert batch_client.received[2:] == ["anode 1"]
+    assert all_client.received[1:] == ["anode 1", "cell 2"]
+
+
+def test_binary_clients_get_the_schema_once_then_packed_frames():
+    encoder = BinaryFrameEncoder()
+    events = [
+        PlantSimulationEvent(
+            PlantSimulationEventType.MACHINE_DATA_GENERATED,
+            timestamp=f"2025-01-01T08:00:0{step}",
+            data={
+                "machine_id": "mixing_anode",
+                "batch_id": "1",
+                "machine_state": {"battery_model": {"viscosity": float(step)}},
+            },
+        )
+        for step in range(2)
+    ]
+
+    async def run():
+        manager = ConnectionManager()
+        json_client, binary_client = FakeWebSocket(), FakeWebSocket()
+        for websocket in [json_client, binary_client]:
+            await manager.connect(websocket)
+        await manager.handle_client_message(
+            json.dumps({"action": "set_format", "format": "binary"}), binary_client
+        )
+        assert manager.has_binary_clients()
+        for event in events:
+            frame = encoder.encode_machine_frame([event], 1)
+            await manager.publish('{"status": "data_generated"}', [], frame)
+        await asyncio.sleep(0.01)
+        return json_client, binary_client
+
+    json_client, binary_client = asyncio.run(run())
+    assert json_client.received == ['{"status": "data_generated"}'] * 2
+    acknowledgement, schema_message, *frames = binary_client.received
+    assert json.loads(acknowledgement)["format"] == "binary"
+    schemas = json.loads(schema_message)["data"]["schemas"]
+    assert [type(frame) for frame in frames] == [bytes, bytes]
+    assert [
+        decode_machine_frame(frame, schemas)["machines"][0]["fields"]
+        for frame in frames
+    ] == [{"battery_model.viscosity": 0.0}, {"battery_model.viscosity": 1.0}]
+
+
+def test_live_view_frames_are_encoded_per_client():
+    def frame(step):
+        events = [
+            PlantSimulationEvent(
+                PlantSimulationEventType.MACHINE_DATA_GENERATED,
+                timestamp=f"2025-01-01T08:00:0{step}",
+                data={
+                    "machine_id": machine_id,
+                    "batch_id": "1",
+                    "machine_state": {"step": step, "process": machine_id},
+                },
+            )
+            for machine_id in ["mixing_anode", "mixing_cathode"]
+        ]
+        return LiveViewFrame([(event, get_event_topics(event)) for event in events], 2)
+
+    async def run():
+        manager = ConnectionManager()
+        anode_client, all_client = FakeWebSocket(), FakeWebSocket()
+        for websocket in [anode_client, all_client]:
+            await manager.connect(websocket)
+        await manager.handle_client_message(
+            json.dumps({"action": "subscribe", "topics": {"machine_id": ["mixing_anode"]}}),
+            anode_client,
+        )
+        for step in range(3):
+            if step == 2:
+                await manager.handle_client_message(
+                    json.dumps({"action": "resync"}), anode_client
+                )
+            await manager.publish_frame(frame(step))
+        await asyncio.sleep(0.01)
+        return anode_client, all_client
+
+    anode_client, all_client = asyncio.run(run())
+    anode_frames = [json.loads(message)["data"] for message in anode_client.received[1:]]
+    all_frames = [json.loads(message)["data"] for message in all_client.received]
+    # the filtered client gets its machine only, numbered without gaps
+    assert [frame["sequence"] for frame in anode_frames] == [1, 2, 3]
+    assert [
+        [machine["machine_id"] for machine in frame["machines"]] for frame in anode_frames
+    ] == [["mixing_anode"]] * 3
+    # its resync does not make the other client's frame a keyframe
+    assert [frame["keyframe"] for frame in anode_frames] == [True, False, True]
+    assert [frame["keyframe"] for frame in all_frames] == [True, False, False]
+    assert all_frames[2]["machines"][0]["changes"] == {"step": 2}
@@ -0,0 +1,106 @@
+"""
+One summary row per completed batch, so that "what were the final properties of batch 42 and did
+it pass" is a lookup in one table rather than a scan of the 16 per-step tables. The last machine
+state of every stage a batch goes through is kept while the batch runs; at BATCH_COMPLETED it is
+combined with the batch's final models and seed (Batch.get_batch_state, sent with the event) into
+the row written to the batch_summary table.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# stages (processes) whose final model decides whether a batch passed
+INSPECTION_STAGES = {"anode": "inspection_anode", "cathode": "inspection_cathode"}
+FORMATION_STAGE = "formation_cycling_cell"
+AGING_STAGE = "aging_cell"
+
+
+def _to_flag(value) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def _get_seconds(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+
+
+class BatchSummaryCollector:
+    """
+    Collects the stages of the running batches from their machine data. Called from the database
+    subscriber's thread only, which receives the machine data and BATCH_COMPLETED in order.
+    """
+
+    def __init__(self):
+        # batch id -> stage (process) -> last machine state
+        self.__stages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # batch id -> stage (process) -> timestamp of its first machine state
+        self.__stage_started_at: Dict[str, Dict[str, str]] = {}
+        # batch id -> timestamp of its first machine data
+        self.__started_at: Dict[str, str] = {}
+
+    def update(self, batch_id: str, machine_state: Dict[str, Any]):
+        process = machine_state.get("process")
+        if process is None:
+            return
+        self.__stages.setdefault(batch_id, {})[process] = machine_state
+        self.__stage_started_at.setdefault(batch_id, {}).setdefault(
+            process, machine_state.get("timestamp")
+        )
+        self.__started_at.setdefault(batch_id, machine_state.get("timestamp"))
+
+    def complete(
+        self, batch_id: str, completed_at: str, batch_state: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """The summary payload of the batch (see the batch_summary record mapping); the batch's
+        stages are forgotten. Without the batch state, the final models are the last machine
+        states of the inspection and aging stages."""
+        stages = self.__stages.pop(batch_id, {})
+        stage_started_at = self.__stage_started_at.pop(batch_id, {})
+        started_at = self.__started_at.pop(batch_id, None) or completed_at
+        stage_properties = {
+            process: state.get("battery_model") or {} for process, state in stages.items()
+        }
+        batch_state = batch_state or {}
+        anode_model = batch_state.get("current_anode_line_model") or stage_properties.get(
+            INSPECTION_STAGES["anode"], {}
+        )
+        cathode_model = batch_state.get("current_cathode_line_model") or stage_properties.get(
+            INSPECTION_STAGES["cathode"], {}
+        )
+        cell_model = batch_state.get("current_cell_line_model") or stage_properties.get(
+            AGING_STAGE, {}
+        )
+        anode_passed = _to_flag(anode_model.get("Overall"))
+        cathode_passed = _to_flag(cathode_model.get("Overall"))
+        defect_risk = _to_flag(cell_model.get("defect_risk"))
+        return {
+            "process": "batch_summary",
+            "batch_id": batch_id,
+            "seed": batch_state.get("seed"),
+            "started_at": started_at,
+            "timestamp": completed_at,
+            "duration_s": _get_seconds(started_at, completed_at),
+            # unknown (None) when a verdict is missing
+            "passed": (
+                None
+                if None in [anode_passed, cathode_passed, defect_risk]
+                else anode_passed and cathode_passed and not defect_risk
+            ),
+            "anode_inspection_passed": anode_passed,
+            "cathode_inspection_passed": cathode_passed,
+            "defect_risk": defect_risk,
+            "capacity_Ah": stage_properties.get(FORMATION_STAGE, {}).get("Capacity_Ah"),
+            "final_ocv_v": cell_model.get("Final_OCV_V"),
+            "leakage_current_A": cell_model.get("Leakage_Current_A"),
+            "stage_properties": stage_properties,
+            "stage_parameters": {
+                process: state.get("machine_parameters") or {}
+                for process, state in stages.items()
+            },
+            # the machine states' "duration" is the index of their step, not a time
+            "stage_durations_s": {
+                process: _get_seconds(stage_started_at.get(process), state.get("timestamp"))
+                for process, state in stages.items()
+            },
+        }
@@ -0,0 +1,141 @@
+"""
+Compact binary encoding of the live view's machine data frames, for the clients that ask for it.
+A schema message (JSON text) describes the layout of a machine's state once: the paths of its
+numeric fields, e.g. "battery_model.viscosity". Frames are then packed binary: for every machine,
+its schema id, timestamp and batch id, followed by its field values as float32 in schema order.
+
+Frame layout (little-endian):
+    header:   version (uint8), message type (uint8), machine count (uint16), coalesced steps (uint32)
+    machine:  schema id (uint16), timestamp (float64, seconds since the epoch, UTC),
+              batch id length (uint8), batch id (utf-8), values (float32 * number of fields)
+"""
+
+import json
+import struct
+from datetime import datetime, timezone
+from numbers import Number
+from threading import Lock
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from simulation.event_bus.events import PlantSimulationEvent
+
+FORMAT_VERSION = 1
+MACHINE_FRAME = 1
+SCHEMA_STATUS = "binary_schema"
+
+_HEADER = struct.Struct("<BBHI")
+_MACHINE_HEADER = struct.Struct("<HdB")
+
+
+def flatten_numeric_fields(state: Optional[dict], prefix: str = "") -> Dict[str, float]:
+    """The numeric leaves of a (nested) machine state, keyed by their dotted path."""
+    fields = {}
+    for name, value in (state or {}).items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict):
+            fields.update(flatten_numeric_fields(value, f"{path}."))
+        elif isinstance(value, (Number, np.number, np.bool_)):
+            fields[path] = float(value)
+    return fields
+
+
+def _to_epoch_seconds(timestamp: str) -> float:
+    # simulated times are naive: read them as UTC so that the clients get them back unchanged
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+
+class BinaryFrame:
+    """An encoded frame and the schemas a client must have received to decode it."""
+
+    def __init__(self, payload: bytes, schema_ids: frozenset, encoder: "BinaryFrameEncoder"):
+        self.payload = payload
+        self.schema_ids = schema_ids
+        self.__encoder = encoder
+
+    def get_schema_message(self, schema_ids) -> str:
+        return self.__encoder.get_schema_message(schema_ids)
+
+
+class BinaryFrameEncoder:
+    """Registry of the machine layouts (schema ids are shared by all connections) and frame encoder."""
+
+    def __init__(self):
+        # (machine id, field paths) -> schema id
+        self.__schema_ids: Dict[tuple[str, tuple[str, ...]], int] = {}
+        self.__schemas: Dict[int, Dict[str, Any]] = {}
+        self.__lock = Lock()
+
+    def __get_schema_id(self, machine_id: str, fields: tuple[str, ...]) -> int:
+        with self.__lock:
+            key = (machine_id, fields)
+            schema_id = self.__schema_ids.get(key)
+            if schema_id is None:
+                schema_id = len(self.__schema_ids)
+                if schema_id > 0xFFFF:
+                    raise ValueError("Too many machine layouts for the binary format")
+                self.__schema_ids[key] = schema_id
+                self.__schemas[schema_id] = {"machine_id": machine_id, "fields": list(fields)}
+            return schema_id
+
+    def encode_machine_frame(
+        self, events: list[PlantSimulationEvent], coalesced_steps: int
+    ) -> BinaryFrame:
+        parts = [_HEADER.pack(FORMAT_VERSION, MACHINE_FRAME, len(events), coalesced_steps)]
+        schema_ids = set()
+        for event in events:
+            fields = flatten_numeric_fields(event.data.get("machine_state"))
+            schema_id = self.__get_schema_id(event.data["machine_id"], tuple(fields))
+            schema_ids.add(schema_id)
+            batch_id = str(event.data.get("batch_id", "")).encode()[:255]
+            parts.append(
+                _MACHINE_HEADER.pack(
+                    schema_id, _to_epoch_seconds(event.timestamp), len(batch_id)
+                )
+            )
+            parts.append(batch_id)
+            parts.append(np.fromiter(fields.values(), dtype="<f4", count=len(fields)).tobytes())
+        return BinaryFrame(b"".join(parts), frozenset(schema_ids), self)
+
+    def get_schema_message(self, schema_ids) -> str:
+        """JSON text message describing the layouts, sent before the first frame that uses them."""
+        with self.__lock:
+            schemas = {
+                str(schema_id): self.__schemas[schema_id] for schema_id in sorted(schema_ids)
+            }
+        return json.dumps(
+            {
+                "process_name": "battery_plant_simulation",
+                "status": SCHEMA_STATUS,
+                "data": {"version": FORMAT_VERSION, "schemas": schemas},
+            }
+        )
+
+
+def decode_machine_frame(payload: bytes, schemas: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Reference decoder (what a client does), schemas as received in the schema messages."""
+    version, message_type, machine_count, coalesced_steps = _HEADER.unpack_from(payload)
+    if version != FORMAT_VERSION or message_type != MACHINE_FRAME:
+        raise ValueError(f"Unsupported frame (version {version}, type {message_type})")
+    offset = _HEADER.size
+    machines = []
+    for _ in range(machine_count):
+        schema_id, epoch_seconds, batch_id_length = _MACHINE_HEADER.unpack_from(payload, offset)
+        offset += _MACHINE_HEADER.size
+        batch_id = payload[offset : offset + batch_id_length].decode()
+        offset += batch_id_length
+        schema = schemas[str(schema_id)]
+        values = np.frombuffer(payload, dtype="<f4", count=len(schema["fields"]), offset=offset)
+        offset += values.nbytes
+        machines.append(
+            {
+                "machine_id": schema["machine_id"],
+                "batch_id": batch_id,
+                "timestamp": datetime.fromtimestamp(epoch_seconds, timezone.utc)
+                .replace(tzinfo=None)
+                .isoformat(),
+                "fields": dict(zip(schema["fields"], values.tolist())),
+            }
+        )
+    return {"coalesced_steps": coalesced_steps, "machines": machines}
@@ -0,0 +1,66 @@
+"""
+Reads of the per-batch summaries (see BatchSummary) for the API: the batches filtered by their
+verdicts and sorted by a quality metric, one page at a time.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from server.db.model_table import BatchSummary
+
+# the indexed columns the batches can be sorted by
+SORT_COLUMNS = [
+    "completed_at",
+    "capacity_Ah",
+    "final_ocv_v",
+    "leakage_current_A",
+    "duration_s",
+]
+MAX_SUMMARIES = 1000
+
+
+def get_batch_summaries(
+    connection: Connection,
+    sort_by: str = "completed_at",
+    descending: bool = True,
+    passed: Optional[bool] = None,
+    defect_risk: Optional[bool] = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """The summaries of the batches with the given verdicts, sorted by a metric (ties by id)."""
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Sort column '{sort_by}' is not found")
+    if not 1 <= limit <= MAX_SUMMARIES:
+        raise ValueError(f"The limit must be between 1 and {MAX_SUMMARIES}")
+    if offset < 0:
+        raise ValueError("The offset must not be negative")
+    table = BatchSummary.__table__
+    statement = select(table)
+    if passed is not None:
+        statement = statement.where(table.c.passed == passed)
+    if defect_risk is not None:
+        statement = statement.where(table.c.defect_risk == defect_risk)
+    column, tie_break = table.c[sort_by], table.c.id
+    if descending:
+        column, tie_break = column.desc(), tie_break.desc()
+    statement = statement.order_by(column.nulls_last(), tie_break).limit(limit).offset(offset)
+    return [dict(row) for row in connection.execute(statement).mappings()]
+
+
+def get_batch_summary(connection: Connection, batch_id: str) -> Optional[Dict[str, Any]]:
+    """The latest summary of the batch id (the ids start again when the server restarts)."""
+    table = BatchSummary.__table__
+    row = (
+        connection.execute(
+            select(table)
+            .where(table.c.batch == batch_id)
+            .order_by(table.c.completed_at.desc(), table.c.id.desc())
+            .limit(1)
+        )
+        .mappings()
+        .first()
+    )
+    return dict(row) if row is not None else None
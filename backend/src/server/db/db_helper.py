@@ -1,26 +1,96 @@
+import json
 import threading
-import time
 from collections import deque
 from datetime import datetime
-from .db import SessionLocal
-from .model_table import *
-from typing import Dict, Any
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DataError, IntegrityError
+from .db import engine as default_engine
+from .migrations import create_partitions
+from .model_table import TelemetryTable
+from .record_mapping import RECORD_MAPPERS, RecordMapper
+from .rollup import update_rollups
+from .write_ahead_log import WriteAheadLog
+from typing import Dict, Any, List, Optional, Tuple
+
+# errors of the rows the database rejects: writing them again cannot succeed, unlike a connection
+# error (the database restarting), after which the write is retried
+PERMANENT_ERRORS = (IntegrityError, DataError)
 
 
 class DBHelper:
-    def __init__(self, queue_size=1000, batch_size=50, interval=5):
-        self.db_queue = deque(maxlen=queue_size)
+    """
+    Writes the queued payloads to the database from a worker thread. The worker flushes when
+    `flush_size` payloads are queued or `interval` seconds after the previous flush, whichever comes
+    first, and then drains the whole queue in chunks of `batch_size` rows.
+    """
+
+    def __init__(
+        self,
+        queue_size=10000,
+        batch_size=1000,
+        interval=1.0,
+        engine: Optional[Engine] = None,
+        wal_directory: Optional[str] = "db_write_ahead_log",
+        flush_size: Optional[int] = None,
+        partition_interval: Optional[str] = None,
+        rollups: bool = False,
+        failed_writes_log: str = "failed_db_writes.log",
+        dead_letter_file: str = "failed_db_records.jsonl",
+    ):
+        # payloads waiting in memory; beyond queue_size they are spilled to the write-ahead log
+        self.db_queue = deque()
+        self.queue_size = queue_size
         self.db_lock = threading.Lock()
+        # notified when flush_size payloads are queued (or the worker stops)
+        self.db_condition = threading.Condition(self.db_lock)
         self.db_worker_thread = None
         self.db_worker_running = False
         self.batch_size = batch_size
+        self.flush_size = flush_size if flush_size is not None else batch_size
         self.interval = interval
+        # the database the records are written to (e.g. a local SQLite database in the tests)
+        self.engine = engine if engine is not None else default_engine
+        # payloads that could not be written yet (buffer full, database unavailable) wait on disk;
+        # without it (wal_directory=None) the oldest payloads are dropped
+        self.write_ahead_log = (
+            WriteAheadLog(wal_directory) if wal_directory is not None else None
+        )
+        # held while payloads move from the memory queue to the database or the log, so that they
+        # reach both in the order they were queued
+        self.__flush_lock = threading.Lock()
+        # "day" or "month" once the telemetry tables are partitioned by time (see migrations):
+        # the partitions the rows fall into are created before they are inserted
+        self.partition_interval = partition_interval
+        self.__known_partitions: set = set()
+        # whether the rows of the telemetry tables are merged into the rollup tables as they are
+        # written (see rollup). The server's writer does; it is an option since it costs about as
+        # much as the inserts themselves (local_tests/benchmark_rollup.py)
+        self.rollups = rollups
+        # file the payloads that are lost (neither written nor spilled) are reported to
+        self.failed_writes_log = failed_writes_log
+        # file (JSON lines) the payloads the database rejects are moved to, with their error
+        self.dead_letter_file = dead_letter_file
+        self.dead_letters = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        # error of the last write, None once a write succeeds again
+        self.last_error: Optional[str] = None
 
     def queue_data(self, payload: Dict[str, Any]):
         with self.db_lock:
             if "timestamp" not in payload:
                 payload["timestamp"] = datetime.now().isoformat()
             self.db_queue.append(payload)
+            if len(self.db_queue) >= self.flush_size:
+                self.db_condition.notify()
+            overflow = len(self.db_queue) > self.queue_size
+        # while a flush runs the queue may grow past its size: the flush spills it afterwards
+        if overflow and self.__flush_lock.acquire(blocking=False):
+            try:
+                self.__spill_overflow()
+            finally:
+                self.__flush_lock.release()
 
     def start_worker(self, broadcast_fn=None):
         if not self.db_worker_thread or not self.db_worker_thread.is_alive():
@@ -31,7 +101,9 @@ class DBHelper:
             self.db_worker_thread.start()
 
     def stop_worker(self):
-        self.db_worker_running = False
+        with self.db_condition:
+            self.db_worker_running = False
+            self.db_condition.notify_all()
         if self.db_worker_thread:
             self.db_worker_thread.join(timeout=10)
             # clear the thread as well!
@@ -39,528 +111,266 @@ class DBHelper:
 
     def _worker(self, broadcast_fn):
         while self.db_worker_running:
-            time.sleep(self.interval)
-            if not self.db_queue:
-                continue
+            with self.db_condition:
+                self.db_condition.wait_for(
+                    lambda: not self.db_worker_running
+                    or len(self.db_queue) >= self.flush_size,
+                    timeout=self.interval,
+                )
+            self.drain(broadcast_fn)
+        # what was queued before stopping
+        self.drain(broadcast_fn)
+
+    def drain(self, broadcast_fn=None) -> int:
+        """Flushes chunk after chunk until the queue is empty or a write fails.
+        Returns the number of rows written."""
+        saved_count = 0
+        while True:
+            saved_count += self.flush(broadcast_fn)
+            with self.db_lock:
+                if not self.db_queue or self.last_error is not None:
+                    break
+        if saved_count and broadcast_fn:
+            broadcast_fn(f"✓ Saved {saved_count} records to database")
+        return saved_count
+
+    def flush(self, broadcast_fn=None) -> int:
+        """Replays the spilled payloads (oldest first), then writes up to batch_size queued payloads.
+        Queued payloads are never written before the spilled ones: while the log cannot be
+        replayed, they are spilled after them. Returns the number of rows written."""
+        saved_count = 0
+        with self.__flush_lock:
+            if self.write_ahead_log is not None and self.write_ahead_log.has_pending():
+                try:
+                    saved_count += self.write_ahead_log.replay(
+                        lambda payloads: self.__write(payloads, broadcast_fn)
+                    )
+                    self.last_error = None
+                    if broadcast_fn:
+                        broadcast_fn(f"✓ Replayed {saved_count} spilled records to database")
+                except Exception as e:
+                    self.last_error = str(e)
+                    if broadcast_fn:
+                        broadcast_fn(f"✗ Database error while replaying: {str(e)}")
+                    self.__spill_overflow()
+                    self.__count_flush(saved_count)
+                    return saved_count
             batch_data = []
             with self.db_lock:
                 while self.db_queue and len(batch_data) < self.batch_size:
                     batch_data.append(self.db_queue.popleft())
             if batch_data:
                 try:
-                    db = SessionLocal()
-                    saved_count = 0
-                    for data in batch_data:
-                        record = self.create_db_record(data, broadcast_fn)
-                        if record:
-                            db.add(record)
-                            saved_count += 1
-                    db.commit()
-                    if broadcast_fn:
-                        broadcast_fn(f"✓ Saved {saved_count} records to database")
+                    saved_count += self.__write(batch_data, broadcast_fn)
+                    self.last_error = None
                 except Exception as e:
+                    self.last_error = str(e)
                     if broadcast_fn:
                         broadcast_fn(f"✗ Database error: {str(e)}")
-                    with open("failed_db_writes.log", "a") as f:
-                        f.write(
-                            f"[{datetime.now()}] Failed to save {len(batch_data)} records: {e}\n"
-                        )
-                finally:
-                    db.close()
+                    self.__spill(batch_data, e)
+            self.__spill_overflow()
+            self.__count_flush(saved_count)
+        return saved_count
 
-    @staticmethod
-    def create_db_record(simulation_data: Dict[str, Any], broadcast_fn=None):
-        def safe_float(val, default=0.0):
+    def __count_flush(self, saved_count: int):
+        with self.db_lock:
+            self.flushes += 1
+            self.written += saved_count
+
+    def __spill_overflow(self):
+        """Moves the queued payloads to the log when the queue is over its size (flush lock held)."""
+        with self.db_lock:
+            if len(self.db_queue) <= self.queue_size:
+                return
+            if self.write_ahead_log is None:
+                while len(self.db_queue) > self.queue_size:
+                    self.db_queue.popleft()
+                    self.dropped += 1
+                return
+            batch_data = list(self.db_queue)
+            self.db_queue.clear()
+        self.__spill(batch_data)
+
+    def __spill(self, batch_data: List[Dict[str, Any]], error: Optional[Exception] = None):
+        if self.write_ahead_log is not None:
             try:
-                return float(val)
-            except Exception:
-                return default
+                self.write_ahead_log.append(batch_data)
+                return
+            except Exception as e:
+                error = e
+        # lost: only a line in the log of failed writes remains
+        self.dropped += len(batch_data)
+        with open(self.failed_writes_log, "a") as f:
+            f.write(
+                f"[{datetime.now()}] Failed to save {len(batch_data)} records: {error}\n"
+            )
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self.db_lock:
+            queued = len(self.db_queue)
+        return {
+            "queued": queued,
+            "queue_size": self.queue_size,
+            "flush_size": self.flush_size,
+            "flush_interval_seconds": self.interval,
+            "flushes": self.flushes,
+            "written": self.written,
+            "last_error": self.last_error,
+            "dropped": self.dropped,
+            "dead_letters": self.dead_letters,
+            "write_ahead_log": (
+                self.write_ahead_log.get_statistics()
+                if self.write_ahead_log is not None
+                else None
+            ),
+        }
 
+    def __write(self, batch_data: List[Dict[str, Any]], broadcast_fn=None) -> int:
+        """Writes the payloads; when the database rejects some of them (PERMANENT_ERRORS), the
+        others are written one by one and the rejected ones moved to the dead letters, so that
+        they do not block the writer. Other errors are raised: the payloads are written again
+        later. Returns the number of rows written."""
         try:
-            process_type = simulation_data.get("process", "unknown")
-            battery_model = simulation_data.get("battery_model", {})
-            machine_params = simulation_data.get("machine_parameters", {})
-            if process_type == "mixing_anode":
-                return AnodeMixing(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "mixing_anode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    am_volume_L=safe_float(battery_model.get("AM_volume", 0.0)),
-                    ca_volume_L=safe_float(battery_model.get("CA_volume", 0.0)),
-                    pvdf_volume_L=safe_float(battery_model.get("PVDF_volume", 0.0)),
-                    solvent_volume_L=safe_float(battery_model.get("H2O_volume", 0.0)),
-                    viscosity_Pa_s=safe_float(battery_model.get("viscosity", 0.0)),
-                    density_kg_m3=safe_float(battery_model.get("density", 0.0)),
-                    yield_stress_Pa=safe_float(battery_model.get("yield_stress", 0.0)),
-                    total_volume_L=safe_float(battery_model.get("total_volume", 0.0)),
-                    am=safe_float(machine_params.get("AM_ratio", 0.0)),
-                    ca=safe_float(machine_params.get("CA_ratio", 0.0)),
-                    pvdf=safe_float(machine_params.get("PVDF_ratio", 0.0)),
-                    solvent=safe_float(machine_params.get("solvent_ratio", 0.0)),
-                )
-            elif process_type == "mixing_cathode":
-                return CathodeMixing(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "mixing_anode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    am_volume_L=safe_float(battery_model.get("AM_volume", 0.0)),
-                    ca_volume_L=safe_float(battery_model.get("CA_volume", 0.0)),
-                    pvdf_volume_L=safe_float(battery_model.get("PVDF_volume", 0.0)),
-                    solvent_volume_L=safe_float(battery_model.get("H2O_volume", 0.0)),
-                    viscosity_Pa_s=safe_float(battery_model.get("viscosity", 0.0)),
-                    density_kg_m3=safe_float(battery_model.get("density", 0.0)),
-                    yield_stress_Pa=safe_float(battery_model.get("yield_stress", 0.0)),
-                    total_volume_L=safe_float(battery_model.get("total_volume", 0.0)),
-                    am=safe_float(machine_params.get("AM_ratio", 0.0)),
-                    ca=safe_float(machine_params.get("CA_ratio", 0.0)),
-                    pvdf=safe_float(machine_params.get("PVDF_ratio", 0.0)),
-                    solvent=safe_float(machine_params.get("solvent_ratio", 0.0)),
-                )
-            elif process_type == "coating_anode":
-                return AnodeCoating(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "coating_anode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    solid_content=safe_float(battery_model.get("solid_content", 0.0)),
-                    viscosity_Pa_s=safe_float(battery_model.get("viscosity", 0.0)),
-                    wet_thickness_um=safe_float(
-                        battery_model.get("wet_thickness", 0.0)
-                    ),
-                    dry_thickness_um=safe_float(
-                        battery_model.get("dry_thickness", 0.0)
-                    ),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    coating_speed=safe_float(machine_params.get("coating_speed", 0.0)),
-                    gap_height_um=safe_float(machine_params.get("gap_height", 0.0)),
-                    flow_rate=safe_float(machine_params.get("flow_rate", 0.0)),
-                    coating_width_mm=safe_float(
-                        machine_params.get("coating_width", 0.0)
-                    ),
-                )
-            elif process_type == "coating_cathode":
-                return CathodeCoating(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "coating_cathode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    solid_content=safe_float(battery_model.get("solid_content", 0.0)),
-                    viscosity_Pa_s=safe_float(battery_model.get("viscosity", 0.0)),
-                    wet_thickness_um=safe_float(
-                        battery_model.get("wet_thickness", 0.0)
-                    ),
-                    dry_thickness_um=safe_float(
-                        battery_model.get("dry_thickness", 0.0)
-                    ),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    coating_speed=safe_float(machine_params.get("coating_speed", 0.0)),
-                    gap_height_um=safe_float(machine_params.get("gap_height", 0.0)),
-                    flow_rate=safe_float(machine_params.get("flow_rate", 0.0)),
-                    coating_width_mm=safe_float(
-                        machine_params.get("coating_width", 0.0)
-                    ),
-                )
-            elif process_type == "drying_anode":
-                return AnodeDrying(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "drying_anode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    wet_thickness_um=safe_float(battery_model.get("wet_thickness", 0.0))
-                    * 1e6,  # convert m to um
-                    dry_thickness_um=safe_float(battery_model.get("dry_thickness", 0.0))
-                    * 1e6,  # convert m to um
-                    m_solvent=safe_float(battery_model.get("M_solvent", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    solid_content=safe_float(battery_model.get("solid_content", 0.0)),
-                    temperature=safe_float(battery_model.get("temperature", 0.0)),
-                    # machine_parameters
-                    web_speed=safe_float(machine_params.get("web_speed", 0.0)),
-                )
-            elif process_type == "drying_cathode":
-                return CathodeDrying(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "drying_cathode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    wet_thickness_um=safe_float(battery_model.get("wet_thickness", 0.0))
-                    * 1e6,
-                    dry_thickness_um=safe_float(battery_model.get("dry_thickness", 0.0))
-                    * 1e6,
-                    m_solvent=safe_float(battery_model.get("M_solvent", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    solid_content=safe_float(battery_model.get("solid_content", 0.0)),
-                    temperature=safe_float(battery_model.get("temperature", 0.0)),
-                    # machine_parameters
-                    web_speed=safe_float(machine_params.get("web_speed", 0.0)),
-                )
-            elif process_type == "calendaring_anode":
-                return AnodeCalendaring(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "calendaring_anode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    roll_gap_um=safe_float(machine_params.get("roll_gap", 0.0)) * 1e6,
-                    roll_pressure=safe_float(machine_params.get("roll_pressure", 0.0)),
-                    temperature=safe_float(machine_params.get("temperature", 0.0)),
-                    roll_speed=safe_float(machine_params.get("roll_speed", 0.0)),
-                    dry_thickness_um=safe_float(
-                        machine_params.get("dry_thickness", 0.0)
-                    )
-                    * 1e6,
-                    initial_porosity=safe_float(
-                        machine_params.get("initial_porosity", 0.0)
-                    ),
-                )
-            elif process_type == "calendaring_cathode":
-                return CathodeCalendaring(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "calendaring_cathode"),
-                    temperature_C=safe_float(simulation_data.get("temperature_C", 0.0)),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,  # m to um
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    roll_gap_um=safe_float(machine_params.get("roll_gap", 0.0))
-                    * 1e6,  # m to um
-                    roll_pressure=safe_float(machine_params.get("roll_pressure", 0.0)),
-                    temperature=safe_float(machine_params.get("temperature", 0.0)),
-                    roll_speed=safe_float(machine_params.get("roll_speed", 0.0)),
-                    dry_thickness_um=safe_float(
-                        machine_params.get("dry_thickness", 0.0)
-                    )
-                    * 1e6,  # m to um
-                    initial_porosity=safe_float(
-                        machine_params.get("initial_porosity", 0.0)
-                    ),
-                )
-            elif process_type == "slitting_anode":
-                return AnodeSlitting(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "slitting_anode"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    width_final_mm=safe_float(battery_model.get("width_final", 0.0)),
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    burr_factor=safe_float(battery_model.get("burr_factor", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    blade_sharpness=safe_float(
-                        machine_params.get("blade_sharpness", 0.0)
-                    ),
-                    slitting_speed=safe_float(
-                        machine_params.get("slitting_speed", 0.0)
-                    ),
-                    target_width_mm=safe_float(machine_params.get("target_width", 0.0)),
-                    slitting_tension=safe_float(
-                        machine_params.get("slitting_tension", 0.0)
-                    ),
-                )
-            elif process_type == "slitting_cathode":
-                return CathodeSlitting(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "slitting_cathode"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    width_final_mm=safe_float(battery_model.get("width_final", 0.0)),
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    burr_factor=safe_float(battery_model.get("burr_factor", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    blade_sharpness=safe_float(
-                        machine_params.get("blade_sharpness", 0.0)
-                    ),
-                    slitting_speed=safe_float(
-                        machine_params.get("slitting_speed", 0.0)
-                    ),
-                    target_width_mm=safe_float(machine_params.get("target_width", 0.0)),
-                    slitting_tension=safe_float(
-                        machine_params.get("slitting_tension", 0.0)
-                    ),
-                )
-            elif process_type == "inspection_anode":
-                return AnodeInspection(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "inspection_anode"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_width_mm=safe_float(battery_model.get("final_width", 0.0)),
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    burr_factor=safe_float(battery_model.get("burr_factor", 0.0)),
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    epsilon_thickness=safe_float(
-                        battery_model.get("epsilon_thickness", 0.0)
-                    ),
-                    d_detected=safe_float(battery_model.get("D_detected", 0.0)),
-                    pass_width_mm=bool(battery_model.get("Pass_width", False)),
-                    pass_thickness_um=bool(battery_model.get("Pass_thickness", False)),
-                    pass_burr=bool(battery_model.get("Pass_burr", False)),
-                    pass_surface=bool(battery_model.get("Pass_surface", False)),
-                    overall=bool(battery_model.get("Overall", False)),
-                    # machine_parameters
-                    epsilon_width_max=safe_float(
-                        machine_params.get("epsilon_width_max", 0.0)
-                    ),
-                    epsilon_thickness_max=safe_float(
-                        machine_params.get("epsilon_thickness_max", 0.0)
-                    ),
-                    b_max=safe_float(machine_params.get("B_max", 0.0)),
-                    d_surface_max=safe_float(machine_params.get("D_surface_max", 0.0)),
-                )
-            elif process_type == "inspection_cathode":
-                return CathodeInspection(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "inspection_anode"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_width_mm=safe_float(battery_model.get("final_width", 0.0)),
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    burr_factor=safe_float(battery_model.get("burr_factor", 0.0)),
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    epsilon_thickness=safe_float(
-                        battery_model.get("epsilon_thickness", 0.0)
-                    ),
-                    d_detected=safe_float(battery_model.get("D_detected", 0.0)),
-                    pass_width_mm=bool(battery_model.get("Pass_width", False)),
-                    pass_thickness_um=bool(battery_model.get("Pass_thickness", False)),
-                    pass_burr=bool(battery_model.get("Pass_burr", False)),
-                    pass_surface=bool(battery_model.get("Pass_surface", False)),
-                    overall=bool(battery_model.get("Overall", False)),
-                    # machine_parameters
-                    epsilon_width_max=safe_float(
-                        machine_params.get("epsilon_width_max", 0.0)
-                    ),
-                    epsilon_thickness_max=safe_float(
-                        machine_params.get("epsilon_thickness_max", 0.0)
-                    ),
-                    b_max=safe_float(machine_params.get("B_max", 0.0)),
-                    d_surface_max=safe_float(machine_params.get("D_surface_max", 0.0)),
-                )
-            elif process_type == "rewinding_cell":
-                return Rewinding(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "rewinding"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
-                    )
-                    * 1e6,
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    final_width_mm=safe_float(battery_model.get("final_width", 0.0)),
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    wound_length_m=safe_float(battery_model.get("wound_length", 0.0)),
-                    roll_diameter_mm=safe_float(battery_model.get("roll_diameter", 0.0))
-                    * 1e3,  # convert m to mm
-                    web_tension=safe_float(battery_model.get("web_tension", 0.0)),
-                    roll_hardness=safe_float(battery_model.get("roll_hardness", 0.0)),
-                    # machine_parameters
-                    rewinding_speed=safe_float(
-                        machine_params.get("rewinding_speed", 0.0)
-                    ),
-                    initial_tension=safe_float(
-                        machine_params.get("initial_tension", 0.0)
-                    ),
-                    tapering_steps=safe_float(
-                        machine_params.get("tapering_steps", 0.0)
-                    ),
-                    environment_humidity=safe_float(
-                        machine_params.get("environment_humidity", 0.0)
-                    ),
+            return self.write_records(batch_data, broadcast_fn)
+        except PERMANENT_ERRORS as e:
+            if broadcast_fn:
+                broadcast_fn(f"✗ Database rejected a record, writing one by one: {str(e)}")
+        return self.__write_records_one_by_one(batch_data, broadcast_fn)
+
+    def write_records(self, batch_data: List[Dict[str, Any]], broadcast_fn=None) -> int:
+        """Writes the payloads in one transaction, with one bulk INSERT (executemany) per table
+        rather than one ORM object flushed per row, and merges them into the rollups.
+        Returns the number of rows written."""
+        rows_by_mapper = self.__map_payloads(batch_data, broadcast_fn)
+        if not rows_by_mapper:
+            return 0
+        created_partitions = []
+        with self.engine.begin() as connection:
+            self.__insert_rows(connection, rows_by_mapper, created_partitions)
+        # only once committed: the partitions of a failed write are rolled back with it
+        self.__known_partitions.update(created_partitions)
+        return sum(len(rows) for rows in rows_by_mapper.values())
+
+    def __write_records_one_by_one(
+        self, batch_data: List[Dict[str, Any]], broadcast_fn=None
+    ) -> int:
+        """Writes the payloads in one transaction, each in its own savepoint: a payload the
+        database rejects is rolled back alone and moved to the dead letters once committed."""
+        written = 0
+        created_partitions = []
+        rejected: List[Tuple[Dict[str, Any], Exception]] = []
+        with self.engine.begin() as connection:
+            for data in batch_data:
+                rows_by_mapper = self.__map_payloads([data], broadcast_fn)
+                if not rows_by_mapper:
+                    continue
+                partitions = []
+                try:
+                    with connection.begin_nested():
+                        self.__insert_rows(connection, rows_by_mapper, partitions)
+                except PERMANENT_ERRORS as e:
+                    rejected.append((data, e))
+                    continue
+                created_partitions += partitions
+                written += 1
+        self.__known_partitions.update(created_partitions)
+        self.__add_dead_letters(rejected, broadcast_fn)
+        return written
+
+    def __map_payloads(
+        self, batch_data: List[Dict[str, Any]], broadcast_fn=None
+    ) -> Dict[RecordMapper, List[tuple]]:
+        """The rows of the payloads per table (the payloads that cannot be mapped are skipped)."""
+        rows_by_mapper: Dict[RecordMapper, List[tuple]] = {}
+        for data in batch_data:
+            mapper = self.get_record_mapper(data, broadcast_fn)
+            if mapper is None:
+                continue
+            try:
+                row = mapper.extract(data)
+            except Exception as e:
+                self.__report_invalid_payload(data, e, broadcast_fn)
+                continue
+            rows_by_mapper.setdefault(mapper, []).append(row)
+        return rows_by_mapper
+
+    def __insert_rows(
+        self,
+        connection: Connection,
+        rows_by_mapper: Dict[RecordMapper, List[tuple]],
+        created_partitions: List[str],
+    ):
+        """Inserts the rows in the connection's transaction; the partitions it creates are added
+        to `created_partitions`."""
+        rollup_records = []
+        for mapper, rows in rows_by_mapper.items():
+            telemetry = issubclass(mapper.table_class, TelemetryTable)
+            if self.partition_interval is not None and telemetry:
+                timestamp_index = mapper.columns.index("timestamp")
+                created_partitions += create_partitions(
+                    connection,
+                    mapper.table.name,
+                    [row[timestamp_index] for row in rows],
+                    self.partition_interval,
+                    self.__known_partitions,
                 )
-            elif process_type == "electrolyte_filling_cell":
-                return ElectrolyteFilling(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "electrolyte_filling"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    final_thickness_um=safe_float(
-                        battery_model.get("final_thickness", 0.0)
+            records = [dict(zip(mapper.columns, row)) for row in rows]
+            connection.execute(mapper.table.insert(), records)
+            if self.rollups and telemetry:
+                rollup_records.append((mapper.table, records))
+        # in the same transaction: a failed write, spilled and replayed, is not counted twice;
+        # after the inserts: the rows are rolled up with the requests of their batches
+        for table, records in rollup_records:
+            update_rollups(connection, table, records)
+
+    def __add_dead_letters(
+        self, rejected: List[Tuple[Dict[str, Any], Exception]], broadcast_fn=None
+    ):
+        if not rejected:
+            return
+        with open(self.dead_letter_file, "a") as f:
+            for data, error in rejected:
+                f.write(
+                    json.dumps(
+                        {
+                            "failed_at": datetime.now().isoformat(),
+                            "error": str(error.orig if error.orig is not None else error),
+                            "payload": data,
+                        },
+                        default=str,
                     )
-                    * 1e6,
-                    porosity=safe_float(battery_model.get("porosity", 0.0)),
-                    final_width_mm=safe_float(battery_model.get("final_width", 0.0)),
-                    epsilon_width=safe_float(battery_model.get("epsilon_width", 0.0)),
-                    wound_length_m=safe_float(battery_model.get("wound_length", 0.0)),
-                    v_sep=safe_float(battery_model.get("V_sep", 0.0)),
-                    v_elec=safe_float(battery_model.get("V_elec", 0.0)),
-                    v_max=safe_float(battery_model.get("V_max", 0.0)),
-                    eta_wetting=safe_float(battery_model.get("eta_wetting", 0.0)),
-                    v_elec_filling=safe_float(battery_model.get("V_elec_filling", 0.0)),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    vacuum_level=safe_float(machine_params.get("Vacuum_level", 0.0)),
-                    vacuum_filling=safe_float(
-                        machine_params.get("Vacuum_filling", 0.0)
-                    ),
-                    soaking_time_s=safe_float(machine_params.get("Soaking_time", 0.0)),
-                )
-            elif process_type == "formation_cycling_cell":
-                return FormationCycling(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "formation_cycling"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    voltage_v=safe_float(battery_model.get("Voltage_V", 0.0)),
-                    capacity_Ah=safe_float(battery_model.get("Capacity_Ah", 0.0)),
-                    sei_efficiency=safe_float(battery_model.get("sei_efficiency", 0.0)),
-                    eta_wetting=safe_float(battery_model.get("Eta wetting", 0.0)),
-                    volume_electrolyte=safe_float(
-                        battery_model.get("Volume_electrolyte", 0.0)
-                    ),
-                    # machine_parameters
-                    charge_current_A=safe_float(
-                        machine_params.get("Charge_current_A", 0.0)
-                    ),
-                    charge_voltage_limit_V=safe_float(
-                        machine_params.get("Charge_voltage_limit_V", 0.0)
-                    ),
-                    initial_voltage=safe_float(
-                        machine_params.get("Initial_Voltage", 0.0)
-                    ),
-                    formation_duration_s=safe_float(
-                        machine_params.get("Formation_duration_s", 0.0)
-                    ),
-                )
-            elif process_type == "aging_cell":
-                return Aging(
-                    batch=simulation_data.get("batch_id", 1),
-                    state=simulation_data.get("state", "Unknown"),
-                    timestamp=datetime.fromisoformat(simulation_data["timestamp"]),
-                    duration=safe_float(simulation_data.get("duration", 0.0)),
-                    process=simulation_data.get("process", "aging"),
-                    temperature_C=(
-                        safe_float(simulation_data.get("temperature_C", 0.0))
-                        if simulation_data.get("temperature_C", None) is not None
-                        else None
-                    ),
-                    # battery_model fields
-                    soc=safe_float(battery_model.get("SOC", 0.0)),
-                    initial_soc=safe_float(battery_model.get("Initial_SOC", 0.0)),
-                    final_ocv_v=safe_float(battery_model.get("Final_OCV_V", 0.0)),
-                    leakage_current_A=safe_float(
-                        battery_model.get("Leakage_Current_A", 0.0)
-                    ),
-                    defect_risk=bool(battery_model.get("defect_risk", False)),
-                    # machine_parameters
-                    k_leak=safe_float(machine_params.get("k_leak", 0.0)),
-                    temperature=safe_float(machine_params.get("temperature", 0.0)),
-                    aging_time_days=safe_float(
-                        machine_params.get("aging_time_days", 0.0)
-                    ),
+                    + "\n"
                 )
-            else:
-                if broadcast_fn:
-                    broadcast_fn(f"⚠ Unknown process type: {process_type}")
-                return None
+        self.dead_letters += len(rejected)
+        if broadcast_fn:
+            broadcast_fn(f"✗ Moved {len(rejected)} rejected records to {self.dead_letter_file}")
+
+    @staticmethod
+    def get_record_mapper(simulation_data: Dict[str, Any], broadcast_fn=None) -> Optional[RecordMapper]:
+        process_type = simulation_data.get("process", "unknown")
+        mapper = RECORD_MAPPERS.get(process_type)
+        if mapper is None and broadcast_fn:
+            broadcast_fn(f"⚠ Unknown process type: {process_type}")
+        return mapper
+
+    @staticmethod
+    def __report_invalid_payload(simulation_data: Dict[str, Any], error: Exception, broadcast_fn=None):
+        if broadcast_fn:
+            broadcast_fn(f"✗ Error creating DB record: {str(error)}")
+            broadcast_fn(f"Problematic data: {simulation_data}")
+
+    @classmethod
+    def create_db_record(cls, simulation_data: Dict[str, Any], broadcast_fn=None):
+        """The ORM object of the payload's row (see record_mapping), None if it cannot be mapped."""
+        mapper = cls.get_record_mapper(simulation_data, broadcast_fn)
+        if mapper is None:
+            return None
+        try:
+            return mapper.create_record(simulation_data)
         except Exception as e:
-            if broadcast_fn:
-                broadcast_fn(f"✗ Error creating DB record: {str(e)}")
-                broadcast_fn(f"Problematic data: {simulation_data}")
+            cls.__report_invalid_payload(simulation_data, e, broadcast_fn)
             return None
 
 
-# a singleton instance of the DBHelper
-database_helper = DBHelper()
+# a singleton instance of the DBHelper, the server's writer: it keeps the rollups up to date
+database_helper = DBHelper(rollups=True)
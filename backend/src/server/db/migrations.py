@@ -0,0 +1,202 @@
+"""
+Schema migrations of the telemetry tables (the per-step tables of the machines):
+
+- the (batch, timestamp) and BRIN timestamp indexes, created on the tables that predate them
+- optional range partitioning by timestamp (PostgreSQL), one partition per day or month: the
+  existing rows are moved into the partitioned table, later partitions are created by the DB writer
+  before it inserts rows that fall into them (see DBHelper partition_interval)
+- a rebuild of the rollup tables from the telemetry tables, for the rows written before the DB
+  writer maintained them (see rollup)
+
+    python src/server/db/migrations.py [--partition day|month] [--rebuild-rollups]
+"""
+
+import argparse
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from server.db.db import Base, engine as default_engine
+from server.db.model_table import BatchRollup, TelemetryTable, TimeRollup
+from server.db.rollup import update_rollups
+
+PARTITION_INTERVALS = ["day", "month"]
+
+
+def get_telemetry_tables() -> List[str]:
+    return sorted(
+        mapper.class_.__tablename__
+        for mapper in Base.registry.mappers
+        if issubclass(mapper.class_, TelemetryTable)
+    )
+
+
+def create_missing_indexes(engine: Engine = default_engine) -> List[str]:
+    """Creates the indexes of the models that the existing tables do not have yet."""
+    created = []
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        for table_name in get_telemetry_tables():
+            if table_name not in existing_tables:
+                continue
+            existing_indexes = {
+                index["name"] for index in inspect(connection).get_indexes(table_name)
+            }
+            for index in Base.metadata.tables[table_name].indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    created.append(index.name)
+    return created
+
+
+def get_partition_bounds(timestamp: datetime, interval: str) -> Tuple[datetime, datetime]:
+    """The range [start, end) of the partition holding the timestamp."""
+    if interval == "day":
+        start = datetime(timestamp.year, timestamp.month, timestamp.day)
+        return start, datetime.fromordinal(start.toordinal() + 1)
+    if interval == "month":
+        start = datetime(timestamp.year, timestamp.month, 1)
+        if start.month == 12:
+            return start, datetime(start.year + 1, 1, 1)
+        return start, datetime(start.year, start.month + 1, 1)
+    raise ValueError(f"Partition interval '{interval}' is not found")
+
+
+def get_partition_name(table_name: str, start: datetime, interval: str) -> str:
+    return f"{table_name}_p{start.strftime('%Y%m%d' if interval == 'day' else '%Y%m')}"
+
+
+def get_partitions(
+    table_name: str, first: datetime, last: datetime, interval: str
+) -> List[Tuple[str, datetime, datetime]]:
+    """The partitions (name, start, end) covering the time range [first, last]."""
+    partitions = []
+    start, end = get_partition_bounds(first, interval)
+    while start <= last:
+        partitions.append((get_partition_name(table_name, start, interval), start, end))
+        start, end = get_partition_bounds(end, interval)
+    return partitions
+
+
+def create_partitions(
+    connection: Connection,
+    table_name: str,
+    timestamps: Iterable[datetime],
+    interval: str,
+    known_partitions: Optional[set] = None,
+) -> List[str]:
+    """Creates the partitions of a partitioned table that the timestamps fall into (if missing).
+    The partitions in `known_partitions` are skipped; the caller adds the returned (created) ones
+    to it once the transaction commits, since a rollback drops them again."""
+    timestamps = list(timestamps)
+    if not timestamps:
+        return []
+    created = []
+    for name, start, end in get_partitions(
+        table_name, min(timestamps), max(timestamps), interval
+    ):
+        if known_partitions is not None and name in known_partitions:
+            continue
+        connection.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table_name}" '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def is_partitioned(connection: Connection, table_name: str) -> bool:
+    return bool(
+        connection.scalar(
+            text(
+                "SELECT count(*) FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table_name"
+            ),
+            {"table_name": table_name},
+        )
+    )
+
+
+def partition_table(connection: Connection, table_name: str, interval: str):
+    """
+    Turns a telemetry table into a table partitioned by timestamp (PostgreSQL), keeping its rows
+    and its id sequence: the table is renamed, a partitioned copy of it is created with the
+    partitions its rows need, the rows are copied over and the old table is dropped.
+    Runs in the caller's transaction, so a failure leaves the table as it was.
+    """
+    if is_partitioned(connection, table_name):
+        return
+    old_table_name = f"{table_name}_unpartitioned"
+    connection.execute(text(f'ALTER TABLE "{table_name}" RENAME TO "{old_table_name}"'))
+    connection.execute(
+        text(
+            f'CREATE TABLE "{table_name}" (LIKE "{old_table_name}" INCLUDING DEFAULTS) '
+            'PARTITION BY RANGE ("timestamp")'
+        )
+    )
+    first, last = connection.execute(
+        text(f'SELECT min("timestamp"), max("timestamp") FROM "{old_table_name}"')
+    ).one()
+    if first is not None:
+        create_partitions(connection, table_name, [first, last], interval)
+    connection.execute(text(f'INSERT INTO "{table_name}" SELECT * FROM "{old_table_name}"'))
+    # the id sequence would be dropped with the old table
+    connection.execute(
+        text(f'ALTER SEQUENCE "{table_name}_id_seq" OWNED BY "{table_name}".id')
+    )
+    connection.execute(text(f'DROP TABLE "{old_table_name}"'))
+    # once the old table and its index names are gone; the partition key must be part of the
+    # primary key. Created on the partitioned table, hence on every partition
+    connection.execute(text(f'ALTER TABLE "{table_name}" ADD PRIMARY KEY (id, "timestamp")'))
+    for index in Base.metadata.tables[table_name].indexes:
+        index.create(connection)
+
+
+def rebuild_rollups(engine: Engine = default_engine, chunk_size: int = 10000):
+    """Recomputes the rollups from all the rows of the telemetry tables, read from a server-side
+    cursor `chunk_size` rows at a time. In one transaction: the DB writer must be stopped."""
+    with engine.begin() as connection:
+        connection.execute(delete(BatchRollup.__table__))
+        connection.execute(delete(TimeRollup.__table__))
+        for table_name in get_telemetry_tables():
+            table = Base.metadata.tables[table_name]
+            result = connection.execution_options(
+                stream_results=True, yield_per=chunk_size
+            ).execute(select(table))
+            for rows in result.mappings().partitions():
+                update_rollups(connection, table, rows)
+
+
+def migrate(
+    engine: Engine = default_engine,
+    partition_interval: Optional[str] = None,
+    rollups: bool = False,
+):
+    Base.metadata.create_all(bind=engine)
+    created = create_missing_indexes(engine)
+    print(f"Created indexes: {created}")
+    if rollups:
+        rebuild_rollups(engine)
+        print("Rebuilt the rollups")
+    if partition_interval is None:
+        return
+    if partition_interval not in PARTITION_INTERVALS:
+        raise ValueError(f"Partition interval '{partition_interval}' is not found")
+    if engine.dialect.name != "postgresql":
+        raise ValueError("Partitioning needs PostgreSQL")
+    for table_name in get_telemetry_tables():
+        with engine.begin() as connection:
+            partition_table(connection, table_name, partition_interval)
+        print(f"Partitioned {table_name} by {partition_interval}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the telemetry tables.")
+    parser.add_argument("--partition", choices=PARTITION_INTERVALS, default=None)
+    parser.add_argument("--rebuild-rollups", action="store_true")
+    arguments = parser.parse_args()
+    migrate(partition_interval=arguments.partition, rollups=arguments.rebuild_rollups)
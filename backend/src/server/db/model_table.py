@@ -1,9 +1,41 @@
 from server.db.db import engine, Base
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Index,
+    Integer,
+    Float,
+    String,
+    DateTime,
+    Boolean,
+    JSON,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declared_attr
 from datetime import datetime
 
 
-class CathodeMixing(Base):
+class TelemetryTable:
+    """
+    The per-step tables of the machines. The dashboards and the API filter them by batch and
+    order them by time: rows are indexed by (batch, timestamp), and by timestamp with a BRIN index
+    (small, and fast for the insertion-ordered time ranges; a plain index on SQLite).
+    """
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (
+            Index(f"ix_{cls.__tablename__}_batch_timestamp", "batch", "timestamp"),
+            Index(
+                f"ix_{cls.__tablename__}_timestamp_brin",
+                "timestamp",
+                postgresql_using="brin",
+            ),
+        )
+
+
+class CathodeMixing(TelemetryTable, Base):
     __tablename__ = "mixing_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -31,7 +63,7 @@ class CathodeMixing(Base):
     solvent = Column(Float)
 
 
-class AnodeMixing(Base):
+class AnodeMixing(TelemetryTable, Base):
     __tablename__ = "mixing_anode"
     id = Column(Integer, primary_key=True, index=True)
     batch = Column(String, nullable=False)
@@ -59,7 +91,7 @@ class AnodeMixing(Base):
 
 
 # --- Coating ---
-class CathodeCoating(Base):
+class CathodeCoating(TelemetryTable, Base):
     __tablename__ = "coating_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -85,7 +117,7 @@ class CathodeCoating(Base):
     coating_width_mm = Column(Float)
 
 
-class AnodeCoating(Base):
+class AnodeCoating(TelemetryTable, Base):
     __tablename__ = "coating_anode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -112,7 +144,7 @@ class AnodeCoating(Base):
 
 
 # --- Drying ---
-class CathodeDrying(Base):
+class CathodeDrying(TelemetryTable, Base):
     __tablename__ = "drying_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -135,7 +167,7 @@ class CathodeDrying(Base):
     web_speed = Column(Float)
 
 
-class AnodeDrying(Base):
+class AnodeDrying(TelemetryTable, Base):
     __tablename__ = "drying_anode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -159,7 +191,7 @@ class AnodeDrying(Base):
 
 
 # --- Calendaring ---
-class CathodeCalendaring(Base):
+class CathodeCalendaring(TelemetryTable, Base):
     __tablename__ = "calendaring_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -184,7 +216,7 @@ class CathodeCalendaring(Base):
     initial_porosity = Column(Float)
 
 
-class AnodeCalendaring(Base):
+class AnodeCalendaring(TelemetryTable, Base):
     __tablename__ = "calendaring_anode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -210,7 +242,7 @@ class AnodeCalendaring(Base):
 
 
 # --- Slitting ---
-class CathodeSlitting(Base):
+class CathodeSlitting(TelemetryTable, Base):
     __tablename__ = "slitting_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -235,7 +267,7 @@ class CathodeSlitting(Base):
     slitting_tension = Column(Float)
 
 
-class AnodeSlitting(Base):
+class AnodeSlitting(TelemetryTable, Base):
     __tablename__ = "slitting_anode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -261,7 +293,7 @@ class AnodeSlitting(Base):
 
 
 # --- Inspection ---
-class AnodeInspection(Base):
+class AnodeInspection(TelemetryTable, Base):
     __tablename__ = "inspection_anode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -293,7 +325,7 @@ class AnodeInspection(Base):
     d_surface_max = Column(Float)
 
 
-class CathodeInspection(Base):
+class CathodeInspection(TelemetryTable, Base):
     __tablename__ = "inspection_cathode"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -326,7 +358,7 @@ class CathodeInspection(Base):
 
 
 # --- Rewinding ---
-class Rewinding(Base):
+class Rewinding(TelemetryTable, Base):
     __tablename__ = "rewinding"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -355,7 +387,7 @@ class Rewinding(Base):
 
 
 # --- Electrolyte Filling ---
-class ElectrolyteFilling(Base):
+class ElectrolyteFilling(TelemetryTable, Base):
     __tablename__ = "electrolyte_filling"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -386,7 +418,7 @@ class ElectrolyteFilling(Base):
 
 
 # --- Formation Cycling ---
-class FormationCycling(Base):
+class FormationCycling(TelemetryTable, Base):
     __tablename__ = "formation_cycling"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -412,7 +444,7 @@ class FormationCycling(Base):
 
 
 # --- Aging ---
-class Aging(Base):
+class Aging(TelemetryTable, Base):
     __tablename__ = "aging"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -436,10 +468,115 @@ class Aging(Base):
     aging_time_days = Column(Float)
 
 
+# --- Batches ---
+class BatchRecord(Base):
+    __tablename__ = "batch"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch = Column(String, nullable=False, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    process = Column(String, nullable=False)
+    # seed of the batch's random draws: a batch added with the same seed is reproduced
+    seed = Column(BigInteger, nullable=False)
+
+
+class BatchSummary(Base):
+    """
+    One row per completed batch (written at BATCH_COMPLETED, see batch_summary): the quality
+    metrics in indexed columns, to query and sort the batches by, and the final model properties,
+    parameters and duration of every stage.
+    """
+
+    __tablename__ = "batch_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # not unique: the batch ids start again from 1 when the server restarts
+    batch = Column(String, nullable=False, index=True)
+    seed = Column(BigInteger)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime, nullable=False, index=True)
+    duration_s = Column(Float, index=True)
+
+    # quality metrics: pass/fail of the inspections and of aging, and the cell's final values
+    passed = Column(Boolean, index=True)
+    anode_inspection_passed = Column(Boolean)
+    cathode_inspection_passed = Column(Boolean)
+    defect_risk = Column(Boolean)
+    capacity_Ah = Column(Float, index=True)
+    final_ocv_v = Column(Float, index=True)
+    leakage_current_A = Column(Float, index=True)
+
+    # stage (process) -> final model properties, parameters, duration (seconds from its first to
+    # its last step)
+    stage_properties = Column(JSON().with_variant(JSONB(), "postgresql"))
+    stage_parameters = Column(JSON().with_variant(JSONB(), "postgresql"))
+    stage_durations_s = Column(JSON().with_variant(JSONB(), "postgresql"))
+
+
+# --- Rollups ---
+# Aggregates of the numeric columns of the telemetry tables, kept up to date by the DB writer as it
+# writes the rows (see rollup): long-range dashboards read them instead of the per-step rows.
+# The mean is sum / count, both kept to merge further rows; "last" is the value at last_timestamp.
+class BatchRollup(Base):
+    """Per stage (telemetry table), batch and column."""
+
+    __tablename__ = "rollup_batch"
+    __table_args__ = (
+        UniqueConstraint(
+            "stage", "batch_record_id", "column_name", name="uq_rollup_batch_key"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    stage = Column(String, nullable=False)
+    batch = Column(String, nullable=False)
+    # the request (BatchRecord) of the batch: the batch ids start again when the server restarts
+    batch_record_id = Column(Integer, nullable=False)
+    column_name = Column(String, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    mean_value = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+
+class TimeRollup(Base):
+    """Per stage (telemetry table), time bucket (a minute or an hour, all batches) and column."""
+
+    __tablename__ = "rollup_time"
+    __table_args__ = (
+        UniqueConstraint(
+            "stage", "resolution", "column_name", "bucket", name="uq_rollup_time_key"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    stage = Column(String, nullable=False)
+    resolution = Column(String, nullable=False)
+    column_name = Column(String, nullable=False)
+    # start of the bucket
+    bucket = Column(DateTime, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    mean_value = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+
 def create_tables():
     """Create all database tables and setup user permissions."""
     Base.metadata.create_all(bind=engine)
 
+    # the indexes added to the tables created by earlier versions
+    from server.db.migrations import create_missing_indexes
+
+    create_missing_indexes(engine)
+
     # Setup read-only user for Grafana
     from server.db.db import user_connection
 
@@ -0,0 +1,392 @@
+"""
+Declarative mapping of the machine state payloads to the rows of their tables.
+
+A mapping lists, for every column of a process table, where its value is in the payload and how it
+is converted. Each mapping is compiled once into an extractor function that reads the payload
+straight into a tuple in column order, ready for a bulk insert. A new machine needs a mapping
+here, not a new branch in the DB writer.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .model_table import *
+
+# a field without a default: a payload without it is not written (e.g. the timestamp)
+REQUIRED = object()
+
+M_TO_UM = 1e6
+M_TO_MM = 1e3
+
+
+def to_float(value, default=0.0) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return default
+
+
+def to_optional_float(value) -> Optional[float]:
+    return None if value is None else to_float(value)
+
+
+# conversion -> expression template applied to the value read from the payload
+CONVERSIONS = {
+    "float": "to_float({})",
+    "optional_float": "to_optional_float({})",
+    "bool": "bool({})",
+    "int": "int({})",
+    "timestamp": "parse_timestamp({})",
+    "raw": "{}",
+}
+
+
+@dataclass(frozen=True)
+class Field:
+    """A column and where its value is in the payload, e.g. "battery_model.viscosity"."""
+
+    column: str
+    path: str
+    conversion: str = "float"
+    default: Any = 0.0
+    # unit conversion of a float, e.g. M_TO_UM
+    scale: float = 1.0
+
+
+def model(column: str, key: str, scale: float = 1.0) -> Field:
+    return Field(column, f"battery_model.{key}", scale=scale)
+
+
+def model_flag(column: str, key: str) -> Field:
+    return Field(column, f"battery_model.{key}", "bool", False)
+
+
+def parameter(column: str, key: str, scale: float = 1.0) -> Field:
+    return Field(column, f"machine_parameters.{key}", scale=scale)
+
+
+def machine_fields(nullable_temperature: bool = False) -> List[Field]:
+    """The columns every machine table has."""
+    return [
+        Field("batch", "batch_id", "raw", 1),
+        Field("state", "state", "raw", "Unknown"),
+        Field("timestamp", "timestamp", "timestamp", REQUIRED),
+        Field("duration", "duration"),
+        Field("process", "process", "raw", REQUIRED),
+        (
+            Field("temperature_C", "temperature_C", "optional_float", None)
+            if nullable_temperature
+            else Field("temperature_C", "temperature_C")
+        ),
+    ]
+
+
+@dataclass(frozen=True)
+class RecordMapping:
+    table_class: type
+    fields: List[Field]
+
+
+def mixing_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields()
+        + [
+            model("am_volume_L", "AM_volume"),
+            model("ca_volume_L", "CA_volume"),
+            model("pvdf_volume_L", "PVDF_volume"),
+            model("solvent_volume_L", "H2O_volume"),
+            model("viscosity_Pa_s", "viscosity"),
+            model("density_kg_m3", "density"),
+            model("yield_stress_Pa", "yield_stress"),
+            model("total_volume_L", "total_volume"),
+            parameter("am", "AM_ratio"),
+            parameter("ca", "CA_ratio"),
+            parameter("pvdf", "PVDF_ratio"),
+            parameter("solvent", "solvent_ratio"),
+        ],
+    )
+
+
+def coating_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields()
+        + [
+            model("solid_content", "solid_content"),
+            model("viscosity_Pa_s", "viscosity"),
+            model("wet_thickness_um", "wet_thickness"),
+            model("dry_thickness_um", "dry_thickness"),
+            model_flag("defect_risk", "defect_risk"),
+            parameter("coating_speed", "coating_speed"),
+            parameter("gap_height_um", "gap_height"),
+            parameter("flow_rate", "flow_rate"),
+            parameter("coating_width_mm", "coating_width"),
+        ],
+    )
+
+
+def drying_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields()
+        + [
+            model("wet_thickness_um", "wet_thickness", M_TO_UM),
+            model("dry_thickness_um", "dry_thickness", M_TO_UM),
+            model("m_solvent", "M_solvent"),
+            model_flag("defect_risk", "defect_risk"),
+            model("solid_content", "solid_content"),
+            model("temperature", "temperature"),
+            parameter("web_speed", "web_speed"),
+        ],
+    )
+
+
+def calendaring_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields()
+        + [
+            model("final_thickness_um", "final_thickness", M_TO_UM),
+            model("porosity", "porosity"),
+            model_flag("defect_risk", "defect_risk"),
+            parameter("roll_gap_um", "roll_gap", M_TO_UM),
+            parameter("roll_pressure", "roll_pressure"),
+            parameter("temperature", "temperature"),
+            parameter("roll_speed", "roll_speed"),
+            parameter("dry_thickness_um", "dry_thickness", M_TO_UM),
+            parameter("initial_porosity", "initial_porosity"),
+        ],
+    )
+
+
+def slitting_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("final_thickness_um", "final_thickness", M_TO_UM),
+            model("width_final_mm", "width_final"),
+            model("epsilon_width", "epsilon_width"),
+            model("burr_factor", "burr_factor"),
+            model_flag("defect_risk", "defect_risk"),
+            parameter("blade_sharpness", "blade_sharpness"),
+            parameter("slitting_speed", "slitting_speed"),
+            parameter("target_width_mm", "target_width"),
+            parameter("slitting_tension", "slitting_tension"),
+        ],
+    )
+
+
+def inspection_mapping(table_class: type) -> RecordMapping:
+    return RecordMapping(
+        table_class,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("final_width_mm", "final_width"),
+            model("final_thickness_um", "final_thickness", M_TO_UM),
+            model("epsilon_width", "epsilon_width"),
+            model("burr_factor", "burr_factor"),
+            model("porosity", "porosity"),
+            model("epsilon_thickness", "epsilon_thickness"),
+            model("d_detected", "D_detected"),
+            model_flag("pass_width_mm", "Pass_width"),
+            model_flag("pass_thickness_um", "Pass_thickness"),
+            model_flag("pass_burr", "Pass_burr"),
+            model_flag("pass_surface", "Pass_surface"),
+            model_flag("overall", "Overall"),
+            parameter("epsilon_width_max", "epsilon_width_max"),
+            parameter("epsilon_thickness_max", "epsilon_thickness_max"),
+            parameter("b_max", "B_max"),
+            parameter("d_surface_max", "D_surface_max"),
+        ],
+    )
+
+
+# process name (the "process" of the payload) -> its table and columns
+RECORD_MAPPINGS: Dict[str, RecordMapping] = {
+    "mixing_anode": mixing_mapping(AnodeMixing),
+    "mixing_cathode": mixing_mapping(CathodeMixing),
+    "coating_anode": coating_mapping(AnodeCoating),
+    "coating_cathode": coating_mapping(CathodeCoating),
+    "drying_anode": drying_mapping(AnodeDrying),
+    "drying_cathode": drying_mapping(CathodeDrying),
+    "calendaring_anode": calendaring_mapping(AnodeCalendaring),
+    "calendaring_cathode": calendaring_mapping(CathodeCalendaring),
+    "slitting_anode": slitting_mapping(AnodeSlitting),
+    "slitting_cathode": slitting_mapping(CathodeSlitting),
+    "inspection_anode": inspection_mapping(AnodeInspection),
+    "inspection_cathode": inspection_mapping(CathodeInspection),
+    "rewinding_cell": RecordMapping(
+        Rewinding,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("final_thickness_um", "final_thickness", M_TO_UM),
+            model("porosity", "porosity"),
+            model("final_width_mm", "final_width"),
+            model("epsilon_width", "epsilon_width"),
+            model("wound_length_m", "wound_length"),
+            model("roll_diameter_mm", "roll_diameter", M_TO_MM),
+            model("web_tension", "web_tension"),
+            model("roll_hardness", "roll_hardness"),
+            parameter("rewinding_speed", "rewinding_speed"),
+            parameter("initial_tension", "initial_tension"),
+            parameter("tapering_steps", "tapering_steps"),
+            parameter("environment_humidity", "environment_humidity"),
+        ],
+    ),
+    "electrolyte_filling_cell": RecordMapping(
+        ElectrolyteFilling,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("final_thickness_um", "final_thickness", M_TO_UM),
+            model("porosity", "porosity"),
+            model("final_width_mm", "final_width"),
+            model("epsilon_width", "epsilon_width"),
+            model("wound_length_m", "wound_length"),
+            model("v_sep", "V_sep"),
+            model("v_elec", "V_elec"),
+            model("v_max", "V_max"),
+            model("eta_wetting", "eta_wetting"),
+            model("v_elec_filling", "V_elec_filling"),
+            model_flag("defect_risk", "defect_risk"),
+            parameter("vacuum_level", "Vacuum_level"),
+            parameter("vacuum_filling", "Vacuum_filling"),
+            parameter("soaking_time_s", "Soaking_time"),
+        ],
+    ),
+    "formation_cycling_cell": RecordMapping(
+        FormationCycling,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("voltage_v", "Voltage_V"),
+            model("capacity_Ah", "Capacity_Ah"),
+            model("sei_efficiency", "sei_efficiency"),
+            model("eta_wetting", "Eta wetting"),
+            model("volume_electrolyte", "Volume_electrolyte"),
+            parameter("charge_current_A", "Charge_current_A"),
+            parameter("charge_voltage_limit_V", "Charge_voltage_limit_V"),
+            parameter("initial_voltage", "Initial_Voltage"),
+            parameter("formation_duration_s", "Formation_duration_s"),
+        ],
+    ),
+    "aging_cell": RecordMapping(
+        Aging,
+        machine_fields(nullable_temperature=True)
+        + [
+            model("soc", "SOC"),
+            model("initial_soc", "Initial_SOC"),
+            model("final_ocv_v", "Final_OCV_V"),
+            model("leakage_current_A", "Leakage_Current_A"),
+            model_flag("defect_risk", "defect_risk"),
+            parameter("k_leak", "k_leak"),
+            parameter("temperature", "temperature"),
+            parameter("aging_time_days", "aging_time_days"),
+        ],
+    ),
+    # the seed a batch was requested with
+    "batch": RecordMapping(
+        BatchRecord,
+        [
+            Field("batch", "batch_id", "raw", REQUIRED),
+            Field("timestamp", "timestamp", "timestamp", REQUIRED),
+            Field("process", "process", "raw", REQUIRED),
+            Field("seed", "seed", "int", REQUIRED),
+        ],
+    ),
+    # one row per completed batch, assembled by the event handler (see batch_summary)
+    "batch_summary": RecordMapping(
+        BatchSummary,
+        [
+            Field("batch", "batch_id", "raw", REQUIRED),
+            Field("seed", "seed", "raw", None),
+            Field("started_at", "started_at", "timestamp", REQUIRED),
+            Field("completed_at", "timestamp", "timestamp", REQUIRED),
+            Field("duration_s", "duration_s", "optional_float", None),
+            Field("passed", "passed", "raw", None),
+            Field("anode_inspection_passed", "anode_inspection_passed", "raw", None),
+            Field("cathode_inspection_passed", "cathode_inspection_passed", "raw", None),
+            Field("defect_risk", "defect_risk", "raw", None),
+            Field("capacity_Ah", "capacity_Ah", "optional_float", None),
+            Field("final_ocv_v", "final_ocv_v", "optional_float", None),
+            Field("leakage_current_A", "leakage_current_A", "optional_float", None),
+            Field("stage_properties", "stage_properties", "raw", {}),
+            Field("stage_parameters", "stage_parameters", "raw", {}),
+            Field("stage_durations_s", "stage_durations_s", "raw", {}),
+        ],
+    ),
+}
+
+
+class RecordMapper:
+    """A compiled mapping: `extract(payload)` returns the row as a tuple in `columns` order."""
+
+    def __init__(
+        self,
+        process: str,
+        table_class: type,
+        columns: Tuple[str, ...],
+        extract: Callable[[Dict[str, Any]], tuple],
+    ):
+        self.process = process
+        self.table_class = table_class
+        self.table = table_class.__table__
+        self.columns = columns
+        self.extract = extract
+
+    def create_record(self, payload: Dict[str, Any]):
+        """The ORM object of the row (the bulk insert does not need one)."""
+        return self.table_class(**dict(zip(self.columns, self.extract(payload))))
+
+
+def compile_record_mapping(process: str, mapping: RecordMapping) -> RecordMapper:
+    """Generates the extractor of the mapping: one function reading every field in turn, without
+    a lookup of the mapping per row."""
+    table_columns = mapping.table_class.__table__.columns
+    sources: Dict[str, str] = {}
+    values = []
+    for field in mapping.fields:
+        if field.column not in table_columns:
+            raise ValueError(
+                f"Column '{field.column}' is not found in table '{mapping.table_class.__tablename__}'"
+            )
+        *parents, key = field.path.split(".")
+        source = "data"
+        if parents:
+            # nested dicts are looked up once per row, e.g. battery_model = data.get("battery_model", {})
+            source = sources.setdefault(".".join(parents), f"source_{len(sources)}")
+        if field.default is REQUIRED:
+            value = f"{source}[{key!r}]"
+        else:
+            value = f"{source}.get({key!r}, {field.default!r})"
+        value = CONVERSIONS[field.conversion].format(value)
+        if field.scale != 1.0:
+            value = f"{value} * {field.scale!r}"
+        values.append(value)
+    lines = [f"def extract_{process}(data):"]
+    for path, name in sources.items():
+        (parent,) = path.split(".")
+        lines.append(f"    {name} = data.get({parent!r}, {{}})")
+    lines.append("    return (")
+    lines.extend(f"        {value}," for value in values)
+    lines.append("    )")
+    namespace = {
+        "to_float": to_float,
+        "to_optional_float": to_optional_float,
+        "parse_timestamp": datetime.fromisoformat,
+    }
+    exec(compile("\n".join(lines), f"<record mapping {process}>", "exec"), namespace)
+    return RecordMapper(
+        process,
+        mapping.table_class,
+        tuple(field.column for field in mapping.fields),
+        namespace[f"extract_{process}"],
+    )
+
+
+# compiled once, when the module is imported
+RECORD_MAPPERS: Dict[str, RecordMapper] = {
+    process: compile_record_mapping(process, mapping)
+    for process, mapping in RECORD_MAPPINGS.items()
+}
@@ -0,0 +1,281 @@
+"""
+Downsampled rollups of the telemetry tables: for every numeric column of a stage the count, sum,
+min, max, mean and last value per batch, and per minute and per hour bucket (see BatchRollup and
+TimeRollup). The DB writer (the server's, or any created with rollups=True) merges the rows it
+writes into them in the same transaction, so the rollups never miss nor count twice a written row; `get_time_rollup` reads the resolution that fits
+a time range in a bounded number of points.
+
+The batch ids start again from 1 when the server restarts, so a row is rolled up with the request
+of its batch (the latest BatchRecord of its batch id at the row's time) rather than its batch id.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Float, Integer, Numeric, Table, case, func, select
+from sqlalchemy.engine import Connection
+
+from server.db.model_table import BatchRecord, BatchRollup, TimeRollup
+
+# bucket size of the time rollups, finest first
+RESOLUTIONS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1)}
+# points a time series is downsampled to at most (when the hourly rollup allows it)
+DEFAULT_MAX_POINTS = 1000
+
+# batch id -> (timestamps, BatchRecord ids) of its requests, in time order
+_BatchRequests = Dict[str, Tuple[List[datetime], List[int]]]
+
+
+def get_rollup_columns(table: Table) -> List[str]:
+    """The numeric columns of a telemetry table (booleans count as 0/1: their mean is a rate)."""
+    return [
+        column.name
+        for column in table.columns
+        if column.name != "id" and isinstance(column.type, (Float, Integer, Numeric, Boolean))
+    ]
+
+
+def get_bucket(timestamp: datetime, resolution: str) -> datetime:
+    if resolution == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    raise ValueError(f"Resolution '{resolution}' is not found")
+
+
+def get_batch_requests(connection: Connection, batches: Iterable[str]) -> _BatchRequests:
+    """The requests (BatchRecord rows) of the batch ids, in time order."""
+    table = BatchRecord.__table__
+    requests: _BatchRequests = {}
+    for batch, timestamp, record_id in connection.execute(
+        select(table.c.batch, table.c.timestamp, table.c.id)
+        .where(table.c.batch.in_(set(batches)))
+        .order_by(table.c.timestamp, table.c.id)
+    ):
+        timestamps, record_ids = requests.setdefault(batch, ([], []))
+        timestamps.append(timestamp)
+        record_ids.append(record_id)
+    return requests
+
+
+def _get_batch_record_id(
+    requests: _BatchRequests, batch: str, timestamp: datetime
+) -> Optional[int]:
+    """The request of the batch the row belongs to, None if the batch was never recorded."""
+    timestamps, record_ids = requests.get(batch, ([], []))
+    index = bisect_right(timestamps, timestamp) - 1
+    return record_ids[index] if index >= 0 else None
+
+
+def _aggregate_columns(
+    rows: List[Dict[str, Any]], columns: List[str]
+) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """The aggregates of every column over the rows (in any order), of the columns with a value.
+    Column by column with builtins rather than value by value: this runs in the write's
+    transaction (see local_tests/benchmark_rollup.py)."""
+    timestamps = [row["timestamp"] for row in rows]
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        if None in values:
+            present = [index for index, value in enumerate(values) if value is not None]
+            if not present:
+                continue
+            values = [values[index] for index in present]
+            value_timestamps = [timestamps[index] for index in present]
+        else:
+            value_timestamps = timestamps
+        values = list(map(float, values))
+        total = sum(values)
+        last_timestamp = max(value_timestamps)
+        # the last of the values at the last timestamp
+        last_index = len(values) - 1 - value_timestamps[::-1].index(last_timestamp)
+        yield name, {
+            "sample_count": len(values),
+            "value_sum": total,
+            "min_value": min(values),
+            "max_value": max(values),
+            "mean_value": total / len(values),
+            "last_value": values[last_index],
+            "last_timestamp": last_timestamp,
+            "first_timestamp": min(value_timestamps),
+        }
+
+
+def aggregate_rows(
+    table: Table, rows: Iterable[Dict[str, Any]], requests: _BatchRequests
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """The batch and time rollup rows of the rows of a telemetry table (one per key). The rows of
+    a batch without a request are left out of the batch rollup."""
+    columns = get_rollup_columns(table)
+    by_batch: Dict[tuple, List[Dict[str, Any]]] = {}
+    by_time: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        timestamp = row["timestamp"]
+        record_id = _get_batch_record_id(requests, row["batch"], timestamp)
+        if record_id is not None:
+            by_batch.setdefault((row["batch"], record_id), []).append(row)
+        for resolution in RESOLUTIONS:
+            by_time.setdefault((resolution, get_bucket(timestamp, resolution)), []).append(row)
+    batch_rows = [
+        {
+            "stage": table.name,
+            "batch": batch,
+            "batch_record_id": record_id,
+            "column_name": name,
+            **values,
+        }
+        for (batch, record_id), group in by_batch.items()
+        for name, values in _aggregate_columns(group, columns)
+    ]
+    time_rows = []
+    for (resolution, bucket), group in by_time.items():
+        for name, values in _aggregate_columns(group, columns):
+            del values["first_timestamp"]
+            time_rows.append(
+                {
+                    "stage": table.name,
+                    "resolution": resolution,
+                    "column_name": name,
+                    "bucket": bucket,
+                    **values,
+                }
+            )
+    return batch_rows, time_rows
+
+
+# (dialect, rollup table) -> its upsert statement, built once
+_upserts: Dict[Tuple[str, str], Any] = {}
+
+
+def _get_upsert(dialect: str, table: Table, key: List[str]):
+    """The statement inserting the rollup rows, merged into the rows already stored under their
+    key."""
+    upsert = _upserts.get((dialect, table.name))
+    if upsert is not None:
+        return upsert
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        least, greatest = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        # the scalar (multi-argument) min and max of SQLite
+        least, greatest = func.min, func.max
+    else:
+        raise ValueError(f"Rollups are not supported on {dialect}")
+    statement = insert(table)
+    stored, new = table.c, statement.excluded
+    count = stored["sample_count"] + new["sample_count"]
+    total = stored["value_sum"] + new["value_sum"]
+    merged = {
+        "sample_count": count,
+        "value_sum": total,
+        "mean_value": total / count,
+        "min_value": least(stored["min_value"], new["min_value"]),
+        "max_value": greatest(stored["max_value"], new["max_value"]),
+        "last_value": case(
+            (new["last_timestamp"] >= stored["last_timestamp"], new["last_value"]),
+            else_=stored["last_value"],
+        ),
+        "last_timestamp": greatest(stored["last_timestamp"], new["last_timestamp"]),
+    }
+    if "first_timestamp" in table.c:
+        merged["first_timestamp"] = least(stored["first_timestamp"], new["first_timestamp"])
+    upsert = statement.on_conflict_do_update(index_elements=key, set_=merged)
+    _upserts[(dialect, table.name)] = upsert
+    return upsert
+
+
+def _upsert(connection: Connection, table: Table, key: List[str], rows: List[Dict[str, Any]]):
+    """Inserts the rollup rows, merged into the rows already stored under their key."""
+    connection.execute(_get_upsert(connection.dialect.name, table, key), rows)
+
+
+def update_rollups(connection: Connection, table: Table, rows: List[Dict[str, Any]]):
+    """Merges the rows of a telemetry table written in the connection's transaction into the
+    rollups (after the requests of their batches)."""
+    requests = get_batch_requests(connection, {row["batch"] for row in rows})
+    batch_rows, time_rows = aggregate_rows(table, rows, requests)
+    if batch_rows:
+        _upsert(
+            connection,
+            BatchRollup.__table__,
+            ["stage", "batch_record_id", "column_name"],
+            batch_rows,
+        )
+    if time_rows:
+        _upsert(
+            connection,
+            TimeRollup.__table__,
+            ["stage", "resolution", "column_name", "bucket"],
+            time_rows,
+        )
+
+
+def choose_resolution(
+    start: datetime, end: datetime, max_points: int = DEFAULT_MAX_POINTS
+) -> str:
+    """The finest resolution with at most `max_points` buckets in [start, end) (hourly at most)."""
+    for resolution, size in RESOLUTIONS.items():
+        if (end - start) / size <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def _to_dict(row) -> Dict[str, Any]:
+    return {
+        name: row[name]
+        for name in row.keys()
+        if name not in ["id", "stage", "value_sum"]
+    }
+
+
+def get_time_rollup(
+    connection: Connection,
+    stage: str,
+    column_name: str,
+    start: datetime,
+    end: datetime,
+    resolution: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """The buckets of a column of a stage over [start, end), in time order, at the given
+    resolution or the one chosen for the range; returns the resolution and the buckets."""
+    if resolution is None:
+        resolution = choose_resolution(start, end, max_points)
+    elif resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolution '{resolution}' is not found")
+    table = TimeRollup.__table__
+    rows = connection.execute(
+        select(table)
+        .where(
+            table.c.stage == stage,
+            table.c.resolution == resolution,
+            table.c.column_name == column_name,
+            # the bucket holding `start` too
+            table.c.bucket >= get_bucket(start, resolution),
+            table.c.bucket < end,
+        )
+        .order_by(table.c.bucket)
+    ).mappings()
+    return resolution, [_to_dict(row) for row in rows]
+
+
+def get_batch_rollup(
+    connection: Connection,
+    stage: str,
+    column_name: Optional[str] = None,
+    batch: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """The per-batch aggregates of a stage, of one column and/or batch id (every run of it) when
+    given."""
+    table = BatchRollup.__table__
+    statement = select(table).where(table.c.stage == stage)
+    if column_name is not None:
+        statement = statement.where(table.c.column_name == column_name)
+    if batch is not None:
+        statement = statement.where(table.c.batch == batch)
+    statement = statement.order_by(table.c.first_timestamp, table.c.column_name)
+    return [_to_dict(row) for row in connection.execute(statement).mappings()]
@@ -0,0 +1,166 @@
+"""
+Reads of the telemetry tables for the API, without loading a whole table: rows are filtered by batch
+and time range, projected to the requested columns and returned one page at a time (keyset
+pagination: a page starts after the last row of the previous one, so deep pages cost as much as
+the first) or streamed as NDJSON/CSV from a server-side cursor.
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, and_, or_, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+
+# the orders rows can be paged in (the timestamp order breaks ties by id)
+ORDER_COLUMNS = ["id", "timestamp"]
+EXPORT_FORMATS = ["json", "ndjson", "csv"]
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# rows fetched from the server-side cursor at a time when streaming
+STREAM_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class TableQuery:
+    """
+    Args:
+        table: The table read
+        columns: The columns returned, all of them when None
+        batch: Only the rows of this batch
+        start: Only the rows from this time on (inclusive)
+        end: Only the rows before this time (exclusive)
+        order_by: "id" or "timestamp"
+        cursor: The `next_cursor` of the previous page, None for the first page
+    """
+
+    table: Table
+    columns: Optional[List[str]] = None
+    batch: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    order_by: str = "id"
+    cursor: Optional[str] = None
+
+    def __post_init__(self):
+        if self.order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Order '{self.order_by}' is not found")
+        unknown_columns = [
+            name for name in self.columns or [] if name not in self.table.c
+        ]
+        if unknown_columns:
+            raise ValueError(
+                f"Columns {unknown_columns} are not found in {self.table.name}"
+            )
+        if self.cursor is not None:
+            self.get_cursor_key()
+
+    @property
+    def output_columns(self) -> List[str]:
+        return self.columns or [column.name for column in self.table.columns]
+
+    def get_cursor_key(self) -> tuple:
+        """The sort key of the last row of the previous page."""
+        try:
+            if self.order_by == "id":
+                return (int(self.cursor),)
+            timestamp, row_id = self.cursor.rsplit("_", 1)
+            return datetime.fromisoformat(timestamp), int(row_id)
+        except ValueError:
+            raise ValueError(f"Cursor '{self.cursor}' is not valid") from None
+
+    def get_select(self, limit: Optional[int] = None) -> Select:
+        table = self.table
+        # the sort key is selected even when it is not projected, to build the next cursor
+        key_columns = [table.c.id] if self.order_by == "id" else [table.c.timestamp, table.c.id]
+        names = list(dict.fromkeys(self.output_columns + [c.name for c in key_columns]))
+        statement = select(*[table.c[name] for name in names])
+        if self.batch is not None:
+            statement = statement.where(table.c.batch == self.batch)
+        if self.start is not None:
+            statement = statement.where(table.c.timestamp >= self.start)
+        if self.end is not None:
+            statement = statement.where(table.c.timestamp < self.end)
+        if self.cursor is not None:
+            key = self.get_cursor_key()
+            if self.order_by == "id":
+                statement = statement.where(table.c.id > key[0])
+            else:
+                statement = statement.where(
+                    or_(
+                        table.c.timestamp > key[0],
+                        and_(table.c.timestamp == key[0], table.c.id > key[1]),
+                    )
+                )
+        statement = statement.order_by(*key_columns)
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
+
+    def get_next_cursor(self, row: Dict[str, Any]) -> str:
+        if self.order_by == "id":
+            return str(row["id"])
+        return f"{row['timestamp'].isoformat()}_{row['id']}"
+
+
+def fetch_page(
+    connection: Connection, query: TableQuery, limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """A page of at most `limit` rows and the cursor of the next page (None on the last page)."""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"The page size must be between 1 and {MAX_PAGE_SIZE}")
+    # one row more than the page tells whether there is a next page
+    rows = connection.execute(query.get_select(limit + 1)).mappings().all()
+    next_cursor = query.get_next_cursor(rows[limit - 1]) if len(rows) > limit else None
+    columns = query.output_columns
+    return [{name: row[name] for name in columns} for row in rows[:limit]], next_cursor
+
+
+def _format_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_rows(
+    engine: Engine,
+    query: TableQuery,
+    export_format: str = "ndjson",
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    The rows of the query as NDJSON lines or CSV (with a header row), one chunk of text per
+    `chunk_size` rows. The rows come from a server-side cursor (psycopg2 named cursor), so only a
+    chunk is held in memory whatever the size of the table. The connection is held until the
+    iterator is exhausted or closed (the client disconnected).
+    """
+    if export_format not in ["ndjson", "csv"]:
+        raise ValueError(f"Streaming format '{export_format}' is not found")
+    columns = query.output_columns
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=chunk_size
+        ).execute(query.get_select())
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+        for partition in result.mappings().partitions():
+            if export_format == "ndjson":
+                yield "".join(
+                    json.dumps({name: _format_value(row[name]) for name in columns})
+                    + "\n"
+                    for row in partition
+                )
+                continue
+            writer.writerows(
+                [_format_value(row[name]) for name in columns] for row in partition
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if export_format == "csv" and buffer.tell():
+            # only the header: the query matched no rows
+            yield buffer.getvalue()
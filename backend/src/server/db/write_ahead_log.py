@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class WriteAheadLog:
+    """
+    Payloads that could not be written to the database yet, kept in local files (JSON lines) until
+    they are replayed. The files are segments of at most `segment_size` payloads, replayed oldest
+    first and deleted once written, so a database outage (or a restart) loses nothing.
+    The directory is created on the first spill; segments left by a previous run are replayed too.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 10000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.__lock = threading.Lock()
+        # segment index -> number of payloads, oldest first
+        self.__segments: Dict[int, int] = {}
+        self.__open_segment: Optional[int] = None
+        self.spilled = 0
+        self.replayed = 0
+        if os.path.isdir(directory):
+            for file_name in sorted(os.listdir(directory)):
+                if file_name.startswith(SEGMENT_PREFIX) and file_name.endswith(SEGMENT_SUFFIX):
+                    index = int(file_name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+                    with open(self.__get_path(index)) as f:
+                        self.__segments[index] = sum(1 for _ in f)
+            self.__segments = dict(sorted(self.__segments.items()))
+
+    def __get_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{index:09d}{SEGMENT_SUFFIX}")
+
+    def has_pending(self) -> bool:
+        with self.__lock:
+            return bool(self.__segments)
+
+    @property
+    def pending_records(self) -> int:
+        with self.__lock:
+            return sum(self.__segments.values())
+
+    def append(self, payloads: List[Dict[str, Any]]):
+        """Appends the payloads after the ones already spilled (durably: the files are synced)."""
+        if not payloads:
+            return
+        lines = [json.dumps(payload) + "\n" for payload in payloads]
+        with self.__lock:
+            os.makedirs(self.directory, exist_ok=True)
+            while lines:
+                if (
+                    self.__open_segment is None
+                    or self.__segments[self.__open_segment] >= self.segment_size
+                ):
+                    self.__open_segment = max(self.__segments, default=0) + 1
+                    self.__segments[self.__open_segment] = 0
+                index = self.__open_segment
+                count = min(len(lines), self.segment_size - self.__segments[index])
+                with open(self.__get_path(index), "a") as f:
+                    f.writelines(lines[:count])
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.__segments[index] += count
+                self.spilled += count
+                lines = lines[count:]
+
+    def replay(self, write_fn: Callable[[List[Dict[str, Any]]], int]) -> int:
+        """Writes the segments oldest first, one call of `write_fn` per segment, and deletes each
+        once written. Stops at the first failure (the exception is raised, the segment is kept).
+        Returns the sum of what `write_fn` returned (the rows written)."""
+        replayed = 0
+        while True:
+            with self.__lock:
+                if not self.__segments:
+                    return replayed
+                index = next(iter(self.__segments))
+                if index == self.__open_segment:
+                    # later spills go to a new segment
+                    self.__open_segment = None
+            payloads = []
+            with open(self.__get_path(index)) as f:
+                for line in f:
+                    try:
+                        payloads.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # the last line of a segment being written when the process stopped
+                        continue
+            written = write_fn(payloads)
+            with self.__lock:
+                os.remove(self.__get_path(index))
+                del self.__segments[index]
+                self.replayed += len(payloads)
+            replayed += written
+
+    def get_statistics(self) -> dict:
+        with self.__lock:
+            return {
+                "directory": self.directory,
+                "pending_segments": len(self.__segments),
+                "pending_records": sum(self.__segments.values()),
+                "spilled": self.spilled,
+                "replayed": self.replayed,
+            }
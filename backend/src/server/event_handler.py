@@ -3,9 +3,14 @@
 import asyncio
 import json
 from logging import error, info, warning
-from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING, Union
 
+from simulation.event_bus.dispatch import AsyncDispatch, OverflowPolicy
 from simulation.event_bus.events import PlantSimulationEvent, PlantSimulationEventType
+from server.batch_summary import BatchSummaryCollector
+from server.binary_format import BinaryFrame, BinaryFrameEncoder
+from server.live_view import MachineDataCoalescer
+from server.state_delta import LiveViewFrame
 
 if TYPE_CHECKING:
     from simulation.factory.PlantSimulation import PlantSimulation
@@ -13,6 +18,43 @@ if TYPE_CHECKING:
     from db.db_helper import DBHelper
 
 
+# the listeners run on their own threads, so a slow client or database never slows the simulation:
+# notifications are dropped (oldest first) when the clients fall behind, database records are not
+WEBSOCKET_DISPATCH = AsyncDispatch(
+    max_queue_size=1000, overflow_policy=OverflowPolicy.DROP_OLDEST
+)
+DATABASE_DISPATCH = AsyncDispatch(
+    max_queue_size=10000, overflow_policy=OverflowPolicy.BLOCK
+)
+
+# line of the batch-level events that concern a single line
+LINE_OF_EVENT_TYPE = {
+    PlantSimulationEventType.BATCH_STARTED_ANODE_LINE: "anode",
+    PlantSimulationEventType.BATCH_COMPLETED_ANODE_LINE: "anode",
+    PlantSimulationEventType.BATCH_STARTED_CATHODE_LINE: "cathode",
+    PlantSimulationEventType.BATCH_COMPLETED_CATHODE_LINE: "cathode",
+    PlantSimulationEventType.BATCH_STARTED_CELL_LINE: "cell",
+    PlantSimulationEventType.BATCH_COMPLETED_CELL_LINE: "cell",
+}
+
+
+def get_event_topics(event: PlantSimulationEvent) -> list[tuple[str, str]]:
+    """Topics a WebSocket client can subscribe to that the event belongs to."""
+    event_data = event.data or {}
+    topics = [("event_type", event.event_type.value)]
+    if "batch_id" in event_data:
+        topics.append(("batch_id", str(event_data["batch_id"])))
+    line_type = LINE_OF_EVENT_TYPE.get(event.event_type)
+    machine_id = event_data.get("machine_id")
+    if machine_id is not None:
+        topics.append(("machine_id", machine_id))
+        # machines are named <stage>_<line type>, e.g. mixing_anode
+        line_type = machine_id.rsplit("_", 1)[-1]
+    if line_type is not None:
+        topics.append(("line_type", line_type))
+    return topics
+
+
 class EventHandler:
     """Routes simulation events to external systems from a single place."""
 
@@ -21,11 +63,29 @@ class EventHandler:
         plant_simulation: "PlantSimulation",
         websocket_manager: "ConnectionManager",
         database_helper: Optional["DBHelper"] = None,
+        max_pending_notifications: int = 1000,
+        live_view_rate_hz: float = 10.0,
     ):
         self.__plant_simulation = plant_simulation
         self.__websocket_manager = websocket_manager
         self.__database_helper = database_helper
         self.__subscriptions_initialised = False
+        # notifications reach the clients through one long-lived broadcaster task on the server's
+        # event loop: the simulation threads hand them over without creating a loop per event
+        self.__max_pending_notifications = max_pending_notifications
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__notifications: Optional[asyncio.Queue] = None
+        self.__broadcaster_task: Optional[asyncio.Task] = None
+        # machine data reaches the clients as frames of the latest state of every machine
+        if live_view_rate_hz <= 0:
+            raise ValueError("The live view rate must be positive")
+        self.__live_view_interval = 1 / live_view_rate_hz
+        self.__machine_data_coalescer = MachineDataCoalescer()
+        self.__live_view_task: Optional[asyncio.Task] = None
+        # packed frames for the clients that asked for the binary format
+        self.__binary_frame_encoder = BinaryFrameEncoder()
+        # the stages of the running batches, summarised in one row when a batch completes
+        self.__batch_summary_collector = BatchSummaryCollector()
 
     def initialise_system_subscriptions(self):
         """Subscribe to all relevant simulation events once."""
@@ -37,15 +97,25 @@ class EventHandler:
                 PlantSimulationEventType,
                 Callable[[PlantSimulationEvent], None],
                 bool,
+                AsyncDispatch,
             ]
         ] = [
             (
                 event_type,
                 self.__broadcast_system_notification,
                 True,  # Enable batch context for all events
+                WEBSOCKET_DISPATCH,
             )
             for event_type in PlantSimulationEventType
             if event_type != PlantSimulationEventType.MACHINE_DATA_GENERATED
+        ] + [
+            (
+                PlantSimulationEventType.MACHINE_DATA_GENERATED,
+                # only keeps the latest state of the machine (cheap enough for the simulation thread)
+                self.__machine_data_coalescer.update,
+                True,
+                None,
+            )
         ]
 
         database_subscriptions: list[
@@ -53,6 +123,7 @@ class EventHandler:
                 PlantSimulationEventType,
                 Callable[[PlantSimulationEvent], None],
                 bool,
+                AsyncDispatch,
             ]
         ] = []
 
@@ -62,21 +133,31 @@ class EventHandler:
                     PlantSimulationEventType.BATCH_REQUESTED,
                     self.__queue_machine_data,
                     False,
+                    DATABASE_DISPATCH,
                 ),
                 (
                     PlantSimulationEventType.MACHINE_DATA_GENERATED,
                     self.__queue_machine_data,
                     True,
+                    DATABASE_DISPATCH,
+                ),
+                # through the same subscriber queue: delivered after the batch's machine data
+                (
+                    PlantSimulationEventType.BATCH_COMPLETED,
+                    self.__queue_machine_data,
+                    False,
+                    DATABASE_DISPATCH,
                 ),
             ]
 
         all_subscriptions = websocket_subscriptions + database_subscriptions
 
-        for event_type, callback, include_batch in all_subscriptions:
+        for event_type, callback, include_batch, dispatch in all_subscriptions:
             self.__plant_simulation.subscribe_to_event(
                 event_type,
                 callback,
                 include_batch_context=include_batch,
+                dispatch=dispatch,
             )
 
         self.__subscriptions_initialised = True
@@ -88,6 +169,7 @@ class EventHandler:
         if self.__database_helper is None or event.event_type not in [
             PlantSimulationEventType.MACHINE_DATA_GENERATED,
             PlantSimulationEventType.BATCH_REQUESTED,
+            PlantSimulationEventType.BATCH_COMPLETED,
         ]:
             return
 
@@ -100,7 +182,32 @@ class EventHandler:
         try:
             machine_state = payload.get("machine_state")
             if machine_state:
+                if "batch_id" in payload:
+                    # the rows are indexed (and the dashboards filtered) by batch
+                    machine_state = {**machine_state, "batch_id": payload["batch_id"]}
+                    self.__batch_summary_collector.update(
+                        payload["batch_id"], machine_state
+                    )
                 self.__database_helper.queue_data(machine_state)
+            elif event.event_type == PlantSimulationEventType.BATCH_COMPLETED:
+                # one row with the final properties and the verdicts of the batch
+                self.__database_helper.queue_data(
+                    self.__batch_summary_collector.complete(
+                        payload["batch_id"],
+                        payload["timestamp"],
+                        payload.get("batch_state"),
+                    )
+                )
+            elif event.event_type == PlantSimulationEventType.BATCH_REQUESTED:
+                # record the seed, so that the batch can be reproduced
+                self.__database_helper.queue_data(
+                    {
+                        "process": "batch",
+                        "batch_id": payload["batch_id"],
+                        "seed": payload["seed"],
+                        "timestamp": payload["timestamp"],
+                    }
+                )
             pass
             # info(
             #     f"[{payload.get("timestamp")}] POSTGRESQL: Queued payload into database queue with event type: {payload.get('event_type')} for batch - id: {payload.get("batch_id")}"
@@ -118,6 +225,11 @@ class EventHandler:
         # legacy structure from the prev. version
         event_data = event.data or {}
 
+        topics = get_event_topics(event)
+        if not self.__websocket_manager.has_recipients(topics):
+            # no client listens to these topics: do not even serialise the event
+            return
+
         if "machine_id" in event_data:
             process_name = event_data.get("machine_id")
         else:
@@ -130,26 +242,136 @@ class EventHandler:
             "data": event_data,
         }
 
-        self.__schedule_websocket_broadcast(processed_notification)
+        self.__schedule_websocket_broadcast(processed_notification, topics)
 
-    def __schedule_websocket_broadcast(self, notification: Dict[str, Any]):
+    def __schedule_websocket_broadcast(
+        self, notification: Dict[str, Any], topics: list[tuple[str, str]]
+    ):
+        """Hand the notification over to the broadcaster task (called from the simulation threads).
+        The message is serialised here, off the event loop."""
+        loop = self.__loop
+        if loop is None or loop.is_closed():
+            warning(
+                f'WEBSOCKET: Broadcaster is not running, dropping an event - {notification.get("status")}'
+            )
+            return
         try:
-            # get event loop
-            loop = asyncio.get_event_loop()
+            message = json.dumps(notification)
+        except (TypeError, ValueError) as exc:
+            error(
+                f'WEBSOCKET: Error serialising an event status {notification.get("status")}: {exc}'
+            )
+            return
+        try:
+            loop.call_soon_threadsafe(
+                self.__enqueue_notification, notification, message, topics
+            )
         except RuntimeError:
-            loop = None
-        # if there is a current process in the loop create a task first
-        if loop and loop.is_running():
-            # __broadcast_to_websocket is async function
-            asyncio.create_task(self.__broadcast_to_websocket(notification))
-        else:
-            # otherwise, execute it
-            asyncio.run(self.__broadcast_to_websocket(notification))
+            # the loop was closed in the meantime (server shutting down)
+            pass
+
+    def __enqueue_notification(
+        self,
+        notification: Dict[str, Any],
+        message: Union[str, LiveViewFrame],
+        topics: list[tuple[str, str]],
+        binary_frame: Optional[BinaryFrame] = None,
+    ):
+        """Runs on the event loop. The message is a live view frame for the machine data, encoded
+        for every client when it is published."""
+        if self.__notifications.full():
+            # the clients fall behind: the oldest notification is dropped
+            self.__notifications.get_nowait()
+            self.__notifications.task_done()
+        self.__notifications.put_nowait((notification, message, topics, binary_frame))
 
-    async def __broadcast_to_websocket(self, notification: Dict[str, Any]):
+    async def start_broadcaster(self):
+        """Start the long-lived broadcaster task on the server's event loop (call at startup)."""
+        if self.__broadcaster_task is not None and not self.__broadcaster_task.done():
+            return
+        self.__notifications = asyncio.Queue(maxsize=self.__max_pending_notifications)
+        self.__broadcaster_task = asyncio.create_task(self.__run_broadcaster())
+        self.__live_view_task = asyncio.create_task(self.__run_live_view())
+        self.__loop = asyncio.get_running_loop()
+
+    async def stop_broadcaster(self):
+        """Stop the broadcaster task (call at shutdown); later events are dropped."""
+        self.__loop = None
+        for task in [self.__broadcaster_task, self.__live_view_task]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.__broadcaster_task = None
+        self.__live_view_task = None
+
+    async def wait_until_broadcasted(self):
+        """Wait until every notification handed over so far has been sent."""
+        if self.__notifications is not None:
+            await self.__notifications.join()
+
+    async def __run_live_view(self):
+        """Sends a frame of the machine data at the live view rate, whatever the simulation speed."""
+        while True:
+            await asyncio.sleep(self.__live_view_interval)
+            self.send_live_view_frame()
+
+    def send_live_view_frame(self):
+        """Hands the latest state of every machine that ran since the last frame to the broadcaster,
+        as one message (runs on the event loop)."""
+        events, coalesced_steps = self.__machine_data_coalescer.take_frame()
+        if not events:
+            return
+        # JSON frames only carry what changed since the previous frame sent to the client, between
+        # keyframes: they are encoded per client when published (see state_delta)
+        frame = LiveViewFrame(
+            [(event, get_event_topics(event)) for event in events], coalesced_steps
+        )
+        if not self.__websocket_manager.has_recipients(frame.topics):
+            return
+        notification = {
+            "process_name": "battery_plant_simulation",
+            "status": PlantSimulationEventType.MACHINE_DATA_GENERATED.value,
+            "data": {"coalesced_steps": coalesced_steps},
+        }
+        binary_frame = None
+        if self.__websocket_manager.has_binary_clients():
+            binary_frame = self.__binary_frame_encoder.encode_machine_frame(
+                events, coalesced_steps
+            )
+        self.__enqueue_notification(notification, frame, list(frame.topics), binary_frame)
+
+    def get_live_view_statistics(self) -> Dict[str, Any]:
+        return {
+            "rate_hz": 1 / self.__live_view_interval,
+            **self.__machine_data_coalescer.get_statistics(),
+        }
+
+    async def __run_broadcaster(self):
+        while True:
+            notification, message, topics, binary_frame = await self.__notifications.get()
+            try:
+                await self.__broadcast_to_websocket(
+                    notification, message, topics, binary_frame
+                )
+            finally:
+                self.__notifications.task_done()
+
+    async def __broadcast_to_websocket(
+        self,
+        notification: Dict[str, Any],
+        message: Union[str, LiveViewFrame],
+        topics: list[tuple[str, str]],
+        binary_frame: Optional[BinaryFrame] = None,
+    ):
         try:
-            message = json.dumps(notification)
-            await self.__websocket_manager.broadcast(message)
+            if isinstance(message, LiveViewFrame):
+                await self.__websocket_manager.publish_frame(message, binary_frame)
+            else:
+                await self.__websocket_manager.publish(message, topics, binary_frame)
             # for testing only
             info(
                 f'WEBSOCKET: Batch ({notification.get("data").get("batch_id")}) Successfully broadcasting an event - {notification.get("status")} from {notification.get("process_name")}',
@@ -0,0 +1,116 @@
+"""
+Experiments (parameter sweeps) run as background jobs: a request submits the sweep and gets an
+experiment id at once, and the results are fetched once the sweep is done, so no request (nor
+threadpool worker of the server) is held for the minutes a sweep can take. A sweep already uses
+every core, so one runs at a time; the others wait in a bounded queue.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from simulation.experiments import ParameterSweep
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class ExperimentQueueFullError(ValueError):
+    """Raised when an experiment is submitted while the queue of experiments is full."""
+
+
+class ExperimentJobs:
+    """
+    The submitted experiments and their results.
+
+    Args:
+        max_pending: experiments queued or running at most (further submissions are rejected)
+        max_finished: finished experiments kept for their results (the oldest are forgotten)
+    """
+
+    def __init__(self, max_pending: int = 4, max_finished: int = 20):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="experiment")
+        # notified when an experiment finishes
+        self.__condition = threading.Condition()
+        # experiment id -> state of the experiment, in submission order. PROTECTED by condition.
+        self.__jobs: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+    def submit(self, parameter_sweep: ParameterSweep) -> str:
+        """Queues the sweep; returns the id of the experiment."""
+        with self.__condition:
+            pending = sum(
+                1 for job in self.__jobs.values() if job["status"] in [QUEUED, RUNNING]
+            )
+            if pending >= self.max_pending:
+                raise ExperimentQueueFullError(
+                    f"{pending} experiments are waiting or running, the maximum is {self.max_pending}"
+                )
+            experiment_id = uuid.uuid4().hex
+            self.__jobs[experiment_id] = {
+                "experiment_id": experiment_id,
+                "status": QUEUED,
+                "n_runs": len(parameter_sweep.design_points),
+                "replicates": parameter_sweep.replicates,
+                "submitted_at": datetime.now().isoformat(),
+                "started_at": None,
+                "completed_at": None,
+                "error": None,
+                "result": None,
+            }
+        self.__executor.submit(self.__run, experiment_id, parameter_sweep)
+        return experiment_id
+
+    def __run(self, experiment_id: str, parameter_sweep: ParameterSweep):
+        with self.__condition:
+            job = self.__jobs[experiment_id]
+            job["status"] = RUNNING
+            job["started_at"] = datetime.now().isoformat()
+        try:
+            result = parameter_sweep.run().get_summary()
+            status, error = COMPLETED, None
+        except Exception as e:
+            # general error handling: a failing sweep must not stop the following ones
+            result, status, error = None, FAILED, str(e)
+        with self.__condition:
+            job.update(
+                status=status,
+                result=result,
+                error=error,
+                completed_at=datetime.now().isoformat(),
+            )
+            self.__forget_finished()
+            self.__condition.notify_all()
+
+    def __forget_finished(self):
+        finished = [
+            experiment_id
+            for experiment_id, job in self.__jobs.items()
+            if job["status"] in [COMPLETED, FAILED]
+        ]
+        for experiment_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.__jobs[experiment_id]
+
+    def get(self, experiment_id: str) -> Optional[Dict[str, Any]]:
+        """State of the experiment (with its result once completed), None when it is not known."""
+        with self.__condition:
+            job = self.__jobs.get(experiment_id)
+            return dict(job) if job is not None else None
+
+    def wait_until_finished(self, experiment_id: str, timeout: Optional[float] = None) -> bool:
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: experiment_id not in self.__jobs
+                or self.__jobs[experiment_id]["status"] in [COMPLETED, FAILED],
+                timeout=timeout,
+            )
+
+    def shutdown(self):
+        """Cancels the queued experiments; a running one finishes in the background."""
+        self.__executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,50 @@
+"""Coalescing of the per-step machine data for the live views (WebSocket clients)."""
+
+from threading import Lock
+from typing import Any, Dict
+
+from simulation.event_bus.events import PlantSimulationEvent
+
+
+class MachineDataCoalescer:
+    """
+    Keeps the latest MACHINE_DATA_GENERATED event of every machine until the next frame is taken.
+    Machines emit one event per step, far more than a UI can render at fast simulation speeds:
+    a frame holds at most one state per machine whatever the speed, so the live view bandwidth is
+    bounded by the frame rate. Updated by the simulation threads, drained by the broadcaster.
+    """
+
+    def __init__(self):
+        self.__latest_events: Dict[str, PlantSimulationEvent] = {}
+        self.__lock = Lock()
+        # steps received since the last frame (for the coalescing ratio)
+        self.__pending_steps = 0
+        self.received_steps = 0
+        self.frames = 0
+
+    def update(self, event: PlantSimulationEvent):
+        machine_id = (event.data or {}).get("machine_id")
+        if machine_id is None:
+            return
+        with self.__lock:
+            self.__latest_events[machine_id] = event
+            self.__pending_steps += 1
+            self.received_steps += 1
+
+    def take_frame(self) -> tuple[list[PlantSimulationEvent], int]:
+        """The latest event of every machine that ran a step since the last frame (empty if none did),
+        and the number of steps they stand for."""
+        with self.__lock:
+            if not self.__latest_events:
+                return [], 0
+            latest_events, self.__latest_events = self.__latest_events, {}
+            coalesced_steps, self.__pending_steps = self.__pending_steps, 0
+            self.frames += 1
+        return list(latest_events.values()), coalesced_steps
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                "received_steps": self.received_steps,
+                "frames": self.frames,
+            }
@@ -1,21 +1,42 @@
 from contextlib import asynccontextmanager
+from datetime import datetime
+import math
+from typing import Optional
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 
 # Import the core simulation class
 
-from simulation.factory.PlantSimulation import PlantSimulation
+from simulation.factory.PlantSimulation import BatchQueueFullError, PlantSimulation
+from simulation.clock import ScaledClock
+from simulation.experiments import Factor, ParameterSweep, count_design_points
 
 # Import websocket manager & database helper (singletons)
 from server.websocket_manager import websocket_manager
 from server.db.db_helper import database_helper
-from server.db.db import SessionLocal
+from server.db.db import engine
 from server.db.model_table import *
+from server.db.batch_summary_query import get_batch_summaries, get_batch_summary
+from server.db.rollup import (
+    DEFAULT_MAX_POINTS,
+    get_batch_rollup,
+    get_rollup_columns,
+    get_time_rollup,
+)
+from server.db.table_query import (
+    DEFAULT_PAGE_SIZE,
+    EXPORT_FORMATS,
+    TableQuery,
+    fetch_page,
+    stream_rows,
+)
 
 # Import event handlers
 from server.event_handler import EventHandler
+from server.experiment_jobs import ExperimentJobs, ExperimentQueueFullError
 
 # Import parameter mapping utilities
 from server.logging_helper import configure_logging, get_logger
@@ -28,8 +49,21 @@ from server.format_helper import create_error_response, create_success_response
 configure_logging()
 logger = get_logger("server")
 
-# Core plant simulation object
-battery_plant_simulation = PlantSimulation()
+# Capacity of the batch request queue; further submissions get a 429 with a Retry-After estimate
+MAX_QUEUED_BATCHES = 10
+
+# Upper bounds of one experiment, checked before its design points are created: the runs (each
+# a full process chain) and the virtual batches per run
+MAX_EXPERIMENT_RUNS = 10000
+MAX_EXPERIMENT_REPLICATES = 1000
+# Experiments run in the background, one at a time; further submissions get a 429
+MAX_PENDING_EXPERIMENTS = 4
+experiment_jobs = ExperimentJobs(max_pending=MAX_PENDING_EXPERIMENTS)
+
+# Core plant simulation object (scaled clock so the speed can be changed at runtime)
+battery_plant_simulation = PlantSimulation(
+    clock=ScaledClock(speed_factor=1.0), max_queued_batches=MAX_QUEUED_BATCHES
+)
 # Initialise event handler with shared dependencies
 event_handler = EventHandler(
     plant_simulation=battery_plant_simulation,
@@ -42,6 +76,7 @@ event_handler = EventHandler(
 async def lifespan(app: FastAPI):
     """Manage startup and shutdown tasks for the FastAPI application."""
     try:
+        await event_handler.start_broadcaster()
         event_handler.initialise_system_subscriptions()
         logger.info("[startup] Successfully initialised event-driven architecture!")
     except Exception:
@@ -61,8 +96,8 @@ async def lifespan(app: FastAPI):
     try:
         yield
     finally:
-        # Placeholder for future shutdown/cleanup logic.
-        pass
+        experiment_jobs.shutdown()
+        await event_handler.stop_broadcaster()
 
 
 # main FastAPI app
@@ -96,11 +131,6 @@ TABLE_MAP = {
 }
 
 
-def serialize_row(row):
-    """Serialize a SQLAlchemy row to a dict."""
-    return {c.name: getattr(row, c.name) for c in row.__table__.columns}
-
-
 @app.get("/")
 def root():
     """Entry of the web server"""
@@ -111,18 +141,44 @@ def root():
 
 @app.websocket("/ws/status")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time machine status updates."""
+    """WebSocket endpoint for real-time machine status updates.
+    Clients receive every event until they subscribe to topics (batch_id, line_type, machine_id,
+    event_type); then only the events of one of their topics."""
     await websocket_manager.connect(websocket)
     try:
         while True:
-            # Keep the connection alive and handle any incoming messages
+            # Keep the connection alive and handle the topic subscriptions of the client, e.g.
+            # {"action": "subscribe", "topics": {"batch_id": ["3"], "line_type": ["anode"]}}, and the
+            # live view resyncs ({"action": "resync"}) after a missed frame
             data = await websocket.receive_text()
-            # Echo back any received messages (optional)
-            await websocket_manager.send_personal_message(f"Echo: {data}", websocket)
-    except WebSocketDisconnect:
+            await websocket_manager.handle_client_message(data, websocket)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager closed the connection (slow consumer)
         websocket_manager.disconnect(websocket)
 
 
+@app.get("/api/websocket/connections")
+def get_websocket_connections():
+    """Get the outbound queue depth and the sent/dropped message counters of every WebSocket client,
+    and how many machine steps the live view frames coalesced."""
+    return create_success_response(
+        "WebSocket connections are retrieved.",
+        data={
+            **websocket_manager.get_statistics(),
+            "live_view": event_handler.get_live_view_statistics(),
+        },
+    )
+
+
+@app.get("/api/database/writer")
+def get_database_writer_state():
+    """Get the payloads waiting to be written to the database, in memory and spilled to disk,
+    and how many were dropped."""
+    return create_success_response(
+        "Database writer state is retrieved.", data=database_helper.get_statistics()
+    )
+
+
 @app.get("/api/simulation/state")
 def get_plant_state():
     """Get the current state of the plant. Returns a dictionary with the current state of the plant."""
@@ -132,21 +188,131 @@ def get_plant_state():
     return create_success_response("Plant state is retrieved.", data=plant_state)
 
 
+def create_batch_queue_full_exception(error: BatchQueueFullError) -> HTTPException:
+    """429 response telling the client when a place is expected to free up in the batch queue."""
+    retry_after = max(math.ceil(error.retry_after), 1)
+    return HTTPException(
+        status_code=429,
+        detail=create_error_response(
+            str(error),
+            error_code="BATCH_QUEUE_FULL",
+            retry_after=retry_after,
+            queue=battery_plant_simulation.get_queue_state(),
+        ),
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 @app.post("/api/simulation/start")
-def add_batch():
-    """Add a batch to the plant. Returns the generated batch ID to the requester."""
+async def add_batch(wait_seconds: float = 0, seed: Optional[int] = None):
+    """Add a batch to the plant. Returns the generated batch ID to the requester.
+    When the queue is full, waits up to wait_seconds for a place before answering 429 (Retry-After).
+    The batch draws its random noise from the seed (random by default; recorded in the batch events).
+    """
     global battery_plant_simulation
     try:
-        batch_id = battery_plant_simulation.add_batch()
-    except ValueError as e:
-        # over limit of batches
+        if wait_seconds > 0:
+            batch_id = await battery_plant_simulation.add_batch_async(
+                timeout=wait_seconds, seed=seed
+            )
+        else:
+            batch_id = battery_plant_simulation.add_batch(seed=seed)
+    except BatchQueueFullError as e:
+        raise create_batch_queue_full_exception(e)
+    return create_success_response(
+        "A new batch was received and added to processing queue.",
+        batch_id=batch_id,
+    )
+
+
+@app.get("/api/simulation/queue")
+def get_batch_queue_state():
+    """Get the depth and capacity of the batch request queue."""
+    global battery_plant_simulation
+    return create_success_response(
+        "Batch queue state is retrieved.",
+        data=battery_plant_simulation.get_queue_state(),
+    )
+
+
+@app.patch("/api/simulation/speed")
+def update_simulation_speed(request_data: dict):
+    """Change the simulation speed factor (simulated seconds per wall-clock second)."""
+    global battery_plant_simulation
+    try:
+        speed_factor = float(request_data.get("speed_factor"))
+        clock_state = battery_plant_simulation.set_simulation_speed(speed_factor)
+    except (TypeError, ValueError) as e:
         raise HTTPException(
             status_code=400,
-            detail=create_error_response(str(e), error_code="BATCH_LIMIT"),
+            detail=create_error_response(str(e), error_code="INVALID_SPEED_FACTOR"),
         )
     return create_success_response(
-        "A new batch was received and added to processing queue.",
-        batch_id=batch_id,
+        f"Simulation speed was set to {speed_factor}x.", data=clock_state
+    )
+
+
+@app.post("/api/experiments", status_code=202)
+def run_experiment(request_data: dict):
+    """Submit a parameter sweep (grid, random or Latin hypercube design) over the full process chain.
+    Runs in the background on its own machines across worker processes, never on the live plant.
+    Returns the experiment id; the results are read from GET /api/experiments/{experiment_id}.
+    """
+    try:
+        factors = [Factor(**factor) for factor in request_data.get("factors") or []]
+        design = request_data.get("design", "grid")
+        n_samples = request_data.get("n_samples")
+        replicates = int(request_data.get("replicates", 1))
+        n_runs = count_design_points(factors, design, n_samples)
+        if n_runs > MAX_EXPERIMENT_RUNS:
+            raise ValueError(
+                f"The experiment has {n_runs} runs, the maximum is {MAX_EXPERIMENT_RUNS}"
+            )
+        if replicates > MAX_EXPERIMENT_REPLICATES:
+            raise ValueError(
+                f"The experiment has {replicates} replicates, the maximum is {MAX_EXPERIMENT_REPLICATES}"
+            )
+        parameter_sweep = ParameterSweep(
+            factors,
+            design=design,
+            n_samples=n_samples,
+            replicates=replicates,
+            seed=request_data.get("seed"),
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=create_error_response(str(e), error_code="INVALID_EXPERIMENT"),
+        )
+    try:
+        experiment_id = experiment_jobs.submit(parameter_sweep)
+    except ExperimentQueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=create_error_response(str(e), error_code="EXPERIMENT_QUEUE_FULL"),
+        )
+    return create_success_response(
+        f"Experiment with {len(parameter_sweep.design_points)} runs was submitted.",
+        experiment_id=experiment_id,
+    )
+
+
+@app.get("/api/experiments/{experiment_id}")
+def get_experiment(experiment_id: str):
+    """Get the status of a submitted experiment (queued, running, completed or failed). Once
+    completed, the result is a columnar table: factor values, mean final properties and pass rates
+    of every run."""
+    experiment = experiment_jobs.get(experiment_id)
+    if experiment is None:
+        raise HTTPException(
+            status_code=404,
+            detail=create_error_response(
+                f"Experiment '{experiment_id}' is not found.",
+                error_code="EXPERIMENT_NOT_FOUND",
+            ),
+        )
+    return create_success_response(
+        f"Experiment is {experiment['status']}.", data=experiment
     )
 
 
@@ -211,6 +377,76 @@ def update_machine_params(line_type: str, machine_id: str, parameters: dict):
         )
 
 
+@app.post("/api/batches/{batch_id}/recompute")
+def recompute_batch(batch_id: str, request_data: dict):
+    """What-if: recompute a batch from a stage with new parameters (only the downstream stages run).
+    Body: line_type, machine_id and optionally the changed parameters of that stage.
+    """
+    global battery_plant_simulation
+    line_type = request_data.get("line_type")
+    machine_id = request_data.get("machine_id")
+    try:
+        result = battery_plant_simulation.recompute_batch_from_stage(
+            batch_id, line_type, machine_id, request_data.get("parameters")
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=create_error_response(
+                str(e),
+                error_code="RECOMPUTE_ERROR",
+                batch_id=batch_id,
+                line_type=line_type,
+                machine_id=machine_id,
+            ),
+        )
+    return create_success_response(
+        f"Batch {batch_id} was recomputed from {machine_id}.", data=result
+    )
+
+
+@app.get("/api/batches/summary")
+def get_batch_summaries_endpoint(
+    sort_by: str = "completed_at",
+    descending: bool = True,
+    passed: Optional[bool] = None,
+    defect_risk: Optional[bool] = None,
+    limit: int = 100,
+    offset: int = 0,
+):
+    """Get the summaries of the completed batches (final properties, parameters and durations of
+    every stage, inspection and aging verdicts), filtered by verdict and sorted by a quality metric:
+    completed_at, capacity_Ah, final_ocv_v, leakage_current_A or duration_s."""
+    try:
+        with engine.connect() as connection:
+            summaries = get_batch_summaries(
+                connection, sort_by, descending, passed, defect_risk, limit, offset
+            )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=create_error_response(str(e), error_code="INVALID_SUMMARY_QUERY"),
+        )
+    return create_success_response("Batch summaries are retrieved.", data=summaries)
+
+
+@app.get("/api/batches/{batch_id}/summary")
+def get_batch_summary_endpoint(batch_id: str):
+    """Get the summary of a completed batch."""
+    with engine.connect() as connection:
+        summary = get_batch_summary(connection, batch_id)
+    if summary is None:
+        raise HTTPException(
+            status_code=404,
+            detail=create_error_response(
+                f"No summary of batch '{batch_id}' is found.",
+                error_code="BATCH_SUMMARY_NOT_FOUND",
+                batch_id=batch_id,
+            ),
+        )
+    return create_success_response(f"Summary of batch {batch_id} is retrieved.", data=summary)
+
+
 @app.post("/api/simulation/reset")
 def reset_plant():
     """Reset the plant."""
@@ -226,20 +462,115 @@ def reset_plant():
 
 
 @app.get("/api/db/{table_name}")
-def get_table_entries(table_name: str):
-    """Return all entries from the specified table."""
+def get_table_entries(
+    table_name: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    batch: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[str] = None,
+    format: str = "json",
+):
+    """Return the entries of the specified table, filtered by batch and time range [start, end) and
+    projected to the comma-separated columns. As JSON one page of `limit` rows at a time: the next
+    page is requested with the returned `next_cursor`. As NDJSON or CSV all the matching rows,
+    streamed."""
     table_class = TABLE_MAP.get(table_name)
     if not table_class:
-        return {"error": f"Table '{table_name}' not found."}
+        raise HTTPException(
+            status_code=404,
+            detail=create_error_response(
+                f"Table '{table_name}' not found.", error_code="TABLE_NOT_FOUND"
+            ),
+        )
     try:
-        db = SessionLocal()
-        rows = db.query(table_class).all()
-        db.close()
-        if not rows:
-            return {"message": f"No entries found in {table_name} table.", "data": []}
-        return {"data": [serialize_row(row) for row in rows]}
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Format '{format}' is not found")
+        query = TableQuery(
+            table=table_class.__table__,
+            columns=[name.strip() for name in columns.split(",")] if columns else None,
+            batch=batch,
+            start=start,
+            end=end,
+            order_by=order_by,
+            cursor=cursor,
+        )
+        if format != "json":
+            return StreamingResponse(
+                stream_rows(engine, query, format),
+                media_type="text/csv" if format == "csv" else "application/x-ndjson",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{table_name}.{format}"'
+                },
+            )
+        with engine.connect() as connection:
+            rows, next_cursor = fetch_page(connection, query, limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=create_error_response(str(e), error_code="INVALID_TABLE_QUERY"),
+        )
     except Exception as e:
         return {"error": f"Failed to fetch entries from {table_name}: {str(e)}"}
+    if not rows:
+        return {
+            "message": f"No entries found in {table_name} table.",
+            "data": [],
+            "next_cursor": None,
+        }
+    return {"data": rows, "next_cursor": next_cursor}
+
+
+@app.get("/api/db/{table_name}/rollup")
+def get_table_rollup(
+    table_name: str,
+    column: Optional[str] = None,
+    resolution: str = "auto",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+):
+    """Return the aggregates (count, min, max, mean, last) of the numeric columns of the specified
+    table per batch (resolution=batch) or the buckets of a column over [start, end) per minute or
+    hour; resolution=auto picks the finest with at most `max_points` buckets. The server's DB writer
+    merges every row it flushes into the rollups, so they are current up to the last flush."""
+    table_class = TABLE_MAP.get(table_name)
+    if not table_class:
+        raise HTTPException(
+            status_code=404,
+            detail=create_error_response(
+                f"Table '{table_name}' not found.", error_code="TABLE_NOT_FOUND"
+            ),
+        )
+    try:
+        if column is not None and column not in get_rollup_columns(table_class.__table__):
+            raise ValueError(f"Column '{column}' is not rolled up in {table_name}")
+        with engine.connect() as connection:
+            if resolution == "batch":
+                rows = get_batch_rollup(connection, table_class.__tablename__, column, batch)
+                return create_success_response(
+                    "Rollup is retrieved.", data=rows, resolution=resolution
+                )
+            if column is None or start is None or end is None:
+                raise ValueError("A time rollup needs a column, a start and an end")
+            resolution, rows = get_time_rollup(
+                connection,
+                table_class.__tablename__,
+                column,
+                start,
+                end,
+                None if resolution == "auto" else resolution,
+                max_points,
+            )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=create_error_response(str(e), error_code="INVALID_ROLLUP_QUERY"),
+        )
+    return create_success_response("Rollup is retrieved.", data=rows, resolution=resolution)
 
 
 # === New Parameter Management Endpoints ===
@@ -438,11 +769,8 @@ def start_mixing_simulation(request_data: dict = None):
             }
         )
         
-    except ValueError as e:
-        raise HTTPException(
-            status_code=400,
-            detail=create_error_response(str(e), error_code="BATCH_LIMIT")
-        )
+    except BatchQueueFullError as e:
+        raise create_batch_queue_full_exception(e)
     except Exception as e:
         logger.error(f"Mixing simulation start error: {e}")
         raise HTTPException(
@@ -0,0 +1,168 @@
+"""
+Delta encoding of the machine states sent to the live views. Between two frames most of a machine's
+state is unchanged (its parameters, process name, most model properties): a frame carries only the
+fields that changed since the machine's previous frame, and a complete snapshot (keyframe) every
+few frames, when a client connects or when a client asks for it with {"action": "resync"}.
+
+Every client has its own encoder (see LiveViewFrame): it is sent the machines of its topics only,
+as changes to what it was sent itself, in frames numbered for it alone. A client that missed a
+frame (its queue overflowed) sees a gap in the numbers and asks for a resync, which only makes
+its own next frame a keyframe.
+"""
+
+import copy
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from simulation.event_bus.events import PlantSimulationEvent, PlantSimulationEventType
+
+_MISSING = object()
+
+
+def diff_state(previous: dict, current: dict) -> tuple[Dict[str, Any], list[str]]:
+    """The changed fields of a (nested) state, as a nested dict of the new values, and the dotted
+    paths of the removed fields."""
+    changes = {}
+    removed = []
+    for name, value in current.items():
+        previous_value = previous.get(name, _MISSING)
+        if isinstance(value, dict) and isinstance(previous_value, dict):
+            nested_changes, nested_removed = diff_state(previous_value, value)
+            if nested_changes:
+                changes[name] = nested_changes
+            removed.extend(f"{name}.{path}" for path in nested_removed)
+        elif previous_value is _MISSING or previous_value != value:
+            changes[name] = value
+    removed.extend(name for name in previous if name not in current)
+    return changes, removed
+
+
+def apply_state_delta(
+    state: dict, changes: Dict[str, Any], removed: Optional[list[str]] = None
+) -> dict:
+    """The state after the changes (what a client does with a delta); the state is not modified."""
+    state = copy.deepcopy(state)
+    for path in removed or []:
+        *parents, name = path.split(".")
+        target = state
+        for parent in parents:
+            target = target.get(parent, {})
+        target.pop(name, None)
+    _merge(state, changes)
+    return state
+
+
+def _merge(state: dict, changes: Dict[str, Any]):
+    for name, value in changes.items():
+        if isinstance(value, dict) and isinstance(state.get(name), dict):
+            _merge(state[name], value)
+        else:
+            state[name] = copy.deepcopy(value)
+
+
+class StateDeltaEncoder:
+    """
+    Keeps the last state sent to a client for every machine and encodes the machines of a frame as
+    changes to it. Runs on the event loop (frames are encoded and resyncs requested there).
+
+    Args:
+        keyframe_interval: Frames between two complete snapshots, which bound how long a client
+            that missed a frame without noticing stays out of date
+    """
+
+    def __init__(self, keyframe_interval: int = 50):
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be at least 1 frame")
+        self.keyframe_interval = keyframe_interval
+        # machine id -> last entry sent (machine id, batch id, timestamp, machine state)
+        self.__machines: Dict[str, Dict[str, Any]] = {}
+        self.__sequence = 0
+        self.__frames_since_keyframe = 0
+        self.__keyframe_requested = True
+        self.keyframes = 0
+
+    def request_keyframe(self):
+        """The next frame is a complete snapshot (a client connected or asked for a resync)."""
+        self.__keyframe_requested = True
+
+    def encode_frame(self, events: list[PlantSimulationEvent]) -> Dict[str, Any]:
+        """The sequence number of the frame, whether it is a keyframe and its machine entries:
+        the machine state in full for a keyframe (with every known machine) or a machine seen for
+        the first time, its changes (and removed fields) otherwise."""
+        self.__sequence += 1
+        keyframe = (
+            self.__keyframe_requested
+            or self.__frames_since_keyframe + 1 >= self.keyframe_interval
+        )
+        machines = []
+        for event in events:
+            entry = {
+                "machine_id": event.data["machine_id"],
+                "batch_id": event.data.get("batch_id"),
+                "timestamp": event.timestamp,
+                "machine_state": event.data.get("machine_state") or {},
+            }
+            previous_entry = self.__machines.get(entry["machine_id"])
+            self.__machines[entry["machine_id"]] = entry
+            if keyframe or previous_entry is None:
+                machines.append(entry)
+                continue
+            changes, removed = diff_state(
+                previous_entry["machine_state"], entry["machine_state"]
+            )
+            delta = {key: entry[key] for key in ["machine_id", "batch_id", "timestamp"]}
+            delta["changes"] = changes
+            if removed:
+                delta["removed"] = removed
+            machines.append(delta)
+        if keyframe:
+            # the machines that did not run since the last frame too: a complete snapshot
+            machines = list(self.__machines.values())
+            self.__keyframe_requested = False
+            self.__frames_since_keyframe = 0
+            self.keyframes += 1
+        else:
+            self.__frames_since_keyframe += 1
+        return {"sequence": self.__sequence, "keyframe": keyframe, "machines": machines}
+
+
+class LiveViewFrame:
+    """
+    The latest machine events of a live view frame, with the topics of each, before the frame is
+    encoded for a client (with the client's encoder, for the machines of the client's topics).
+    """
+
+    def __init__(
+        self,
+        events_with_topics: list[tuple[PlantSimulationEvent, Iterable[tuple[str, str]]]],
+        coalesced_steps: int,
+    ):
+        self.entries = [(event, frozenset(topics)) for event, topics in events_with_topics]
+        self.coalesced_steps = coalesced_steps
+        self.topics = frozenset(
+            topic for _, event_topics in self.entries for topic in event_topics
+        )
+
+    def encode(
+        self, encoder: StateDeltaEncoder, client_topics: Optional[set] = None
+    ) -> Optional[str]:
+        """The frame message for a client subscribed to the topics (None: to every topic), None
+        when none of the machines is for the client."""
+        events = [
+            event
+            for event, event_topics in self.entries
+            if client_topics is None or not event_topics.isdisjoint(client_topics)
+        ]
+        if not events:
+            return None
+        return json.dumps(
+            {
+                "process_name": "battery_plant_simulation",
+                "status": PlantSimulationEventType.MACHINE_DATA_GENERATED.value,
+                "timestamp": max(event.timestamp for event in events),
+                "data": {
+                    "coalesced_steps": self.coalesced_steps,
+                    **encoder.encode_frame(events),
+                },
+            }
+        )
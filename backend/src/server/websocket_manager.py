@@ -1,36 +1,360 @@
+import asyncio
+import itertools
+import json
+from threading import Lock
+from typing import Iterable, Optional, Union
 from fastapi import WebSocket
+from server.binary_format import BinaryFrame
+from server.state_delta import LiveViewFrame, StateDeltaEncoder
+
+# what happens to a client whose outbound queue is full (it reads slower than messages are produced)
+SLOW_CONSUMER_POLICIES = ["drop", "disconnect"]
+# "try again later": the client is closed because it fell behind
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# what clients can subscribe to, e.g. {"action": "subscribe", "topics": {"batch_id": ["3"]}}
+TOPIC_KINDS = ["batch_id", "line_type", "machine_id", "event_type"]
+# (kind, value), e.g. ("line_type", "anode")
+Topic = tuple[str, str]
+# formats a client can ask for with {"action": "set_format", "format": "binary"}: binary clients get
+# the machine data frames packed (see binary_format), everything else stays JSON
+MESSAGE_FORMATS = ["json", "binary"]
+# text or binary payload, and the binary schemas it carries (to resend them if it is dropped)
+OutboundMessage = tuple[Union[str, bytes], Optional[frozenset]]
+
+
+class ClientConnection:
+    """A connected client: a bounded outbound queue drained by its own writer task."""
+
+    def __init__(
+        self,
+        client_id: int,
+        websocket: WebSocket,
+        max_queue_size: int,
+        keyframe_interval: int = 50,
+    ):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[OutboundMessage] = asyncio.Queue(maxsize=max_queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.format = "json"
+        # binary schemas queued for (or sent to) the client
+        self.known_schemas: set[int] = set()
+        # None until the client subscribes to a topic: it receives every message
+        self.topics: Optional[set[Topic]] = None
+        # the live view states sent to the client, which its frames are deltas against; the first
+        # frame is a keyframe
+        self.state_delta_encoder = StateDeltaEncoder(keyframe_interval)
+        self.sent = 0
+        self.dropped = 0
+
+    def get_statistics(self) -> dict:
+        return {
+            "client_id": self.client_id,
+            "queued": self.queue.qsize(),
+            "max_queue_size": self.queue.maxsize,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "format": self.format,
+            "keyframes": self.state_delta_encoder.keyframes,
+            "topics": (
+                None
+                if self.topics is None
+                else [f"{kind}:{value}" for kind, value in sorted(self.topics)]
+            ),
+        }
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    """
+    Fans messages out to the WebSocket clients. Every client has its own bounded queue and writer task,
+    so a slow client never delays the others (nor the broadcaster, which only enqueues).
+    Clients receive every message until they subscribe to topics; then only the messages published
+    to one of their topics. Recipients are looked up in an index from topic to clients.
+
+    Args:
+        max_queue_size: Messages a client can fall behind by
+        slow_consumer_policy: "drop" (the client's oldest queued message is dropped) or "disconnect"
+            (the client is closed) when a client's queue is full
+        send_timeout: Seconds a single send may take before the client is treated as a slow consumer
+        keyframe_interval: Live view frames between two complete snapshots sent to a client (see
+            state_delta)
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        slow_consumer_policy: str = "drop",
+        send_timeout: float = 10.0,
+        keyframe_interval: int = 50,
+    ):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(
+                f"Slow consumer policy '{slow_consumer_policy}' is not found"
+            )
+        self.max_queue_size = max_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be at least 1 frame")
+        self.keyframe_interval = keyframe_interval
+        self.__clients: dict[WebSocket, ClientConnection] = {}
+        self.__client_ids = itertools.count(1)
+        # topic -> subscribed clients, and the clients without subscriptions (they get everything);
+        # read by the simulation threads (has_recipients), hence the lock
+        self.__topic_index: dict[Topic, set[ClientConnection]] = {}
+        self.__unfiltered_clients: set[ClientConnection] = set()
+        self.__index_lock = Lock()
+        self.__binary_clients = 0
+        # clients closed for being too slow
+        self.slow_consumers_disconnected = 0
+
+    @property
+    def active_connections(self) -> list[WebSocket]:
+        return list(self.__clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(
+            next(self.__client_ids),
+            websocket,
+            self.max_queue_size,
+            self.keyframe_interval,
+        )
+        client.writer_task = asyncio.create_task(self.__write_messages(client))
+        self.__clients[websocket] = client
+        with self.__index_lock:
+            self.__unfiltered_clients.add(client)
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.__clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.format == "binary":
+            self.__binary_clients -= 1
+        with self.__index_lock:
+            self.__unfiltered_clients.discard(client)
+            for topic in client.topics or ():
+                self.__remove_from_index(topic, client)
+        if client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+    def subscribe(self, websocket: WebSocket, topics: Iterable[Topic]):
+        client = self.__clients[websocket]
+        with self.__index_lock:
+            if client.topics is None:
+                client.topics = set()
+                self.__unfiltered_clients.discard(client)
+            for topic in topics:
+                client.topics.add(topic)
+                self.__topic_index.setdefault(topic, set()).add(client)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[Topic]):
+        """The client keeps receiving only its remaining topics (nothing when none are left)."""
+        client = self.__clients[websocket]
+        with self.__index_lock:
+            if client.topics is None:
+                client.topics = set()
+                self.__unfiltered_clients.discard(client)
+            for topic in topics:
+                client.topics.discard(topic)
+                self.__remove_from_index(topic, client)
+
+    def __remove_from_index(self, topic: Topic, client: ClientConnection):
+        subscribers = self.__topic_index.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client)
+            if not subscribers:
+                del self.__topic_index[topic]
+
+    async def handle_client_message(self, data: str, websocket: WebSocket):
+        """Handles a subscribe/unsubscribe request and acknowledges it, e.g.
+        {"action": "subscribe", "topics": {"line_type": ["anode"], "event_type": ["batch_completed"]}}
+        or a change of message format: {"action": "set_format", "format": "binary"}
+        or a resync of the live view, after a missed frame: {"action": "resync"}
+        """
+        if websocket not in self.__clients:
+            return
         try:
-            await websocket.send_text(message)
-        except:
-            # Remove disconnected websocket
-            self.disconnect(websocket)
+            request = json.loads(data)
+            action = request["action"]
+            if action not in ["subscribe", "unsubscribe", "set_format", "resync"]:
+                raise ValueError(f"Action '{action}' is not found")
+            if action == "resync":
+                # the other clients keep receiving deltas
+                self.__clients[websocket].state_delta_encoder.request_keyframe()
+                return
+            if action == "set_format":
+                self.set_format(websocket, request["format"])
+                await self.send_personal_message(
+                    json.dumps(
+                        {
+                            "status": "format_set",
+                            **self.__clients[websocket].get_statistics(),
+                        }
+                    ),
+                    websocket,
+                )
+                return
+            topics = []
+            for kind, values in request["topics"].items():
+                if kind not in TOPIC_KINDS:
+                    raise ValueError(f"Topic '{kind}' is not found")
+                if not isinstance(values, list):
+                    values = [values]
+                topics.extend((kind, str(value)) for value in values)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            await self.send_personal_message(
+                json.dumps({"status": "error", "message": f"Invalid request: {e}"}),
+                websocket,
+            )
+            return
+        if action == "subscribe":
+            self.subscribe(websocket, topics)
+        else:
+            self.unsubscribe(websocket, topics)
+        await self.send_personal_message(
+            json.dumps(
+                {"status": f"{action}d", **self.__clients[websocket].get_statistics()}
+            ),
+            websocket,
+        )
+
+    def set_format(self, websocket: WebSocket, message_format: str):
+        if message_format not in MESSAGE_FORMATS:
+            raise ValueError(f"Format '{message_format}' is not found")
+        client = self.__clients[websocket]
+        if client.format != message_format:
+            self.__binary_clients += 1 if message_format == "binary" else -1
+        client.format = message_format
+
+    def has_binary_clients(self) -> bool:
+        """Whether a binary frame is worth encoding (thread-safe)."""
+        return self.__binary_clients > 0
+
+    def has_recipients(self, topics: Iterable[Topic]) -> bool:
+        """Whether a message published to the topics would reach anyone (thread-safe), so that
+        the publisher can skip serialising it."""
+        with self.__index_lock:
+            return bool(self.__unfiltered_clients) or any(
+                topic in self.__topic_index for topic in topics
+            )
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        """Queues the message after the ones already waiting for this client."""
+        client = self.__clients.get(websocket)
+        if client is not None:
+            self.__enqueue(client, message)
 
     async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
+        """Queues the message for every client; the writer tasks send it concurrently."""
+        for client in list(self.__clients.values()):
+            self.__enqueue(client, message)
+
+    async def publish(
+        self,
+        message: str,
+        topics: Iterable[Topic],
+        binary_frame: Optional[BinaryFrame] = None,
+    ):
+        """Queues the message for the clients subscribed to one of the topics and for the clients
+        without subscriptions. Binary clients get the binary frame instead when there is one,
+        preceded by the schemas they do not have yet."""
+        for client in self.__get_recipients(topics):
+            if binary_frame is None or client.format != "binary":
+                self.__enqueue(client, message)
+                continue
+            self.__enqueue_binary_frame(client, binary_frame)
+
+    async def publish_frame(
+        self, frame: LiveViewFrame, binary_frame: Optional[BinaryFrame] = None
+    ):
+        """Queues a live view frame for the clients subscribed to the topics of one of its machines
+        and for the clients without subscriptions: each gets the machines of its topics, encoded
+        against what it was sent before. Binary clients get the binary frame instead."""
+        for client in self.__get_recipients(frame.topics):
+            if binary_frame is not None and client.format == "binary":
+                self.__enqueue_binary_frame(client, binary_frame)
+                continue
+            message = frame.encode(client.state_delta_encoder, client.topics)
+            if message is not None:
+                self.__enqueue(client, message)
+
+    def __get_recipients(self, topics: Iterable[Topic]) -> set[ClientConnection]:
+        with self.__index_lock:
+            recipients = set(self.__unfiltered_clients)
+            for topic in topics:
+                recipients.update(self.__topic_index.get(topic, ()))
+        return recipients
 
-        # Remove disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
+    def __enqueue_binary_frame(self, client: ClientConnection, binary_frame: BinaryFrame):
+        """The frame, preceded by the schemas the client does not have yet."""
+        missing_schemas = binary_frame.schema_ids - client.known_schemas
+        if missing_schemas:
+            client.known_schemas |= missing_schemas
+            self.__enqueue(
+                client,
+                binary_frame.get_schema_message(missing_schemas),
+                frozenset(missing_schemas),
+            )
+        self.__enqueue(client, binary_frame.payload)
+
+    def get_statistics(self) -> dict:
+        return {
+            "connections": len(self.__clients),
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "slow_consumers_disconnected": self.slow_consumers_disconnected,
+            "clients": [client.get_statistics() for client in self.__clients.values()],
+        }
+
+    def __enqueue(
+        self,
+        client: ClientConnection,
+        message: Union[str, bytes],
+        schema_ids: Optional[frozenset] = None,
+    ):
+        if client.queue.full():
+            if self.slow_consumer_policy == "disconnect":
+                self.__disconnect_slow_consumer(client)
+                return
+            _, dropped_schema_ids = client.queue.get_nowait()
+            if dropped_schema_ids:
+                # sent again before the next frame that needs them
+                client.known_schemas -= dropped_schema_ids
+            client.dropped += 1
+        client.queue.put_nowait((message, schema_ids))
+
+    def __disconnect_slow_consumer(self, client: ClientConnection):
+        if client.websocket not in self.__clients:
+            return
+        self.slow_consumers_disconnected += 1
+        self.disconnect(client.websocket)
+        asyncio.create_task(self.__close(client.websocket))
+
+    async def __close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            # already closed by the client
+            pass
+
+    async def __write_messages(self, client: ClientConnection):
+        while True:
+            message, _ = await client.queue.get()
+            send = (
+                client.websocket.send_bytes(message)
+                if isinstance(message, bytes)
+                else client.websocket.send_text(message)
+            )
+            try:
+                await asyncio.wait_for(send, timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self.__disconnect_slow_consumer(client)
+                return
+            except Exception:
+                # Remove disconnected websocket
+                self.disconnect(client.websocket)
+                return
+            client.sent += 1
 
 
 websocket_manager = ConnectionManager()
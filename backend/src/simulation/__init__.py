@@ -2,4 +2,4 @@
 Simulation package for battery manufacturing digital twin.
 """
 
-__all__ = ["factory", "machine", "battery_model", "event_bus"]
\ No newline at end of file
+__all__ = ["factory", "machine", "battery_model", "event_bus", "clock", "monte_carlo", "scheduler", "process_pool", "experiments"]
\ No newline at end of file
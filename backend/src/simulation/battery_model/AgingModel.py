@@ -5,6 +5,8 @@ import numpy as np
 
 
 class AgingModel(BaseModel):
+    carries_state_between_steps = False
+
     def __init__(self, formation_model: FormationCyclingModel):
         self.SOC_0 = formation_model.sei_efficiency
         self.Q_cell = formation_model.capacity
@@ -23,8 +25,10 @@ class AgingModel(BaseModel):
     def leakage_current(self, k_leak):
         return k_leak * 1e-3
 
-    def defect_check(self, soc, ocv, ileak, soc0):
-        return {(self.V_OCV - ocv) > 0.1 or ileak > 0.0001 or soc < 0.95 * soc0}
+    def defect_check(self, soc, ocv, ileak, soc0, reference_ocv=None):
+        # update_properties has already stored the drifted OCV, hence the default reference
+        reference_ocv = self.V_OCV if reference_ocv is None else reference_ocv
+        return ((reference_ocv - ocv) > 0.1) | (ileak > 0.0001) | (soc < 0.95 * soc0)
 
     def update_properties(
         self, machine_parameters: AgingParameters, current_time_step: int
@@ -38,6 +42,24 @@ class AgingModel(BaseModel):
             self.SOC, self.V_OCV, self.I_leak, self.SOC_0
         )
 
+    def compute_trajectory(
+        self, machine_parameters: AgingParameters, n_steps: int
+    ):
+        """Compute the whole aging stage at once."""
+        SOC = self.soc_decay(self.SOC_0, machine_parameters.k_leak, np.arange(n_steps))
+        V_OCV = self.ocv_drift(SOC)
+        I_leak = np.full(
+            n_steps, self.leakage_current(machine_parameters.k_leak), dtype=float
+        )
+        return {
+            "SOC": SOC,
+            "V_OCV": V_OCV,
+            "I_leak": I_leak,
+            "defect_risk": self.defect_check(
+                SOC, V_OCV, I_leak, self.SOC_0, reference_ocv=V_OCV
+            ),
+        }
+
     def get_properties(self):
         return {
             "SOC": float(self.SOC),
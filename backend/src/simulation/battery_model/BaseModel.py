@@ -1,9 +1,49 @@
 from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import numpy as np
 from simulation.process_parameters import BaseMachineParameters
 
 
+def safe_divide(numerator, denominator):
+    """numerator / denominator, or 0 where the denominator is not positive.
+    Works on plain numbers as well as NumPy arrays so the model equations can be vectorised.
+    """
+    if np.ndim(numerator) == 0 and np.ndim(denominator) == 0:
+        return numerator / denominator if denominator > 0 else 0
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float)
+    )
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros(denominator.shape),
+        where=denominator > 0,
+    )
+
+
+def batch_size_of(*properties):
+    """Number of virtual batches held by array-backed model properties, or None for a single batch.
+    Models draw their random noise with this size so every virtual batch gets its own draw.
+    """
+    shape = np.broadcast_shapes(*(np.shape(value) for value in properties))
+    return shape[0] if shape else None
+
+
+# used by models that were not given a generator (e.g. built outside a batch): not reproducible
+_unseeded_generator = np.random.default_rng()
+
+
 # simple Base class for battery models
 class BaseModel(ABC):
+    # whether update_properties builds on the state left by the previous step; when it does not,
+    # the state after the last step only needs the last update (used by the Monte Carlo engine)
+    carries_state_between_steps = True
+    # whether the outputs only depend on the incoming state and the machine parameters (no random
+    # noise), so a stage can be served from the stage-output cache
+    deterministic = True
+    # generator the random noise is drawn from, set for every stage by whoever runs the model
+    # (see Batch.get_random_generator); not part of the model state
+    rng: Optional[np.random.Generator] = None
 
     # def __init__(self, previous_model: "BaseModel" = None):
     #     self.previous_model = previous_model
@@ -17,3 +57,54 @@ class BaseModel(ABC):
         self, machine_parameters: BaseMachineParameters, current_time_step: int = None
     ):
         pass
+
+    def compute_trajectory(
+        self,
+        machine_parameters: BaseMachineParameters,
+        n_steps: int,
+        **step_inputs,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Compute a whole stage in one shot (optional).
+        Returns a dict mapping attribute names to arrays of length n_steps, where row t is the
+        state of the model after update_properties(machine_parameters, t).
+        The model itself is left untouched; use apply_trajectory_step to load a row.
+        Models that do not support it return None and the machine steps through update_properties.
+        """
+        return None
+
+    @property
+    def random_generator(self) -> np.random.Generator:
+        return self.rng if self.rng is not None else _unseeded_generator
+
+    def get_state(self) -> dict:
+        """Copy of the model attributes (arrays are copied too), without the random generator."""
+        return {
+            name: value.copy() if isinstance(value, np.ndarray) else value
+            for name, value in vars(self).items()
+            if name != "rng"
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BaseModel":
+        """Rebuild a model from get_state() (bypassing the constructor, which takes the previous model)."""
+        model = cls.__new__(cls)
+        vars(model).update(state)
+        return model
+
+    def apply_trajectory_step(self, trajectory: Dict[str, np.ndarray], t: int):
+        """Load row t of a trajectory into the model attributes (as plain Python values)."""
+        for attribute_name, values in trajectory.items():
+            setattr(self, attribute_name, values[t].item())
+
+
+def export_model_state(model: BaseModel) -> tuple[str, dict]:
+    """(model class name, attributes): compact and picklable, e.g. for snapshots and worker processes."""
+    return type(model).__name__, model.get_state()
+
+
+def import_model_state(state: tuple[str, dict]) -> BaseModel:
+    # imported here: the model classes are defined in the package built on this module
+    from simulation import battery_model
+
+    class_name, attributes = state
+    return getattr(battery_model, class_name).from_state(attributes)
@@ -5,6 +5,8 @@ import numpy as np
 
 
 class CalendaringModel(BaseModel):
+    carries_state_between_steps = False
+
     def __init__(self, drying_model: DryingModel, initial_porosity: float):
         # from drying
         self.dry_thickness = drying_model.dry_thickness
@@ -45,6 +47,28 @@ class CalendaringModel(BaseModel):
             machine_parameters.roll_pressure, self.sigma_theory
         )
 
+    def compute_trajectory(
+        self, machine_parameters: CalendaringParameters, n_steps: int
+    ):
+        """Compute the whole calendaring stage at once (the outputs are constant over the steps)."""
+        epsilon_val = self.epsilon(machine_parameters.roll_gap)
+        sigma_theory = self.sigma_calc(epsilon_val)
+        return {
+            "epsilon_val": np.full(n_steps, epsilon_val, dtype=float),
+            "sigma_theory": np.full(n_steps, sigma_theory, dtype=float),
+            "porosity": np.full(
+                n_steps, self.porosity_reduction(epsilon_val), dtype=float
+            ),
+            "final_thickness": np.full(
+                n_steps, machine_parameters.roll_gap, dtype=float
+            ),
+            "defect_risk": np.full(
+                n_steps,
+                self.defect_check(machine_parameters.roll_pressure, sigma_theory),
+                dtype=bool,
+            ),
+        }
+
     def get_properties(self):
         return {
             "final_thickness": self.final_thickness,
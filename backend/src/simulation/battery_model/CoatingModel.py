@@ -1,9 +1,12 @@
 from simulation.process_parameters.Parameters import CoatingParameters
 from simulation.battery_model.MixingModel import MixingModel
-from simulation.battery_model.BaseModel import BaseModel
+from simulation.battery_model.BaseModel import BaseModel, safe_divide
+import numpy as np
 
 
 class CoatingModel(BaseModel):
+    carries_state_between_steps = False
+
     def __init__(self, mixing_model: MixingModel):
         # passed from mixing model
         total_solids = (
@@ -13,7 +16,7 @@ class CoatingModel(BaseModel):
             total_solids + mixing_model.solvent
         )  # total volume, taken from mixing model's AM, CA, PVDF, solvent
         self.electrode_type = mixing_model.electrode_type
-        self.solid_content = total_solids / total_volume if total_volume > 0 else 0
+        self.solid_content = safe_divide(total_solids, total_volume)
         self.viscosity = mixing_model.viscosity  # taken from mixing model's viscosity
         # calculated properties
         self.wet_thickness = 0  # wet thickness (m)
@@ -96,6 +99,30 @@ class CoatingModel(BaseModel):
             self.viscosity,
         )
 
+    def compute_trajectory(
+        self, machine_parameters: CoatingParameters, n_steps: int
+    ):
+        """
+        Compute the whole coating stage at once. The coating outputs only depend on the
+        parameters and the incoming slurry, so every step holds the same values.
+        """
+        wet_thickness = self.calculate_wet_thickness(
+            machine_parameters.flow_rate,
+            machine_parameters.coating_speed,
+            machine_parameters.coating_width,
+        )
+        dry_thickness = self.calculate_dry_thickness(wet_thickness, self.solid_content)
+        defect_risk = self.calculate_defect_risk(
+            machine_parameters.coating_speed,
+            machine_parameters.gap_height,
+            self.viscosity,
+        )
+        return {
+            "wet_thickness": np.full(n_steps, wet_thickness, dtype=float),
+            "dry_thickness": np.full(n_steps, dry_thickness, dtype=float),
+            "defect_risk": np.full(n_steps, defect_risk, dtype=bool),
+        }
+
     def get_properties(self):
         return {
             # "temperature": round(self.temperature, 2), # not implemented!
@@ -1,6 +1,7 @@
 from simulation.process_parameters.Parameters import DryingParameters
 from simulation.battery_model.BaseModel import BaseModel
 from simulation.battery_model.CoatingModel import CoatingModel
+import numpy as np
 
 
 class DryingModel(BaseModel):
@@ -48,13 +49,59 @@ class DryingModel(BaseModel):
     ):
         # newly added to the model properties
         self.evap_rate = self.calculate_evaporation_rate()
-        if self.M_solvent == 0:
-            self.M_solvent = self.calculate_initial_solvent_mass()
-        self.M_solvent -= (self.evap_rate / self.AREA) * self.DELTA_T
-        self.M_solvent = max(self.M_solvent, 0)
+        # refill the solvent once it has fully evaporated
+        self.M_solvent = np.where(
+            self.M_solvent == 0, self.calculate_initial_solvent_mass(), self.M_solvent
+        )
+        self.M_solvent = self.M_solvent - (self.evap_rate / self.AREA) * self.DELTA_T
+        self.M_solvent = np.maximum(self.M_solvent, 0)
         self.dry_thickness = self.calculate_dry_thickness()
         self.defect_risk = abs(self.evap_rate / self.AREA) > self.MAX_SAFE_EVAP_RATE
 
+    def compute_trajectory(
+        self, machine_parameters: DryingParameters, n_steps: int
+    ):
+        """
+        Compute the whole drying stage at once.
+        The solvent mass decreases linearly and is clipped at 0; like update_properties, it is
+        refilled from the initial mass when it has reached 0, so the trajectory is built one
+        linear segment at a time instead of one step at a time.
+        The segments use a running subtraction so the rounding matches the step loop exactly.
+        """
+        evap_rate = self.calculate_evaporation_rate()
+        initial_solvent_mass = self.calculate_initial_solvent_mass()
+        decrement = (evap_rate / self.AREA) * self.DELTA_T
+        M_solvent = np.empty(n_steps)
+        current_mass = self.M_solvent
+        t = 0
+        while t < n_steps:
+            if current_mass == 0:
+                current_mass = initial_solvent_mass
+            segment_length = n_steps - t
+            if decrement > 0:
+                # one extra step of margin for the rounding of the running subtraction
+                segment_length = min(segment_length, int(current_mass / decrement) + 2)
+            segment = np.subtract.accumulate(
+                np.concatenate(([current_mass], np.full(segment_length, decrement)))
+            )[1:]
+            empty_steps = np.flatnonzero(segment <= 0)
+            if empty_steps.size:
+                segment_length = empty_steps[0] + 1
+            segment = np.maximum(segment[:segment_length], 0)
+            M_solvent[t : t + segment_length] = segment
+            current_mass = segment[-1]
+            t += segment_length
+        return {
+            "evap_rate": np.full(n_steps, evap_rate, dtype=float),
+            "M_solvent": M_solvent,
+            "dry_thickness": np.full(
+                n_steps, self.calculate_dry_thickness(), dtype=float
+            ),
+            "defect_risk": np.full(
+                n_steps, abs(evap_rate / self.AREA) > self.MAX_SAFE_EVAP_RATE, dtype=bool
+            ),
+        }
+
     def get_properties(self):
         return {
             "wet_thickness": float(self.wet_thickness),
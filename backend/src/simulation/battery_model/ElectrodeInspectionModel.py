@@ -1,10 +1,13 @@
 from simulation.process_parameters.Parameters import ElectrodeInspectionParameters
-from simulation.battery_model.BaseModel import BaseModel
+from simulation.battery_model.BaseModel import BaseModel, batch_size_of
 from simulation.battery_model.SlittingModel import SlittingModel
 import numpy as np
 
 
 class ElectrodeInspectionModel(BaseModel):
+    carries_state_between_steps = False
+    deterministic = False
+
     def __init__(self, slitting_model: SlittingModel):
         # from slitting
         self.final_width = slitting_model.width_final
@@ -24,21 +27,72 @@ class ElectrodeInspectionModel(BaseModel):
     def update_properties(
         self, machine_parameters: ElectrodeInspectionParameters, current_time_step: int = None
     ):
-        self.epsilon_thickness = (self.final_thickness * 1e-6) * np.random.uniform(
-            -1, 1
-        )
-        self.D_detected = np.random.randint(0, 3)
-        self.pass_width = (
-            abs(self.epsilon_width) <= machine_parameters.epsilon_width_max
+        size = batch_size_of(self.final_thickness, self.epsilon_width)
+        rng = self.random_generator
+        self.epsilon_thickness = (self.final_thickness * 1e-6) * rng.uniform(-1, 1, size)
+        D_detected = rng.integers(0, 3, size)
+        # a plain int for a single batch (JSON serialisable, like the other properties)
+        self.D_detected = D_detected if size is not None else int(D_detected)
+        (
+            self.pass_width,
+            self.pass_thickness,
+            self.pass_burr,
+            self.pass_surface,
+            self.overall,
+        ) = self.inspect(
+            machine_parameters,
+            self.epsilon_width,
+            self.epsilon_thickness,
+            self.burr_factor,
+            self.D_detected,
         )
-        self.pass_thickness = (
-            abs(self.epsilon_thickness) <= machine_parameters.epsilon_thickness_max
+
+    def inspect(
+        self,
+        machine_parameters: ElectrodeInspectionParameters,
+        epsilon_width,
+        epsilon_thickness,
+        burr_factor,
+        D_detected,
+    ):
+        """Compare the measured deviations with the inspection limits (scalars or arrays)."""
+        pass_width = abs(epsilon_width) <= machine_parameters.epsilon_width_max
+        pass_thickness = (
+            abs(epsilon_thickness) <= machine_parameters.epsilon_thickness_max
         )
-        self.pass_burr = self.burr_factor <= machine_parameters.B_max
-        self.pass_surface = self.D_detected <= machine_parameters.D_surface_max
-        self.overall = all(
-            [self.pass_width, self.pass_thickness, self.pass_burr, self.pass_surface]
+        pass_burr = burr_factor <= machine_parameters.B_max
+        pass_surface = D_detected <= machine_parameters.D_surface_max
+        overall = pass_width & pass_thickness & pass_burr & pass_surface
+        return pass_width, pass_thickness, pass_burr, pass_surface, overall
+
+    def compute_trajectory(
+        self, machine_parameters: ElectrodeInspectionParameters, n_steps: int
+    ):
+        """Compute the whole inspection stage at once, drawing the measurement noise for every step.
+        The draws alternate like the steps of update_properties (one uniform, then one integer), so a
+        seeded batch inspects the same whichever path the machine takes."""
+        rng = self.random_generator
+        epsilon_thickness = np.empty(n_steps, dtype=float)
+        D_detected = np.empty(n_steps, dtype=np.int64)
+        for t in range(n_steps):
+            epsilon_thickness[t] = (self.final_thickness * 1e-6) * rng.uniform(-1, 1)
+            D_detected[t] = rng.integers(0, 3)
+        pass_width, pass_thickness, pass_burr, pass_surface, overall = self.inspect(
+            machine_parameters,
+            np.full(n_steps, self.epsilon_width, dtype=float),
+            epsilon_thickness,
+            np.full(n_steps, self.burr_factor, dtype=float),
+            D_detected,
         )
+        return {
+            "epsilon_thickness": epsilon_thickness,
+            "D_detected": D_detected,
+            "pass_width": pass_width,
+            "pass_thickness": pass_thickness,
+            "pass_burr": pass_burr,
+            "pass_surface": pass_surface,
+            "overall": overall,
+        }
 
     def get_properties(self):
         return {
@@ -5,6 +5,8 @@ import numpy as np
 
 
 class ElectrolyteFillingModel(BaseModel):
+    carries_state_between_steps = False
+
     def __init__(self, rewinding_model: RewindingModel):
         # from rewinding
         self.final_thickness = rewinding_model.delta_sl
@@ -30,8 +32,10 @@ class ElectrolyteFillingModel(BaseModel):
     def V_elec_calc(self):
         return self.length * self.final_width * self.final_thickness
 
-    def V_max_calc(self):
-        return self.porosity * (self.V_elec + self.V_sep)
+    def V_max_calc(self, V_elec=None, V_sep=None):
+        V_elec = self.V_elec if V_elec is None else V_elec
+        V_sep = self.V_sep if V_sep is None else V_sep
+        return self.porosity * (V_elec + V_sep)
 
     def eta_wetting_calc(self, t, soaking_time):
         return 1 - np.exp(-3 * (t / soaking_time))
@@ -48,6 +52,26 @@ class ElectrolyteFillingModel(BaseModel):
         self.V_elec_filling = self.eta_wetting * self.V_max
         self.defect_risk = self.V_elec_filling < 0.8 * self.V_max
 
+    def compute_trajectory(
+        self, machine_parameters: ElectrolyteFillingParameters, n_steps: int
+    ):
+        """Compute the whole electrolyte filling stage at once."""
+        V_sep = self.V_sep_calc()
+        V_elec = self.V_elec_calc()
+        V_max = self.V_max_calc(V_elec, V_sep)
+        eta_wetting = self.eta_wetting_calc(
+            np.arange(n_steps), machine_parameters.soaking_time
+        )
+        V_elec_filling = eta_wetting * V_max
+        return {
+            "V_sep": np.full(n_steps, V_sep, dtype=float),
+            "V_elec": np.full(n_steps, V_elec, dtype=float),
+            "V_max": np.full(n_steps, V_max, dtype=float),
+            "eta_wetting": eta_wetting,
+            "V_elec_filling": V_elec_filling,
+            "defect_risk": V_elec_filling < 0.8 * V_max,
+        }
+
     def get_properties(self):
         return {
             "final_thickness": float(self.final_thickness),
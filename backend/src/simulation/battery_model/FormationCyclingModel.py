@@ -5,6 +5,8 @@ import numpy as np
 
 
 class FormationCyclingModel(BaseModel):
+    carries_state_between_steps = False
+
     def __init__(self, filling_model: ElectrolyteFillingModel):
         self.eta_wetting = filling_model.eta_wetting
         self.volume_elec = filling_model.V_elec_filling
@@ -17,20 +19,41 @@ class FormationCyclingModel(BaseModel):
         self.k_sei = 0.05
         self.t50 = 300
 
+    def sei_efficiency_calc(self, t):
+        return 1 / (1 + np.exp(-self.k_sei * (t - self.t50)))
+
+    def capacity_calc(self, sei_efficiency):
+        return sei_efficiency * self.Q_theoretical_Ah * self.eta_wetting
+
+    def voltage_calc(self, machine_parameters: FormationCyclingParameters, t, capacity):
+        return np.minimum(
+            machine_parameters.initial_voltage
+            + (machine_parameters.charge_current_A * t) / (capacity + 1e-6),
+            machine_parameters.charge_voltage_limit_V,
+        )
+
     def update_properties(
         self, machine_parameters: FormationCyclingParameters, current_time_step: int
     ):
-        self.sei_efficiency = float(
-            1 / (1 + np.exp(-self.k_sei * (current_time_step - self.t50)))
-        )
-        self.capacity = self.sei_efficiency * self.Q_theoretical_Ah * self.eta_wetting
-        self.voltage = min(
-            machine_parameters.initial_voltage
-            + (machine_parameters.charge_current_A * current_time_step)
-            / (self.capacity + 1e-6),
-            machine_parameters.charge_voltage_limit_V,
+        self.sei_efficiency = float(self.sei_efficiency_calc(current_time_step))
+        self.capacity = self.capacity_calc(self.sei_efficiency)
+        self.voltage = self.voltage_calc(
+            machine_parameters, current_time_step, self.capacity
         )
 
+    def compute_trajectory(
+        self, machine_parameters: FormationCyclingParameters, n_steps: int
+    ):
+        """Compute the whole formation stage at once."""
+        t = np.arange(n_steps)
+        sei_efficiency = self.sei_efficiency_calc(t)
+        capacity = self.capacity_calc(sei_efficiency)
+        return {
+            "sei_efficiency": sei_efficiency,
+            "capacity": capacity,
+            "voltage": self.voltage_calc(machine_parameters, t, capacity),
+        }
+
     def get_properties(self):
         return {
             "Voltage_V": self.voltage,
@@ -1,6 +1,5 @@
 from simulation.process_parameters.Parameters import MixingParameters
-from simulation.battery_model.BaseModel import BaseModel
-import random
+from simulation.battery_model.BaseModel import BaseModel, safe_divide, batch_size_of
 import numpy as np
 
 
@@ -18,24 +17,24 @@ class MixingModel(BaseModel):
             NMP (float): Amount of solvent for cathode slurry
     """
 
-    def __init__(self, electrode_type):
+    carries_state_between_steps = False
+    deterministic = False
+
+    def __init__(self, electrode_type, rng: np.random.Generator = None):
         """
         Initialise a new MixingModel instance.
 
         Args:
             electrode_type (str): The type of electrode ("Anode" or "Cathode")
+            rng (np.random.Generator): Generator of the random properties (unseeded by default)
         """
+        self.rng = rng
         self.AM = 0  # Active Material volume
         self.CA = 0  # Conductive Additive volume
         self.PVDF = 0  # PVDF Binder volume
         self.solvent = 0  # Solvent volume
         # random parameters
-        self.temperature = random.uniform(24, 26)
-        self.k_vis = random.uniform(0.1, 0.3)  # Viscosity temperature coefficient
-        self.k_yield = random.uniform(
-            0.05, 0.15
-        )  # Yield stress temperature coefficient
-        self.alpha = random.uniform(0.0005, 0.0015)
+        self.randomise_properties()
         self.electrode_type = electrode_type
         if electrode_type == "Anode":
             self.solvent_type = "H2O"
@@ -46,6 +45,19 @@ class MixingModel(BaseModel):
         self.density = 0  # mixing model's density (kg/m^3)
         self.yield_stress = 0  # mixing model's yield stress (Pa)
 
+    def randomise_properties(self, size=None):
+        """
+        Draw the random properties of the slurry.
+
+        Args:
+            size (int): Number of virtual batches to draw for (array-backed model), None for a single batch
+        """
+        rng = self.random_generator
+        self.temperature = rng.uniform(24, 26, size)
+        self.k_vis = rng.uniform(0.1, 0.3, size)  # Viscosity temperature coefficient
+        self.k_yield = rng.uniform(0.05, 0.15, size)  # Yield stress temperature coefficient
+        self.alpha = rng.uniform(0.0005, 0.0015, size)
+
     def add(self, component, amount):
         """
         Add a specified amount of a component to the slurry.
@@ -76,7 +88,7 @@ class MixingModel(BaseModel):
         )
 
         volume = AM_volume + CA_volume + PVDF_volume + solvent_volume
-        return total_mass / volume if volume > 0 else 0
+        return safe_divide(total_mass, volume)
 
     def calculate_viscosity(
         self,
@@ -90,9 +102,11 @@ class MixingModel(BaseModel):
         """Calculate viscosity using Krieger-Dougherty model"""
         total_volume = AM_volume + CA_volume + PVDF_volume + solvent_volume
         solid_volume = AM_volume + CA_volume + PVDF_volume
-        phi = solid_volume / total_volume if total_volume > 0 else 0
+        phi = safe_divide(solid_volume, total_volume)
 
-        if phi >= max_solid_fraction:
+        if np.ndim(phi) > 0:
+            phi = np.where(phi >= max_solid_fraction, max_solid_fraction - 0.001, phi)
+        elif phi >= max_solid_fraction:
             phi = max_solid_fraction - 0.001
 
         return (1 - (phi / max_solid_fraction)) ** (
@@ -133,6 +147,47 @@ class MixingModel(BaseModel):
             self.AM, self.CA, self.PVDF, self.solvent, self.electrode_type
         )
 
+    def compute_trajectory(
+        self,
+        machine_parameters: MixingParameters,
+        n_steps: int,
+        volumes: dict = None,
+    ):
+        """Compute the whole mixing stage at once.
+
+        Args:
+            machine_parameters (MixingParameters): The mixing parameters
+            n_steps (int): Number of steps of the stage
+            volumes (dict): Per-step component volumes ('AM', 'CA', 'PVDF', 'solvent' -> array),
+                as produced by the mixing machine's addition schedule. Defaults to the current volumes.
+        """
+        if volumes is None:
+            volumes = {
+                component: np.full(n_steps, float(getattr(self, component)))
+                for component in ("AM", "CA", "PVDF", "solvent")
+            }
+        AM, CA, PVDF, solvent = (
+            volumes["AM"],
+            volumes["CA"],
+            volumes["PVDF"],
+            volumes["solvent"],
+        )
+        return {
+            "AM": AM,
+            "CA": CA,
+            "PVDF": PVDF,
+            "solvent": solvent,
+            # same fluctuation as update_temperature, drawn for every step at once
+            "temperature": self.random_generator.uniform(24, 26, size=n_steps),
+            "density": self.calculate_density(
+                AM, CA, PVDF, solvent, self.electrode_type
+            ),
+            "viscosity": self.calculate_viscosity(AM, CA, PVDF, solvent),
+            "yield_stress": self.calculate_yield_stress(
+                AM, CA, PVDF, solvent, self.electrode_type
+            ),
+        }
+
     def get_total_volume(self, AM_volume, CA_volume, PVDF_volume, solvent_volume):
         """
         Calculate the current total volume of all components in the slurry.
@@ -164,4 +219,6 @@ class MixingModel(BaseModel):
         """
         Update the temperature to simulate fluctuation (random between 24 and 26°C)
         """
-        self.temperature = random.uniform(24, 26)
+        self.temperature = self.random_generator.uniform(
+            24, 26, batch_size_of(self.temperature)
+        )
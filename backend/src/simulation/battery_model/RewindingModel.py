@@ -64,6 +64,28 @@ class RewindingModel(BaseModel):
         )
         self.H_roll = self.H_roll_calc(self.delta_sl, self.tau_rewind)
 
+    def compute_trajectory(
+        self, machine_parameters: RewindingParameters, n_steps: int
+    ):
+        """Compute the whole rewinding stage at once: the wound length grows linearly with the steps."""
+        INTERVAL = 1
+        L_wound = self.L_wound + machine_parameters.rewinding_speed * INTERVAL * np.arange(
+            1, n_steps + 1
+        )
+        D_roll = self.D_roll_calc(L_wound, self.delta_sl, self.D_core)
+        tau_rewind = self.tau_rewind_calc(
+            D_roll,
+            machine_parameters.initial_tension,
+            machine_parameters.tapering_steps,
+            self.D_core,
+        )
+        return {
+            "L_wound": L_wound,
+            "D_roll": D_roll,
+            "tau_rewind": tau_rewind,
+            "H_roll": self.H_roll_calc(self.delta_sl, tau_rewind),
+        }
+
     def get_properties(self):
         return {
             "final_thickness": float(self.delta_sl),
@@ -1,10 +1,13 @@
 from simulation.process_parameters.Parameters import SlittingParameters
-from simulation.battery_model.BaseModel import BaseModel
+from simulation.battery_model.BaseModel import BaseModel, batch_size_of
 from simulation.battery_model.CalendaringModel import CalendaringModel
 import numpy as np
 
 
 class SlittingModel(BaseModel):
+    carries_state_between_steps = False
+    deterministic = False
+
     def __init__(self, calendaring_model: CalendaringModel):
         # from calendaring
         self.dry_thickness = calendaring_model.dry_thickness
@@ -21,8 +24,8 @@ class SlittingModel(BaseModel):
         self.max_width_deviation = 0.1
         self.max_burr_threshold = 2.0
 
-    def simulate_width_variation(self, target_width):
-        return target_width + np.random.normal(0, 0.05)
+    def simulate_width_variation(self, target_width, size=None):
+        return target_width + self.random_generator.normal(0, 0.05, size=size)
 
     def calculate_epsilon_width(self, w_final, w_target):
         return w_final - w_target
@@ -31,16 +34,16 @@ class SlittingModel(BaseModel):
         return (self.C / S) * (v_slit / self.v_ref) * (tau_slit / self.tau_ref)
 
     def defect_check(self, epsilon_width, burr_factor):
-        return (
-            abs(epsilon_width) > self.max_width_deviation
-            or burr_factor > self.max_burr_threshold
+        return (abs(epsilon_width) > self.max_width_deviation) | (
+            burr_factor > self.max_burr_threshold
         )
 
     def update_properties(
         self, machine_parameters: SlittingParameters, current_time_step: int = None
     ):
         self.width_final = self.simulate_width_variation(
-            machine_parameters.target_width
+            machine_parameters.target_width,
+            size=batch_size_of(self.dry_thickness, self.porosity),
         )
         self.epsilon_width = self.calculate_epsilon_width(
             self.width_final, machine_parameters.target_width
@@ -54,6 +57,33 @@ class SlittingModel(BaseModel):
         # assuming no thickness change during slitting
         self.final_thickness = self.dry_thickness
 
+    def compute_trajectory(
+        self, machine_parameters: SlittingParameters, n_steps: int
+    ):
+        """Compute the whole slitting stage at once, drawing the width noise for every step."""
+        width_final = self.simulate_width_variation(
+            machine_parameters.target_width, size=n_steps
+        )
+        epsilon_width = self.calculate_epsilon_width(
+            width_final, machine_parameters.target_width
+        )
+        burr_factor = np.full(
+            n_steps,
+            self.calculate_burr_factor(
+                machine_parameters.blade_sharpness,
+                machine_parameters.slitting_speed,
+                machine_parameters.slitting_tension,
+            ),
+            dtype=float,
+        )
+        return {
+            "width_final": width_final,
+            "epsilon_width": epsilon_width,
+            "burr_factor": burr_factor,
+            "defect_risk": self.defect_check(epsilon_width, burr_factor),
+            "final_thickness": np.full(n_steps, self.dry_thickness, dtype=float),
+        }
+
     def get_properties(self):
         return {
             "final_thickness": self.final_thickness,
@@ -1,5 +1,5 @@
 # Battery model package initialization
-from .BaseModel import BaseModel
+from .BaseModel import BaseModel, export_model_state, import_model_state
 from .MixingModel import MixingModel
 from .CoatingModel import CoatingModel
 from .DryingModel import DryingModel
@@ -23,4 +23,6 @@ __all__ = [
     'ElectrolyteFillingModel',
     'FormationCyclingModel',
     'AgingModel',
+    'export_model_state',
+    'import_model_state',
 ]
@@ -0,0 +1,141 @@
+"""
+Clocks that drive the pacing and the timestamps of the plant simulation.
+Machines never call time.sleep() or datetime.now() directly; they ask the clock instead,
+so the same simulation can run in real time, faster than real time, or as fast as possible.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from threading import Condition, Lock
+import time
+
+
+class SimulationClock(ABC):
+    """Abstract base class for the clock shared by a plant simulation."""
+
+    @abstractmethod
+    def now(self) -> datetime:
+        """Return the current simulated time."""
+        pass
+
+    @abstractmethod
+    def wait_until(self, target: datetime):
+        """Block the calling thread until the simulated time reaches the target."""
+        pass
+
+    @property
+    def speed_factor(self) -> float:
+        """Ratio of simulated time to wall time (inf when unthrottled)."""
+        return 1.0
+
+    @property
+    def throttled(self) -> bool:
+        """Whether waiting on this clock blocks. Unthrottled clocks enable the fast paths."""
+        return True
+
+    def set_speed_factor(self, speed_factor: float):
+        """Change the speed of the clock at runtime (only supported by scaled clocks)."""
+        raise TypeError(f"{type(self).__name__} does not support changing its speed")
+
+    def get_clock_state(self):
+        speed_factor = self.speed_factor
+        return {
+            "clock_type": type(self).__name__,
+            # None means unthrottled (infinity is not valid JSON)
+            "speed_factor": speed_factor if speed_factor != float("inf") else None,
+            "simulated_time": self.now().isoformat(),
+        }
+
+
+class RealTimeClock(SimulationClock):
+    """Simulated time is wall time. This is the historical behaviour of the plant."""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def wait_until(self, target: datetime):
+        remaining = (target - datetime.now()).total_seconds()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class ScaledClock(SimulationClock):
+    """
+    Simulated time runs speed_factor times faster than wall time.
+    The speed factor can be changed while machines are waiting; waiting threads are woken up
+    and recompute their remaining wall time so the change takes effect immediately.
+    """
+
+    def __init__(self, speed_factor: float = 1.0, start_time: datetime = None):
+        self.__validate_speed_factor(speed_factor)
+        self.__condition = Condition()
+        self.__speed_factor = float(speed_factor)
+        # anchors: simulated time at the moment the speed was last changed, and the matching wall time
+        self.__anchor_simulated_time = start_time or datetime.now()
+        self.__anchor_wall_time = time.monotonic()
+
+    @staticmethod
+    def __validate_speed_factor(speed_factor: float):
+        if speed_factor <= 0:
+            raise ValueError("Speed factor must be greater than 0")
+
+    @property
+    def speed_factor(self) -> float:
+        return self.__speed_factor
+
+    def __now_unlocked(self) -> datetime:
+        wall_elapsed = time.monotonic() - self.__anchor_wall_time
+        return self.__anchor_simulated_time + timedelta(
+            seconds=wall_elapsed * self.__speed_factor
+        )
+
+    def now(self) -> datetime:
+        with self.__condition:
+            return self.__now_unlocked()
+
+    def set_speed_factor(self, speed_factor: float):
+        self.__validate_speed_factor(speed_factor)
+        with self.__condition:
+            # re-anchor so the simulated time stays continuous across the change
+            self.__anchor_simulated_time = self.__now_unlocked()
+            self.__anchor_wall_time = time.monotonic()
+            self.__speed_factor = float(speed_factor)
+            self.__condition.notify_all()
+
+    def wait_until(self, target: datetime):
+        with self.__condition:
+            while True:
+                remaining = (target - self.__now_unlocked()).total_seconds()
+                if remaining <= 0:
+                    return
+                self.__condition.wait(timeout=remaining / self.__speed_factor)
+
+
+class UnthrottledClock(SimulationClock):
+    """
+    As-fast-as-possible mode: waiting never blocks, it only moves the simulated time forward.
+    Concurrent machines each keep their own cursor, so the shared time is the furthest point
+    any machine has reached.
+    """
+
+    def __init__(self, start_time: datetime = None):
+        self.__lock = Lock()
+        self.__simulated_time = start_time or datetime.now()
+
+    @property
+    def speed_factor(self) -> float:
+        return float("inf")
+
+    @property
+    def throttled(self) -> bool:
+        return False
+
+    def now(self) -> datetime:
+        with self.__lock:
+            return self.__simulated_time
+
+    def wait_until(self, target: datetime):
+        with self.__lock:
+            if target > self.__simulated_time:
+                self.__simulated_time = target
+
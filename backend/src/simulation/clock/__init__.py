@@ -0,0 +1,8 @@
+from .SimulationClock import (
+    SimulationClock,
+    RealTimeClock,
+    ScaledClock,
+    UnthrottledClock,
+)
+
+__all__ = ["SimulationClock", "RealTimeClock", "ScaledClock", "UnthrottledClock"]
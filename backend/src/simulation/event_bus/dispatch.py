@@ -0,0 +1,180 @@
+"""
+Asynchronous delivery of events: a subscriber gets a bounded queue drained by its own worker thread,
+so the thread emitting the event (the simulation) never runs the subscriber's callback.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from threading import Condition, Thread
+from typing import Any, Callable, Hashable, Optional
+
+
+class OverflowPolicy(Enum):
+    """What happens to a new event when the subscriber's queue is full."""
+
+    # the emitter waits for a place (no event is lost, the simulation slows down to the subscriber)
+    BLOCK = "block"
+    # the oldest pending event is dropped
+    DROP_OLDEST = "drop_oldest"
+    # a new event replaces the pending event with the same key (whether the queue is full or not),
+    # e.g. only the latest data of every machine is delivered; events without a key (None) are
+    # queued as they come. Otherwise the oldest event is dropped
+    COALESCE = "coalesce"
+
+
+def default_coalesce_key(event) -> Optional[Hashable]:
+    """Events of the same type from the same machine replace each other. The events that do not
+    come from a machine (e.g. the batch events) are never coalesced: their key is None."""
+    machine_id = (event.data or {}).get("machine_id")
+    if machine_id is None:
+        return None
+    return event.event_type, machine_id
+
+
+@dataclass
+class AsyncDispatch:
+    """Options of an asynchronous subscription (see EventBus.subscribe)."""
+
+    max_queue_size: int = 1000
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    coalesce_key: Callable[[Any], Hashable] = default_coalesce_key
+
+    def __post_init__(self):
+        if self.max_queue_size < 1:
+            raise ValueError("The queue of a subscriber must hold at least 1 event")
+
+
+class _PendingEvent:
+    __slots__ = ["event", "enqueued_at", "key"]
+
+    def __init__(self, event, enqueued_at: float, key: Hashable):
+        self.event = event
+        # wall-clock time the event has been waiting since (kept when it is coalesced)
+        self.enqueued_at = enqueued_at
+        self.key = key
+
+
+class SubscriberQueue:
+    """
+    Bounded queue of the events of one subscriber, delivered in order by a daemon worker thread.
+    Keeps the lag metrics of the subscriber: how many events wait and for how long.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[Any], None],
+        options: AsyncDispatch,
+    ):
+        self.name = name
+        self.options = options
+        self.__callback = callback
+        self.__pending: deque[_PendingEvent] = deque()
+        # coalesce key -> pending event, for the COALESCE policy
+        self.__pending_by_key: dict[Hashable, _PendingEvent] = {}
+        self.__condition = Condition()
+        self.__delivering = False
+        self.__closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.__worker = Thread(
+            target=self.__deliver_events, name=f"event-dispatch-{name}", daemon=True
+        )
+        self.__worker.start()
+
+    def put(self, event):
+        """Queues the event, applying the overflow policy when the queue is full."""
+        policy = self.options.overflow_policy
+        with self.__condition:
+            if self.__closed:
+                return
+            key = None
+            if policy == OverflowPolicy.COALESCE:
+                key = self.options.coalesce_key(event)
+                pending_event = (
+                    self.__pending_by_key.get(key) if key is not None else None
+                )
+                if pending_event is not None:
+                    pending_event.event = event
+                    self.coalesced += 1
+                    return
+            if policy == OverflowPolicy.BLOCK:
+                self.__condition.wait_for(
+                    lambda: self.__closed
+                    or len(self.__pending) < self.options.max_queue_size
+                )
+                if self.__closed:
+                    return
+            elif len(self.__pending) >= self.options.max_queue_size:
+                self.__forget(self.__pending.popleft())
+                self.dropped += 1
+            pending_event = _PendingEvent(event, time.monotonic(), key)
+            self.__pending.append(pending_event)
+            if key is not None:
+                self.__pending_by_key[key] = pending_event
+            self.__condition.notify_all()
+
+    def __forget(self, pending_event: _PendingEvent):
+        if self.__pending_by_key.get(pending_event.key) is pending_event:
+            del self.__pending_by_key[pending_event.key]
+
+    def __deliver_events(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending or self.__closed)
+                if not self.__pending:
+                    return
+                pending_event = self.__pending.popleft()
+                self.__forget(pending_event)
+                self.__delivering = True
+                # emitters blocked on a full queue
+                self.__condition.notify_all()
+            lag_seconds = time.monotonic() - pending_event.enqueued_at
+            try:
+                self.__callback(pending_event.event)
+            except Exception as e:
+                # general error handling for the event callback
+                print(f"Error in event callback: {e}")
+            with self.__condition:
+                self.__delivering = False
+                self.delivered += 1
+                self.last_lag_seconds = lag_seconds
+                self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+                self.__condition.notify_all()
+
+    def wait_until_empty(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every queued event has been delivered."""
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: not self.__pending and not self.__delivering, timeout=timeout
+            )
+
+    def close(self):
+        """Stops the worker once the pending events are delivered; later events are ignored."""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def get_statistics(self) -> dict:
+        with self.__condition:
+            oldest_pending = self.__pending[0].enqueued_at if self.__pending else None
+            return {
+                "subscriber": self.name,
+                "overflow_policy": self.options.overflow_policy.value,
+                "queued_events": len(self.__pending),
+                "max_queue_size": self.options.max_queue_size,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                # how far behind the emitter the subscriber is
+                "lag_seconds": (
+                    time.monotonic() - oldest_pending if oldest_pending is not None else 0.0
+                ),
+                "last_lag_seconds": self.last_lag_seconds,
+                "max_lag_seconds": self.max_lag_seconds,
+            }
@@ -3,10 +3,13 @@ Event system for decoupling simulation logic from notification logic.
 Machines emit events, and other components can listen to these events.
 """
 
+import time
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, Callable, List
+from typing import Dict, Any, Callable, List, Optional
 from enum import Enum
+from simulation.clock import SimulationClock
+from simulation.event_bus.dispatch import AsyncDispatch, SubscriberQueue
 
 
 class PlantSimulationEventType(Enum):
@@ -44,9 +47,12 @@ class EventBus:
     """
     Simple event bus for machine events.
     Machines emit events, listeners can subscribe to specific event types.
+    Listeners are called on the emitting thread, unless they subscribe with an AsyncDispatch:
+    their events are then queued (bounded) and delivered by a worker thread of their own, so a
+    slow listener does not slow the simulation down.
     """
 
-    def __init__(self):
+    def __init__(self, clock: Optional[SimulationClock] = None):
         """listeners example:
         {
             PlantSimulationEventType.BATCH_STARTED_ANODE_LINE: [callback_x],
@@ -58,11 +64,18 @@ class EventBus:
         }
         """
         self.__listeners: Dict[PlantSimulationEventType, List[Callable]] = {}
+        # asynchronous listener -> its queue (shared by all the event types it subscribed to)
+        self.__subscriber_queues: Dict[Callable, SubscriberQueue] = {}
+        # called on the emitting thread before dispatching, see add_preprocessor
+        self.__preprocessors: Dict[PlantSimulationEventType, List[Callable]] = {}
+        # events are stamped with simulated time when the bus belongs to a clocked simulation
+        self.__clock = clock
 
     def subscribe(
         self,
         event_type: PlantSimulationEventType,
         callback: Callable[[PlantSimulationEvent], None],
+        dispatch: Optional[AsyncDispatch] = None,
     ):
         """Subscribe to events of a specific type.
         For example, if the event type is MachineEventType.TURNED_ON, the callback (callback_x) will be called when the machine is turned on.
@@ -70,7 +83,13 @@ class EventBus:
         {
             MachineEventType.TURNED_ON: [callback_x],
         }
+        With a dispatch, the callback is called asynchronously from its own queue (the options of its
+        first asynchronous subscription apply to all its event types, which are delivered in order).
         """
+        if dispatch is not None and callback not in self.__subscriber_queues:
+            self.__subscriber_queues[callback] = SubscriberQueue(
+                getattr(callback, "__qualname__", repr(callback)), callback, dispatch
+            )
         # check if the event type is already in the listeners.
         if event_type not in self.__listeners:
             self.__listeners[event_type] = []
@@ -88,28 +107,84 @@ class EventBus:
                 self.__listeners[event_type].remove(callback)
             except ValueError:
                 pass
+        if callback in self.__subscriber_queues and not any(
+            callback in callbacks for callbacks in self.__listeners.values()
+        ):
+            self.__subscriber_queues.pop(callback).close()
+
+    def add_preprocessor(
+        self,
+        event_type: PlantSimulationEventType,
+        preprocessor: Callable[[PlantSimulationEvent], None],
+    ):
+        """Run preprocessor on every event of the type, on the emitting thread, before any listener
+        gets it (e.g. to attach context that is only valid when the event is emitted)."""
+        preprocessors = self.__preprocessors.setdefault(event_type, [])
+        if preprocessor not in preprocessors:
+            preprocessors.append(preprocessor)
+
+    def has_subscribers(self, event_type: PlantSimulationEventType) -> bool:
+        """Whether anyone listens to this event type (lets emitters skip building payloads)."""
+        return bool(self.__listeners.get(event_type))
 
     def __emit(self, event: PlantSimulationEvent):
         """Emit an event to all subscribers."""
+        for preprocessor in self.__preprocessors.get(event.event_type, []):
+            try:
+                preprocessor(event)
+            except Exception as e:
+                print(f"Error in event preprocessor: {e}")
         # check the event type is in the listeners
         if event.event_type in self.__listeners:
             # call all of the callbacks for the event type.
             for callback in self.__listeners[event.event_type]:
+                subscriber_queue = self.__subscriber_queues.get(callback)
+                if subscriber_queue is not None:
+                    subscriber_queue.put(event)
+                    continue
                 try:
                     callback(event)
                 except Exception as e:
                     # general error handling for the event callback
                     print(f"Error in event callback: {e}")
 
+    def wait_until_dispatched(self, timeout: Optional[float] = None) -> bool:
+        """Block until the asynchronous listeners have received every event emitted so far."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for subscriber_queue in list(self.__subscriber_queues.values()):
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not subscriber_queue.wait_until_empty(remaining):
+                return False
+        return True
+
+    def get_dispatch_statistics(self) -> List[dict]:
+        """Queue depth and lag of every asynchronous listener."""
+        return [
+            subscriber_queue.get_statistics()
+            for subscriber_queue in list(self.__subscriber_queues.values())
+        ]
+
+    def close(self):
+        """Stop the workers of the asynchronous listeners (after they deliver their pending events).
+        Later events are not delivered to them."""
+        for subscriber_queue in self.__subscriber_queues.values():
+            subscriber_queue.close()
+
     def emit_plant_simulation_event(
         self,
         event_type: PlantSimulationEventType,
         data: Dict[str, Any] = None,
+        timestamp: Optional[datetime] = None,
     ):
-        """Emit a plant simulation event."""
+        """Emit a plant simulation event.
+        The timestamp defaults to the simulation clock (or wall time when there is no clock);
+        machines pass their own simulated time so events line up with their data.
+        """
+        if timestamp is None:
+            timestamp = self.__clock.now() if self.__clock else datetime.now()
         event = PlantSimulationEvent(
             event_type=event_type,
-            timestamp=datetime.now().isoformat(),
+            timestamp=timestamp.isoformat(),
             data=data or {},
         )
         self.__emit(event)
@@ -0,0 +1,108 @@
+"""
+Designs of experiments over the machine parameters: which parameter values to evaluate.
+"""
+
+import itertools
+import math
+from dataclasses import dataclass, fields
+from typing import Optional
+import numpy as np
+from simulation.factory.FactoryStructure import (
+    FACTORY_LINES,
+    get_default_machine_parameters,
+)
+
+DESIGNS = ["grid", "random", "latin_hypercube"]
+
+
+@dataclass
+class Factor:
+    """
+    A machine parameter varied by an experiment.
+    Grid designs take its values; random and Latin hypercube designs sample in [low, high].
+    When a mixing ratio is varied, the solvent ratio takes up the remainder (unless it is a factor too).
+    """
+
+    line_type: str
+    stage: str
+    parameter: str
+    values: Optional[list[float]] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.line_type}.{self.stage}.{self.parameter}"
+
+    def validate(self, design: str):
+        if self.line_type not in FACTORY_LINES:
+            raise ValueError(f"Line type '{self.line_type}' is not found")
+        if self.stage not in FACTORY_LINES[self.line_type]:
+            raise ValueError(f"Machine '{self.stage}' is not found in '{self.line_type}'")
+        default_parameters = get_default_machine_parameters()[self.line_type][self.stage]
+        if self.parameter not in {field.name for field in fields(default_parameters)}:
+            raise ValueError(
+                f"Parameter '{self.parameter}' is not found in '{self.stage}'"
+            )
+        if design == "grid":
+            if not self.values:
+                raise ValueError(f"Factor '{self.name}' needs values for a grid design")
+        elif self.low is None or self.high is None or self.low > self.high:
+            raise ValueError(
+                f"Factor '{self.name}' needs a range (low <= high) for a {design} design"
+            )
+
+
+def count_design_points(
+    factors: list[Factor], design: str = "grid", n_samples: Optional[int] = None
+) -> int:
+    """Number of runs of the design, without creating its points (to bound an experiment before
+    allocating them): the product of the numbers of values of a grid, n_samples otherwise."""
+    if design == "grid":
+        return math.prod(len(factor.values or []) for factor in factors)
+    return n_samples or 0
+
+
+def create_design_points(
+    factors: list[Factor],
+    design: str = "grid",
+    n_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> list[dict[str, float]]:
+    """Parameter values of every run of the experiment, keyed by factor name.
+    Args:
+        design: "grid" (every combination of the values), "random" (uniform samples) or
+            "latin_hypercube" (one sample in each of n_samples equal strata of every factor)
+        n_samples: number of runs of the random and Latin hypercube designs
+    """
+    if design not in DESIGNS:
+        raise ValueError(f"Design '{design}' is not found")
+    if not factors:
+        raise ValueError("An experiment needs at least one factor")
+    for factor in factors:
+        factor.validate(design)
+    names = [factor.name for factor in factors]
+    if len(set(names)) != len(names):
+        raise ValueError("Each parameter can only be varied by one factor")
+
+    if design == "grid":
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*(factor.values for factor in factors))
+        ]
+
+    if n_samples is None or n_samples < 1:
+        raise ValueError(f"A {design} design needs a number of samples of at least 1")
+    generator = np.random.default_rng(seed)
+    if design == "random":
+        unit_samples = generator.random((n_samples, len(factors)))
+    else:
+        # a random point in each stratum, strata shuffled independently for every factor
+        strata = np.column_stack(
+            [generator.permutation(n_samples) for _ in factors]
+        )
+        unit_samples = (strata + generator.random((n_samples, len(factors)))) / n_samples
+    lows = np.array([factor.low for factor in factors], dtype=float)
+    highs = np.array([factor.high for factor in factors], dtype=float)
+    samples = lows + unit_samples * (highs - lows)
+    return [dict(zip(names, row.tolist())) for row in samples]
@@ -0,0 +1,213 @@
+"""
+Parameter sweeps over the full process chain (mixing -> ... -> aging).
+Every run of the design is evaluated by the Monte Carlo engine, with its own unthrottled machines,
+so the live plant's machines and locks are never involved. Runs are fanned out across cores.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Optional
+import numpy as np
+from simulation.experiments.ExperimentDesign import Factor, create_design_points
+from simulation.factory.FactoryStructure import get_default_machine_parameters
+from simulation.machine import StageOutputCache
+from simulation.monte_carlo import MonteCarloSimulation
+
+# column of the overall verdict of a run
+PASS_RATE_COLUMN = "pass_rate"
+ERROR_COLUMN = "error"
+
+# outputs of the deterministic stages already evaluated by this process (one cache per worker):
+# runs that only differ by late-stage parameters reuse the upstream stages
+_stage_cache = StageOutputCache(max_entries=1024)
+
+
+class SweepResult:
+    """Columnar table of the runs: one column per factor, per final property and per stage verdict."""
+
+    def __init__(self, columns: dict[str, list], elapsed_seconds: float):
+        # column name -> one value per run ('line.stage.property', 'line.stage.pass_rate', ...)
+        self.columns = columns
+        self.elapsed_seconds = elapsed_seconds
+
+    @property
+    def n_runs(self) -> int:
+        return len(self.columns[PASS_RATE_COLUMN])
+
+    def get_column(self, name: str) -> np.ndarray:
+        """Values of a column as an array (NaN for runs that failed)."""
+        return np.array(
+            [np.nan if value is None else value for value in self.columns[name]],
+            dtype=float,
+        )
+
+    def get_rows(self) -> list[dict]:
+        return [
+            {name: values[index] for name, values in self.columns.items()}
+            for index in range(self.n_runs)
+        ]
+
+    def get_summary(self) -> dict:
+        """JSON-friendly report of the sweep."""
+        return {
+            "n_runs": self.n_runs,
+            "elapsed_seconds": round(self.elapsed_seconds, 4),
+            "columns": self.columns,
+        }
+
+
+def evaluate_design_point(
+    point: dict[str, float], replicates: int, seed: Optional[int], use_stage_cache: bool
+) -> dict:
+    """Runs the chain with the parameter values of a design point (in a worker process).
+    Returns one row: the mean of every final property and the pass rates over the replicates.
+    """
+    row: dict = {ERROR_COLUMN: None}
+    machine_parameters = {}
+    default_parameters = get_default_machine_parameters()
+    for name, value in point.items():
+        line_type, stage, parameter = name.split(".")
+        stage_parameters = machine_parameters.setdefault(line_type, {}).get(
+            stage, default_parameters[line_type][stage]
+        )
+        machine_parameters[line_type][stage] = replace(
+            stage_parameters, **{parameter: value}
+        )
+    for line_type, stage_parameters in machine_parameters.items():
+        mixing_parameters = stage_parameters.get("mixing")
+        if mixing_parameters is not None and f"{line_type}.mixing.solvent_ratio" not in point:
+            # the material ratios must add up to 1: the solvent takes up the remainder
+            stage_parameters["mixing"] = replace(
+                mixing_parameters,
+                solvent_ratio=1
+                - mixing_parameters.AM_ratio
+                - mixing_parameters.CA_ratio
+                - mixing_parameters.PVDF_ratio,
+            )
+    try:
+        for stage_parameters in machine_parameters.values():
+            for parameters in stage_parameters.values():
+                parameters.validate_parameters()
+        result = MonteCarloSimulation(
+            n_batches=replicates,
+            machine_parameters=machine_parameters,
+            seed=seed,
+            stage_cache=_stage_cache if use_stage_cache else None,
+        ).run()
+    except ValueError as e:
+        # invalid combination of parameters: the run is kept in the table with its error
+        row[ERROR_COLUMN] = str(e)
+        row[PASS_RATE_COLUMN] = None
+        return row
+
+    row[PASS_RATE_COLUMN] = result.pass_rate
+    stage_pass_rates = result.get_stage_pass_rates()
+    for line_type, line_properties in result.stage_properties.items():
+        for stage, properties in line_properties.items():
+            for property_name, value in properties.items():
+                row[f"{line_type}.{stage}.{property_name}"] = _to_number(
+                    np.mean(value)
+                )
+            row[f"{line_type}.{stage}.{PASS_RATE_COLUMN}"] = stage_pass_rates[
+                line_type
+            ][stage]
+    return row
+
+
+def _to_number(value) -> Optional[float]:
+    value = float(value)
+    # NaN and infinity are not valid JSON
+    return value if math.isfinite(value) else None
+
+
+class ParameterSweep:
+    """
+    Design of experiments over the machine parameters.
+
+    Args:
+        factors (list[Factor]): The varied parameters (others keep their default values)
+        design (str): "grid", "random" or "latin_hypercube"
+        n_samples (int): Number of runs of the random and Latin hypercube designs
+        replicates (int): Virtual batches per run (the model noise is drawn per batch)
+        seed (int): Optional seed of the design sampling and of the runs. Every run uses the same seed
+            (common random numbers): runs only differ by their factors, and the stages upstream of the
+            varied parameters are served from the stage-output cache
+        max_workers (int): Worker processes (defaults to the number of cores; 1 runs in this process)
+        use_stage_cache (bool): Whether the workers reuse the outputs of repeated deterministic stages
+    """
+
+    def __init__(
+        self,
+        factors: list[Factor],
+        design: str = "grid",
+        n_samples: Optional[int] = None,
+        replicates: int = 1,
+        seed: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        use_stage_cache: bool = True,
+    ):
+        if replicates < 1:
+            raise ValueError("The number of replicates must be at least 1")
+        self.factors = factors
+        self.design = design
+        self.replicates = replicates
+        self.seed = seed
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_stage_cache = use_stage_cache
+        # validates the factors
+        self.design_points = create_design_points(factors, design, n_samples, seed)
+
+    def run(self) -> SweepResult:
+        start_time = time.perf_counter()
+        n_runs = len(self.design_points)
+        seeds = [self.seed] * n_runs
+        replicates = [self.replicates] * n_runs
+        use_stage_cache = [self.use_stage_cache] * n_runs
+        if self.max_workers == 1 or n_runs == 1:
+            rows = list(
+                map(
+                    evaluate_design_point,
+                    self.design_points,
+                    replicates,
+                    seeds,
+                    use_stage_cache,
+                )
+            )
+        else:
+            # spawn: forking a process that runs threads (scheduler, server) is unsafe
+            with ProcessPoolExecutor(
+                max_workers=min(self.max_workers, n_runs),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                rows = list(
+                    executor.map(
+                        evaluate_design_point,
+                        self.design_points,
+                        replicates,
+                        seeds,
+                        use_stage_cache,
+                        chunksize=max(1, n_runs // (4 * self.max_workers)),
+                    )
+                )
+        return SweepResult(
+            self.__to_columns(rows), time.perf_counter() - start_time
+        )
+
+    def __to_columns(self, rows: list[dict]) -> dict[str, list]:
+        columns = {
+            factor.name: [point[factor.name] for point in self.design_points]
+            for factor in self.factors
+        }
+        # failed runs only have the error and the overall verdict: fill the other columns with None
+        output_names = []
+        for row in rows:
+            for name in row:
+                if name not in output_names and name not in columns:
+                    output_names.append(name)
+        for name in output_names:
+            columns[name] = [row.get(name) for row in rows]
+        return columns
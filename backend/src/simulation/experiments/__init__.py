@@ -0,0 +1,11 @@
+# Experiments package initialization
+from .ExperimentDesign import Factor, count_design_points, create_design_points
+from .ParameterSweep import ParameterSweep, SweepResult
+
+__all__ = [
+    'Factor',
+    'count_design_points',
+    'create_design_points',
+    'ParameterSweep',
+    'SweepResult',
+]
@@ -1,22 +1,60 @@
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
 from simulation.battery_model import (
     BaseModel,
     MixingModel,
     ElectrodeInspectionModel,
     RewindingModel,
 )
+from simulation.process_parameters import BaseMachineParameters
+
+
+@dataclass
+class StageSnapshot:
+    """State at a stage boundary: the model entering the stage and the parameters the stage ran with."""
+
+    # (model class name, attributes), see export_model_state
+    model_state: tuple[str, dict]
+    machine_parameters: BaseMachineParameters
+
+
+def create_stage_generator(seed: int, line_type: str, stage: str) -> np.random.Generator:
+    """Generator of a stage of a batch, spawned from the batch seed.
+    Each stage has its own independent stream, the same whatever the order (or the process)
+    the stages run in, so concurrent batches and stages never share a generator.
+    """
+    seed_sequence = np.random.SeedSequence(
+        seed, spawn_key=(zlib.crc32(line_type.encode()), zlib.crc32(stage.encode()))
+    )
+    return np.random.default_rng(seed_sequence)
 
 
 class Batch:
-    def __init__(self, batch_id: str):
+    def __init__(self, batch_id: str, seed: Optional[int] = None):
         self.batch_id = batch_id
+        # seed of every random draw of the batch: the same seed reproduces the batch
+        self.seed = (
+            seed
+            if seed is not None
+            else int(np.random.SeedSequence().generate_state(1)[0])
+        )
         # Initialise the models
-        self.__anode_line_model: BaseModel = MixingModel("Anode")  #
-        self.__cathode_line_model: BaseModel = MixingModel("Cathode")  #
+        self.__anode_line_model: BaseModel = MixingModel(
+            "Anode", rng=self.get_random_generator("anode", "materials")
+        )
+        self.__cathode_line_model: BaseModel = MixingModel(
+            "Cathode", rng=self.get_random_generator("cathode", "materials")
+        )
         self.__cell_line_model = None
+        # (line type, stage) -> snapshot taken when the stage started, to recompute the downstream stages
+        self.__stage_snapshots: dict[tuple[str, str], StageSnapshot] = {}
 
     def get_batch_state(self):
         return {
             "batch_id": self.batch_id,
+            "seed": self.seed,
             "current_anode_line_model": self.__anode_line_model.get_properties(),
             "current_cathode_line_model": self.__cathode_line_model.get_properties(),
             "current_cell_line_model": (
@@ -26,6 +64,9 @@ class Batch:
             ),
         }
 
+    def get_random_generator(self, line_type: str, stage: str) -> np.random.Generator:
+        return create_stage_generator(self.seed, line_type, stage)
+
     def assemble_cell_line_model(self):
         assert isinstance(
             self.__anode_line_model, ElectrodeInspectionModel
@@ -56,3 +97,19 @@ class Batch:
             self.__cell_line_model = model
         else:
             raise ValueError("line_type not found")
+
+    def record_stage_snapshot(
+        self, line_type: str, machine_id: str, snapshot: StageSnapshot
+    ):
+        self.__stage_snapshots[(line_type, machine_id)] = snapshot
+
+    def get_stage_snapshot(self, line_type: str, machine_id: str) -> StageSnapshot:
+        """Snapshot of a stage the batch went through, throws if the stage has not started yet."""
+        if (line_type, machine_id) not in self.__stage_snapshots:
+            raise ValueError(
+                f"Batch {self.batch_id} has no snapshot of '{machine_id}' in '{line_type}'"
+            )
+        return self.__stage_snapshots[(line_type, machine_id)]
+
+    def has_stage_snapshot(self, line_type: str, machine_id: str) -> bool:
+        return (line_type, machine_id) in self.__stage_snapshots
@@ -0,0 +1,179 @@
+from typing import Optional
+from simulation.machine import (
+    BaseMachine,
+    StageOutputCache,
+    MixingMachine,
+    CoatingMachine,
+    DryingMachine,
+    CalendaringMachine,
+    SlittingMachine,
+    ElectrodeInspectionMachine,
+    RewindingMachine,
+    ElectrolyteFillingMachine,
+    FormationCyclingMachine,
+    AgingMachine,
+)
+from simulation.process_parameters import (
+    BaseMachineParameters,
+    MixingParameters,
+    CoatingParameters,
+    DryingParameters,
+    CalendaringParameters,
+    SlittingParameters,
+    ElectrodeInspectionParameters,
+    RewindingParameters,
+    ElectrolyteFillingParameters,
+    FormationCyclingParameters,
+    AgingParameters,
+)
+from simulation.clock import SimulationClock
+from simulation.event_bus.events import EventBus
+
+# stages of each production line, in processing order (hardcoded design of the factory)
+FACTORY_LINES = {
+    "anode": ["mixing", "coating", "drying", "calendaring", "slitting", "inspection"],
+    "cathode": ["mixing", "coating", "drying", "calendaring", "slitting", "inspection"],
+    "cell": ["rewinding", "electrolyte_filling", "formation_cycling", "aging"],
+}
+
+# machine class of each stage and the name of its parameters argument
+MACHINE_TYPES = {
+    "mixing": (MixingMachine, "mixing_parameters"),
+    "coating": (CoatingMachine, "coating_parameters"),
+    "drying": (DryingMachine, "drying_parameters"),
+    "calendaring": (CalendaringMachine, "calendaring_parameters"),
+    "slitting": (SlittingMachine, "slitting_parameters"),
+    "inspection": (ElectrodeInspectionMachine, "electrode_inspection_parameters"),
+    "rewinding": (RewindingMachine, "rewinding_parameters"),
+    "electrolyte_filling": (
+        ElectrolyteFillingMachine,
+        "electrolyte_filling_parameters",
+    ),
+    "formation_cycling": (FormationCyclingMachine, "formation_cycling_parameters"),
+    "aging": (AgingMachine, "aging_parameters"),
+}
+
+
+def get_default_machine_parameters() -> dict[str, dict[str, BaseMachineParameters]]:
+    """Default parameters of every machine, keyed by line type then stage."""
+    default_mixing_parameters_anode = MixingParameters(
+        AM_ratio=0.495, CA_ratio=0.045, PVDF_ratio=0.05, solvent_ratio=0.41
+    )
+    default_mixing_parameters_cathode = MixingParameters(
+        AM_ratio=0.513, CA_ratio=0.039, PVDF_ratio=0.098, solvent_ratio=0.35
+    )
+    default_coating_parameters = CoatingParameters(
+        coating_speed=0.05, gap_height=200e-6, flow_rate=5e-6, coating_width=0.5
+    )
+    default_drying_parameters = DryingParameters(web_speed=0.05)
+    default_calendaring_parameters = CalendaringParameters(
+        roll_gap=100e-6,
+        roll_pressure=5e6,
+        temperature=80,
+        roll_speed=0.1,
+        dry_thickness=100e-6,
+        initial_porosity=0.4,
+    )
+    default_slitting_parameters = SlittingParameters(
+        blade_sharpness=1.0,
+        slitting_speed=0.1,
+        target_width=0.5,
+        slitting_tension=50.0,
+    )
+    default_electrode_inspection_parameters = ElectrodeInspectionParameters(
+        epsilon_width_max=0.1,
+        epsilon_thickness_max=10e-6,
+        B_max=2.0,
+        D_surface_max=3,
+    )
+    default_rewinding_parameters = RewindingParameters(
+        rewinding_speed=0.5,
+        initial_tension=100.0,
+        tapering_steps=0.3,
+        environment_humidity=30.0,
+    )
+    default_electrolyte_filling_parameters = ElectrolyteFillingParameters(
+        vacuum_level=100,
+        vacuum_filling=60,
+        soaking_time=10,
+    )
+    default_formation_cycling_parameters = FormationCyclingParameters(
+        charge_current_A=0.05, charge_voltage_limit_V=4.2, initial_voltage=1
+    )
+    default_aging_parameters = AgingParameters(
+        k_leak=1e-8, temperature=25, aging_time_days=10
+    )
+    machine_parameters = {}
+    for electrode_type in ["anode", "cathode"]:
+        machine_parameters[electrode_type] = {
+            "mixing": (
+                default_mixing_parameters_anode
+                if electrode_type == "anode"
+                else default_mixing_parameters_cathode
+            ),
+            "coating": default_coating_parameters,
+            "drying": default_drying_parameters,
+            "calendaring": default_calendaring_parameters,
+            "slitting": default_slitting_parameters,
+            "inspection": default_electrode_inspection_parameters,
+        }
+    machine_parameters["cell"] = {
+        "rewinding": default_rewinding_parameters,
+        "electrolyte_filling": default_electrolyte_filling_parameters,
+        "formation_cycling": default_formation_cycling_parameters,
+        "aging": default_aging_parameters,
+    }
+    return machine_parameters
+
+
+def create_machine(
+    line_type: str,
+    machine_id: str,
+    machine_parameters: BaseMachineParameters,
+    event_bus: Optional[EventBus] = None,
+    clock: Optional[SimulationClock] = None,
+) -> BaseMachine:
+    """Create the machine of a stage, named '<stage>_<line type>' like the plant machines."""
+    if line_type not in FACTORY_LINES:
+        raise ValueError(f"Line type '{line_type}' is not found")
+    if machine_id not in FACTORY_LINES[line_type]:
+        raise ValueError(f"Machine '{machine_id}' is not found")
+    machine_class, parameters_argument = MACHINE_TYPES[machine_id]
+    return machine_class(
+        process_name=f"{machine_id}_{line_type}",
+        event_bus=event_bus,
+        clock=clock,
+        **{parameters_argument: machine_parameters},
+    )
+
+
+def create_factory_structure(
+    event_bus: Optional[EventBus] = None,
+    clock: Optional[SimulationClock] = None,
+    machine_parameters: Optional[dict] = None,
+    stage_cache: Optional[StageOutputCache] = None,
+) -> dict[str, dict[str, BaseMachine]]:
+    """Create every machine of the factory, keyed by line type then stage.
+    Args:
+        machine_parameters: optional overrides, keyed by line type then stage; other machines use the defaults.
+        stage_cache: optional stage-output cache shared by every machine (used with unthrottled clocks).
+    """
+    parameters = get_default_machine_parameters()
+    for line_type, stage_parameters in (machine_parameters or {}).items():
+        for machine_id, stage_parameter in stage_parameters.items():
+            if line_type not in parameters or machine_id not in parameters[line_type]:
+                raise ValueError(f"Machine '{machine_id}' is not found in '{line_type}'")
+            parameters[line_type][machine_id] = stage_parameter
+    factory_structure = {
+        line_type: {
+            machine_id: create_machine(
+                line_type, machine_id, parameters[line_type][machine_id], event_bus, clock
+            )
+            for machine_id in stages
+        }
+        for line_type, stages in FACTORY_LINES.items()
+    }
+    for line_machines in factory_structure.values():
+        for machine in line_machines.values():
+            machine.stage_cache = stage_cache
+    return factory_structure
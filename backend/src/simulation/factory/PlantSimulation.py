@@ -1,31 +1,19 @@
-from threading import Condition, Event, Thread, Lock
-from typing import Callable, Optional
+import asyncio
+import math
+from threading import Condition, Event, RLock
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import Callable, Optional, Union
 import uuid
-from simulation.machine import (
-    MixingMachine,
-    CoatingMachine,
-    DryingMachine,
-    CalendaringMachine,
-    SlittingMachine,
-    ElectrodeInspectionMachine,
-    RewindingMachine,
-    ElectrolyteFillingMachine,
-    FormationCyclingMachine,
-    AgingMachine,
-)
-from simulation.process_parameters import (
-    MixingParameters,
-    CoatingParameters,
-    DryingParameters,
-    CalendaringParameters,
-    SlittingParameters,
-    ElectrodeInspectionParameters,
-    RewindingParameters,
-    ElectrolyteFillingParameters,
-    FormationCyclingParameters,
-    AgingParameters,
-)
-from simulation.factory.Batch import Batch
+from simulation.battery_model import export_model_state
+from simulation.factory.Batch import Batch, StageSnapshot
+from simulation.factory.FactoryStructure import FACTORY_LINES, create_factory_structure
+from simulation.factory.StageRecomputation import recompute_from_stage
+from simulation.clock import SimulationClock, RealTimeClock
+from simulation.machine import BaseMachine, StageOutputCache
+from simulation.process_parameters import BaseMachineParameters
+from simulation.scheduler import DiscreteEventScheduler, SimulationResource
+from simulation.event_bus.dispatch import AsyncDispatch
 from simulation.event_bus.events import (
     EventBus,
     PlantSimulationEvent,
@@ -33,191 +21,116 @@ from simulation.event_bus.events import (
 )
 
 
+class BatchQueueFullError(ValueError):
+    """
+    Raised when a batch is submitted while the queue of batch requests is full.
+    retry_after is an estimate of the wall-clock seconds until a place frees up in the queue.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class PlantSimulation:
     """
     This class is the main class for the plant simulation.
     It is responsible for the overall simulation of the plant.
+    The pipeline runs on a single-threaded discrete-event scheduler: machine steps and batch
+    transitions are timed events and machines are resources, so queued batches hold no OS thread.
+
+    Execution modes:
+        "scheduler": the plant's machines run every batch in this process (default).
+        "process_batch" / "process_line": each batch (or each line of a batch) is computed in a worker
+            process with its own copy of the machines (using the plant's current parameters); up to
+            max_workers batches run at once and their events are replayed here at their simulated times.
     """
 
-    def __init__(self, listeners: list[Callable[[PlantSimulationEvent], None]] = None):
+    EXECUTION_MODES = ["scheduler", "process_batch", "process_line"]
+
+    def __init__(
+        self,
+        listeners: list[Callable[[PlantSimulationEvent], None]] = None,
+        clock: Optional[SimulationClock] = None,
+        max_queued_batches: int = 3,
+        execution_mode: str = "scheduler",
+        max_workers: Optional[int] = None,
+        max_completed_batches: int = 100,
+    ):
+        if max_queued_batches < 1:
+            raise ValueError("The maximum number of queued batches must be at least 1")
+        if execution_mode not in self.EXECUTION_MODES:
+            raise ValueError(f"Execution mode '{execution_mode}' is not found")
         # Callables: regular function, method, lambda, functor object, taking an argument - PlantSimulation event
+        # the clock shared by every machine: paces the steps and stamps all data/events with simulated time.
+        # defaults to real time (historical behaviour); use ScaledClock or UnthrottledClock for faster runs.
+        self.__clock = clock or RealTimeClock()
         # array of batches requests (to be processed). PROTECTED by pipeline_condition.
         self.__batch_request_list: list[Batch] = []
+        # capacity of the batch request queue: submissions beyond it are rejected or wait for a place
+        self.__max_queued_batches = max_queued_batches
+        # futures of the asynchronous submissions waiting for a place in the queue. PROTECTED by pipeline_condition.
+        self.__queue_space_waiters: list[asyncio.Future] = []
         # array of batches that are CURRENTLY BEING processed. PROTECTED by pipeline_condition.
         self.__running_batch_list: list[Batch] = []
-        # track worker threads handling batch requests so we can await graceful shutdowns.
-        # [str, Thread]: str refers to the batch id, Thread refers to the processing thread.
+        # most recently completed batches, kept (with their stage snapshots) for what-if recomputations.
         # PROTECTED by pipeline_condition.
-        self.__batch_worker_thread_list: dict[str, Thread] = {}
-        # structure of the factory (to be used to create the machines) - hardcoded design.
-        self.__factory_structure = {
-            "anode": {
-                "mixing": None,
-                "coating": None,
-                "drying": None,
-                "calendaring": None,
-                "slitting": None,
-                "inspection": None,
-            },
-            "cathode": {
-                "mixing": None,
-                "coating": None,
-                "drying": None,
-                "calendaring": None,
-                "slitting": None,
-                "inspection": None,
-            },
-            "cell": {
-                "rewinding": None,
-                "electrolyte_filling": None,
-                "formation_cycling": None,
-                "aging": None,
-            },
-        }
+        self.__completed_batches: OrderedDict[str, Batch] = OrderedDict()
+        self.__max_completed_batches = max_completed_batches
+        # reuses the unchanged stages of repeated what-if recomputations
+        self.__recomputation_stage_cache = StageOutputCache()
+        # structure of the factory: line type -> stage -> machine (created from the hardcoded design).
+        self.__factory_structure = {}
         # the event bus for different components to interface with the other components.
-        self.__event_bus = EventBus()
+        self.__event_bus = EventBus(clock=self.__clock)
         # track the active batch associated with each machine
         self.__machine_batch_context: dict[str, str] = {}
-        # runner thread management for background processing loop
-        self.__runner_thread_lock = Lock()
-        # this object can be None. This thread is a monitoring thread to keep track of all batch threads,
-        # making sure the batch threads run with some sort of parent threads.
-        self.__runner_thread: Optional[Thread] = None
-        #
         self.__plant_is_idle_event = Event()
         # initially, no batch so that's why it is set
         self.__plant_is_idle_event.set()
-        """ 
-            Condition object: initialises a shared Condition used in __process_batch_request 
-            to block batch-worker threads until they reach the queue front and both mixing machines are idle, 
-            and to wake waiting workers when slots free up.
-            This object also prevents concurrent accesses to the batch_requests, running_batches, and batch_worker_threads.
         """
-        self.__access_pipeline_condition = Condition()
+            Condition object: held by the scheduler while it runs an event, and by the public methods,
+            so the batch_requests, running_batches and machines are never seen half-updated.
+            Re-entrant because event callbacks (running on the scheduler thread) may call back into the plant.
+        """
+        self.__access_pipeline_condition = Condition(RLock())
+        # single thread running every batch: a priority queue of timed events paced by the clock.
+        self.__scheduler = DiscreteEventScheduler(
+            self.__clock,
+            self.__access_pipeline_condition,
+            name="PlantSimulationScheduler",
+        )
         # better than check the states of the mixing machines, which might entail some delays.
         self.__pipeline_is_ready = True
+        # simulated time at which the mixing machines are expected to be free (estimate for the queue wait)
+        self.__pipeline_ready_time: Optional[datetime] = None
         # initialise the factory structure with the default machines
         self.__initialise_default_factory_structure()
-        # machine-level locks to ensure only one batch uses a machine at a time
-        self.__machine_lock_structure = {
-            line_type: {stage: Lock() for stage in self.__factory_structure[line_type]}
-            for line_type in self.__factory_structure
-        }
+        # worker processes computing the batches (process execution modes only)
+        self.__process_pool_runner = None
+        if execution_mode != "scheduler":
+            # imported here: the process pool module builds on the factory package
+            from simulation.process_pool import ProcessPoolRunner
+
+            self.__process_pool_runner = ProcessPoolRunner(
+                max_workers=max_workers, per_line=execution_mode == "process_line"
+            )
         # FOR TESTING ONLY
         self.auto_generated_batch_id = 1
 
     def __initialise_default_factory_structure(self):
-        # initialise the default parameters
-        default_mixing_parameters_anode = MixingParameters(
-            AM_ratio=0.495, CA_ratio=0.045, PVDF_ratio=0.05, solvent_ratio=0.41
-        )
-        default_mixing_parameters_cathode = MixingParameters(
-            AM_ratio=0.513, CA_ratio=0.039, PVDF_ratio=0.098, solvent_ratio=0.35
-        )
-        default_coating_parameters = CoatingParameters(
-            coating_speed=0.05, gap_height=200e-6, flow_rate=5e-6, coating_width=0.5
-        )
-        default_drying_parameters = DryingParameters(web_speed=0.05)
-        default_calendaring_parameters = CalendaringParameters(
-            roll_gap=100e-6,
-            roll_pressure=5e6,
-            temperature=80,
-            roll_speed=0.1,
-            dry_thickness=100e-6,
-            initial_porosity=0.4,
-        )
-        default_slitting_parameters = SlittingParameters(
-            blade_sharpness=1.0,
-            slitting_speed=0.1,
-            target_width=0.5,
-            slitting_tension=50.0,
-        )
-        default_electrode_inspection_parameters = ElectrodeInspectionParameters(
-            epsilon_width_max=0.1,
-            epsilon_thickness_max=10e-6,
-            B_max=2.0,
-            D_surface_max=3,
-        )
-        default_rewinding_parameters = RewindingParameters(
-            rewinding_speed=0.5,
-            initial_tension=100.0,
-            tapering_steps=0.3,
-            environment_humidity=30.0,
-        )
-        default_electrolyte_filling_parameters = ElectrolyteFillingParameters(
-            vacuum_level=100,
-            vacuum_filling=60,
-            soaking_time=10,
-        )
-        default_formation_cycling_parameters = FormationCyclingParameters(
-            charge_current_A=0.05, charge_voltage_limit_V=4.2, initial_voltage=1
-        )
-        default_aging_parameters = AgingParameters(
-            k_leak=1e-8, temperature=25, aging_time_days=10
-        )
-        # Create and append machines to anode & cathode lines
-        for electrode_type in ["anode", "cathode"]:
-            self.__factory_structure[electrode_type]["mixing"] = MixingMachine(
-                process_name=f"mixing_{electrode_type}",
-                mixing_parameters=(
-                    default_mixing_parameters_anode
-                    if electrode_type == "anode"
-                    else default_mixing_parameters_cathode
-                ),
-                event_bus=self.__event_bus,
-            )
-            self.__factory_structure[electrode_type]["coating"] = CoatingMachine(
-                process_name=f"coating_{electrode_type}",
-                coating_parameters=default_coating_parameters,
-                event_bus=self.__event_bus,
-            )
-            self.__factory_structure[electrode_type]["drying"] = DryingMachine(
-                process_name=f"drying_{electrode_type}",
-                drying_parameters=default_drying_parameters,
-                event_bus=self.__event_bus,
-            )
-            self.__factory_structure[electrode_type]["calendaring"] = (
-                CalendaringMachine(
-                    process_name=f"calendaring_{electrode_type}",
-                    calendaring_parameters=default_calendaring_parameters,
-                    event_bus=self.__event_bus,
-                )
-            )
-            self.__factory_structure[electrode_type]["slitting"] = SlittingMachine(
-                process_name=f"slitting_{electrode_type}",
-                slitting_parameters=default_slitting_parameters,
-                event_bus=self.__event_bus,
-            )
-            self.__factory_structure[electrode_type]["inspection"] = (
-                ElectrodeInspectionMachine(
-                    process_name=f"inspection_{electrode_type}",
-                    electrode_inspection_parameters=default_electrode_inspection_parameters,
-                    event_bus=self.__event_bus,
-                )
-            )
-        # Create and append cell line machines
-        self.__factory_structure["cell"]["rewinding"] = RewindingMachine(
-            process_name="rewinding_cell",
-            rewinding_parameters=default_rewinding_parameters,
-            event_bus=self.__event_bus,
-        )
-        self.__factory_structure["cell"]["electrolyte_filling"] = (
-            ElectrolyteFillingMachine(
-                process_name="electrolyte_filling_cell",
-                electrolyte_filling_parameters=default_electrolyte_filling_parameters,
-                event_bus=self.__event_bus,
-            )
-        )
-        self.__factory_structure["cell"]["formation_cycling"] = FormationCyclingMachine(
-            process_name="formation_cycling_cell",
-            formation_cycling_parameters=default_formation_cycling_parameters,
-            event_bus=self.__event_bus,
-        )
-        self.__factory_structure["cell"]["aging"] = AgingMachine(
-            process_name="aging_cell",
-            aging_parameters=default_aging_parameters,
-            event_bus=self.__event_bus,
+        # create every machine with its default parameters, sharing the plant's event bus and clock
+        self.__factory_structure = create_factory_structure(
+            event_bus=self.__event_bus, clock=self.__clock
         )
+        # machine-level resources to ensure only one batch uses a machine at a time (FIFO)
+        self.__machine_resource_structure = {
+            line_type: {
+                stage: SimulationResource(machine.process_name, self.__scheduler)
+                for stage, machine in self.__factory_structure[line_type].items()
+            }
+            for line_type in self.__factory_structure
+        }
 
     def __attach_batch_context(self, event: PlantSimulationEvent):
         """Include batch information on machine events before dispatch."""
@@ -242,49 +155,265 @@ class PlantSimulation:
         else:
             return self.__factory_structure[line_type][machine_id]
 
-    def __get_machine_lock(self, line_type: str, machine_id: str):
+    def __get_machine_resource(self, line_type: str, machine_id: str):
         if line_type not in self.__factory_structure:
             raise ValueError(f"Line type '{line_type}' is not found")
         elif machine_id not in self.__factory_structure[line_type]:
             raise ValueError(f"Machine '{machine_id}' is not found")
         else:
-            return self.__machine_lock_structure[line_type][machine_id]
+            return self.__machine_resource_structure[line_type][machine_id]
 
     def __run_batch_on_machines(
         self,
         line_type: str,
         batch: Batch,
-        machine_list: Optional[list[str]],
+        machine_list: list[str],
+        on_completed: Callable[[], None],
+    ):
+        """runs the batch across a number of machines in order, then calls on_completed.
+        Each machine is requested as a resource, so the batch waits (as a queued callback) while the
+        previous batch is still using it. Fails if a machine is not found."""
+
+        def __run_next_machine(index: int):
+            if index == len(machine_list):
+                on_completed()
+                return
+            machine_id = machine_list[index]
+            self.__get_machine_resource(line_type, machine_id).request(
+                lambda: self.__run_batch_on_machine(
+                    line_type,
+                    machine_id,
+                    batch,
+                    lambda: __run_next_machine(index + 1),
+                )
+            )
+
+        __run_next_machine(0)
+
+    def __run_batch_on_machine(
+        self,
+        line_type: str,
+        machine_id: str,
+        batch: Batch,
+        on_completed: Callable[[], None],
+    ):
+        """Starts a machine (already acquired) on the batch. Its steps are scheduled as timed events;
+        the machine is released and on_completed is called once the stage is over."""
+        running_machine = self.__get_machine(line_type, machine_id)
+        # attach batch information into machine-batch context
+        machine_name = running_machine.process_name
+        self.__machine_batch_context[machine_name] = (
+            batch.batch_id
+        )  # attach the current batch id associated with the machine
+        # stage-boundary snapshot, to recompute the downstream stages with other parameters later
+        batch.record_stage_snapshot(
+            line_type,
+            machine_id,
+            StageSnapshot(
+                export_model_state(batch.get_batch_model(line_type)),
+                running_machine.machine_parameters,
+            ),
+        )
+        running_machine.receive_model_from_previous_process(
+            batch.get_batch_model(line_type)
+        )
+        running_machine.battery_model.rng = batch.get_random_generator(
+            line_type, machine_id
+        )
+        running_machine.begin_run(verbose=False, start_time=self.__scheduler.now())
+        finish_stage = lambda: self.__finish_batch_on_machine(
+            line_type, machine_id, batch, on_completed
+        )
+        if running_machine.can_skip_steps():
+            # nobody observes the steps: jump straight to the end of the stage
+            running_machine.skip_steps()
+            self.__scheduler.schedule(running_machine.simulated_time, finish_stage)
+        else:
+            self.__run_machine_step(running_machine, 0, finish_stage)
+
+    def __run_machine_step(
+        self, running_machine: BaseMachine, t: int, finish_stage: Callable[[], None]
+    ):
+        step_time = self.__scheduler.now()
+        running_machine.simulated_time = step_time
+        if not running_machine.run_step(t, verbose=False):
+            # the stage stopped early
+            finish_stage()
+            return
+        next_step_time = step_time + timedelta(
+            seconds=running_machine.pause_between_steps
+        )
+        if t + 1 < running_machine.total_steps:
+            self.__scheduler.schedule(
+                next_step_time,
+                self.__run_machine_step,
+                running_machine,
+                t + 1,
+                finish_stage,
+            )
+        else:
+            self.__scheduler.schedule(next_step_time, finish_stage)
+
+    def __finish_batch_on_machine(
+        self,
+        line_type: str,
+        machine_id: str,
+        batch: Batch,
+        on_completed: Callable[[], None],
+    ):
+        running_machine = self.__get_machine(line_type, machine_id)
+        running_machine.simulated_time = self.__scheduler.now()
+        try:
+            running_machine.end_run()
+        finally:
+            # remove batch information from machine-batch context
+            self.__machine_batch_context.pop(running_machine.process_name, None)
+        batch.update_batch_model(line_type, running_machine.empty_model())
+        self.__get_machine_resource(line_type, machine_id).release()
+        on_completed()
+
+    def __start_next_batch(self, verbose: bool = False):
+        """
+        Starts the batch at the front of the queue when the mixing machines are free.
+        Called (as an event) whenever a batch is requested and whenever the mixing machines become free.
+        """
+        if self.__process_pool_runner is not None:
+            self.__start_batches_in_process_pool(verbose)
+            return
+        if not self.__batch_request_list or not self.__pipeline_is_ready:
+            return
+        # get the first batch in the queue
+        batch = self.__batch_request_list.pop(0)
+        # append it to the running batches
+        self.__running_batch_list.append(batch)
+        # set the pipeline state to busy (mostly about the mixing machines being busy)
+        self.__pipeline_is_ready = False
+        self.__run_pipeline_on_batch(batch, verbose=verbose)
+        # a place is free in the queue: wake up the asynchronous submissions
+        self.__notify_queue_space_waiters()
+
+    def __start_batches_in_process_pool(self, verbose: bool = False):
+        """Hands the batches at the front of the queue to the worker processes, while a worker is free."""
+        started_batch = False
+        while (
+            self.__batch_request_list
+            and len(self.__running_batch_list) < self.__process_pool_runner.max_workers
+        ):
+            batch = self.__batch_request_list.pop(0)
+            self.__running_batch_list.append(batch)
+            started_batch = True
+            if verbose:
+                print(
+                    f"EMIT EVENT - BATCH_STARTED_PROCESSING: Batch processing started for batch {batch.batch_id}."
+                )
+            self.__event_bus.emit_plant_simulation_event(
+                PlantSimulationEventType.BATCH_STARTED_PROCESSING,
+                {"batch_id": batch.batch_id},
+            )
+            # only the events someone listens to are recorded by the workers
+            forwarded_event_types = frozenset(
+                event_type.value
+                for event_type in PlantSimulationEventType
+                if self.__event_bus.has_subscribers(event_type)
+            )
+            self.__process_pool_runner.run_batch(
+                batch.batch_id,
+                batch.seed,
+                {
+                    line_type: batch.get_batch_model(line_type)
+                    for line_type in ["anode", "cathode"]
+                },
+                self.__get_machine_parameters(),
+                self.__scheduler.now(),
+                forwarded_event_types,
+                on_result=lambda result, batch=batch: self.__on_worker_result(
+                    batch, result
+                ),
+                on_completed=lambda models, end_time, batch=batch: self.__scheduler.schedule(
+                    end_time, self.__finish_batch_in_process_pool, batch, models, verbose
+                ),
+                on_error=lambda error, batch=batch: self.__scheduler.schedule_now(
+                    self.__abort_batch_in_process_pool, batch, error, verbose
+                ),
+            )
+        if started_batch:
+            self.__notify_queue_space_waiters()
+
+    def __get_machine_parameters(self) -> dict:
+        return {
+            line_type: {
+                machine_id: machine.machine_parameters
+                for machine_id, machine in self.__factory_structure[line_type].items()
+            }
+            for line_type in self.__factory_structure
+        }
+
+    def __on_worker_result(self, batch: Batch, result):
+        """Called from the pool's thread: keeps the stage snapshots of the batch and emits the
+        events recorded by the worker at their simulated times."""
+        self.__scheduler.schedule_now(self.__record_stage_snapshots, batch, result)
+        for event_type_value, timestamp, data in result.events:
+            self.__scheduler.schedule(
+                timestamp,
+                self.__event_bus.emit_plant_simulation_event,
+                PlantSimulationEventType(event_type_value),
+                data,
+                timestamp,
+            )
+
+    @staticmethod
+    def __record_stage_snapshots(batch: Batch, result):
+        for (line_type, machine_id), snapshot in result.stage_snapshots.items():
+            batch.record_stage_snapshot(line_type, machine_id, snapshot)
+
+    def __finish_batch_in_process_pool(
+        self, batch: Batch, models: dict, verbose: bool = False
+    ):
+        for line_type, model in models.items():
+            batch.update_batch_model(line_type, model)
+        if verbose:
+            print(
+                f"EMIT EVENT - BATCH_COMPLETED: Finished pipeline processing for batch {batch.batch_id}"
+            )
+        if batch in self.__running_batch_list:
+            self.__running_batch_list.remove(batch)
+        self.__add_completed_batch(batch)
+        self.__event_bus.emit_plant_simulation_event(
+            PlantSimulationEventType.BATCH_COMPLETED,
+            {"batch_id": batch.batch_id, "batch_state": batch.get_batch_state()},
+        )
+        self.__update_plant_is_idle()
+        self.__start_next_batch(verbose)
+
+    def __abort_batch_in_process_pool(
+        self, batch: Batch, error: BaseException, verbose: bool = False
     ):
-        """runs the batch across a number of machines, fails
-        if the machine is not found or the machine list is not in the correct order"""
-        model = batch.get_batch_model(line_type)
-        for machine_id in machine_list:
-            running_machine = self.__get_machine(line_type, machine_id)
-            machine_lock = self.__get_machine_lock(line_type, machine_id)
-            with machine_lock:
-                # attach batch information into machine-batch context
-                machine_name = running_machine.process_name
-                self.__machine_batch_context[machine_name] = (
-                    batch.batch_id
-                )  # attach the current batch id associated with the machine
-                try:
-                    running_machine.receive_model_from_previous_process(model)
-                    running_machine.run_simulation(verbose=False)
-                finally:
-                    # remove batch information from machine-batch context
-                    self.__machine_batch_context.pop(machine_name, None)
-                model = running_machine.empty_model()
-                batch.update_batch_model(line_type, model)
+        # general error handling: a failing batch must not stop the plant
+        print(f"Error in worker process for batch {batch.batch_id}: {error!r}")
+        if batch in self.__running_batch_list:
+            self.__running_batch_list.remove(batch)
+        self.__update_plant_is_idle()
+        self.__start_next_batch(verbose)
+
+    def __notify_queue_space_waiters(self):
+        for future in self.__queue_space_waiters:
+            if not future.done():
+                future.get_loop().call_soon_threadsafe(self.__resolve_future, future)
+        self.__queue_space_waiters = []
+
+    @staticmethod
+    def __resolve_future(future: asyncio.Future):
+        # the submission may have been cancelled (e.g. timed out) in the meantime
+        if not future.done():
+            future.set_result(None)
 
     def __run_pipeline_on_batch(self, batch: Batch, verbose: bool = False):
         """
-        wraps the initial notification phase in the condition so that the subsequent notify_all() is legal
-        (Python requires the condition to be held when calling notify_all).
-        This wake-up lets any batch thread waiting in the queue re-check availability as soon as mixing finishes.
+        Runs the pipeline on a batch as a chain of events: each phase starts the next one from the
+        completion callback of its machines. Anode and cathode lines run concurrently in simulated time.
         """
 
-        def __notify_start_batch_processing(batch, verbose):
+        def __notify_start_batch_processing():
             # Batch started processing
             if verbose:
                 print(
@@ -296,71 +425,63 @@ class PlantSimulation:
                 {"batch_id": batch.batch_id},
             )
 
-        # NOTICE NOTICE NOTICE: CONDITION VARIABLE CHANGED HERE!
-        def __run_mixing_stages_on_batch(batch, verbose):
+        def __run_mixing_stages_on_batch():
             stages_to_run = ["mixing"]
-            # threads for concurrent-like simulation
-            run_anode_mixing_thread = Thread(
-                target=self.__run_batch_on_machines,
-                args=(
-                    "anode",
-                    batch,
-                    stages_to_run,
-                ),
-            )
-            run_cathode_mixing_thread = Thread(
-                target=self.__run_batch_on_machines,
-                args=(
-                    "cathode",
-                    batch,
-                    stages_to_run,
-                ),
-            )
+            lines_still_mixing = {"anode", "cathode"}
+
+            def __on_mixing_completed(line_type):
+                lines_still_mixing.discard(line_type)
+                if verbose:
+                    print(
+                        f"NO EMIT: {line_type.capitalize()} mixing processing finished for batch {batch.batch_id}."
+                    )
+                if lines_still_mixing:
+                    return
+                # the mixing machines are free: the next batch in the queue can start straight away
+                self.__pipeline_is_ready = True
+                self.__scheduler.schedule_now(self.__start_next_batch, verbose)
+                __run_remaining_stages_of_electrode_lines_on_batch()
+
             # Batch started processing anode
             if verbose:
                 print(
                     f"EMIT EVENT - BATCH_STARTED_ANODE_LINE: Anode processing started for batch {batch.batch_id}."
                 )
-            # start anode thread
-            run_anode_mixing_thread.start()
             # emit batch started processing anode event
             self.__event_bus.emit_plant_simulation_event(
                 PlantSimulationEventType.BATCH_STARTED_ANODE_LINE,
                 {"batch_id": batch.batch_id},
             )
+            self.__run_batch_on_machines(
+                "anode", batch, stages_to_run, lambda: __on_mixing_completed("anode")
+            )
             # Batch started processing cathode
             if verbose:
                 print(
                     f"EMIT EVENT - BATCH_STARTED_CATHODE_LINE: Cathode processing started for batch {batch.batch_id}. Emitting event."
                 )
-            # start cathode thread
-            run_cathode_mixing_thread.start()
             # emit batch started processing cathode event
             self.__event_bus.emit_plant_simulation_event(
                 PlantSimulationEventType.BATCH_STARTED_CATHODE_LINE,
                 {"batch_id": batch.batch_id},
             )
-            # Wait for anode & cathode processing finish
-            run_anode_mixing_thread.join()
-            if verbose:
-                print(
-                    f"NO EMIT: Anode mixing processing finished for batch {batch.batch_id}."
-                )
-            # no emit as still in anode processing
-            run_cathode_mixing_thread.join()
-            if verbose:
-                print(
-                    f"NO EMIT: Cathode mixing processing finished for batch {batch.batch_id}."
-                )
-            # no emit as still in anode processing
-            # This is necessary to allow other thread to be executed straight away when mixing machines are available
-            with self.__access_pipeline_condition:
-                self.__pipeline_is_ready = True
-                self.__access_pipeline_condition.notify_all()
+            self.__run_batch_on_machines(
+                "cathode",
+                batch,
+                stages_to_run,
+                lambda: __on_mixing_completed("cathode"),
+            )
+            # the mixing machines were free, so they started straight away
+            mixing_duration = max(
+                self.__get_machine(line_type, "mixing").total_steps
+                * self.__get_machine(line_type, "mixing").pause_between_steps
+                for line_type in ["anode", "cathode"]
+            )
+            self.__pipeline_ready_time = self.__scheduler.now() + timedelta(
+                seconds=mixing_duration
+            )
 
-        def __run_remaining_stages_of_electrode_lines_on_batch(
-            batch: Batch, verbose: bool
-        ):
+        def __run_remaining_stages_of_electrode_lines_on_batch():
             # Continue with the remaining electrode line stages in parallel
             stages_to_run = [
                 "coating",
@@ -369,43 +490,37 @@ class PlantSimulation:
                 "slitting",
                 "inspection",
             ]
-            # create threads for concurrent anode-cathode simulation
-            run_anode_thread = Thread(
-                target=self.__run_batch_on_machines,
-                args=("anode", batch, stages_to_run),
-            )
-            run_cathode_thread = Thread(
-                target=self.__run_batch_on_machines,
-                args=("cathode", batch, stages_to_run),
-            )
-            # run the remaining stages
-            run_anode_thread.start()
-            run_cathode_thread.start()
-            # finish anode processing
-            run_anode_thread.join()
-            # logging
-            if verbose:
-                print(
-                    f"EMIT EVENT - BATCH_COMPLETED_ANODE_LINE: Anode processing done for batch {batch.batch_id}."
+            lines_still_running = {"anode", "cathode"}
+            completed_event_types = {
+                "anode": PlantSimulationEventType.BATCH_COMPLETED_ANODE_LINE,
+                "cathode": PlantSimulationEventType.BATCH_COMPLETED_CATHODE_LINE,
+            }
+
+            def __on_line_completed(line_type):
+                lines_still_running.discard(line_type)
+                # logging
+                if verbose:
+                    print(
+                        f"EMIT EVENT - {completed_event_types[line_type].name}: {line_type.capitalize()} processing done for batch {batch.batch_id}."
+                    )
+                # emit event - finish anode/cathode processing
+                self.__event_bus.emit_plant_simulation_event(
+                    completed_event_types[line_type],
+                    {"batch_id": batch.batch_id},
                 )
-            # emit event - finish anode processing
-            self.__event_bus.emit_plant_simulation_event(
-                PlantSimulationEventType.BATCH_COMPLETED_ANODE_LINE,
-                {"batch_id": batch.batch_id},
-            )
-            run_cathode_thread.join()
-            # logging
-            if verbose:
-                print(
-                    f"EMIT EVENT - BATCH_COMPLETED_CATHODE_LINE: Cathode processing done for batch {batch.batch_id}."
+                if not lines_still_running:
+                    __assemble_batch_to_cell()
+                    __run_cell_line_on_batch()
+
+            for line_type in ["anode", "cathode"]:
+                self.__run_batch_on_machines(
+                    line_type,
+                    batch,
+                    stages_to_run,
+                    lambda line_type=line_type: __on_line_completed(line_type),
                 )
-            # emit event - finish cathode processing
-            self.__event_bus.emit_plant_simulation_event(
-                PlantSimulationEventType.BATCH_COMPLETED_CATHODE_LINE,
-                {"batch_id": batch.batch_id},
-            )
 
-        def __assemble_batch_to_cell(batch, verbose):
+        def __assemble_batch_to_cell():
             # assemble anode-cathode
             batch.assemble_cell_line_model()
             if verbose:
@@ -417,13 +532,8 @@ class PlantSimulation:
                 PlantSimulationEventType.BATCH_ASSEMBLED, {"batch_id": batch.batch_id}
             )
 
-        def __run_cell_line_on_batch(batch, verbose):
-            stages_to_run = [
-                "rewinding",
-                "electrolyte_filling",
-                "formation_cycling",
-                "aging",
-            ]
+        def __run_cell_line_on_batch():
+            stages_to_run = FACTORY_LINES["cell"]
             # Batch started processing cell line
             if verbose:
                 print(
@@ -434,7 +544,11 @@ class PlantSimulation:
                 PlantSimulationEventType.BATCH_STARTED_CELL_LINE,
                 {"batch_id": batch.batch_id},
             )
-            self.__run_batch_on_machines("cell", batch, stages_to_run)
+            self.__run_batch_on_machines(
+                "cell", batch, stages_to_run, __on_cell_line_completed
+            )
+
+        def __on_cell_line_completed():
             # Batch finished processing cell line
             if verbose:
                 print(
@@ -445,172 +559,168 @@ class PlantSimulation:
                 PlantSimulationEventType.BATCH_COMPLETED_CELL_LINE,
                 {"batch_id": batch.batch_id},
             )
+            __notify_finish_batch_processing()
 
-        def __notify_finish_batch_processing(batch, verbose):
+        def __notify_finish_batch_processing():
             # Batch finished whole pipeline
             if verbose:
                 print(
                     f"EMIT EVENT - BATCH_COMPLETED: Finished pipeline processing for batch {batch.batch_id}"
                 )
-            # Emit event - finish batch processing
+            if batch in self.__running_batch_list:
+                self.__running_batch_list.remove(batch)
+            self.__add_completed_batch(batch)
+            # Emit event - finish batch processing, with the final models and seed of the batch:
+            # the subscribers must not call back into the plant from their dispatch threads
             self.__event_bus.emit_plant_simulation_event(
-                PlantSimulationEventType.BATCH_COMPLETED, {"batch_id": batch.batch_id}
+                PlantSimulationEventType.BATCH_COMPLETED,
+                {"batch_id": batch.batch_id, "batch_state": batch.get_batch_state()},
             )
+            self.__update_plant_is_idle()
 
         """
         INFO: Main simulation logic here!!!
         """
-        __notify_start_batch_processing(batch, verbose)
-        __run_mixing_stages_on_batch(batch, verbose)
-        __run_remaining_stages_of_electrode_lines_on_batch(batch, verbose)
-        __assemble_batch_to_cell(batch, verbose)
-        __run_cell_line_on_batch(batch, verbose)
-        __notify_finish_batch_processing(batch, verbose)
-        return True
-
-    def __process_batch_request(self, batch: Batch, verbose: bool = False):
-        """
-        An internal operation of a worker thread for one batch.
-        Efficiently check for the availability of the mixing machines and whether it is at the start of the queue.
-        Then executes the pipeline operation and removes itself from the queue.
-        """
-        # acquire the condition's lock because of access to the list
-        while True:
-            with self.__access_pipeline_condition:
-                # if the batch is the start of the queue
-                batch_is_at_front = (
-                    self.__batch_request_list[0].batch_id == batch.batch_id
-                )
-                if batch_is_at_front and self.__pipeline_is_ready:
-                    # get the first batch in the queue
-                    self.__batch_request_list.pop(0)
-                    # append it to the running batches
-                    self.__running_batch_list.append(batch)
-                    # set the pipeline state to busy (mostly about the mixing machines being busy)
-                    self.__pipeline_is_ready = False
-                    break
-                else:
-                    # else: tell the thread to wait
-                    self.__access_pipeline_condition.wait()
-        try:
-            # start simulation
-            self.__run_pipeline_on_batch(batch, verbose=verbose)
-        finally:
-            # access queue/list
-            with self.__access_pipeline_condition:
-                if batch in self.__running_batch_list:
-                    self.__running_batch_list.remove(batch)
-                self.__batch_worker_thread_list.pop(batch.batch_id, None)
-                # notify that a batch has been finished to the other parked threads
-                # this is necessary for the other thread to be processed. The parked thread will execute the check again
-                # self.__pipeline_condition.notify_all()
-
-    def __maintain_monitoring_thread(self):
-        """Ensure the background processing loop is running."""
-        # first obtain the lock for access to the monitoring thread
-        # the lock is initialised with the plant simulation object's initialisation
-        with self.__runner_thread_lock:
-            # indicates there should be a processing batch request
-            if self.__plant_is_idle_event.is_set:
-                self.__plant_is_idle_event.clear()
-            # if there is no active monitoring thread OR
-            # there hasn't been any monitoring thread
-            if self.__runner_thread is None or not self.__runner_thread.is_alive():
-                # create a monitoring thread
-                self.__runner_thread = Thread(
-                    target=self.__monitoring_loop,
-                    name="PlantSimulationRunner",
-                    daemon=True,
-                )
-                self.__runner_thread.start()
-                # debug
-                # print("There is a monitoring thread creating")
-            # otherwise, just know that there is a running thread
-            else:
-                # debug
-                # print("There is a monitoring thread running")
-                pass
+        __notify_start_batch_processing()
+        __run_mixing_stages_on_batch()
 
-    def __monitoring_loop(self, poll_interval: float = 0.5):
-        """
-            This loop ensures and maintains that any simulation running can be still running with along with this thread.
-            It also updates the event flag when there is no simulation left.
-        """
-        try:
-            # start the loop
-            while True:
-                with self.__access_pipeline_condition:
-                    # when there are no requests, no running batches, no processing threads
-                    if (
-                        not self.__batch_request_list
-                        and not self.__running_batch_list
-                        and not self.__batch_worker_thread_list
-                    ):
-                        break
-                    self.__access_pipeline_condition.wait(timeout=poll_interval)
-        finally:
-            # if there is no more processing, and this monitoring thread senses it.
-            # set the plant_is_idle flag to true
+    def __add_completed_batch(self, batch: Batch):
+        self.__completed_batches[batch.batch_id] = batch
+        while len(self.__completed_batches) > self.__max_completed_batches:
+            self.__completed_batches.popitem(last=False)
+
+    def __update_plant_is_idle(self):
+        """Set the plant_is_idle flag when there is no request and no running batch left."""
+        if not self.__batch_request_list and not self.__running_batch_list:
             self.__plant_is_idle_event.set()
-            with self.__runner_thread_lock:
-                self.__runner_thread = None
 
-    def add_batch(self, batch: Batch = None, verbose: bool = False):
+    def add_batch(
+        self,
+        batch: Batch = None,
+        verbose: bool = False,
+        block: bool = False,
+        timeout: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
         """
-        Adds a new batch to the plant simulation (maximum number of threads is 3).
-        This method performs the queue mutation under the same condition lock so no worker can read a half-updated queue.
+        Adds a new batch to the plant simulation (at most max_queued_batches batches wait in the queue).
+        Without a batch, one is generated, with the given seed (e.g. to replay a batch) or a random one.
+        When the queue is full, raises BatchQueueFullError, or with block=True waits for a place
+        (at most timeout seconds, then raises BatchQueueFullError).
+        This method performs the queue mutation under the same condition lock so the scheduler never reads a half-updated queue.
         Returns the identifier of the queued batch so callers can track it.
         """
-        # make sure batch_requests, batch_worker_threads are only accessed atomically
+        # make sure batch_requests are only accessed atomically
         # wait to obtain the lock to access the simulation pipeline
         with self.__access_pipeline_condition:
-            # For testing only
-            if batch is None:
-                # FOR TESTING ONLY
-                batch = Batch(batch_id=str(self.auto_generated_batch_id))
-                # FOR TESTING ONLY
-                self.auto_generated_batch_id += 1
-
-            # only allows maximum 3 batches/threads at a time
-            if len(self.__batch_request_list) == 3:
-                raise ValueError("Maximum number of batches reached")
-            # add batch (information to the list)
-            self.__batch_request_list.append(batch)
-
-            # wraps batch processing into a thread
-            batch_processing_worker = Thread(
-                target=self.__process_batch_request,
-                args=(batch, verbose),
-                name=f"PlantBatchWorker-{batch.batch_id}",
-            )
-            # save batch processing thread to the thread list
-            self.__batch_worker_thread_list[batch.batch_id] = batch_processing_worker
-
-            if verbose:
-                print(
-                    f"EMIT EVENT - BATCH_REQUESTED: Batch id: {batch.batch_id} has arrived."
+            if block:
+                # the scheduler notifies the condition after every event, so the queue is re-checked
+                self.__access_pipeline_condition.wait_for(
+                    lambda: not self.__batch_queue_is_full(), timeout=timeout
                 )
+            return self.__enqueue_batch(batch, verbose, seed)
 
-            # emit event - batch requested
-            self.__event_bus.emit_plant_simulation_event(
-                PlantSimulationEventType.BATCH_REQUESTED,
-                {
-                    "batch_id": batch.batch_id,
-                    "message": f"Batch id {batch.batch_id} has been requested and added to the processing queue.",
-                },
-            )
+    async def add_batch_async(
+        self,
+        batch: Batch = None,
+        verbose: bool = False,
+        timeout: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Adds a new batch, waiting without blocking the event loop (nor holding a thread) while the queue is full.
+        Raises BatchQueueFullError if no place frees up within timeout seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self.__access_pipeline_condition:
+                if not self.__batch_queue_is_full():
+                    return self.__enqueue_batch(batch, verbose, seed)
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    raise BatchQueueFullError(
+                        "Maximum number of batches reached",
+                        retry_after=self.__estimate_queue_wait_seconds(),
+                    )
+                place_is_free = loop.create_future()
+                self.__queue_space_waiters.append(place_is_free)
+            try:
+                await asyncio.wait_for(place_is_free, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
 
-            # notify all the batch processing threads (needs more testing)
-            # self.__access_pipeline_condition.notify_all()
+    def __batch_queue_is_full(self) -> bool:
+        return len(self.__batch_request_list) >= self.__max_queued_batches
 
-        # start the batch processing request
-        batch_processing_worker.start()
+    def __enqueue_batch(
+        self, batch: Optional[Batch], verbose: bool, seed: Optional[int] = None
+    ):
+        """Adds the batch to the queue. The pipeline condition must be held."""
+        if self.__batch_queue_is_full():
+            raise BatchQueueFullError(
+                "Maximum number of batches reached",
+                retry_after=self.__estimate_queue_wait_seconds(),
+            )
+        # For testing only
+        if batch is None:
+            # FOR TESTING ONLY
+            batch = Batch(batch_id=str(self.auto_generated_batch_id), seed=seed)
+            # FOR TESTING ONLY
+            self.auto_generated_batch_id += 1
+
+        # add batch (information to the list)
+        self.__batch_request_list.append(batch)
+        # indicates there should be a processing batch request
+        self.__plant_is_idle_event.clear()
+
+        if verbose:
+            print(
+                f"EMIT EVENT - BATCH_REQUESTED: Batch id: {batch.batch_id} has arrived."
+            )
 
-        # ensure the background processing loop is active
-        self.__maintain_monitoring_thread()
+        # emit event - batch requested
+        self.__event_bus.emit_plant_simulation_event(
+            PlantSimulationEventType.BATCH_REQUESTED,
+            {
+                "batch_id": batch.batch_id,
+                "seed": batch.seed,
+                "message": f"Batch id {batch.batch_id} has been requested and added to the processing queue.",
+            },
+        )
+
+        # the scheduler starts the batch once it is at the front and the mixing machines are free
+        self.__scheduler.schedule_now(self.__start_next_batch, verbose)
 
         return batch.batch_id
 
+    def __estimate_queue_wait_seconds(self) -> float:
+        """Wall-clock seconds until the batch at the front of the queue starts (and frees its place)."""
+        if self.__pipeline_is_ready or self.__pipeline_ready_time is None:
+            return 0.0
+        remaining = (self.__pipeline_ready_time - self.__clock.now()).total_seconds()
+        speed_factor = self.__clock.speed_factor
+        if remaining <= 0 or math.isinf(speed_factor):
+            return 0.0
+        return remaining / speed_factor
+
+    def get_queue_state(self):
+        """Depth and capacity of the batch request queue, with the estimated wait for a place."""
+        with self.__access_pipeline_condition:
+            queued_batches = len(self.__batch_request_list)
+            return {
+                "queued_batches": queued_batches,
+                "max_queued_batches": self.__max_queued_batches,
+                "available_places": max(self.__max_queued_batches - queued_batches, 0),
+                "running_batches": len(self.__running_batch_list),
+                "waiting_submissions": len(self.__queue_space_waiters),
+                "estimated_wait_seconds": (
+                    round(self.__estimate_queue_wait_seconds(), 3)
+                    if self.__batch_queue_is_full()
+                    else 0.0
+                ),
+            }
+
     def get_machine_status(self, line_type: str, machine_id: str):
         """Due to the real-time nature of this functionality, obtaining a lock is not needed!"""
         machine = self.__get_machine(line_type, machine_id)
@@ -631,63 +741,87 @@ class PlantSimulation:
                 for line_type in self.__factory_structure
                 for machine_id in self.__factory_structure[line_type]
             ]
+            queue_state = self.get_queue_state()
 
         return {
             "batch_requests": batch_request_list_info,
             "running_batches": running_batches,
             "machine_statuses": machine_statuses,
+            "queue": queue_state,
+            "clock": self.__clock.get_clock_state(),
+            "event_dispatch": self.get_event_dispatch_statistics(),
         }
 
+    def __find_batch(self, batch_id: str) -> Optional[Batch]:
+        """A running or recently completed batch, None when it is not (or no longer) known."""
+        with self.__access_pipeline_condition:
+            return self.__completed_batches.get(batch_id) or next(
+                (
+                    batch
+                    for batch in self.__running_batch_list
+                    if batch.batch_id == batch_id
+                ),
+                None,
+            )
+
+    def set_simulation_speed(self, speed_factor: float):
+        """Change how fast simulated time runs relative to wall time, even while batches are running.
+        Raises TypeError when the plant's clock is not a scaled clock and ValueError for a non-positive factor.
+        """
+        self.__clock.set_speed_factor(speed_factor)
+        return self.__clock.get_clock_state()
+
+    def get_simulation_clock(self) -> SimulationClock:
+        return self.__clock
+
     def reset_plant(self):
         if not self.wait_until_plant_simulation_is_idle(timeout=5):
             raise TimeoutError(
                 "Cannot reset plant. Possibly because there are simulations still running."
             )
 
-        self.__factory_structure = {
-            "anode": {
-                "mixing": None,
-                "coating": None,
-                "drying": None,
-                "calendaring": None,
-                "slitting": None,
-                "inspection": None,
-            },
-            "cathode": {
-                "mixing": None,
-                "coating": None,
-                "drying": None,
-                "calendaring": None,
-                "slitting": None,
-                "inspection": None,
-            },
-            "cell": {
-                "rewinding": None,
-                "electrolyte_filling": None,
-                "formation_cycling": None,
-                "aging": None,
-            },
-        }
-
-        self.__initialise_default_factory_structure()
-        # reset the machine locks
-        self.__machine_lock_structure = None
-        self.__machine_lock_structure = {
-            line_type: {stage: Lock() for stage in self.__factory_structure[line_type]}
-            for line_type in self.__factory_structure
-        }
         # empty the batch-related software memory
         with self.__access_pipeline_condition:
+            # recreate the machines and their resources
+            self.__initialise_default_factory_structure()
             self.__batch_request_list = []
             self.__running_batch_list = []
-            self.__batch_worker_thread_list = {}
+            self.__completed_batches = OrderedDict()
+            self.__pipeline_is_ready = True
+            self.__pipeline_ready_time = None
             self.__machine_batch_context = {}  # Clear machine batch context on reset
 
+    def recompute_batch_from_stage(
+        self,
+        batch_id: str,
+        line_type: str,
+        machine_id: str,
+        machine_parameters: Union[dict, BaseMachineParameters, None] = None,
+    ) -> dict:
+        """
+        What-if: recompute a running or recently completed batch from a stage with new parameters.
+        Only the downstream stages are replayed, from the batch's stage-boundary snapshots, on
+        separate machines: the plant's machines and the batch itself are left untouched.
+        """
+        batch = self.__find_batch(batch_id)
+        if batch is None:
+            raise ValueError(f"Batch '{batch_id}' is not found")
+        return recompute_from_stage(
+            batch,
+            line_type,
+            machine_id,
+            machine_parameters,
+            stage_cache=self.__recomputation_stage_cache,
+        )
+
     def update_machine_parameters(self, line_type: str, machine_id: str, parameters):
         """Update parameters for a specific machine."""
-        machine_lock = self.__get_machine_lock(line_type, machine_id)
-        if machine_lock.acquire(timeout=5):
-            try:
+        with self.__access_pipeline_condition:
+            machine_resource = self.__get_machine_resource(line_type, machine_id)
+            # the scheduler notifies the condition after every event, so a machine in use is re-checked
+            if self.__access_pipeline_condition.wait_for(
+                lambda: not machine_resource.busy, timeout=5
+            ):
                 machine = self.__get_machine(line_type, machine_id)
                 
                 # Validate parameters and get the proper parameter object
@@ -704,12 +838,10 @@ class PlantSimulation:
                     machine.update_machine_parameters(parameters)
                     
                 return True
-            finally:
-                machine_lock.release()
-        else:
-            raise TimeoutError(
-                "Cannot update machine parameters. Possibly because this machine is busy. Please update the parameters later."
-            )
+            else:
+                raise TimeoutError(
+                    "Cannot update machine parameters. Possibly because this machine is busy. Please update the parameters later."
+                )
     
     def _create_parameter_object(self, machine_id: str, parameters: dict):
         """Create the appropriate parameter object based on machine ID."""
@@ -745,17 +877,25 @@ class PlantSimulation:
         callback: Callable[[PlantSimulationEvent], None],
         *,  # Keyword-only arguments
         include_batch_context: bool = False,
+        dispatch: Optional[AsyncDispatch] = None,
     ):
-        """Expose event subscription with optional batch context enrichment."""
+        """Expose event subscription with optional batch context enrichment.
+        With a dispatch, the callback runs on its own worker thread, fed by a bounded queue, instead of
+        the simulation thread (see EventBus.subscribe).
+        """
         if include_batch_context:
-
-            def __callback_with_batch(event: PlantSimulationEvent):
-                self.__attach_batch_context(event)
-                callback(event)
-
-            self.__event_bus.subscribe(event_type, __callback_with_batch)
-        else:
-            self.__event_bus.subscribe(event_type, callback)
+            # attached when the event is emitted: the machine may run another batch by the time an
+            # asynchronous listener gets the event
+            self.__event_bus.add_preprocessor(event_type, self.__attach_batch_context)
+        self.__event_bus.subscribe(event_type, callback, dispatch)
+
+    def get_event_dispatch_statistics(self) -> list[dict]:
+        """Queue depth and lag of the asynchronous listeners."""
+        return self.__event_bus.get_dispatch_statistics()
+
+    def wait_until_events_are_dispatched(self, timeout: Optional[float] = None) -> bool:
+        """Block until the asynchronous listeners have received every event emitted so far."""
+        return self.__event_bus.wait_until_dispatched(timeout)
 
     def wait_until_plant_simulation_is_idle(
         self, timeout: Optional[float] = None
@@ -1,4 +1,4 @@
 from .Batch import Batch
-from .PlantSimulation import PlantSimulation
+from .PlantSimulation import BatchQueueFullError, PlantSimulation
 
-__all__ = ['Batch', 'PlantSimulation']
\ No newline at end of file
+__all__ = ['Batch', 'BatchQueueFullError', 'PlantSimulation']
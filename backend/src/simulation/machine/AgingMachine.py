@@ -3,6 +3,7 @@ from simulation.process_parameters.Parameters import AgingParameters
 from simulation.battery_model.AgingModel import AgingModel
 from simulation.battery_model.FormationCyclingModel import FormationCyclingModel
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 
 
 class AgingMachine(BaseMachine):
@@ -12,8 +13,9 @@ class AgingMachine(BaseMachine):
         aging_parameters: AgingParameters,
         aging_model: AgingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
-        super().__init__(process_name, aging_model, aging_parameters, event_bus)
+        super().__init__(process_name, aging_model, aging_parameters, event_bus, clock)
 
     def receive_model_from_previous_process(
         self, previous_model: FormationCyclingModel
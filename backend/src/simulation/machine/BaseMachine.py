@@ -1,10 +1,16 @@
 from abc import ABC, abstractmethod
 from dataclasses import asdict
-from datetime import datetime
-import time
+from datetime import datetime, timedelta
+from typing import Optional
+from simulation.clock import SimulationClock, RealTimeClock
 from simulation.event_bus.events import EventBus, PlantSimulationEventType
 from simulation.process_parameters import BaseMachineParameters
 from simulation.battery_model.BaseModel import BaseModel
+from simulation.machine.StageOutputCache import (
+    CachedStage,
+    StageOutputCache,
+    copy_state,
+)
 
 
 class BaseMachine(ABC):
@@ -18,6 +24,7 @@ class BaseMachine(ABC):
         battery_model: BaseModel = None,
         machine_parameters: BaseMachineParameters = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         self.process_name = process_name
         self.battery_model = battery_model
@@ -30,6 +37,20 @@ class BaseMachine(ABC):
         # simulation-related
         self.total_steps = None  # required
         self.pause_between_steps = 0.1
+        # the clock paces the steps and provides every timestamp of this machine
+        self.clock = clock or RealTimeClock()
+        # simulated time of the current step (None when the machine is off)
+        self.simulated_time = None
+        # precomputed trajectory of the current run (unthrottled clock only)
+        self.__trajectory = None
+        self.__trajectory_stop_step = None
+        # optional cache of stage outputs (unthrottled clock only), possibly shared with other machines
+        self.stage_cache: Optional[StageOutputCache] = None
+        self.__cache_key = None
+        self.__cached_stage: Optional[CachedStage] = None
+        # progress of the current run, stored in the cache at the end of the run
+        self.__completed_steps = 0
+        self.__stopped_early = False
 
     @abstractmethod
     def receive_model_from_previous_process(self, previous_model: BaseModel):
@@ -45,11 +66,12 @@ class BaseMachine(ABC):
         """Update the machine parameters."""
         self.machine_parameters = machine_parameters
 
-    def turn_on(self):
-        """Turn on the machine."""
+    def turn_on(self, start_time: Optional[datetime] = None):
+        """Turn on the machine (at the given simulated time, defaults to the clock's current time)."""
         self.state = True
-        self.start_datetime = datetime.now()
-        self.current_process_start_time = datetime.now()
+        self.simulated_time = start_time or self.clock.now()
+        self.start_datetime = self.simulated_time
+        self.current_process_start_time = self.simulated_time
         self.__emit_event(
             PlantSimulationEventType.MACHINE_TURNED_ON,
             data={
@@ -59,6 +81,7 @@ class BaseMachine(ABC):
 
     def turn_off(self):
         """Turn off the machine."""
+        turned_off_time = self.simulated_time or self.clock.now()
         self.state = False
         self.total_time = 0
         self.current_time_step = 0
@@ -66,9 +89,11 @@ class BaseMachine(ABC):
         self.__emit_event(
             PlantSimulationEventType.MACHINE_TURNED_OFF,
             data={
-                "message": f"{self.process_name} was turned off at {datetime.now().isoformat()}"
+                "message": f"{self.process_name} was turned off at {turned_off_time.isoformat()}"
             },
+            timestamp=turned_off_time,
         )
+        self.simulated_time = None
 
     def pre_run_check(self):
         """Pre-run check for the machine."""
@@ -109,7 +134,7 @@ class BaseMachine(ABC):
                     battery_model_props = {"error": "Unable to get battery model properties"}
             
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": (self.simulated_time or self.clock.now()).isoformat(),
                 "state": "On",
                 "duration": round(self.current_time_step, 2),
                 "process": self.process_name,
@@ -119,7 +144,7 @@ class BaseMachine(ABC):
             }
         else:
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": self.clock.now().isoformat(),
                 "process": self.process_name,
                 "state": "Off",
                 "machine_parameters": machine_params_dict,
@@ -146,52 +171,202 @@ class BaseMachine(ABC):
         """
         pass
 
-    def run_simulation(self, verbose: bool = True):
-        """Run the simulation.
+    def stop_condition_reached(self):
+        """Whether the current model state ends the stage early (one flag per virtual batch for
+        array-backed models). step_logic raises when it is reached.
+        """
+        return False
+
+    def prepare_trajectory(self) -> dict:
+        """Called once instead of step_logic when the stage is computed as a trajectory.
+        Returns the extra per-step inputs passed to the model's compute_trajectory.
+        """
+        return {}
+
+    def find_trajectory_stop_step(self, trajectory: dict) -> Optional[int]:
+        """Return the step at which step_logic would have raised for this trajectory, or None."""
+        return None
+
+    def run_simulation(self, verbose: bool = True, start_time: Optional[datetime] = None):
+        """Run the simulation, paced by the clock.
+        With an unthrottled clock, models that support it compute the whole stage in one shot
+        and the rows are replayed for the events; otherwise the machine steps through the model.
         Args:
-            total_steps (int): The total number of steps to run the simulation for
-            pause_between_steps (float): The pause between steps in seconds
             verbose (bool): Whether to print to the console when running the simulation
+            start_time (datetime): Simulated start of the run (defaults to the clock's current time)
         """
-        # make sure the machine has a model to simulate and some parameters!
-        if self.pre_run_check():
-            # turn on the machine
-            self.turn_on()
-            if verbose:
-                print(
-                    f"Machine {self.process_name} is going to be running for {self.total_steps} steps"
-                )
+        self.begin_run(verbose, start_time)
+        if self.can_skip_steps(verbose):
+            self.skip_steps(verbose)
+        else:
+            step_duration = timedelta(seconds=self.pause_between_steps)
             for t in range(0, self.total_steps):
-                self.current_time_step = t  # current time step
-                try:
-                    self.step_logic(t, verbose)
-                except RuntimeError as rte:
-                    if verbose:
-                        print("Plant Warning: Voltage exceeded! ", rte)
-                    self.__emit_event(
-                        PlantSimulationEventType.MACHINE_SIMULATION_ERROR,
-                        {
-                            "error": "Plant Warning: Voltage exceeded! in Formation Cycling"
-                        },
-                    )
+                if not self.run_step(t, verbose):
                     break
-                self.battery_model.update_properties(self.machine_parameters, t)
-                self.__emit_event(
-                    PlantSimulationEventType.MACHINE_DATA_GENERATED,
-                    data={
-                        "message": f"Machine {self.process_name} has been running for {t} steps",
-                        "machine_state": self.get_current_state(),
-                    },
+                # advance the simulated time by one step and let the clock pace it
+                self.simulated_time += step_duration
+                self.clock.wait_until(self.simulated_time)
+        self.clock.wait_until(self.simulated_time)
+        self.end_run()
+
+    # Step-wise interface: run_simulation drives it with the clock, the plant's discrete-event
+    # scheduler drives it with timed events (setting simulated_time before each step).
+
+    def begin_run(self, verbose: bool = False, start_time: Optional[datetime] = None):
+        """Check the machine can run and turn it on. With an unthrottled clock, the model's
+        trajectory for the whole stage is computed up front when the model supports it,
+        or taken from the stage cache when the same stage already ran.
+        """
+        # make sure the machine has a model to simulate and some parameters!
+        if not self.pre_run_check():
+            raise Exception("Implementation error!")
+        self.turn_on(start_time)
+        if verbose:
+            print(
+                f"Machine {self.process_name} is going to be running for {self.total_steps} steps"
+            )
+        self.__trajectory = None
+        self.__trajectory_stop_step = None
+        self.__cache_key = None
+        self.__cached_stage = None
+        self.__completed_steps = 0
+        self.__stopped_early = False
+        if self.clock.throttled:
+            return
+        if self.stage_cache is not None and self.stage_cache.is_cacheable(
+            self.battery_model
+        ):
+            self.__cache_key = self.stage_cache.fingerprint(self, self.battery_model)
+            self.__cached_stage = self.stage_cache.get(self.__cache_key)
+        if self.__cached_stage is not None:
+            self.__trajectory = self.__cached_stage.trajectory
+            self.__trajectory_stop_step = self.__cached_stage.trajectory_stop_step
+        else:
+            self.__trajectory = self.battery_model.compute_trajectory(
+                self.machine_parameters,
+                self.total_steps,
+                **self.prepare_trajectory(),
+            )
+            if self.__trajectory is not None:
+                self.__trajectory_stop_step = self.find_trajectory_stop_step(
+                    self.__trajectory
+                )
+
+    def can_skip_steps(self, verbose: bool = False) -> bool:
+        """Whether the steps can be skipped: the trajectory is precomputed (or the output is cached)
+        and nobody observes the step data."""
+        observed = verbose or (
+            self.event_bus is not None
+            and self.event_bus.has_subscribers(
+                PlantSimulationEventType.MACHINE_DATA_GENERATED
+            )
+        )
+        precomputed = self.__trajectory is not None or self.__cached_stage is not None
+        return precomputed and not observed
+
+    def skip_steps(self, verbose: bool = False) -> int:
+        """Load the final state of the precomputed trajectory and move the simulated time to the
+        end of the stage. Returns the number of completed steps.
+        """
+        if self.__cached_stage is not None:
+            completed_steps = self.__cached_stage.completed_steps
+            stopped_early = self.__cached_stage.stopped_early
+            # nobody is listening: only the final state matters
+            vars(self.battery_model).update(
+                copy_state(self.__cached_stage.output_state)
+            )
+        else:
+            stop_step = self.__trajectory_stop_step
+            completed_steps = self.total_steps if stop_step is None else stop_step
+            stopped_early = stop_step is not None
+            if completed_steps > 0:
+                # nobody is listening: only the final state matters
+                self.battery_model.apply_trajectory_step(
+                    self.__trajectory, completed_steps - 1
                 )
+        if completed_steps > 0:
+            self.current_time_step = completed_steps - 1
+        self.__completed_steps = completed_steps
+        self.__stopped_early = stopped_early
+        self.simulated_time += completed_steps * timedelta(
+            seconds=self.pause_between_steps
+        )
+        if stopped_early:
+            if verbose:
+                print("Plant Warning: Voltage exceeded! ")
+            self.__emit_simulation_error()
+        return completed_steps
+
+    def run_step(self, t: int, verbose: bool = False) -> bool:
+        """Run step t at the current simulated time and emit its data.
+        Returns False when the stage stops early (step_logic raised).
+        """
+        self.current_time_step = t  # current time step
+        if self.__trajectory is not None:
+            if t == self.__trajectory_stop_step:
                 if verbose:
-                    print("Current machine state: ", self.get_current_state())
-                time.sleep(self.pause_between_steps)
-            self.turn_off()
+                    print("Plant Warning: Voltage exceeded! ")
+                self.__stopped_early = True
+                self.__emit_simulation_error()
+                return False
+            self.battery_model.apply_trajectory_step(self.__trajectory, t)
         else:
-            raise Exception("Implementation error!")
+            try:
+                self.step_logic(t, verbose)
+            except RuntimeError as rte:
+                if verbose:
+                    print("Plant Warning: Voltage exceeded! ", rte)
+                self.__stopped_early = True
+                self.__emit_simulation_error()
+                return False
+            self.battery_model.update_properties(self.machine_parameters, t)
+        self.__completed_steps = t + 1
+        self.__emit_step_data(t, verbose)
+        return True
 
-    def __emit_event(self, event_type: PlantSimulationEventType, data: dict = None):
-        """Emit an event to the event bus."""
+    def end_run(self):
+        """Turn the machine off after a run (storing its output in the stage cache after a miss)."""
+        if self.__cache_key is not None and self.__cached_stage is None:
+            self.stage_cache.put(
+                self.__cache_key,
+                CachedStage(
+                    output_state=self.battery_model.get_state(),
+                    completed_steps=self.__completed_steps,
+                    stopped_early=self.__stopped_early,
+                    trajectory=self.__trajectory,
+                    trajectory_stop_step=self.__trajectory_stop_step,
+                ),
+            )
+        self.__cache_key = None
+        self.__cached_stage = None
+        self.__trajectory = None
+        self.__trajectory_stop_step = None
+        self.turn_off()
+
+    def __emit_step_data(self, t: int, verbose: bool):
+        self.__emit_event(
+            PlantSimulationEventType.MACHINE_DATA_GENERATED,
+            data={
+                "message": f"Machine {self.process_name} has been running for {t} steps",
+                "machine_state": self.get_current_state(),
+            },
+        )
+        if verbose:
+            print("Current machine state: ", self.get_current_state())
+
+    def __emit_simulation_error(self):
+        self.__emit_event(
+            PlantSimulationEventType.MACHINE_SIMULATION_ERROR,
+            {"error": "Plant Warning: Voltage exceeded! in Formation Cycling"},
+        )
+
+    def __emit_event(
+        self,
+        event_type: PlantSimulationEventType,
+        data: dict = None,
+        timestamp: datetime = None,
+    ):
+        """Emit an event to the event bus, stamped with the machine's simulated time."""
         processed_data = None
         if data is not None:
             processed_data = {"machine_id": self.process_name, **data}
@@ -199,4 +374,5 @@ class BaseMachine(ABC):
             self.event_bus.emit_plant_simulation_event(
                 event_type=event_type,
                 data=processed_data,
+                timestamp=timestamp or self.simulated_time,
             )
@@ -1,4 +1,5 @@
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import CalendaringParameters
 from simulation.battery_model.DryingModel import DryingModel
@@ -12,9 +13,10 @@ class CalendaringMachine(BaseMachine):
         calendaring_parameters: CalendaringParameters,
         calendaring_model: CalendaringModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         super().__init__(
-            process_name, calendaring_model, calendaring_parameters, event_bus
+            process_name, calendaring_model, calendaring_parameters, event_bus, clock
         )
 
     def receive_model_from_previous_process(self, previous_model: DryingModel):
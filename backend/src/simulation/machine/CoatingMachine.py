@@ -2,6 +2,7 @@ from simulation.battery_model import MixingModel, CoatingModel
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import CoatingParameters
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 
 
 def calculate_shear_rate(coating_speed, gap_height):
@@ -56,6 +57,7 @@ class CoatingMachine(BaseMachine):
         coating_parameters: CoatingParameters,
         coating_model: CoatingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         """
         Initialise the coating machine.
@@ -70,6 +72,7 @@ class CoatingMachine(BaseMachine):
             coating_model,
             coating_parameters,
             event_bus,
+            clock,
         )
 
     def receive_model_from_previous_process(self, previous_model: MixingModel):
@@ -92,6 +95,11 @@ class CoatingMachine(BaseMachine):
             }
         )
 
+    def prepare_trajectory(self):
+        # the process specifics only depend on the parameters, so one evaluation covers every step
+        self.step_logic(0, verbose=False)
+        return {}
+
     def validate_parameters(self, parameters):
         if isinstance(parameters, CoatingParameters):
             return parameters.validate_parameters()
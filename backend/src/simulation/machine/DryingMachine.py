@@ -2,6 +2,7 @@ from simulation.battery_model import CoatingModel, DryingModel
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import DryingParameters
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 
 
 class DryingMachine(BaseMachine):
@@ -11,8 +12,11 @@ class DryingMachine(BaseMachine):
         drying_parameters: DryingParameters,
         drying_model: DryingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
-        super().__init__(process_name, drying_model, drying_parameters, event_bus)
+        super().__init__(
+            process_name, drying_model, drying_parameters, event_bus, clock
+        )
 
     def receive_model_from_previous_process(self, previous_model: CoatingModel):
         self.battery_model = DryingModel(previous_model)
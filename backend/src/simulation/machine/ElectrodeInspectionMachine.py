@@ -4,6 +4,7 @@ from simulation.process_parameters.Parameters import ElectrodeInspectionParamete
 from simulation.battery_model.ElectrodeInspectionModel import ElectrodeInspectionModel
 from simulation.battery_model.SlittingModel import SlittingModel
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 
 
 class ElectrodeInspectionMachine(BaseMachine):
@@ -13,12 +14,14 @@ class ElectrodeInspectionMachine(BaseMachine):
         electrode_inspection_parameters: ElectrodeInspectionParameters,
         electrode_inspection_model: ElectrodeInspectionModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         super().__init__(
             process_name,
             electrode_inspection_model,
             electrode_inspection_parameters,
             event_bus,
+            clock,
         )
 
     def calculate_total_steps(self):
@@ -1,4 +1,5 @@
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import ElectrolyteFillingParameters
 from simulation.battery_model.RewindingModel import RewindingModel
@@ -12,12 +13,14 @@ class ElectrolyteFillingMachine(BaseMachine):
         electrolyte_filling_parameters: ElectrolyteFillingParameters,
         electrolyte_filling_model: ElectrolyteFillingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         super().__init__(
             process_name,
             electrolyte_filling_model,
             electrolyte_filling_parameters,
             event_bus,
+            clock,
         )
 
     def receive_model_from_previous_process(self, previous_model: RewindingModel):
@@ -1,5 +1,7 @@
 from logging import info
+import numpy as np
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import FormationCyclingParameters
 from simulation.battery_model.FormationCyclingModel import FormationCyclingModel
@@ -13,9 +15,14 @@ class FormationCyclingMachine(BaseMachine):
         formation_cycling_parameters: FormationCyclingParameters,
         formation_model: FormationCyclingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
         super().__init__(
-            process_name, formation_model, formation_cycling_parameters, event_bus
+            process_name,
+            formation_model,
+            formation_cycling_parameters,
+            event_bus,
+            clock,
         )
 
     def receive_model_from_previous_process(
@@ -27,9 +34,23 @@ class FormationCyclingMachine(BaseMachine):
         self.total_steps = int(self.machine_parameters.formation_duration_s + 1)
 
     def step_logic(self, t: int, verbose: bool):
-        if self.battery_model.voltage >= self.machine_parameters.charge_voltage_limit_V:
+        # with array-backed models, the stage only stops once every virtual batch has reached the limit
+        if np.all(self.stop_condition_reached()):
             raise RuntimeError("Voltage limit was reached")
 
+    def stop_condition_reached(self):
+        return self.battery_model.voltage >= self.machine_parameters.charge_voltage_limit_V
+
+    def find_trajectory_stop_step(self, trajectory):
+        """step_logic stops the stage as soon as the voltage of the previous step hits the limit."""
+        previous_voltage = np.concatenate(
+            ([self.battery_model.voltage], trajectory["voltage"][:-1])
+        )
+        limit_reached = np.flatnonzero(
+            previous_voltage >= self.machine_parameters.charge_voltage_limit_V
+        )
+        return int(limit_reached[0]) if limit_reached.size else None
+
     def validate_parameters(self, parameters):
         if isinstance(parameters, FormationCyclingParameters):
             return parameters.validate_parameters()
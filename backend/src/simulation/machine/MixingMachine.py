@@ -1,8 +1,10 @@
 from simulation.event_bus.events import EventBus, PlantSimulationEventType
+from simulation.clock import SimulationClock
 from simulation.process_parameters.Parameters import MixingParameters
 from simulation.battery_model.MixingModel import MixingModel
 from simulation.machine.BaseMachine import BaseMachine
 from dataclasses import asdict
+import numpy as np
 
 
 class MixingMachine(BaseMachine):
@@ -13,8 +15,11 @@ class MixingMachine(BaseMachine):
         mixing_model: MixingModel = None,
         mixing_parameters: MixingParameters = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
-        super().__init__(process_name, mixing_model, mixing_parameters, event_bus)
+        super().__init__(
+            process_name, mixing_model, mixing_parameters, event_bus, clock
+        )
         self.mixing_tank_volume = 200
         self.duration_secs = {"PVDF": 8, "CA": 8, "AM": 10}
         self.expected_total_amount_of_solvent = None
@@ -103,6 +108,53 @@ class MixingMachine(BaseMachine):
             if self.battery_model.AM < self.expected_total_amount_of_AM:
                 self.battery_model.add("AM", self.am_per_step)
 
+    def prepare_trajectory(self):
+        """Vectorised equivalent of step_logic: the component volumes of the slurry at every step.
+        Solvent is added at t == 0, then PVDF, CA and AM are added per step in their own phases,
+        each one stopping once its expected amount has been reached.
+        """
+        t = np.arange(self.total_steps)
+
+        def added_volume(initial, expected, per_step, phase_start, phase_length):
+            # number of additions made up to (and including) each step
+            additions = np.clip(t - phase_start, 0, phase_length)
+            if per_step > 0:
+                additions_needed = max(0, int(np.ceil((expected - initial) / per_step)))
+                additions = np.minimum(additions, additions_needed)
+            return initial + additions * per_step
+
+        model = self.battery_model
+        am_phase_start = self.pvdf_step + self.ca_step
+        solvent = np.full(
+            self.total_steps, model.solvent + self.expected_total_amount_of_solvent
+        )
+        return {
+            "volumes": {
+                "solvent": solvent,
+                "PVDF": added_volume(
+                    model.PVDF,
+                    self.expected_total_amount_of_PVDF,
+                    self.pvdf_per_step,
+                    0,
+                    self.pvdf_step,
+                ),
+                "CA": added_volume(
+                    model.CA,
+                    self.expected_total_amount_of_CA,
+                    self.ca_per_step,
+                    self.pvdf_step,
+                    self.ca_step,
+                ),
+                "AM": added_volume(
+                    model.AM,
+                    self.expected_total_amount_of_AM,
+                    self.am_per_step,
+                    am_phase_start,
+                    self.total_steps - am_phase_start,
+                ),
+            }
+        }
+
     def validate_parameters(self, parameters):
         if isinstance(parameters, MixingParameters):
             return parameters.validate_parameters()
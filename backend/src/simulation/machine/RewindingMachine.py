@@ -1,4 +1,5 @@
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import RewindingParameters
 from simulation.battery_model.RewindingModel import RewindingModel
@@ -11,8 +12,11 @@ class RewindingMachine(BaseMachine):
         rewinding_parameters: RewindingParameters,
         rewinding_model: RewindingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
-        super().__init__(process_name, rewinding_model, rewinding_parameters, event_bus)
+        super().__init__(
+            process_name, rewinding_model, rewinding_parameters, event_bus, clock
+        )
 
     def receive_model_from_previous_process(
         self,
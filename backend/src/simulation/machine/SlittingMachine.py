@@ -1,4 +1,5 @@
 from simulation.event_bus.events import EventBus
+from simulation.clock import SimulationClock
 from simulation.machine.BaseMachine import BaseMachine
 from simulation.process_parameters.Parameters import SlittingParameters
 from simulation.battery_model import CalendaringModel
@@ -12,8 +13,11 @@ class SlittingMachine(BaseMachine):
         slitting_parameters: SlittingParameters,
         slitting_model: SlittingModel = None,
         event_bus: EventBus = None,
+        clock: SimulationClock = None,
     ):
-        super().__init__(process_name, slitting_model, slitting_parameters, event_bus)
+        super().__init__(
+            process_name, slitting_model, slitting_parameters, event_bus, clock
+        )
 
     def receive_model_from_previous_process(self, previous_model: CalendaringModel):
         self.battery_model = SlittingModel(previous_model)
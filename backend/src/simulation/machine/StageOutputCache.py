@@ -0,0 +1,109 @@
+"""
+Cache of stage outputs. A deterministic stage produces the same trajectory and output model for
+the same incoming model and machine parameters, so a repeated stage is served from the cache.
+"""
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from threading import Lock
+from typing import Optional
+import numpy as np
+from simulation.battery_model.BaseModel import BaseModel
+
+
+@dataclass
+class CachedStage:
+    # attributes of the model leaving the stage
+    output_state: dict
+    # number of steps the stage ran (fewer than total_steps when it stopped early)
+    completed_steps: int
+    stopped_early: bool = False
+    # precomputed trajectory of the stage, when the model supports it (replayed for the step events)
+    trajectory: Optional[dict] = None
+    trajectory_stop_step: Optional[int] = None
+
+
+def copy_state(state: dict) -> dict:
+    """Copy of model attributes, so that cached arrays are never shared with a running model."""
+    return {
+        name: value.copy() if isinstance(value, np.ndarray) else value
+        for name, value in state.items()
+    }
+
+
+class StageOutputCache:
+    """
+    LRU cache of stage outputs, keyed by a fingerprint of the machine, its parameters and the
+    incoming model state. Only stages whose model is deterministic are cached.
+    Shared by many machines (and threads): every operation takes the cache's lock.
+
+    Args:
+        max_entries (int): Number of stages kept before the least recently used one is evicted
+    """
+
+    def __init__(self, max_entries: int = 256):
+        if max_entries < 1:
+            raise ValueError("The cache must hold at least 1 entry")
+        self.max_entries = max_entries
+        self.__entries: OrderedDict[str, CachedStage] = OrderedDict()
+        self.__lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_cacheable(model: BaseModel) -> bool:
+        return model is not None and model.deterministic
+
+    @staticmethod
+    def fingerprint(machine, model: BaseModel) -> str:
+        """Digest of everything the stage output depends on."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(type(machine).__name__.encode())
+        digest.update(repr(machine.pause_between_steps).encode())
+        digest.update(repr(sorted(asdict(machine.machine_parameters).items())).encode())
+        digest.update(type(model).__name__.encode())
+        for name, value in sorted(model.get_state().items()):
+            digest.update(name.encode())
+            if isinstance(value, np.ndarray):
+                digest.update(value.dtype.str.encode())
+                digest.update(repr(value.shape).encode())
+                digest.update(np.ascontiguousarray(value).tobytes())
+            else:
+                digest.update(repr(value).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedStage]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedStage):
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def get_statistics(self) -> dict:
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.__entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
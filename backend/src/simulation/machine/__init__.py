@@ -10,6 +10,7 @@ from .RewindingMachine import RewindingMachine
 from .ElectrolyteFillingMachine import ElectrolyteFillingMachine
 from .FormationCyclingMachine import FormationCyclingMachine
 from .AgingMachine import AgingMachine
+from .StageOutputCache import StageOutputCache
 
 __all__ = [
     'BaseMachine',
@@ -23,4 +24,5 @@ __all__ = [
     'ElectrolyteFillingMachine',
     'FormationCyclingMachine',
     'AgingMachine',
+    'StageOutputCache',
 ]
@@ -0,0 +1,287 @@
+"""
+Monte Carlo evaluation of the production lines: many virtual batches at once.
+The battery models are array-backed (struct of arrays): every property holds one value per
+virtual batch, so the existing model equations evaluate all the batches in a single call.
+"""
+
+import time
+from numbers import Number
+from typing import Optional
+import numpy as np
+from simulation.battery_model import BaseModel, MixingModel, RewindingModel
+from simulation.clock import UnthrottledClock
+from simulation.factory.Batch import create_stage_generator
+from simulation.factory.FactoryStructure import FACTORY_LINES, create_factory_structure
+from simulation.machine import BaseMachine
+from simulation.machine.StageOutputCache import (
+    CachedStage,
+    StageOutputCache,
+    copy_state,
+)
+
+PERCENTILES = [5, 50, 95]
+
+
+class MonteCarloResult:
+    """Per-stage properties of every virtual batch, with their distributions and the pass rates."""
+
+    def __init__(
+        self,
+        n_batches: int,
+        stage_properties: dict[str, dict[str, dict]],
+        stage_passed: dict[str, dict[str, np.ndarray]],
+        elapsed_seconds: float,
+    ):
+        self.n_batches = n_batches
+        # line type -> stage -> property name -> array (one value per batch) or scalar (same for every batch)
+        self.stage_properties = stage_properties
+        # line type -> stage -> boolean array, whether each batch passed the stage
+        self.stage_passed = stage_passed
+        self.elapsed_seconds = elapsed_seconds
+
+    def get_passed_batches(self) -> np.ndarray:
+        """Whether each batch passed every stage of every line."""
+        passed = np.ones(self.n_batches, dtype=bool)
+        for line_passed in self.stage_passed.values():
+            for stage_passed in line_passed.values():
+                passed &= stage_passed
+        return passed
+
+    @property
+    def pass_rate(self) -> float:
+        return float(np.mean(self.get_passed_batches()))
+
+    def get_stage_pass_rates(self) -> dict[str, dict[str, float]]:
+        return {
+            line_type: {
+                stage: float(np.mean(passed)) for stage, passed in line_passed.items()
+            }
+            for line_type, line_passed in self.stage_passed.items()
+        }
+
+    def get_property_values(self, line_type: str, stage: str, property_name: str):
+        """Values of a property for every batch (scalars are broadcast)."""
+        value = self.stage_properties[line_type][stage][property_name]
+        return np.broadcast_to(value, (self.n_batches,))
+
+    def get_stage_distribution(self, line_type: str, stage: str) -> dict[str, dict]:
+        """Summary statistics of every property of a stage.
+        Flags are summarised by the fraction of batches where they are set.
+        """
+        return {
+            property_name: summarise_values(value)
+            for property_name, value in self.stage_properties[line_type][stage].items()
+        }
+
+    def get_summary(self) -> dict:
+        """JSON-friendly report of the run."""
+        return {
+            "n_batches": self.n_batches,
+            "elapsed_seconds": round(self.elapsed_seconds, 4),
+            "pass_rate": self.pass_rate,
+            "stage_pass_rates": self.get_stage_pass_rates(),
+            "stage_distributions": {
+                line_type: {
+                    stage: self.get_stage_distribution(line_type, stage)
+                    for stage in line_properties
+                }
+                for line_type, line_properties in self.stage_properties.items()
+            },
+        }
+
+
+def summarise_values(values) -> dict:
+    values = np.asarray(values)
+    if values.ndim == 0:
+        # the same value for every batch
+        return {"value": values.item()}
+    if values.dtype == bool:
+        return {"rate": float(np.mean(values))}
+    percentiles = np.percentile(values, PERCENTILES)
+    summary = {
+        "mean": float(np.mean(values)),
+        "std": float(np.std(values)),
+        "min": float(np.min(values)),
+        "max": float(np.max(values)),
+    }
+    for percentile, value in zip(PERCENTILES, percentiles):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+
+class MonteCarloSimulation:
+    """
+    Runs N virtual batches through the full chain (mixing -> ... -> aging) with array-backed models.
+    The stages are run by their own machines (unthrottled, without event bus), separate from the
+    plant's machines, so the step logic and the model equations are the ones of the plant.
+
+    Args:
+        n_batches (int): Number of virtual batches
+        machine_parameters (dict): Optional parameter overrides, keyed by line type then stage
+        seed (int): Optional seed of the run; every stage draws its noise from its own generator spawned
+            from it, like the stages of a batch
+        stage_cache (StageOutputCache): Optional cache reusing the outputs of deterministic stages
+            whose incoming models and parameters were already evaluated (e.g. by a previous run of a sweep)
+    """
+
+    def __init__(
+        self,
+        n_batches: int,
+        machine_parameters: Optional[dict] = None,
+        seed: Optional[int] = None,
+        stage_cache: Optional[StageOutputCache] = None,
+    ):
+        if n_batches < 1:
+            raise ValueError("The number of batches must be at least 1")
+        self.n_batches = n_batches
+        self.machine_parameters = machine_parameters
+        self.seed = seed
+        self.stage_cache = stage_cache
+
+    def run(self) -> MonteCarloResult:
+        start_time = time.perf_counter()
+        # a random seed when none is given
+        seed = np.random.SeedSequence(self.seed).entropy
+        machines = create_factory_structure(
+            clock=UnthrottledClock(), machine_parameters=self.machine_parameters
+        )
+        stage_properties = {}
+        stage_passed = {}
+        electrode_models = {}
+        for electrode_type in ["anode", "cathode"]:
+            model = MixingModel(
+                electrode_type.capitalize(),
+                rng=create_stage_generator(seed, electrode_type, "materials"),
+            )
+            model.randomise_properties(self.n_batches)
+            electrode_models[electrode_type] = self.__run_line(
+                electrode_type,
+                model,
+                machines[electrode_type],
+                stage_properties,
+                stage_passed,
+                seed,
+            )
+        # assemble the cells, like Batch.assemble_cell_line_model
+        cell_model = RewindingModel(
+            electrode_models["anode"], electrode_models["cathode"]
+        )
+        self.__run_line(
+            "cell", cell_model, machines["cell"], stage_properties, stage_passed, seed
+        )
+        return MonteCarloResult(
+            self.n_batches,
+            stage_properties,
+            stage_passed,
+            time.perf_counter() - start_time,
+        )
+
+    def __run_line(
+        self,
+        line_type: str,
+        model: BaseModel,
+        line_machines: dict[str, BaseMachine],
+        stage_properties: dict,
+        stage_passed: dict,
+        seed: int,
+    ) -> BaseModel:
+        stage_properties[line_type] = {}
+        stage_passed[line_type] = {}
+        for stage in FACTORY_LINES[line_type]:
+            machine = line_machines[stage]
+            machine.receive_model_from_previous_process(model)
+            machine.battery_model.rng = create_stage_generator(seed, line_type, stage)
+            self.__run_stage_with_cache(machine)
+            model = machine.empty_model()
+            if stage == "mixing":
+                # the slurry volumes are the same for every batch: give them a batch axis so that
+                # the downstream models (and their noise) are evaluated per batch
+                self.__broadcast_to_batches(model)
+            stage_properties[line_type][stage] = self.__collect_properties(model)
+            stage_passed[line_type][stage] = self.__get_passed(model)
+        return model
+
+    def __run_stage_with_cache(self, machine: BaseMachine):
+        model = machine.battery_model
+        if self.stage_cache is None or not self.stage_cache.is_cacheable(model):
+            self.__run_stage(machine)
+            return
+        if not machine.pre_run_check():
+            raise Exception("Implementation error!")
+        key = self.stage_cache.fingerprint(machine, model)
+        cached_stage = self.stage_cache.get(key)
+        if cached_stage is not None:
+            vars(model).update(copy_state(cached_stage.output_state))
+            return
+        self.__run_stage(machine)
+        self.stage_cache.put(
+            key,
+            CachedStage(
+                output_state=model.get_state(),
+                completed_steps=machine.total_steps,
+            ),
+        )
+
+    def __run_stage(self, machine: BaseMachine):
+        """Step through the stage like BaseMachine.run_simulation, for every batch at once.
+        Batches that reach the stop condition keep the state they had when they stopped.
+        """
+        if not machine.pre_run_check():
+            raise Exception("Implementation error!")
+        model = machine.battery_model
+        last_step = machine.total_steps - 1
+        # the intermediate updates can be skipped when the final state only depends on the last one
+        update_every_step = model.carries_state_between_steps or (
+            type(machine).stop_condition_reached
+            is not BaseMachine.stop_condition_reached
+        )
+        stopped = np.zeros(self.n_batches, dtype=bool)
+        for t in range(machine.total_steps):
+            stopped = stopped | machine.stop_condition_reached()
+            if stopped.all():
+                break
+            machine.step_logic(t, verbose=False)
+            if not update_every_step and t != last_step:
+                continue
+            if not stopped.any():
+                model.update_properties(machine.machine_parameters, t)
+                continue
+            previous_state = dict(vars(model))
+            model.update_properties(machine.machine_parameters, t)
+            for name, value in vars(model).items():
+                previous_value = previous_state.get(name)
+                if value is not previous_value and self.__is_numeric(value):
+                    setattr(model, name, np.where(stopped, previous_value, value))
+
+    def __broadcast_to_batches(self, model: BaseModel):
+        for name, value in vars(model).items():
+            if self.__is_numeric(value):
+                setattr(model, name, np.broadcast_to(value, (self.n_batches,)).copy())
+
+    def __collect_properties(self, model: BaseModel) -> dict:
+        properties = {}
+        for name, value in vars(model).items():
+            if not self.__is_numeric(value):
+                continue
+            value = np.asarray(value)
+            # keep a single value when it is the same for every batch
+            if value.ndim == 0 or np.all(value == value.flat[0]):
+                value = value.flat[0].item()
+            properties[name] = value
+        return properties
+
+    def __get_passed(self, model: BaseModel) -> np.ndarray:
+        # the inspection gives an overall verdict, the other stages flag a defect risk
+        if hasattr(model, "overall"):
+            passed = np.asarray(model.overall, dtype=bool)
+        elif hasattr(model, "defect_risk"):
+            passed = ~np.asarray(model.defect_risk, dtype=bool)
+        else:
+            passed = np.asarray(True)
+        return np.broadcast_to(passed, (self.n_batches,)).copy()
+
+    @staticmethod
+    def __is_numeric(value) -> bool:
+        return isinstance(value, (Number, np.ndarray, np.generic)) and not isinstance(
+            value, (str, bytes)
+        )
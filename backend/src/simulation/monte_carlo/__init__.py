@@ -0,0 +1,7 @@
+# Monte Carlo package initialization
+from .MonteCarloSimulation import MonteCarloSimulation, MonteCarloResult
+
+__all__ = [
+    'MonteCarloSimulation',
+    'MonteCarloResult',
+]
@@ -0,0 +1,306 @@
+"""
+Process-pool execution of the plant: each batch (or each line of a batch) is computed in a worker
+process, with its own machines and an unthrottled clock, so the numeric work of many batches runs
+on every core instead of serialising on the GIL of the server process.
+Only compact state crosses the process boundary: the models as (class name, attributes), the
+machine parameters, and the events the parent listens to, which the parent replays on its event bus.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Optional
+from simulation.battery_model import (
+    BaseModel,
+    RewindingModel,
+    export_model_state,
+    import_model_state,
+)
+from simulation.clock import UnthrottledClock
+from simulation.event_bus.events import (
+    EventBus,
+    PlantSimulationEvent,
+    PlantSimulationEventType,
+)
+from simulation.factory.Batch import StageSnapshot, create_stage_generator
+from simulation.factory.FactoryStructure import FACTORY_LINES, create_factory_structure
+from simulation.machine import BaseMachine
+
+# (model class name, model attributes): enough to rebuild the model on the other side
+ModelState = tuple[str, dict]
+# (event type value, simulated time, data)
+ForwardedEvent = tuple[str, datetime, dict]
+
+LINE_EVENT_TYPES = {
+    "anode": (
+        PlantSimulationEventType.BATCH_STARTED_ANODE_LINE,
+        PlantSimulationEventType.BATCH_COMPLETED_ANODE_LINE,
+    ),
+    "cathode": (
+        PlantSimulationEventType.BATCH_STARTED_CATHODE_LINE,
+        PlantSimulationEventType.BATCH_COMPLETED_CATHODE_LINE,
+    ),
+    "cell": (
+        PlantSimulationEventType.BATCH_STARTED_CELL_LINE,
+        PlantSimulationEventType.BATCH_COMPLETED_CELL_LINE,
+    ),
+}
+
+
+@dataclass
+class LineRunTask:
+    """Work shipped to a worker: run some lines of a batch from the given models."""
+
+    batch_id: str
+    # seed of the batch, the stages draw their noise from generators spawned from it
+    seed: int
+    # lines to run, in order; the cell line is assembled from the anode and cathode models
+    line_types: list[str]
+    # line type -> state of the model entering the line (finished electrodes for the cell line)
+    model_states: dict[str, ModelState]
+    # line type -> stage -> machine parameters
+    machine_parameters: dict
+    start_time: datetime
+    # values of the event types the parent listens to (the others are not recorded)
+    forwarded_event_types: frozenset
+
+
+@dataclass
+class LineRunResult:
+    batch_id: str
+    # line type -> state of the model leaving the line
+    model_states: dict[str, ModelState]
+    end_time: datetime
+    # recorded events, in simulated time order
+    events: list[ForwardedEvent]
+    # (line type, stage) -> snapshot taken when the stage started
+    stage_snapshots: dict[tuple[str, str], StageSnapshot]
+
+
+def run_lines_in_worker(task: LineRunTask) -> LineRunResult:
+    """Runs in the worker process. Electrode lines start together at task.start_time (they run
+    concurrently in the plant), the cell line starts once both are finished."""
+    clock = UnthrottledClock(start_time=task.start_time)
+    event_bus = EventBus(clock=clock)
+    events: list[ForwardedEvent] = []
+
+    def __record_event(event: PlantSimulationEvent):
+        data = {"batch_id": task.batch_id, **event.data}
+        events.append(
+            (event.event_type.value, datetime.fromisoformat(event.timestamp), data)
+        )
+
+    for event_type_value in task.forwarded_event_types:
+        event_bus.subscribe(PlantSimulationEventType(event_type_value), __record_event)
+
+    machines = create_factory_structure(
+        event_bus=event_bus, clock=clock, machine_parameters=task.machine_parameters
+    )
+    models = {
+        line_type: import_model_state(state)
+        for line_type, state in task.model_states.items()
+    }
+    end_times: dict[str, datetime] = {}
+    stage_snapshots: dict[tuple[str, str], StageSnapshot] = {}
+    for line_type in task.line_types:
+        start_time = task.start_time
+        if line_type == "cell":
+            start_time = max(end_times.values(), default=task.start_time)
+            models["cell"] = RewindingModel(models["anode"], models["cathode"])
+            event_bus.emit_plant_simulation_event(
+                PlantSimulationEventType.BATCH_ASSEMBLED,
+                {"batch_id": task.batch_id},
+                start_time,
+            )
+        started_event_type, completed_event_type = LINE_EVENT_TYPES[line_type]
+        event_bus.emit_plant_simulation_event(
+            started_event_type, {"batch_id": task.batch_id}, start_time
+        )
+        models[line_type], end_times[line_type] = run_line(
+            machines[line_type],
+            line_type,
+            models[line_type],
+            start_time,
+            stage_snapshots,
+            task.seed,
+        )
+        event_bus.emit_plant_simulation_event(
+            completed_event_type, {"batch_id": task.batch_id}, end_times[line_type]
+        )
+    # interleave the lines in simulated time, like the plant emits them
+    events.sort(key=lambda event: event[1])
+    return LineRunResult(
+        batch_id=task.batch_id,
+        model_states={
+            line_type: export_model_state(models[line_type])
+            for line_type in task.line_types
+        },
+        end_time=max(end_times.values()),
+        events=events,
+        stage_snapshots=stage_snapshots,
+    )
+
+
+def run_line(
+    line_machines: dict[str, BaseMachine],
+    line_type: str,
+    model: BaseModel,
+    start_time: datetime,
+    stage_snapshots: dict[tuple[str, str], StageSnapshot],
+    seed: int,
+) -> tuple[BaseModel, datetime]:
+    """Runs the stages of a line back to back, returns the final model and the simulated end time."""
+    # a clock per line: the electrode lines of a batch overlap in simulated time
+    line_clock = UnthrottledClock(start_time=start_time)
+    for stage in FACTORY_LINES[line_type]:
+        machine = line_machines[stage]
+        machine.clock = line_clock
+        stage_snapshots[(line_type, stage)] = StageSnapshot(
+            export_model_state(model), machine.machine_parameters
+        )
+        machine.receive_model_from_previous_process(model)
+        machine.battery_model.rng = create_stage_generator(seed, line_type, stage)
+        machine.run_simulation(verbose=False, start_time=line_clock.now())
+        model = machine.empty_model()
+    return model, line_clock.now()
+
+
+class ProcessPoolRunner:
+    """
+    Runs batches in a pool of worker processes, per batch or per line.
+    Per line, the anode and cathode lines of a batch run in two workers, then the cell line in a third.
+    Callbacks are called from the pool's result thread.
+
+    Args:
+        max_workers: number of worker processes (defaults to the number of cores)
+        per_line: whether each line of a batch is a separate task
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, per_line: bool = False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.per_line = per_line
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__lock = Lock()
+
+    def __get_executor(self) -> ProcessPoolExecutor:
+        with self.__lock:
+            if self.__executor is None:
+                # spawn: forking a process that runs threads (scheduler, server) is unsafe
+                self.__executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self.__executor
+
+    def run_batch(
+        self,
+        batch_id: str,
+        seed: int,
+        electrode_models: dict[str, BaseModel],
+        machine_parameters: dict,
+        start_time: datetime,
+        forwarded_event_types: frozenset,
+        on_result: Callable[[LineRunResult], None],
+        on_completed: Callable[[dict[str, BaseModel], datetime], None],
+        on_error: Callable[[BaseException], None],
+    ):
+        """Runs the batch from its anode and cathode models.
+        on_result is called with the result of every task (its events to replay), then on_completed
+        with the final model of every line (rebuilt in this process) and the simulated end time of the batch.
+        """
+
+        def __create_task(line_types, model_states, task_start_time):
+            return LineRunTask(
+                batch_id=batch_id,
+                seed=seed,
+                line_types=line_types,
+                model_states=model_states,
+                machine_parameters=machine_parameters,
+                start_time=task_start_time,
+                forwarded_event_types=forwarded_event_types,
+            )
+
+        electrode_states = {
+            line_type: export_model_state(model)
+            for line_type, model in electrode_models.items()
+        }
+        if not self.per_line:
+            task = __create_task(["anode", "cathode", "cell"], electrode_states, start_time)
+
+            def __on_batch_result(result: LineRunResult):
+                on_result(result)
+                on_completed(self.__import_models(result.model_states), result.end_time)
+
+            self.__submit(task, __on_batch_result, on_error)
+            return
+
+        electrode_results: dict[str, LineRunResult] = {}
+        results_lock = Lock()
+
+        def __on_electrode_result(result: LineRunResult):
+            on_result(result)
+            line_type = next(iter(result.model_states))
+            with results_lock:
+                electrode_results[line_type] = result
+                if len(electrode_results) < 2:
+                    return
+            cell_task = __create_task(
+                ["cell"],
+                {
+                    line_type: electrode_result.model_states[line_type]
+                    for line_type, electrode_result in electrode_results.items()
+                },
+                max(
+                    electrode_result.end_time
+                    for electrode_result in electrode_results.values()
+                ),
+            )
+            self.__submit(cell_task, __on_cell_result, on_error)
+
+        def __on_cell_result(result: LineRunResult):
+            on_result(result)
+            model_states = {
+                line_type: electrode_result.model_states[line_type]
+                for line_type, electrode_result in electrode_results.items()
+            }
+            model_states.update(result.model_states)
+            on_completed(self.__import_models(model_states), result.end_time)
+
+        for line_type in ["anode", "cathode"]:
+            task = __create_task(
+                [line_type], {line_type: electrode_states[line_type]}, start_time
+            )
+            self.__submit(task, __on_electrode_result, on_error)
+
+    @staticmethod
+    def __import_models(model_states: dict[str, ModelState]) -> dict[str, BaseModel]:
+        return {
+            line_type: import_model_state(state)
+            for line_type, state in model_states.items()
+        }
+
+    def __submit(
+        self,
+        task: LineRunTask,
+        on_done: Callable[[LineRunResult], None],
+        on_error: Callable[[BaseException], None],
+    ):
+        def __on_future_done(future: Future):
+            error = future.exception()
+            if error is not None:
+                on_error(error)
+            else:
+                on_done(future.result())
+
+        self.__get_executor().submit(run_lines_in_worker, task).add_done_callback(
+            __on_future_done
+        )
+
+    def shutdown(self, wait: bool = True):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait=wait)
+                self.__executor = None
@@ -0,0 +1,12 @@
+# Process pool package initialization
+from .ProcessPoolRunner import (
+    ProcessPoolRunner,
+    export_model_state,
+    import_model_state,
+)
+
+__all__ = [
+    'ProcessPoolRunner',
+    'export_model_state',
+    'import_model_state',
+]
@@ -0,0 +1,141 @@
+"""
+Discrete-event scheduling of the plant simulation.
+Every action of the plant (a machine step, the start of a stage, a batch moving to the next line)
+is a timed event in a priority queue. One thread pops the events in simulated time order, lets the
+clock pace them, and runs them, so batches do not need an OS thread of their own.
+"""
+
+import heapq
+import itertools
+import traceback
+from collections import deque
+from datetime import datetime
+from threading import Condition, RLock, Thread
+from typing import Callable, Optional
+from simulation.clock import SimulationClock
+
+# longest wall time the worker waits before re-reading the clock: a change of the clock's speed
+# takes effect within it
+MAX_WAIT_SECONDS = 0.05
+
+
+class DiscreteEventScheduler:
+    """
+    Priority queue of timed actions run by a single worker thread.
+    Actions scheduled for the same time run in scheduling order, so runs are deterministic.
+
+    Args:
+        clock: paces the events (the worker waits on the clock until an event is due)
+        condition: lock held while an action runs; share it with the owner of the simulated state
+            so other threads never see a half-applied action (must be re-entrant)
+    """
+
+    def __init__(
+        self,
+        clock: SimulationClock,
+        condition: Optional[Condition] = None,
+        name: str = "DiscreteEventScheduler",
+    ):
+        self.__clock = clock
+        self.__condition = condition or Condition(RLock())
+        self.__name = name
+        # heap of (time, sequence number, action, args). PROTECTED by condition.
+        self.__event_queue: list = []
+        self.__sequence = itertools.count()
+        self.__worker_thread: Optional[Thread] = None
+        # simulated time of the event being run (None outside of actions)
+        self.current_time: Optional[datetime] = None
+
+    def now(self) -> datetime:
+        """Simulated time of the running event, or the clock's time outside of actions."""
+        return self.current_time or self.__clock.now()
+
+    def schedule(self, at: datetime, action: Callable, *args):
+        """Run action(*args) when the simulated time reaches 'at'."""
+        with self.__condition:
+            heapq.heappush(
+                self.__event_queue, (at, next(self.__sequence), action, args)
+            )
+            self.__ensure_worker_thread()
+            self.__condition.notify_all()
+
+    def schedule_now(self, action: Callable, *args):
+        self.schedule(self.now(), action, *args)
+
+    def get_pending_event_count(self) -> int:
+        with self.__condition:
+            return len(self.__event_queue)
+
+    def __ensure_worker_thread(self):
+        if self.__worker_thread is None or not self.__worker_thread.is_alive():
+            self.__worker_thread = Thread(
+                target=self.__run_loop, name=self.__name, daemon=True
+            )
+            self.__worker_thread.start()
+
+    def __run_loop(self):
+        while True:
+            with self.__condition:
+                self.__wait_for_next_event()
+                event_time, _, action, args = heapq.heappop(self.__event_queue)
+                self.current_time = event_time
+                try:
+                    action(*args)
+                except Exception:
+                    # general error handling: one failing action must not stop the simulation
+                    print(f"Error in scheduled simulation event {action}:")
+                    traceback.print_exc()
+                finally:
+                    self.current_time = None
+                    # let threads waiting on the shared condition re-check the simulated state
+                    self.__condition.notify_all()
+
+    def __wait_for_next_event(self):
+        """Waits (condition held) until the event at the head of the queue is due. The wait is on
+        the condition, so that an earlier event scheduled meanwhile becomes the head and is run
+        first, and other threads use the simulated state while the worker waits."""
+        while True:
+            while not self.__event_queue:
+                self.__condition.wait()
+            next_event_time = self.__event_queue[0][0]
+            if not self.__clock.throttled:
+                # never blocks: only moves the simulated time forward
+                self.__clock.wait_until(next_event_time)
+                return
+            remaining = (next_event_time - self.__clock.now()).total_seconds()
+            if remaining <= 0:
+                return
+            self.__condition.wait(
+                timeout=min(remaining / self.__clock.speed_factor, MAX_WAIT_SECONDS)
+            )
+
+
+class SimulationResource:
+    """
+    A resource used by one process at a time (e.g. a machine). Requests are granted in FIFO order;
+    a waiting request is only a callback in the queue, not a blocked thread.
+    """
+
+    def __init__(self, name: str, scheduler: DiscreteEventScheduler):
+        self.name = name
+        self.__scheduler = scheduler
+        self.__waiting_requests: deque[Callable] = deque()
+        self.busy = False
+
+    def request(self, on_acquired: Callable):
+        """Call on_acquired once the resource is granted (immediately when it is free)."""
+        if self.busy:
+            self.__waiting_requests.append(on_acquired)
+        else:
+            self.busy = True
+            on_acquired()
+
+    def release(self):
+        """Release the resource, handing it to the next waiting request (as a new event)."""
+        if self.__waiting_requests:
+            self.__scheduler.schedule_now(self.__waiting_requests.popleft())
+        else:
+            self.busy = False
+
+    def get_waiting_request_count(self) -> int:
+        return len(self.__waiting_requests)
@@ -0,0 +1,7 @@
+# Scheduler package initialization
+from .DiscreteEventScheduler import DiscreteEventScheduler, SimulationResource
+
+__all__ = [
+    'DiscreteEventScheduler',
+    'SimulationResource',
+]